@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Publication groupée - Messages sortants du manager envoyés par lots pipelinés
+Les PUBLISH (annonces, sélections, notifications) sont mis en file puis envoyés
+en un pipeline par nœud Redis, dès qu'un lot est complet ou que le premier
+message a attendu `linger` secondes. L'ordre est conservé sur chaque nœud.
+
+Débit et contre-pression (côté producteur, via admit()):
+    - seau à jetons: au plus `rate` annonces par seconde, rafales de `burst`
+    - si la latence des flush dépasse `latency_target`, le débit est divisé par
+      deux (jusqu'à MIN_RATE_FACTOR) et le producteur attend que la file se vide;
+      il remonte ensuite progressivement quand Redis redevient rapide
+    - file bornée: publish() bloque quand elle est pleine (message perdu après
+      PUT_TIMEOUT secondes)
+
+Un lot dont le pipeline échoue est renvoyé en tête d'un flush après RETRY_INTERVAL
+(l'ordre par nœud est gardé: les nouveaux messages de ce nœud attendent derrière
+lui), au plus MAX_SEND_ATTEMPTS fois avant d'être compté comme perdu.
+"""
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from console import get_logger
+from metrics import REGISTRY
+
+# Lots: taille maximale et attente maximale du premier message
+DEFAULT_MAX_BATCH = 100
+DEFAULT_LINGER = 0.005
+DEFAULT_MAX_QUEUE = 10000
+PUT_TIMEOUT = 5.0
+
+# Renvoi des lots en échec (Redis coupé ou lent)
+MAX_SEND_ATTEMPTS = 5
+RETRY_INTERVAL = 0.5
+
+# Débit des annonces (seau à jetons)
+DEFAULT_RATE = 500.0
+DEFAULT_BURST = 100
+
+# Contre-pression selon la latence des flush (moyenne glissante)
+DEFAULT_LATENCY_TARGET = 0.05
+LATENCY_SMOOTHING = 0.2
+MIN_RATE_FACTOR = 0.1
+RATE_RECOVERY_STEP = 0.1
+CONGESTION_WAIT_MAX = 1.0
+
+FLUSH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+log = get_logger('publisher')
+
+PUBLISHER_QUEUE_DEPTH = REGISTRY.gauge('dispatch_publisher_queue_depth', 'Messages en attente de publication')
+PUBLISHER_RATE = REGISTRY.gauge('dispatch_publisher_rate', 'Débit autorisé des annonces (par seconde)')
+PUBLISHER_FLUSH_SIZE = REGISTRY.histogram('dispatch_publisher_flush_size', 'Messages par flush',
+                                          buckets=FLUSH_SIZE_BUCKETS)
+PUBLISHER_FLUSH_SECONDS = REGISTRY.histogram('dispatch_publisher_flush_seconds', 'Durée des flush pipelinés')
+PUBLISHER_THROTTLE_SECONDS = REGISTRY.histogram('dispatch_publisher_throttle_seconds',
+                                                'Attente des producteurs (débit et contre-pression)')
+PUBLISHER_DROPPED_TOTAL = REGISTRY.counter('dispatch_publisher_dropped_total',
+                                           'Messages perdus (file pleine ou envois en échec)')
+PUBLISHER_RETRIED_TOTAL = REGISTRY.counter('dispatch_publisher_retried_total', 'Messages renvoyés après un échec')
+PUBLISHER_ERRORS_TOTAL = REGISTRY.counter('dispatch_errors_total', 'Erreurs du pipeline', {'component': 'publisher'})
+
+
+class TokenBucket:
+    """Seau à jetons: `rate` jetons par seconde, au plus `burst` en réserve"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Prend un jeton, en attendant si nécessaire; retourne l'attente en secondes"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class BatchingPublisher:
+    """File de PUBLISH vidée par lots pipelinés, avec limite de débit et contre-pression"""
+
+    def __init__(self, redis_client, max_batch: int = DEFAULT_MAX_BATCH, linger: float = DEFAULT_LINGER,
+                 max_queue: int = DEFAULT_MAX_QUEUE, rate: Optional[float] = DEFAULT_RATE,
+                 burst: float = DEFAULT_BURST, latency_target: float = DEFAULT_LATENCY_TARGET):
+        self.redis_client = redis_client
+        self.max_batch = max_batch
+        self.linger = linger
+        self.buffer = queue.Queue(maxsize=max_queue)
+        self.rate = rate
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.latency_target = latency_target
+        self.rate_factor = 1.0
+        self.flush_latency = 0.0
+        self.congested = False
+        self.drained = threading.Event()
+        self.drained.set()
+        self.running = False
+        self.sender_thread = None
+        self.flush_lock = threading.Lock()
+
+        # Messages des lots en échec (avec leur nombre d'essais), renvoyés en tête d'un flush après retry_at
+        self.failed: List[Tuple] = []
+        self.retry_at = 0.0
+
+        # Statistiques
+        self.stats = {
+            'published': 0,
+            'sent': 0,
+            'dropped': 0,
+            'failed_batches': 0,
+            'retried': 0,
+            'flushes': 0
+        }
+
+        PUBLISHER_QUEUE_DEPTH.track(self, lambda publisher: publisher.buffer.qsize())
+        PUBLISHER_RATE.track(self, lambda publisher: publisher.bucket.rate if publisher.bucket else 0)
+
+    def start(self):
+        """Démarre le thread d'envoi"""
+        self.running = True
+        self.sender_thread = threading.Thread(target=self._run)
+        self.sender_thread.daemon = True
+        self.sender_thread.start()
+
+    def stop(self):
+        """Arrête le thread et envoie ce qui reste dans la file"""
+        self.running = False
+        if self.sender_thread:
+            self.sender_thread.join(timeout=5)
+        self.flush()
+        PUBLISHER_QUEUE_DEPTH.untrack(self)
+        PUBLISHER_RATE.untrack(self)
+
+    def admit(self) -> float:
+        """Autorise la production d'une annonce (débit et contre-pression), retourne l'attente"""
+        waited = self.bucket.acquire() if self.bucket else 0.0
+        if self.congested:
+            # Redis lent: le producteur attend que les messages en file soient partis
+            start = time.monotonic()
+            self.drained.wait(CONGESTION_WAIT_MAX)
+            waited += time.monotonic() - start
+        if waited:
+            PUBLISHER_THROTTLE_SECONDS.observe(waited)
+        return waited
+
+    def publish(self, channel: str, message: str, client=None,
+                on_sent: Optional[Callable[[], None]] = None) -> bool:
+        """Met un message en file pour le nœud `client` (le client par défaut sinon)
+
+        Bloque si la file est pleine; on_sent() est appelé après l'envoi effectif.
+        """
+        self.drained.clear()
+        try:
+            self.buffer.put((client or self.redis_client, channel, message, on_sent, 0), timeout=PUT_TIMEOUT)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            PUBLISHER_DROPPED_TOTAL.inc()
+            log.error("❌ File de publication pleine: message perdu sur %s", channel)
+            return False
+        self.stats['published'] += 1
+        return True
+
+    def flush(self) -> int:
+        """Envoie immédiatement le contenu de la file (et les messages à renvoyer),
+        retourne le nombre de messages envoyés"""
+        sent = 0
+        with self.flush_lock:
+            while True:
+                batch = self._drain(self.max_batch)
+                if not batch and not self.failed:
+                    break
+                if not batch:
+                    # Redis coupé: les renvois restent espacés de RETRY_INTERVAL
+                    time.sleep(max(0.0, self.retry_at - time.monotonic()))
+                sent += self._send(batch)
+        self.drained.set()
+        return sent
+
+    def _drain(self, limit: int) -> List[Tuple]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.buffer.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch: List[Tuple]) -> int:
+        """Un pipeline par nœud Redis, dans l'ordre d'arrivée des messages (appelé sous flush_lock)"""
+        # Les messages en échec partent avant les nouveaux: l'ordre par nœud est gardé.
+        # Avant RETRY_INTERVAL, les nouveaux messages d'un nœud en échec attendent derrière eux
+        if self.failed:
+            if time.monotonic() >= self.retry_at:
+                retried = sum(1 for entry in self.failed if entry[4])
+                self.stats['retried'] += retried
+                PUBLISHER_RETRIED_TOTAL.inc(retried)
+                batch, self.failed = self.failed + batch, []
+            else:
+                waiting = {id(entry[0]) for entry in self.failed}
+                self.failed.extend(entry for entry in batch if id(entry[0]) in waiting)
+                batch = [entry for entry in batch if id(entry[0]) not in waiting]
+        if not batch:
+            return 0
+        by_client: Dict[int, Tuple[object, List[Tuple]]] = {}
+        for entry in batch:
+            by_client.setdefault(id(entry[0]), (entry[0], []))[1].append(entry)
+
+        sent = 0
+        start = time.perf_counter()
+        for client, entries in by_client.values():
+            try:
+                pipe = client.pipeline(transaction=False)
+                for _, channel, message, _, _ in entries:
+                    pipe.publish(channel, message)
+                pipe.execute()
+            except Exception as e:
+                self._failed(entries, e)
+                continue
+            sent += len(entries)
+            for _, _, _, on_sent, _ in entries:
+                if on_sent:
+                    on_sent()
+        elapsed = time.perf_counter() - start
+
+        PUBLISHER_FLUSH_SIZE.observe(len(batch))
+        PUBLISHER_FLUSH_SECONDS.observe(elapsed)
+        self.stats['sent'] += sent
+        self.stats['flushes'] += 1
+        self._adapt_rate(elapsed)
+        return sent
+
+    def _failed(self, entries: List[Tuple], error: Exception):
+        """Garde les messages d'un pipeline en échec pour le prochain flush, ou les abandonne
+        après MAX_SEND_ATTEMPTS essais"""
+        self.stats['failed_batches'] += 1
+        PUBLISHER_ERRORS_TOTAL.inc()
+        kept = [entry[:4] + (entry[4] + 1,) for entry in entries if entry[4] + 1 < MAX_SEND_ATTEMPTS]
+        lost = len(entries) - len(kept)
+        self.failed.extend(kept)
+        self.retry_at = time.monotonic() + RETRY_INTERVAL
+        if lost:
+            self.stats['dropped'] += lost
+            PUBLISHER_DROPPED_TOTAL.inc(lost)
+        log.error("❌ Erreur lors de la publication groupée (%d messages, %d à renvoyer, %d perdus): %s",
+                  len(entries), len(kept), lost, error)
+
+    def _adapt_rate(self, elapsed: float):
+        """Contre-pression: débit divisé par deux si Redis ralentit, remonté par paliers ensuite"""
+        self.flush_latency += LATENCY_SMOOTHING * (elapsed - self.flush_latency)
+        was_congested = self.congested
+        self.congested = self.flush_latency > self.latency_target
+        if self.congested:
+            self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+        elif self.flush_latency < self.latency_target / 2:
+            self.rate_factor = min(1.0, self.rate_factor + RATE_RECOVERY_STEP)
+        if self.bucket:
+            self.bucket.rate = self.rate * self.rate_factor
+        if self.congested and not was_congested:
+            log.warning("🐢 Redis lent (flush %.0f ms): débit des annonces réduit", self.flush_latency * 1000)
+        elif was_congested and not self.congested:
+            log.info("✅ Latence Redis revenue à %.0f ms", self.flush_latency * 1000)
+
+    def _run(self):
+        """Boucle du thread d'envoi: flush par taille ou après `linger`"""
+        while self.running:
+            try:
+                first = self.buffer.get(timeout=0.1)
+            except queue.Empty:
+                if self.failed and time.monotonic() >= self.retry_at:
+                    with self.flush_lock:
+                        self._send([])
+                if not self.failed:
+                    self.drained.set()
+                continue
+
+            # Attendre un lot complet sans retenir le premier message plus que `linger`
+            batch = [first]
+            deadline = time.monotonic() + self.linger
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.buffer.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            with self.flush_lock:
+                self._send(batch)
+            if self.buffer.empty() and not self.failed:
+                self.drained.set()
@@ -0,0 +1,4 @@
+"""
+Benchmarks - Mesures de bout en bout du système de livraison
+Lancement: python3 -m benchmarks.dispatch_benchmark --help
+"""
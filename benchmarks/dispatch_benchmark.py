@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Benchmark de bout en bout du dispatch
+Un DeliveryManager et N livreurs automatiques sur des scénarios scriptés:
+régime stable, rafale et rotation de la flotte (churn)
+
+Exemples:
+    python3 -m benchmarks.dispatch_benchmark --scenario steady --rate 50 --duration 10
+    python3 -m benchmarks.dispatch_benchmark --scenario burst --output burst.json --compare baseline.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import redis
+
+from benchmarks.redis_backend import open_backend
+from benchmarks.synthetic_data import make_dataset
+from console import set_console_level
+from livreur_redis import DeliveryPerson
+from manager_redis import CHANNELS, DeliveryManager
+
+SCENARIOS = ('steady', 'burst', 'churn')
+
+# Métriques comparées entre deux exécutions: (chemin, plus grand = meilleur)
+COMPARED_METRICS = [
+    (('announcements_per_sec',), True),
+    (('response_latency_ms', 'p50'), False),
+    (('response_latency_ms', 'p95'), False),
+    (('response_latency_ms', 'p99'), False),
+    (('assignment_latency_ms', 'p50'), False),
+    (('assignment_latency_ms', 'p95'), False),
+    (('assignment_latency_ms', 'p99'), False),
+]
+
+
+def percentiles(values: List[float]) -> Dict:
+    """p50/p95/p99 et moyenne en millisecondes"""
+    if not values:
+        return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'mean': None}
+    ordered = sorted(values)
+
+    def at(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'p50': at(0.50),
+        'p95': at(0.95),
+        'p99': at(0.99),
+        'mean': round(sum(ordered) / len(ordered) * 1000, 3)
+    }
+
+
+def process_usage(role: str, pid: Optional[int] = None) -> Dict:
+    """CPU (s) et mémoire (Ko) d'un processus, lus dans /proc si disponible"""
+    usage = {'role': role, 'pid': pid or os.getpid()}
+
+    if pid is None:
+        rusage = resource.getrusage(resource.RUSAGE_SELF)
+        usage['cpu_user_s'] = round(rusage.ru_utime, 3)
+        usage['cpu_system_s'] = round(rusage.ru_stime, 3)
+    else:
+        try:
+            with open(f'/proc/{pid}/stat') as stat_file:
+                fields = stat_file.read().rsplit(')', 1)[1].split()
+            ticks = os.sysconf('SC_CLK_TCK')
+            usage['cpu_user_s'] = round(int(fields[11]) / ticks, 3)
+            usage['cpu_system_s'] = round(int(fields[12]) / ticks, 3)
+        except (OSError, IndexError, ValueError):
+            pass
+
+    try:
+        with open(f'/proc/{usage["pid"]}/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    usage['rss_kb'] = int(line.split()[1])
+                elif line.startswith('VmHWM:'):
+                    usage['max_rss_kb'] = int(line.split()[1])
+    except OSError:
+        pass
+    return usage
+
+
+class BenchmarkManager(DeliveryManager):
+    """Manager qui enregistre chaque latence brute pour les percentiles"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.response_latencies = []
+        self.assignment_latencies = []
+
+    def _process_delivery_response(self, response):
+        started = self.announcement_started.get(response.announcement_id)
+        if started is not None:
+            self.response_latencies.append(time.perf_counter() - started)
+        super()._process_delivery_response(response)
+
+    def _cleanup_announcement(self, announcement_id, selection=None):
+        started = self.announcement_started.get(announcement_id)
+        if selection and started is not None:
+            self.assignment_latencies.append(time.perf_counter() - started)
+        super()._cleanup_announcement(announcement_id, selection)
+
+
+class CourierFleet:
+    """Livreurs automatiques dans le processus courant"""
+
+    def __init__(self, client_factory, count: int, prefix: str = 'bench'):
+        self.client_factory = client_factory
+        self.prefix = prefix
+        self.couriers = []
+        self.created = 0
+        for _ in range(count):
+            self.add()
+
+    def add(self):
+        self.created += 1
+        courier = DeliveryPerson(str(uuid.uuid4()), f"{self.prefix}-{self.created}",
+                                 redis_client=self.client_factory(), auto_respond=True)
+        courier.start()
+        self.couriers.append(courier)
+
+    def churn(self, fraction: float):
+        """Remplace une fraction des livreurs par de nouveaux"""
+        count = max(1, int(len(self.couriers) * fraction))
+        leaving = random.sample(self.couriers, min(count, len(self.couriers)))
+        for courier in leaving:
+            self.couriers.remove(courier)
+            # L'arrêt attend la fin des threads d'écoute: il ne doit pas bloquer le scénario
+            threading.Thread(target=courier.stop, daemon=True).start()
+        for _ in range(len(leaving)):
+            self.add()
+
+    def stop(self):
+        for courier in self.couriers:
+            threading.Thread(target=courier.stop, daemon=True).start()
+
+
+def _churn_loop(fleet: CourierFleet, interval: float, fraction: float, stop_event):
+    while not stop_event.wait(interval):
+        fleet.churn(fraction)
+
+
+def _courier_process_main(host, port, count, index, churn_interval, churn_fraction, stop_event, results):
+    """Processus de livreurs (backend redis-server uniquement)"""
+    set_console_level(logging.WARNING)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        fleet = CourierFleet(lambda: redis.Redis(host=host, port=port, decode_responses=True),
+                             count, prefix=f"bench{index}")
+        if churn_interval:
+            threading.Thread(target=_churn_loop, args=(fleet, churn_interval, churn_fraction, stop_event),
+                             daemon=True).start()
+        stop_event.wait()
+        fleet.stop()
+    results.put(process_usage(f'couriers-{index}'))
+
+
+def _wait_for_subscribers(client, count: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        subscribed = dict(client.pubsub_numsub(CHANNELS['ORDER_ANNOUNCEMENT'])).get(CHANNELS['ORDER_ANNOUNCEMENT'], 0)
+        if subscribed >= count:
+            return
+        time.sleep(0.05)
+    raise RuntimeError(f"Les {count} livreurs ne se sont pas abonnés à temps")
+
+
+def _publish(manager, scenario: str, args) -> int:
+    """Publie les annonces du scénario, retourne le nombre publié"""
+    if scenario == 'burst':
+        for _ in range(args.burst_size):
+            manager.create_and_publish_announcement()
+        return args.burst_size
+
+    # Régime stable (avec ou sans churn): cadence fixe
+    interval = 1.0 / args.rate
+    total = int(args.rate * args.duration)
+    start = time.perf_counter()
+    for i in range(total):
+        delay = start + i * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        manager.create_and_publish_announcement()
+    return total
+
+
+def _drain(manager, selection_delay: float, timeout: float):
+    """Attend que les sélections en cours soient terminées"""
+    time.sleep(selection_delay)
+    deadline = time.monotonic() + timeout
+    last_count, stable_since = None, time.monotonic()
+    while time.monotonic() < deadline:
+        count = len(manager.assignment_latencies)
+        if count != last_count:
+            last_count, stable_since = count, time.monotonic()
+        elif time.monotonic() - stable_since >= 1.0:
+            return
+        time.sleep(0.1)
+
+
+def run_benchmark(args) -> Dict:
+    """Exécute un scénario et retourne les résultats"""
+    backend = open_backend(use_server=not args.no_server)
+    dataset = make_dataset(args.restaurants, seed=args.seed)
+    random.seed(args.seed)
+
+    stop_event = multiprocessing.Event()
+    results_queue = multiprocessing.Queue()
+    processes = []
+    fleet = None
+    churn_interval = args.churn_interval if args.scenario == 'churn' else 0
+
+    # Mode silencieux: la sortie console ne doit pas limiter le débit mesuré
+    if not args.verbose:
+        set_console_level(logging.WARNING)
+    devnull = open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(devnull if not args.verbose else sys.stdout):
+            manager = BenchmarkManager(dataset=dataset, redis_client=backend.client(),
+                                       auto_select=True, selection_delay=args.selection_delay)
+            manager.start()
+
+            # Les processus de livreurs ont besoin d'un vrai serveur Redis
+            if backend.server and args.courier_processes > 0:
+                host, port = backend.host_port
+                per_process = [args.couriers // args.courier_processes] * args.courier_processes
+                for i in range(args.couriers % args.courier_processes):
+                    per_process[i] += 1
+                for index, count in enumerate(per_process):
+                    process = multiprocessing.Process(
+                        target=_courier_process_main,
+                        args=(host, port, count, index, churn_interval, args.churn_fraction, stop_event, results_queue)
+                    )
+                    process.start()
+                    processes.append(process)
+            else:
+                fleet = CourierFleet(backend.client, args.couriers)
+                if churn_interval:
+                    threading.Thread(target=_churn_loop,
+                                     args=(fleet, churn_interval, args.churn_fraction, stop_event),
+                                     daemon=True).start()
+
+            _wait_for_subscribers(manager.redis_client, args.couriers)
+
+            publish_start = time.perf_counter()
+            published = _publish(manager, args.scenario, args)
+            publish_seconds = time.perf_counter() - publish_start
+
+            _drain(manager, args.selection_delay, args.drain_timeout)
+
+            stop_event.set()
+            if fleet:
+                fleet.stop()
+            manager.running = False
+
+        usages = [process_usage('manager' if fleet is None else 'manager+couriers')]
+        for process in processes:
+            process.join(timeout=15)
+        while not results_queue.empty() or len(usages) < len(processes) + 1:
+            try:
+                usages.append(results_queue.get(timeout=5))
+            except Exception:
+                break
+        if backend.server:
+            usages.append(process_usage('redis-server', backend.server.pid))
+    finally:
+        stop_event.set()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        backend.close()
+        devnull.close()
+
+    return {
+        'scenario': args.scenario,
+        'backend': backend.kind,
+        'timestamp': datetime.now().isoformat(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'config': {
+            'couriers': args.couriers,
+            'courier_processes': len(processes),
+            'rate': args.rate,
+            'duration': args.duration,
+            'burst_size': args.burst_size,
+            'churn_interval': churn_interval,
+            'churn_fraction': args.churn_fraction,
+            'selection_delay': args.selection_delay,
+            'restaurants': args.restaurants,
+            'seed': args.seed
+        },
+        'announcements': published,
+        'publish_seconds': round(publish_seconds, 3),
+        'announcements_per_sec': round(published / publish_seconds, 2) if publish_seconds else None,
+        'responses': len(manager.response_latencies),
+        'assigned': len(manager.assignment_latencies),
+        'response_latency_ms': percentiles(manager.response_latencies),
+        'assignment_latency_ms': percentiles(manager.assignment_latencies),
+        'processes': usages
+    }
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Compare deux exécutions, retourne la liste des régressions"""
+    regressions = []
+    print(f"\n{'='*60}")
+    print(f"📊 COMPARAISON AVEC LA RÉFÉRENCE")
+    print(f"{'='*60}")
+    for path, higher_is_better in COMPARED_METRICS:
+        current, reference = results, baseline
+        for key in path:
+            current = (current or {}).get(key)
+            reference = (reference or {}).get(key)
+        name = '.'.join(path)
+        if current is None or not reference:
+            print(f"   {name}: non comparable")
+            continue
+
+        change = (current - reference) / reference
+        worse = -change if higher_is_better else change
+        marker = "❌" if worse > tolerance else "✅"
+        print(f"   {marker} {name}: {reference} → {current} ({change:+.1%})")
+        if worse > tolerance:
+            regressions.append(name)
+    print(f"{'='*60}")
+    return regressions
+
+
+def print_results(results: Dict):
+    print(f"\n{'='*60}")
+    print(f"🏁 BENCHMARK {results['scenario'].upper()} ({results['backend']})")
+    print(f"{'='*60}")
+    print(f"📢 Annonces: {results['announcements']} ({results['announcements_per_sec']} /s)")
+    print(f"📨 Réponses: {results['responses']} - Sélections: {results['assigned']}")
+    for label, key in (("Annonce → réponse", 'response_latency_ms'), ("Annonce → sélection", 'assignment_latency_ms')):
+        latency = results[key]
+        print(f"⏱️  {label}: p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms")
+    for usage in results['processes']:
+        print(f"🖥️  {usage['role']} (pid {usage['pid']}): CPU {usage.get('cpu_user_s')}s user / "
+              f"{usage.get('cpu_system_s')}s sys, RSS {usage.get('rss_kb')} Ko (max {usage.get('max_rss_kb')} Ko)")
+    print(f"{'='*60}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bout en bout du dispatch")
+    parser.add_argument('--scenario', choices=SCENARIOS, default='steady')
+    parser.add_argument('--couriers', type=int, default=20, help="nombre de livreurs automatiques")
+    parser.add_argument('--courier-processes', type=int, default=2,
+                        help="processus de livreurs (redis-server uniquement, 0 = dans le processus du manager)")
+    parser.add_argument('--rate', type=float, default=20.0, help="annonces par seconde (steady, churn)")
+    parser.add_argument('--duration', type=float, default=10.0, help="durée de publication en secondes (steady, churn)")
+    parser.add_argument('--burst-size', type=int, default=500, help="annonces publiées d'un coup (burst)")
+    parser.add_argument('--churn-interval', type=float, default=2.0, help="secondes entre deux rotations (churn)")
+    parser.add_argument('--churn-fraction', type=float, default=0.2, help="part de la flotte remplacée (churn)")
+    parser.add_argument('--selection-delay', type=float, default=0.5, help="délai avant sélection automatique")
+    parser.add_argument('--drain-timeout', type=float, default=30.0)
+    parser.add_argument('--restaurants', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-server', action='store_true', help="forcer le Redis en mémoire")
+    parser.add_argument('--verbose', action='store_true', help="garder les affichages du manager")
+    parser.add_argument('--output', help="fichier JSON des résultats")
+    parser.add_argument('--compare', help="fichier JSON de référence")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="dégradation tolérée (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, ensure_ascii=False)
+        print(f"💾 Résultats écrits dans {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark mémoire et codec des messages (models.py)
+Octets par annonce ouverte (annonce + réponses gardées par le manager) avec les
+classes compactes et avec les anciens dictionnaires, puis débit d'encodage et de
+décodage JSON (orjson si installé, json sinon)
+
+Exemples:
+    python3 -m benchmarks.memory_benchmark --announcements 10000 --responses 5
+    python3 -m benchmarks.memory_benchmark --output memory.json
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import models
+from benchmarks.synthetic_data import make_dataset
+from models import Announcement, Response
+from orders import build_announcement, create_random_order
+
+
+def make_messages(dataset, announcement_count: int, responses_per_announcement: int) -> List:
+    """Annonces synthétiques et leurs réponses: [(annonce, [réponses])]"""
+    messages = []
+    for _ in range(announcement_count):
+        announcement = build_announcement(create_random_order(dataset, None), {})
+        responses = [
+            Response(
+                response_id=str(uuid.uuid4()),
+                delivery_person_id=f"bench-{i}",
+                delivery_person_name=f"Livreur {i}",
+                announcement_id=announcement.announcement_id,
+                is_interested=random.random() < 0.7,
+                estimated_arrival_time=random.randint(5, 30),
+                current_location="Centre-ville",
+                response_time=datetime.now().isoformat()
+            )
+            for i in range(responses_per_announcement)
+        ]
+        messages.append((announcement, responses))
+    return messages
+
+
+def measure(build: Callable[[], object]) -> int:
+    """Octets alloués (et encore vivants) par build()"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def throughput(function: Callable, values: List, repeat: int = 3) -> float:
+    """Appels par seconde (meilleur de `repeat` passages)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for value in values:
+            function(value)
+        best = min(best, time.perf_counter() - start)
+    return round(len(values) / best, 1) if best > 0 else 0.0
+
+
+def run(announcement_count: int, responses_per_announcement: int, restaurants: int) -> Dict:
+    random.seed(42)
+    dataset = make_dataset(restaurant_count=restaurants)
+    messages = make_messages(dataset, announcement_count, responses_per_announcement)
+
+    # Chaque variante est reconstruite depuis le JSON, comme à la réception d'un message
+    payloads = [(a.to_json(), [r.to_json() for r in responses]) for a, responses in messages]
+    model_bytes = measure(lambda: [(Announcement.from_json(a), [Response.from_json(r) for r in rs])
+                                   for a, rs in payloads])
+    dict_bytes = measure(lambda: [(json.loads(a), [json.loads(r) for r in rs]) for a, rs in payloads])
+
+    announcements = [a for a, _ in messages]
+    encoded = [a.to_json() for a in announcements]
+    encoded_text = [json.dumps(a.to_dict(), ensure_ascii=False) for a in announcements]
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'config': {
+            'announcements': announcement_count,
+            'responses_per_announcement': responses_per_announcement,
+            'restaurants': restaurants
+        },
+        'codec': 'orjson' if models.orjson is not None else 'json',
+        'bytes_per_open_announcement': {
+            'models': round(model_bytes / announcement_count),
+            'dicts': round(dict_bytes / announcement_count),
+            'saving_pct': round(100.0 * (dict_bytes - model_bytes) / dict_bytes, 1) if dict_bytes else 0.0
+        },
+        'payload_bytes': round(sum(len(e) for e in encoded) / announcement_count),
+        'announcements_per_sec': {
+            'encode': throughput(Announcement.to_json, announcements),
+            'decode': throughput(Announcement.from_json, encoded),
+            'encode_json': throughput(lambda a: json.dumps(a.to_dict(), ensure_ascii=False), announcements),
+            'decode_json': throughput(lambda e: Announcement.from_dict(json.loads(e)), encoded_text)
+        }
+    }
+
+
+def print_report(result: Dict):
+    config = result['config']
+    memory = result['bytes_per_open_announcement']
+    rates = result['announcements_per_sec']
+    print("🧬 BENCHMARK MÉMOIRE DES MESSAGES")
+    print("=" * 50)
+    print(f"📦 {config['announcements']} annonces ouvertes, {config['responses_per_announcement']} réponses chacune")
+    print(f"💾 Par annonce ouverte: {memory['models']} octets (models) / {memory['dicts']} octets (dicts), "
+          f"-{memory['saving_pct']}%")
+    print(f"📨 Taille JSON moyenne: {result['payload_bytes']} octets")
+    print(f"⚡ Codec {result['codec']}: {rates['encode']:.0f} encodages/s, {rates['decode']:.0f} décodages/s")
+    print(f"🐢 json (référence): {rates['encode_json']:.0f} encodages/s, {rates['decode_json']:.0f} décodages/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mémoire et codec des messages")
+    parser.add_argument('--announcements', type=int, default=10000)
+    parser.add_argument('--responses', type=int, default=5, help="Réponses gardées par annonce")
+    parser.add_argument('--restaurants', type=int, default=2000)
+    parser.add_argument('--output', help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    result = run(args.announcements, args.responses, args.restaurants)
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"📝 Résultats écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
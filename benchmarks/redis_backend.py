@@ -0,0 +1,223 @@
+"""
+Backend Redis des benchmarks
+Démarre un redis-server local, sinon bascule sur un Redis en mémoire dans le processus
+"""
+import queue
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+import redis
+
+try:
+    import fakeredis
+except ImportError:  # fakeredis est optionnel: le faux Redis minimal ci-dessous suffit au pub/sub
+    fakeredis = None
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class RedisServerProcess:
+    """redis-server local sans persistance, lancé pour la durée d'un benchmark"""
+
+    def __init__(self, port: Optional[int] = None):
+        self.port = port or _free_port()
+        self.process = None
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which('redis-server') is not None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def start(self, timeout: float = 5.0):
+        self.process = subprocess.Popen(
+            ['redis-server', '--port', str(self.port), '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        client = redis.Redis(host='127.0.0.1', port=self.port)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                client.ping()
+                return
+            except redis.ConnectionError:
+                time.sleep(0.05)
+        self.stop()
+        raise RuntimeError(f"redis-server n'a pas démarré sur le port {self.port}")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class _PubSubHub:
+    """Routage des messages entre les abonnés du faux Redis"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers: Dict[str, Set['InProcessPubSub']] = {}
+
+
+class InProcessPubSub:
+    """Abonnement pub/sub du faux Redis (API compatible redis-py)"""
+
+    def __init__(self, hub: _PubSubHub):
+        self.hub = hub
+        self.messages = queue.Queue()
+        self.channels: Set[str] = set()
+        self.closed = False
+
+    def subscribe(self, *channels):
+        with self.hub.lock:
+            for channel in channels:
+                self.hub.subscribers.setdefault(channel, set()).add(self)
+                self.channels.add(channel)
+                self.messages.put({'type': 'subscribe', 'pattern': None,
+                                   'channel': channel, 'data': len(self.channels)})
+
+    def unsubscribe(self, *channels):
+        with self.hub.lock:
+            for channel in channels or list(self.channels):
+                self.hub.subscribers.get(channel, set()).discard(self)
+                self.channels.discard(channel)
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        deadline = time.monotonic() + (timeout or 0.0)
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    message = self.messages.get(timeout=remaining)
+                else:
+                    message = self.messages.get_nowait()
+            except queue.Empty:
+                return None
+            if message is None:
+                return None
+            if ignore_subscribe_messages and message['type'] != 'message':
+                continue
+            return message
+
+    def listen(self):
+        while not self.closed:
+            message = self.messages.get()
+            if message is None:
+                break
+            yield message
+
+    def close(self):
+        self.unsubscribe()
+        self.closed = True
+        self.messages.put(None)
+
+
+class _InProcessPipeline:
+    """Pipeline du faux Redis: les commandes sont rejouées à execute()"""
+
+    def __init__(self, client: 'InProcessRedis'):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class InProcessRedis:
+    """Faux Redis minimal: pub/sub complet, lectures de données toujours vides
+
+    Utilisé quand ni redis-server ni fakeredis ne sont disponibles. Le dataset
+    partagé n'existe donc jamais et le manager utilise les données locales.
+    """
+
+    def __init__(self, hub: Optional[_PubSubHub] = None):
+        self.hub = hub or _PubSubHub()
+
+    def ping(self):
+        return True
+
+    def publish(self, channel, message):
+        if isinstance(message, bytes):
+            # Comme un client decode_responses=True: les abonnés reçoivent des chaînes
+            message = message.decode('utf-8')
+        with self.hub.lock:
+            subscribers = list(self.hub.subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.messages.put({'type': 'message', 'pattern': None, 'channel': channel, 'data': message})
+        return len(subscribers)
+
+    def pubsub(self, **kwargs):
+        return InProcessPubSub(self.hub)
+
+    def pipeline(self, transaction: bool = True):
+        return _InProcessPipeline(self)
+
+    def pubsub_numsub(self, *channels):
+        with self.hub.lock:
+            return [(channel, len(self.hub.subscribers.get(channel, ()))) for channel in channels]
+
+    def hgetall(self, key):
+        return {}
+
+    def hget(self, key, field):
+        return None
+
+    def get(self, key):
+        return None
+
+
+class RedisBackend:
+    """Fabrique de clients Redis pour un benchmark"""
+
+    def __init__(self, kind: str, client_factory: Callable, server: Optional[RedisServerProcess] = None):
+        self.kind = kind
+        self.client_factory = client_factory
+        self.server = server
+
+    @property
+    def host_port(self):
+        return ('127.0.0.1', self.server.port) if self.server else None
+
+    def client(self):
+        return self.client_factory()
+
+    def close(self):
+        if self.server:
+            self.server.stop()
+
+
+def open_backend(use_server: bool = True) -> RedisBackend:
+    """redis-server local si disponible, sinon fakeredis, sinon le faux Redis minimal"""
+    if use_server and RedisServerProcess.available():
+        server = RedisServerProcess()
+        server.start()
+        return RedisBackend('redis-server', lambda: redis.Redis(host='127.0.0.1', port=server.port,
+                                                                decode_responses=True), server)
+
+    if fakeredis is not None:
+        fake_server = fakeredis.FakeServer()
+        return RedisBackend('fakeredis', lambda: fakeredis.FakeRedis(server=fake_server, decode_responses=True))
+
+    hub = _PubSubHub()
+    return RedisBackend('in-process', lambda: InProcessRedis(hub))
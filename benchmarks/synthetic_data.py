@@ -0,0 +1,40 @@
+"""
+Données synthétiques des benchmarks
+Restaurants et menus générés autour de Birmingham, sans fichier CSV
+"""
+import numpy as np
+import pandas as pd
+
+from dataset import LocalDataset, prepare_menus
+
+CENTER_LAT = 33.5186
+CENTER_LNG = -86.8104
+CATEGORIES = ['Burgers, American', 'Pizza, Italian', 'Mexican', 'Desserts', 'Chinese, Asian', 'Sandwich']
+MENU_CATEGORIES = ['Picked for you', 'Mains', 'Sides', 'Desserts', 'Drinks']
+
+
+def make_dataset(restaurant_count: int = 5000, items_per_restaurant: int = 10, seed: int = 42) -> LocalDataset:
+    """Construit un LocalDataset synthétique reproductible"""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, restaurant_count + 1)
+
+    restaurants_df = pd.DataFrame({
+        'id': ids,
+        'name': [f"Restaurant {i}" for i in ids],
+        'full_address': [f"{i} Main St, Birmingham, AL" for i in ids],
+        'lat': CENTER_LAT + rng.normal(0, 0.05, restaurant_count),
+        'lng': CENTER_LNG + rng.normal(0, 0.05, restaurant_count),
+        'category': rng.choice(CATEGORIES, restaurant_count),
+        'price_range': rng.choice(['$', '$$', '$$$'], restaurant_count)
+    })
+
+    item_count = restaurant_count * items_per_restaurant
+    menus_df = pd.DataFrame({
+        'restaurant_id': np.repeat(ids, items_per_restaurant),
+        'category': rng.choice(MENU_CATEGORIES, item_count),
+        'name': [f"Item {i}" for i in range(item_count)],
+        'price': [f"{price:.2f} USD" for price in rng.uniform(2, 30, item_count)]
+    })
+    menus_df, rejected_count = prepare_menus(menus_df)
+
+    return LocalDataset(restaurants_df, menus_df, rejected_count)
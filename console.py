@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Console asynchrone - Sortie emoji du manager et des livreurs via logging
+Les threads d'écoute n'écrivent plus dans le terminal: chaque message passe
+par une file (QueueHandler) vidée par un unique thread d'écriture (QueueListener).
+
+Niveaux:
+    INFO     sortie habituelle (défaut, identique à l'affichage d'origine)
+    WARNING  mode silencieux: avertissements et erreurs seulement
+Le niveau initial vient de DISPATCH_LOG_LEVEL (DEBUG/INFO/WARNING/ERROR);
+DISPATCH_QUIET=1 active directement le mode silencieux.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+# Logger racine des scripts de livraison
+ROOT_LOGGER = 'dispatch'
+
+_log_queue = queue.Queue()
+_listener = None
+_start_lock = threading.Lock()
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Écrit sur le sys.stdout courant (compatible avec redirect_stdout)"""
+
+    def emit(self, record):
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+def _initial_level() -> int:
+    if os.environ.get('DISPATCH_QUIET', '') not in ('', '0'):
+        return logging.WARNING
+    level = logging.getLevelName(os.environ.get('DISPATCH_LOG_LEVEL', 'INFO').upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+def _start():
+    global _listener
+    with _start_lock:
+        if _listener is not None:
+            return
+        handler = _StdoutHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(_initial_level())
+        root.propagate = False
+        root.addHandler(logging.handlers.QueueHandler(_log_queue))
+
+        _listener = logging.handlers.QueueListener(_log_queue, handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger d'un composant (manager, courier, history...)"""
+    _start()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def flush_console():
+    """Attend que tous les messages en file soient écrits (avant un input())"""
+    if _listener is not None:
+        _log_queue.join()
+        sys.stdout.flush()
+
+
+def set_console_level(level: int):
+    _start()
+    logging.getLogger(ROOT_LOGGER).setLevel(level)
+
+
+def is_quiet() -> bool:
+    return not logging.getLogger(ROOT_LOGGER).isEnabledFor(logging.INFO)
+
+
+def toggle_quiet():
+    """Commande REPL: bascule entre sortie complète et mode silencieux"""
+    if is_quiet():
+        set_console_level(logging.INFO)
+        print("🔊 Sortie complète")
+    else:
+        set_console_level(logging.WARNING)
+        print("🔇 Mode silencieux: avertissements et erreurs seulement")
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Simulation des déplacements des livreurs - Moteur par ticks vectorisé (NumPy)
+Positions, états et trajets de milliers de livreurs sont tenus dans des tableaux
+et avancés tous ensemble à chaque tick. Les positions sont publiées par lots
+dans Redis (GEOADD en pipeline, clé couriers:geo).
+
+Cycle d'un livreur: libre -> vers le restaurant -> vers le client -> libre.
+Un DeliveryPerson créé avec simulation=... répond avec sa position simulée et
+part livrer quand il est sélectionné. Avec un zone_tracker, les livreurs libres
+de chaque zone lui sont signalés une fois par bucket (offre du surge).
+
+Exemple (flotte simulée + manager automatique dans le même processus):
+    python3 courier_simulation.py --couriers 2000 --rate 20 --with-manager
+    python3 courier_simulation.py --couriers 50000 --rate 20 --with-manager --batched-decisions
+"""
+import argparse
+import random
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import redis
+
+from spatial_index import DEFAULT_ZONE_KM, KM_PER_DEG_LAT, zone_for
+
+# Configuration Redis
+REDIS_HOST = 'localhost'
+REDIS_PORT = 6379
+REDIS_DB = 0
+
+# Clés Redis des positions et états simulés
+COURIER_GEO_KEY = 'couriers:geo'
+COURIER_STATE_KEY = 'couriers:state'
+
+# États des livreurs
+STATE_IDLE = 0
+STATE_TO_RESTAURANT = 1
+STATE_TO_CUSTOMER = 2
+STATE_NAMES = ['idle', 'to_restaurant', 'to_customer']
+
+# Paramètres par défaut
+CENTER_LAT = 33.5186
+CENTER_LNG = -86.8104
+DEFAULT_SPREAD_KM = 5.0
+DEFAULT_SPEED_KMH = 30.0
+DEFAULT_TICK_SECONDS = 1.0
+DEFAULT_TIME_SCALE = 10.0  # secondes simulées par seconde réelle
+DEFAULT_RESPONSE_RADIUS_KM = 3.0  # au-delà, le livreur ignore l'annonce
+PIPELINE_BATCH_SIZE = 1000
+INITIAL_CAPACITY = 1024
+
+
+def _distance_km(lat1, lng1, lat2, lng2):
+    """Distance approchée (équirectangulaire), suffisante à l'échelle d'une ville"""
+    dlat = (lat2 - lat1) * KM_PER_DEG_LAT
+    dlng = (lng2 - lng1) * KM_PER_DEG_LAT * np.cos(np.radians((lat1 + lat2) / 2))
+    return np.hypot(dlat, dlng)
+
+
+class CourierFleetSimulation:
+    """Flotte de livreurs simulée: tableaux NumPy avancés par ticks"""
+
+    # Un élément par livreur: position, état, cible courante et point de livraison
+    ARRAYS = (
+        ('lat', np.float64), ('lng', np.float64), ('state', np.int8),
+        ('target_lat', np.float64), ('target_lng', np.float64),
+        ('dropoff_lat', np.float64), ('dropoff_lng', np.float64),
+        ('dirty', bool), ('zone_row', np.int64), ('zone_col', np.int64),
+    )
+
+    def __init__(self, redis_client=None, center: Tuple[float, float] = (CENTER_LAT, CENTER_LNG),
+                 spread_km: float = DEFAULT_SPREAD_KM, speed_kmh: float = DEFAULT_SPEED_KMH,
+                 tick_seconds: float = DEFAULT_TICK_SECONDS, time_scale: float = DEFAULT_TIME_SCALE,
+                 response_radius_km: float = DEFAULT_RESPONSE_RADIUS_KM, seed: Optional[int] = None,
+                 zone_tracker=None):
+        self.redis_client = redis_client
+        self.center = center
+        self.spread_km = spread_km
+        self.speed_kmh = speed_kmh
+        self.tick_seconds = tick_seconds
+        self.time_scale = time_scale
+        self.response_radius_km = response_radius_km
+        self.rng = np.random.default_rng(seed)
+
+        self.count = 0
+        self.ids: List[str] = []
+        self.index_by_id: Dict[str, int] = {}
+        self.announcement_ids: List[Optional[str]] = []
+        self._allocate(INITIAL_CAPACITY)
+        # Rappels appelés (lat, lng) quand un livreur change de zone (abonnements par zone)
+        self.zone_watchers: Dict[int, Callable[[float, float], None]] = {}
+        self.zone_deg = DEFAULT_ZONE_KM / KM_PER_DEG_LAT
+        # Livreurs libres signalés au suivi des zones (zone_tracker.ZoneTracker), une fois par bucket
+        self.zone_tracker = zone_tracker
+        self._idle_bucket = None
+
+        self.lock = threading.Lock()
+        self.running = False
+        self.tick_thread = None
+        self.stats = {
+            'ticks': 0,
+            'assignments': 0,
+            'pickups': 0,
+            'deliveries': 0,
+            'pickup_distance_km': 0.0,
+            'location_updates': 0,
+            'tick_seconds': 0.0
+        }
+
+    def _allocate(self, capacity: int):
+        """(Ré)alloue les tableaux de la flotte en conservant les livreurs existants"""
+        for name, dtype in self.ARRAYS:
+            array = np.zeros(capacity, dtype=dtype)
+            previous = getattr(self, name, None)
+            if previous is not None:
+                array[:len(previous)] = previous
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def add_courier(self, courier_id: str, lat: Optional[float] = None, lng: Optional[float] = None) -> int:
+        """Ajoute un livreur (position aléatoire autour du centre par défaut) et retourne son index"""
+        with self.lock:
+            if self.count == self.capacity:
+                self._allocate(self.capacity * 2)
+            index = self.count
+            if lat is None or lng is None:
+                offset_lat, offset_lng = self.rng.normal(0, self.spread_km / 2, 2)
+                lat = self.center[0] + offset_lat / KM_PER_DEG_LAT
+                lng = self.center[1] + offset_lng / (KM_PER_DEG_LAT * np.cos(np.radians(self.center[0])))
+            self.lat[index], self.lng[index] = lat, lng
+            self.zone_row[index] = np.floor(lat / self.zone_deg)
+            self.zone_col[index] = np.floor(lng / self.zone_deg)
+            self.state[index] = STATE_IDLE
+            self.dirty[index] = True
+            self.ids.append(courier_id)
+            self.announcement_ids.append(None)
+            self.index_by_id[courier_id] = index
+            self.count += 1
+            return index
+
+    def watch_zone(self, index: int, callback: Callable[[float, float], None]):
+        """callback(lat, lng) à chaque changement de zone du livreur (thread des ticks)"""
+        with self.lock:
+            self.zone_watchers[index] = callback
+
+    def position(self, index: int) -> Tuple[float, float]:
+        with self.lock:
+            return float(self.lat[index]), float(self.lng[index])
+
+    def is_idle(self, index: int) -> bool:
+        return self.state[index] == STATE_IDLE
+
+    def distance_to(self, index: int, lat: float, lng: float) -> float:
+        """Distance (km) entre un livreur et un point"""
+        with self.lock:
+            return float(_distance_km(self.lat[index], self.lng[index], lat, lng))
+
+    def pickup_distances(self, indices: np.ndarray, lats: np.ndarray, lngs: np.ndarray):
+        """Positions et disponibilité de plusieurs livreurs, et leurs distances (km) à plusieurs points
+
+        Retourne (lat, lng, idle, distances) avec distances[point, livreur].
+        """
+        with self.lock:
+            lat = self.lat[indices]
+            lng = self.lng[indices]
+            idle = self.state[indices] == STATE_IDLE
+        return lat, lng, idle, _distance_km(lat[None, :], lng[None, :], lats[:, None], lngs[:, None])
+
+    def assign(self, index: int, announcement_id: str, pickup: Tuple[float, float], dropoff: Tuple[float, float]) -> bool:
+        """Envoie un livreur libre chercher une commande; False s'il est déjà occupé"""
+        with self.lock:
+            if self.state[index] != STATE_IDLE:
+                return False
+            self.state[index] = STATE_TO_RESTAURANT
+            self.target_lat[index], self.target_lng[index] = pickup
+            self.dropoff_lat[index], self.dropoff_lng[index] = dropoff
+            self.announcement_ids[index] = announcement_id
+            self.dirty[index] = True
+            self.stats['assignments'] += 1
+            self.stats['pickup_distance_km'] += float(_distance_km(self.lat[index], self.lng[index], *pickup))
+            return True
+
+    def nearest_idle(self, lat: float, lng: float, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Index et distances des k livreurs libres les plus proches d'un point"""
+        with self.lock:
+            idle = np.flatnonzero(self.state[:self.count] == STATE_IDLE)
+            distances = _distance_km(self.lat[idle], self.lng[idle], lat, lng)
+        order = np.argsort(distances)[:k]
+        return idle[order], distances[order]
+
+    def tick(self, dt_seconds: float) -> List[str]:
+        """Avance tous les livreurs en route de dt_seconds; retourne les annonces livrées"""
+        start = time.perf_counter()
+        zone_changes = []
+        with self.lock:
+            n = self.count
+            moving = np.flatnonzero(self.state[:n] != STATE_IDLE)
+            delivered = []
+            if len(moving):
+                remaining = _distance_km(self.lat[moving], self.lng[moving],
+                                         self.target_lat[moving], self.target_lng[moving])
+                step = self.speed_kmh * dt_seconds / 3600.0
+                arrived = remaining <= step
+
+                # En route: avancer d'une fraction du trajet restant
+                travelling = moving[~arrived]
+                fraction = step / remaining[~arrived]
+                self.lat[travelling] += (self.target_lat[travelling] - self.lat[travelling]) * fraction
+                self.lng[travelling] += (self.target_lng[travelling] - self.lng[travelling]) * fraction
+
+                # Arrivés: se placer sur la cible puis passer à l'étape suivante
+                reached = moving[arrived]
+                self.lat[reached] = self.target_lat[reached]
+                self.lng[reached] = self.target_lng[reached]
+
+                at_restaurant = self.state[reached] == STATE_TO_RESTAURANT
+                picked_up = reached[at_restaurant]
+                dropped_off = reached[~at_restaurant]
+
+                self.state[picked_up] = STATE_TO_CUSTOMER
+                self.target_lat[picked_up] = self.dropoff_lat[picked_up]
+                self.target_lng[picked_up] = self.dropoff_lng[picked_up]
+
+                self.state[dropped_off] = STATE_IDLE
+                for index in dropped_off.tolist():
+                    delivered.append(self.announcement_ids[index])
+                    self.announcement_ids[index] = None
+
+                self.dirty[moving] = True
+                self.stats['pickups'] += len(picked_up)
+                self.stats['deliveries'] += len(dropped_off)
+                if self.zone_watchers:
+                    zone_changes = self._zone_changes(moving)
+
+            self.stats['ticks'] += 1
+            self.stats['tick_seconds'] += time.perf_counter() - start
+        # Rappels hors verrou (ils peuvent relire la position)
+        for callback, lat, lng in zone_changes:
+            callback(lat, lng)
+        return delivered
+
+    def _zone_changes(self, moving: np.ndarray) -> List[tuple]:
+        """Livreurs suivis passés dans une autre zone: (rappel, lat, lng) (appelé sous verrou)"""
+        rows = np.floor(self.lat[moving] / self.zone_deg).astype(np.int64)
+        cols = np.floor(self.lng[moving] / self.zone_deg).astype(np.int64)
+        changed = (rows != self.zone_row[moving]) | (cols != self.zone_col[moving])
+        indices = moving[changed]
+        self.zone_row[indices] = rows[changed]
+        self.zone_col[indices] = cols[changed]
+        return [(self.zone_watchers[index], float(self.lat[index]), float(self.lng[index]))
+                for index in indices.tolist() if index in self.zone_watchers]
+
+    def flush_locations(self) -> int:
+        """Publie les positions et états modifiés dans Redis (GEOADD/HSET en pipeline)"""
+        if self.redis_client is None:
+            return 0
+        with self.lock:
+            changed = np.flatnonzero(self.dirty[:self.count])
+            self.dirty[changed] = False
+            lats = self.lat[changed].tolist()
+            lngs = self.lng[changed].tolist()
+            states = self.state[changed].tolist()
+        ids = [self.ids[index] for index in changed.tolist()]
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for start in range(0, len(ids), PIPELINE_BATCH_SIZE):
+                end = start + PIPELINE_BATCH_SIZE
+                geo_values = []
+                for courier_id, lat, lng in zip(ids[start:end], lats[start:end], lngs[start:end]):
+                    geo_values.extend((lng, lat, courier_id))
+                pipe.geoadd(COURIER_GEO_KEY, geo_values)
+                pipe.hset(COURIER_STATE_KEY, mapping={courier_id: STATE_NAMES[state]
+                                                      for courier_id, state in zip(ids[start:end], states[start:end])})
+                pipe.execute()
+        except redis.RedisError:
+            # Republier ces livreurs au prochain flush
+            with self.lock:
+                self.dirty[changed] = True
+            raise
+        self.stats['location_updates'] += len(ids)
+        return len(ids)
+
+    def report_idle(self, now: Optional[float] = None) -> int:
+        """Signale les livreurs libres de chaque zone au zone_tracker; retourne leur nombre
+
+        Un seul signalement par bucket du tracker: ses compteurs sont des livreurs distincts par bucket.
+        """
+        if self.zone_tracker is None:
+            return 0
+        bucket = int((now if now is not None else time.time()) // self.zone_tracker.bucket_seconds)
+        if bucket == self._idle_bucket:
+            return 0
+        self._idle_bucket = bucket
+        with self.lock:
+            idle = np.flatnonzero(self.state[:self.count] == STATE_IDLE)
+            lats = self.lat[idle].tolist()
+            lngs = self.lng[idle].tolist()
+        by_zone: Dict[str, List[str]] = {}
+        for index, lat, lng in zip(idle.tolist(), lats, lngs):
+            by_zone.setdefault(zone_for(lat, lng), []).append(self.ids[index])
+        self.zone_tracker.couriers_idle(by_zone)
+        return len(lats)
+
+    def state_counts(self) -> Dict[str, int]:
+        with self.lock:
+            counts = np.bincount(self.state[:self.count], minlength=len(STATE_NAMES))
+        return {name: int(count) for name, count in zip(STATE_NAMES, counts)}
+
+    def start(self):
+        """Démarre la boucle de ticks (un tick réel = tick_seconds * time_scale simulées)"""
+        self.running = True
+        self.tick_thread = threading.Thread(target=self._run)
+        self.tick_thread.daemon = True
+        self.tick_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.tick_thread:
+            self.tick_thread.join(timeout=5)
+        self.flush_locations()
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while self.running:
+            self.tick(self.tick_seconds * self.time_scale)
+            self.report_idle()
+            try:
+                self.flush_locations()
+            except redis.RedisError:
+                pass  # positions gardées à publier, nouvel essai au prochain tick
+            next_tick += self.tick_seconds
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def summary(self) -> Dict:
+        """Qualité du dispatch et coût de la simulation"""
+        stats = dict(self.stats)
+        assignments = max(1, stats['assignments'])
+        ticks = max(1, stats['ticks'])
+        return {
+            'couriers': self.count,
+            'states': self.state_counts(),
+            'assignments': stats['assignments'],
+            'deliveries': stats['deliveries'],
+            'mean_pickup_distance_km': round(stats['pickup_distance_km'] / assignments, 3),
+            'mean_tick_ms': round(stats['tick_seconds'] / ticks * 1000, 3),
+            'location_updates': stats['location_updates']
+        }
+
+
+def main():
+    """Flotte simulée sur un hub partagé, avec un manager automatique en option"""
+    # Imports locaux: le module reste utilisable sans charger le manager
+    import logging
+    from console import set_console_level
+    from fleet_decisions import FleetDecider
+    from livreur_redis import DeliveryPerson, EventHub
+    from redis_connections import get_client
+    from sharding import ShardRouter
+    from zone_tracker import ZoneTracker
+
+    parser = argparse.ArgumentParser(description="Simulation vectorisée des déplacements des livreurs")
+    parser.add_argument('--couriers', type=int, default=1000, help="nombre de livreurs simulés")
+    parser.add_argument('--time-scale', type=float, default=DEFAULT_TIME_SCALE,
+                        help="secondes simulées par seconde réelle")
+    parser.add_argument('--with-manager', action='store_true',
+                        help="lancer un manager à sélection automatique dans le processus")
+    parser.add_argument('--rate', type=float, default=5.0, help="annonces par seconde (avec --with-manager)")
+    parser.add_argument('--duration', type=float, default=60.0, help="durée en secondes")
+    parser.add_argument('--batched-decisions', action='store_true',
+                        help="décider pour toute la flotte par lots (NumPy) et répondre en pipeline")
+    args = parser.parse_args()
+
+    print("🗺️  SIMULATION DES LIVREURS")
+    print("=" * 50)
+    set_console_level(logging.WARNING)
+
+    shard_router = ShardRouter.from_env()
+    if shard_router:
+        redis_client = shard_router.primary
+    else:
+        redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+    # Livreurs libres par zone partagés avec les managers (surge) via Redis
+    zone_tracker = ZoneTracker(redis_client)
+    zone_tracker.start()
+    simulation = CourierFleetSimulation(redis_client, time_scale=args.time_scale, zone_tracker=zone_tracker)
+    decider = FleetDecider() if args.batched_decisions else None
+    hub = EventHub(redis_client, shard_router=shard_router, decider=decider)
+    hub.start()
+    # Avec DISPATCH_SHARDS, chaque livreur écoute les zones autour de sa position simulée
+    for i in range(args.couriers):
+        DeliveryPerson(str(uuid.uuid4()), f"Sim_{i}", hub=hub, auto_respond=True, simulation=simulation).start()
+    simulation.start()
+    print(f"🛵 {args.couriers} livreurs simulés (x{args.time_scale:g})")
+
+    manager = None
+    if args.with_manager:
+        from manager_redis import DeliveryManager
+        manager = DeliveryManager(redis_client=redis_client, auto_select=True, selection_delay=1.0,
+                                  shard_router=shard_router, zone_tracker=zone_tracker)
+        manager.start()
+
+    try:
+        deadline = time.monotonic() + args.duration
+        next_report = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if manager is not None:
+                # Annonce près d'un livreur au hasard pour couvrir toute la ville
+                index = random.randrange(simulation.count)
+                manager.create_and_publish_announcement(near=simulation.position(index), radius_km=2.0)
+                time.sleep(1.0 / args.rate)
+            else:
+                time.sleep(0.5)
+            if time.monotonic() >= next_report:
+                print(f"📊 {simulation.summary()}")
+                next_report += 5
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if manager is not None:
+            manager.stop()
+        hub.stop()
+        simulation.stop()
+        zone_tracker.stop()
+        print(f"🏁 {simulation.summary()}")
+        if decider is not None:
+            print(f"🧮 Décisions groupées: {decider.stats}")
+
+
+if __name__ == "__main__":
+    main()
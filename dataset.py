@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Dataset - Chargement des restaurants et des menus
+Lecture des CSV par morceaux avec des types compacts (seules les colonnes
+utilisées, catégories pour les valeurs répétées); normalise les prix une
+seule fois au chargement (vectorisé, morceau par morceau)
+"""
+import random
+import pandas as pd
+import numpy as np
+from pandas.api.types import union_categoricals
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Fichiers de données par défaut
+RESTAURANTS_CSV = 'restaurants.csv'
+MENUS_CSV = 'restaurant-menus.csv'
+
+# Colonnes lues et leurs types (les autres colonnes des CSV sont ignorées)
+RESTAURANT_DTYPES = {
+    'id': 'int64',
+    'name': 'object',
+    'category': 'category',
+    'price_range': 'category',
+    'full_address': 'object',
+    'lat': 'float64',
+    'lng': 'float64',
+}
+MENU_DTYPES = {
+    'restaurant_id': 'int32',
+    'category': 'category',
+    'name': 'object',
+    'price': 'category',
+}
+
+# Lignes lues par morceau
+DEFAULT_CHUNK_SIZE = 100_000
+
+# Symboles et suffixes monétaires retirés avant la conversion
+CURRENCY_PATTERN = r'USD|EUR|US\$|\$|€|£'
+
+# Fourchette de prix: "10.00 - 15.00", "10 to 15", "10–15" (insensible à la casse: les prix sont mis en majuscules)
+RANGE_PATTERN = r'(?i)^(\d+(?:\.\d+)?)\s*(?:-|–|to)\s*(\d+(?:\.\d+)?)$'
+
+
+def normalize_prices(prices: pd.Series) -> Tuple[pd.DataFrame, int]:
+    """Convertit une colonne de prix texte en colonnes float32
+
+    Retourne un DataFrame (price, price_min, price_max, price_valid) aligné sur
+    l'index d'entrée et le nombre de prix rejetés. Une fourchette donne son
+    milieu comme prix. Les valeurs rejetées valent 0.0 comme avant.
+    """
+    # Nettoyage des suffixes monétaires et des séparateurs de milliers
+    cleaned = (
+        prices.astype('string')
+        .str.upper()
+        .str.replace(CURRENCY_PATTERN, '', regex=True)
+        .str.replace(',', '', regex=False)
+        .str.strip()
+    )
+
+    # Prix simple
+    single = pd.to_numeric(cleaned, errors='coerce')
+
+    # Fourchettes de prix
+    bounds = cleaned.str.extract(RANGE_PATTERN)
+    range_min = pd.to_numeric(bounds[0], errors='coerce')
+    range_max = pd.to_numeric(bounds[1], errors='coerce')
+
+    price_min = single.fillna(range_min)
+    price_max = single.fillna(range_max)
+
+    # Les valeurs négatives, infinies ou absentes sont rejetées
+    valid = np.isfinite(price_min) & np.isfinite(price_max) & (price_min >= 0) & (price_max >= price_min)
+    valid = valid.fillna(False).astype(bool)
+
+    price_min = price_min.where(valid, 0.0)
+    price_max = price_max.where(valid, 0.0)
+
+    normalized = pd.DataFrame({
+        'price': ((price_min + price_max) / 2.0).astype(np.float32),
+        'price_min': price_min.astype(np.float32),
+        'price_max': price_max.astype(np.float32),
+        'price_valid': valid,
+    }, index=prices.index)
+
+    rejected_count = int((~valid).sum())
+    return normalized, rejected_count
+
+
+def prepare_menus(menus_df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """Remplace la colonne prix texte par les colonnes typées
+
+    Le prix brut est conservé dans 'price_raw' pour le diagnostic.
+    """
+    normalized, rejected_count = normalize_prices(menus_df['price'])
+
+    menus_df = menus_df.rename(columns={'price': 'price_raw'})
+    menus_df = pd.concat([menus_df, normalized], axis=1)
+    return menus_df, rejected_count
+
+
+def read_chunks(path: str, dtypes: Dict[str, str], chunksize: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Lit un CSV par morceaux, seulement les colonnes de `dtypes` et avec ces types"""
+    return pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+
+
+def concat_chunks(chunks: List[pd.DataFrame], dtypes: Dict[str, str]) -> pd.DataFrame:
+    """Concatène des morceaux en gardant les colonnes catégorielles (catégories unifiées)"""
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+    if len(chunks) > 1:
+        for column in chunks[0].columns:
+            if isinstance(chunks[0][column].dtype, pd.CategoricalDtype):
+                categories = union_categoricals([chunk[column] for chunk in chunks]).categories
+                for chunk in chunks:
+                    chunk[column] = chunk[column].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_menus(path: str = MENUS_CSV, chunksize: int = DEFAULT_CHUNK_SIZE) -> Tuple[pd.DataFrame, int]:
+    """Charge les menus avec des prix normalisés (morceau par morceau)"""
+    chunks, rejected_count = [], 0
+    for chunk in read_chunks(path, MENU_DTYPES, chunksize):
+        chunk, rejected = prepare_menus(chunk)
+        chunks.append(chunk)
+        rejected_count += rejected
+    return concat_chunks(chunks, MENU_DTYPES), rejected_count
+
+
+def load_restaurants(path: str = RESTAURANTS_CSV, chunksize: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """Charge les restaurants"""
+    return concat_chunks(list(read_chunks(path, RESTAURANT_DTYPES, chunksize)), RESTAURANT_DTYPES)
+
+
+class LocalDataset:
+    """Copie locale (pandas) des restaurants et des menus"""
+
+    def __init__(self, restaurants_df: pd.DataFrame, menus_df: pd.DataFrame, rejected_price_count: int = 0):
+        self.restaurants_df = restaurants_df
+        self.menus_df = menus_df
+        self.rejected_price_count = rejected_price_count
+
+        # Colonnes extraites une fois pour éviter iloc dans le chemin chaud
+        self._ids = restaurants_df['id'].to_numpy()
+        self._names = restaurants_df['name'].tolist()
+        self._addresses = restaurants_df['full_address'].tolist()
+        self._lats = restaurants_df['lat'].to_numpy(dtype=np.float64)
+        self._lngs = restaurants_df['lng'].to_numpy(dtype=np.float64)
+        self._categories = restaurants_df['category'].tolist()
+        self._price_ranges = restaurants_df['price_range'].tolist()
+        self._positions = {int(restaurant_id): i for i, restaurant_id in enumerate(self._ids)}
+
+        # Index des lignes de menu par restaurant
+        self._menu_rows = menus_df.groupby('restaurant_id').indices
+        self._menu_names = menus_df['name'].tolist()
+        self._menu_categories = menus_df['category'].tolist()
+        self._menu_prices = menus_df['price'].to_numpy()
+
+    @classmethod
+    def from_csv(cls, restaurants_path: str = RESTAURANTS_CSV, menus_path: str = MENUS_CSV) -> 'LocalDataset':
+        """Charge le dataset depuis les fichiers CSV"""
+        restaurants_df = load_restaurants(restaurants_path)
+        menus_df, rejected_price_count = load_menus(menus_path)
+        return cls(restaurants_df, menus_df, rejected_price_count)
+
+    @property
+    def restaurant_count(self) -> int:
+        return len(self._ids)
+
+    @property
+    def menu_item_count(self) -> int:
+        return len(self._menu_names)
+
+    def coordinates(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Retourne les tableaux (ids, lat, lng) de tous les restaurants"""
+        return self._ids, self._lats, self._lngs
+
+    def restaurant_categories(self) -> Tuple[np.ndarray, List]:
+        """Retourne les ids et les catégories (cuisines) de tous les restaurants"""
+        return self._ids, self._categories
+
+    def menu_columns(self) -> Tuple[np.ndarray, List, List]:
+        """Retourne (id du restaurant, nom, catégorie) de tous les items de menu, dans l'ordre des menus"""
+        return self.menus_df['restaurant_id'].to_numpy(), self._menu_names, self._menu_categories
+
+    def _restaurant_at(self, position: int) -> Dict:
+        return {
+            'id': int(self._ids[position]),
+            'name': self._names[position],
+            'address': self._addresses[position],
+            'lat': float(self._lats[position]),
+            'lng': float(self._lngs[position]),
+            'category': self._categories[position],
+            'price_range': self._price_ranges[position]
+        }
+
+    def random_restaurant(self) -> Dict:
+        """Retourne un restaurant aléatoire"""
+        return self._restaurant_at(random.randrange(len(self._ids)))
+
+    def get_restaurant(self, restaurant_id: int) -> Optional[Dict]:
+        """Retourne un restaurant par son id"""
+        position = self._positions.get(int(restaurant_id))
+        if position is None:
+            return None
+        return self._restaurant_at(position)
+
+    def menu_items(self, restaurant_id: int) -> List[Dict]:
+        """Retourne les items du menu d'un restaurant"""
+        rows = self._menu_rows.get(int(restaurant_id), ())
+        return [
+            {
+                'name': self._menu_names[row],
+                'category': self._menu_categories[row],
+                'price': round(float(self._menu_prices[row]), 2)
+            }
+            for row in rows
+        ]
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Dataset partitionné - Restaurants et menus découpés par ville ou par zone
+Les CSV complets (plusieurs villes, millions d'items de menu) sont lus une
+seule fois par morceaux et répartis dans un dossier par partition:
+    partitions/manifest.json               partitions, effectifs et emprises
+    partitions/<partition>/restaurants.csv
+    partitions/<partition>/restaurant-menus.csv
+Un manager ne charge ensuite que ses partitions: la mémoire dépend de la zone
+active, pas de la taille du dataset complet.
+
+Exemples:
+    python3 dataset_partitions.py --build                   # par ville (adresse)
+    python3 dataset_partitions.py --build --by zone --zone-km 25
+    python3 dataset_partitions.py --list
+    DATASET_PARTITIONS=birmingham-al python3 manager_redis.py
+    DATASET_PARTITIONS=near:33.52,-86.81,30 python3 manager_redis.py
+"""
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from console import get_logger
+from dataset import (DEFAULT_CHUNK_SIZE, MENU_DTYPES, MENUS_CSV, RESTAURANT_DTYPES, RESTAURANTS_CSV,
+                     LocalDataset, concat_chunks, prepare_menus, read_chunks)
+from spatial_index import KM_PER_DEG_LAT, haversine_km
+
+# Dossier et manifeste par défaut
+PARTITION_DIR = 'partitions'
+MANIFEST_FILE = 'manifest.json'
+RESTAURANTS_FILE = 'restaurants.csv'
+MENUS_FILE = 'restaurant-menus.csv'
+
+# Variables d'environnement: partitions à charger ('all' pour toutes) et leur dossier
+PARTITIONS_ENV = 'DATASET_PARTITIONS'
+PARTITION_DIR_ENV = 'DATASET_PARTITION_DIR'
+
+# Découpage par zone: côté des carrés de la grille
+DEFAULT_PARTITION_ZONE_KM = 25.0
+
+UNKNOWN_PARTITION = 'unknown'
+
+log = get_logger('dataset')
+
+
+def _slug(label: str) -> str:
+    """Nom de dossier d'une partition: 'Birmingham, AL' -> 'birmingham-al'"""
+    return re.sub(r'[^a-z0-9]+', '-', label.lower()).strip('-') or UNKNOWN_PARTITION
+
+
+def city_partitions(restaurants: pd.DataFrame) -> pd.Series:
+    """Ville de chaque restaurant, lue dans l'adresse '[rue, ]Ville, État, Code postal'
+
+    L'État et le code postal sont toujours les deux derniers champs: l'adresse est
+    lue depuis la droite, avec ou sans rue (et sans code postal, comme dans les
+    données synthétiques des benchmarks).
+    """
+    parts = restaurants['full_address'].astype('string').str.split(',')
+
+    def field(position: int) -> pd.Series:
+        return parts.str[position].astype('string').str.strip()
+
+    has_zip = field(-1).str.fullmatch(r'\d{5}(?:-\d{4})?').fillna(False).astype(bool)
+    city = field(-3).where(has_zip, field(-2))
+    state = field(-2).where(has_zip, field(-1))
+    # Pas assez de champs: pas de ville
+    labels = (city + ', ' + state).where(parts.str.len() >= np.where(has_zip, 3, 2))
+    return labels.fillna(UNKNOWN_PARTITION).map(_slug)
+
+
+def zone_partitions(restaurants: pd.DataFrame, zone_km: float = DEFAULT_PARTITION_ZONE_KM) -> pd.Series:
+    """Carré de grille de chaque restaurant (même découpage que spatial_index.zone_for)
+
+    Les restaurants sans coordonnées vont dans la partition UNKNOWN_PARTITION.
+    """
+    zone_deg = zone_km / KM_PER_DEG_LAT
+    lats = restaurants['lat'].to_numpy(dtype=np.float64)
+    lngs = restaurants['lng'].to_numpy(dtype=np.float64)
+    known = np.isfinite(lats) & np.isfinite(lngs)
+    rows = np.floor(np.where(known, lats, 0.0) / zone_deg).astype(np.int64)
+    cols = np.floor(np.where(known, lngs, 0.0) / zone_deg).astype(np.int64)
+    return pd.Series([f"z{row}_{col}" if ok else UNKNOWN_PARTITION for row, col, ok in zip(rows, cols, known)],
+                     index=restaurants.index)
+
+
+def build_partitions(restaurants_path: str = RESTAURANTS_CSV, menus_path: str = MENUS_CSV,
+                     output_dir: str = PARTITION_DIR, by: str = 'city',
+                     zone_km: float = DEFAULT_PARTITION_ZONE_KM, chunksize: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Découpe les CSV en partitions, par morceaux (mémoire bornée par la taille d'un morceau)
+
+    Le dossier est construit à côté puis remplace l'ancien d'un coup. Retourne le manifeste.
+    """
+    temp_dir = f"{output_dir.rstrip(os.sep)}.building"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    partitions: Dict[str, Dict] = {}
+
+    def append(partition: str, filename: str, frame: pd.DataFrame):
+        directory = os.path.join(temp_dir, partition)
+        path = os.path.join(directory, filename)
+        os.makedirs(directory, exist_ok=True)
+        frame.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+    # Restaurants: partition de chaque ligne, et table id -> partition pour les menus
+    ids, codes, codes_by_name = [], [], {}
+    for chunk in read_chunks(restaurants_path, RESTAURANT_DTYPES, chunksize):
+        keys = city_partitions(chunk) if by == 'city' else zone_partitions(chunk, zone_km)
+        for partition, rows in chunk.groupby(keys.to_numpy(), sort=False):
+            append(partition, RESTAURANTS_FILE, rows)
+            info = partitions.setdefault(partition, {'restaurants': 0, 'menu_items': 0,
+                                                     'bbox': [math.inf, -math.inf, math.inf, -math.inf]})
+            info['restaurants'] += len(rows)
+            bbox = info['bbox']
+            bbox[:] = [min(bbox[0], float(rows['lat'].min())), max(bbox[1], float(rows['lat'].max())),
+                       min(bbox[2], float(rows['lng'].min())), max(bbox[3], float(rows['lng'].max()))]
+            code = codes_by_name.setdefault(partition, len(codes_by_name))
+            ids.append(rows['id'].to_numpy(dtype=np.int64))
+            codes.append(np.full(len(rows), code, dtype=np.int32))
+
+    all_ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+    all_codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+    order = np.argsort(all_ids, kind='stable')
+    sorted_ids, sorted_codes = all_ids[order], all_codes[order]
+    names = list(codes_by_name)
+
+    # Menus: partition du restaurant par dichotomie (items sans restaurant connu ignorés)
+    orphans = 0
+    for chunk in read_chunks(menus_path, MENU_DTYPES, chunksize):
+        restaurant_ids = chunk['restaurant_id'].to_numpy(dtype=np.int64)
+        positions = np.searchsorted(sorted_ids, restaurant_ids)
+        positions[positions == len(sorted_ids)] = 0
+        known = (sorted_ids[positions] == restaurant_ids) if len(sorted_ids) else np.zeros(len(chunk), bool)
+        orphans += int((~known).sum())
+        chunk_codes = sorted_codes[positions[known]]
+        for code, rows in chunk[known].groupby(chunk_codes, sort=False):
+            append(names[code], MENUS_FILE, rows)
+            partitions[names[code]]['menu_items'] += len(rows)
+
+    manifest = {
+        'by': by,
+        'zone_km': zone_km if by == 'zone' else None,
+        'built_at': time.time(),
+        'orphan_menu_items': orphans,
+        'partitions': partitions
+    }
+    with open(os.path.join(temp_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(temp_dir, output_dir)
+    return manifest
+
+
+def read_manifest(directory: str = PARTITION_DIR) -> Dict:
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+
+def partitions_near(manifest: Dict, lat: float, lng: float, radius_km: float) -> List[str]:
+    """Partitions dont l'emprise est à moins de radius_km d'un point"""
+    selected = []
+    for name, info in manifest['partitions'].items():
+        lat_min, lat_max, lng_min, lng_max = info['bbox']
+        # Point de l'emprise le plus proche du point demandé
+        nearest_lat = min(max(lat, lat_min), lat_max)
+        nearest_lng = min(max(lng, lng_min), lng_max)
+        if haversine_km(lat, lng, nearest_lat, nearest_lng) <= radius_km:
+            selected.append(name)
+    return selected
+
+
+def load_partitions(names: Optional[List[str]] = None, directory: str = PARTITION_DIR,
+                    chunksize: int = DEFAULT_CHUNK_SIZE) -> LocalDataset:
+    """LocalDataset des seules partitions demandées (toutes si names est None)
+
+    LookupError si la sélection est vide: un dataset sans restaurant ne peut pas
+    produire d'annonce.
+    """
+    manifest = read_manifest(directory)
+    names = list(manifest['partitions']) if names is None else names
+    if not names:
+        raise LookupError(f"Aucune partition sélectionnée dans {directory}")
+    missing = [name for name in names if name not in manifest['partitions']]
+    if missing:
+        raise LookupError(f"Partition(s) inconnue(s) dans {directory}: {', '.join(missing)}")
+
+    restaurants, menus, rejected_count = [], [], 0
+    for name in names:
+        restaurants.extend(read_chunks(os.path.join(directory, name, RESTAURANTS_FILE), RESTAURANT_DTYPES, chunksize))
+        menus_path = os.path.join(directory, name, MENUS_FILE)
+        if not os.path.exists(menus_path):
+            continue
+        for chunk in read_chunks(menus_path, MENU_DTYPES, chunksize):
+            chunk, rejected = prepare_menus(chunk)
+            menus.append(chunk)
+            rejected_count += rejected
+
+    restaurants_df = concat_chunks(restaurants, RESTAURANT_DTYPES)
+    if restaurants_df.empty:
+        raise LookupError(f"Aucun restaurant dans les partitions {', '.join(names)} ({directory})")
+    menus_df = concat_chunks(menus, MENU_DTYPES)
+    if not menus:
+        menus_df, _ = prepare_menus(menus_df)
+    return LocalDataset(restaurants_df, menus_df, rejected_count)
+
+
+def dataset_from_env() -> Optional[LocalDataset]:
+    """Dataset des partitions de DATASET_PARTITIONS, None si la variable est absente
+
+    Valeurs: 'birmingham-al,atlanta-ga', 'all', ou 'near:lat,lng,rayon_km' (partitions proches).
+    """
+    value = os.environ.get(PARTITIONS_ENV, '').strip()
+    if not value:
+        return None
+    directory = os.environ.get(PARTITION_DIR_ENV, PARTITION_DIR)
+    if value == 'all':
+        names = None
+    elif value.startswith('near:'):
+        try:
+            lat, lng, radius_km = (float(part) for part in value[len('near:'):].split(','))
+        except ValueError:
+            raise ValueError(f"{PARTITIONS_ENV} invalide: {value!r} (attendu near:lat,lng,rayon_km)") from None
+        names = partitions_near(read_manifest(directory), lat, lng, radius_km)
+        if not names:
+            raise LookupError(f"Aucune partition à moins de {radius_km:g} km de ({lat:g}, {lng:g}) dans {directory}")
+    else:
+        names = [name.strip() for name in value.split(',') if name.strip()]
+    dataset = load_partitions(names, directory)
+    log.info("🧱 Partitions chargées depuis %s: %s", directory, value)
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Découpage du dataset en partitions par ville ou par zone")
+    parser.add_argument('--build', action='store_true', help="construit les partitions depuis les CSV")
+    parser.add_argument('--list', action='store_true', help="affiche les partitions existantes")
+    parser.add_argument('--by', choices=('city', 'zone'), default='city')
+    parser.add_argument('--zone-km', type=float, default=DEFAULT_PARTITION_ZONE_KM)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--dir', default=PARTITION_DIR)
+    args = parser.parse_args()
+
+    if args.build:
+        start = time.perf_counter()
+        manifest = build_partitions(output_dir=args.dir, by=args.by, zone_km=args.zone_km, chunksize=args.chunksize)
+        print(f"✅ {len(manifest['partitions'])} partition(s) écrites dans {args.dir}/ "
+              f"en {time.perf_counter() - start:.1f}s")
+        if manifest['orphan_menu_items']:
+            print(f"⚠️ {manifest['orphan_menu_items']} items de menu sans restaurant ignorés")
+    if args.build or args.list:
+        manifest = read_manifest(args.dir)
+        for name, info in sorted(manifest['partitions'].items(), key=lambda item: -item[1]['menu_items']):
+            print(f"   {name}: {info['restaurants']} restaurants, {info['menu_items']} items de menu")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
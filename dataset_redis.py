@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Dataset Redis - Copie partagée des restaurants et des menus
+Importe les CSV dans Redis une seule fois, lus ensuite par tous les managers
+"""
+import redis
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from redis_connections import get_client
+from dataset import LocalDataset, RESTAURANTS_CSV, MENUS_CSV
+
+# Configuration Redis
+REDIS_HOST = 'localhost'
+REDIS_PORT = 6379
+REDIS_DB = 0
+
+# Clés Redis du dataset
+META_KEY = 'dataset:meta'
+RESTAURANT_IDS_KEY = 'restaurants:ids'
+RESTAURANT_GEO_KEY = 'restaurants:geo'
+RESTAURANT_KEY = 'restaurant:{}'
+MENU_KEY = 'restaurant:{}:menu'
+
+# Nombre de commandes envoyées par aller-retour lors de l'import
+PIPELINE_BATCH_SIZE = 1000
+
+# Taille par défaut du cache LRU local (restaurants et menus)
+DEFAULT_CACHE_SIZE = 2048
+
+
+def load_dataset_into_redis(redis_client, restaurants_path: str = RESTAURANTS_CSV,
+                            menus_path: str = MENUS_CSV, batch_size: int = PIPELINE_BATCH_SIZE) -> Dict:
+    """Importe les restaurants et les menus dans Redis en pipeline
+
+    Chaque restaurant devient un petit hash (encodé en listpack par Redis),
+    une entrée du GEO index et une liste de menus au format JSON compact
+    [nom, catégorie, prix]. Retourne les métadonnées écrites.
+    """
+    dataset = LocalDataset.from_csv(restaurants_path, menus_path)
+    restaurants_df = dataset.restaurants_df
+    menus_df = dataset.menus_df
+
+    pipe = redis_client.pipeline(transaction=False)
+    pending = 0
+
+    def flush_if_needed(force=False):
+        nonlocal pending
+        if pending >= batch_size or (force and pending):
+            pipe.execute()
+            pending = 0
+
+    # Les anciennes données sont remplacées, y compris les restaurants retirés des CSV
+    for restaurant_id in redis_client.sscan_iter(RESTAURANT_IDS_KEY, count=batch_size):
+        pipe.delete(RESTAURANT_KEY.format(restaurant_id), MENU_KEY.format(restaurant_id))
+        pending += 1
+        flush_if_needed()
+    pipe.delete(RESTAURANT_IDS_KEY, RESTAURANT_GEO_KEY)
+    pending += 1
+    flush_if_needed(force=True)
+
+    known_ids = set()
+
+    columns = zip(restaurants_df['id'], restaurants_df['name'], restaurants_df['full_address'],
+                  restaurants_df['lat'], restaurants_df['lng'],
+                  restaurants_df['category'], restaurants_df['price_range'])
+    for restaurant_id, name, address, lat, lng, category, price_range in columns:
+        restaurant_id = int(restaurant_id)
+        pipe.hset(RESTAURANT_KEY.format(restaurant_id), mapping={
+            'name': _to_field(name),
+            'address': _to_field(address),
+            'lat': float(lat),
+            'lng': float(lng),
+            'category': _to_field(category),
+            'price_range': _to_field(price_range)
+        })
+        # Coordonnées manquantes: pas d'entrée GEO (comme dans spatial_index)
+        if math.isfinite(lat) and math.isfinite(lng):
+            pipe.geoadd(RESTAURANT_GEO_KEY, (float(lng), float(lat), restaurant_id))
+            pending += 1
+        pipe.sadd(RESTAURANT_IDS_KEY, restaurant_id)
+        known_ids.add(restaurant_id)
+        pending += 2
+        flush_if_needed()
+
+    # Menus groupés par restaurant: un seul RPUSH par restaurant (items sans restaurant connu ignorés)
+    menus = zip(menus_df['restaurant_id'], menus_df['name'], menus_df['category'], menus_df['price'])
+    grouped: Dict[int, List[str]] = {}
+    orphans = 0
+    for restaurant_id, name, category, price in menus:
+        restaurant_id = int(restaurant_id)
+        if restaurant_id not in known_ids:
+            orphans += 1
+            continue
+        grouped.setdefault(restaurant_id, []).append(
+            json.dumps([_to_field(name), _to_field(category), round(float(price), 2)],
+                       ensure_ascii=False, separators=(',', ':'))
+        )
+    for restaurant_id, items in grouped.items():
+        pipe.rpush(MENU_KEY.format(restaurant_id), *items)
+        pending += 1
+        flush_if_needed()
+
+    meta = {
+        'version': str(time.time()),
+        'restaurants': dataset.restaurant_count,
+        'menu_items': dataset.menu_item_count - orphans,
+        'orphan_menu_items': orphans,
+        'rejected_prices': dataset.rejected_price_count
+    }
+    pipe.hset(META_KEY, mapping=meta)
+    pending += 1
+    flush_if_needed(force=True)
+    return meta
+
+
+def _to_field(value) -> str:
+    """Convertit une valeur pandas (éventuellement NaN) en champ Redis"""
+    if value is None or value != value:
+        return ''
+    return str(value)
+
+
+class LRUCache:
+    """Petit cache LRU thread-safe"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisDataset:
+    """Lecture du dataset partagé dans Redis, avec cache LRU local optionnel"""
+
+    def __init__(self, redis_client, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.redis_client = redis_client
+        self.cache = LRUCache(cache_size)
+
+        meta = redis_client.hgetall(META_KEY)
+        if not meta:
+            raise LookupError("Dataset absent de Redis - lancez: python3 dataset_redis.py")
+        self.version = meta['version']
+        self.restaurant_count = int(meta['restaurants'])
+        self.menu_item_count = int(meta['menu_items'])
+        self.rejected_price_count = int(meta['rejected_prices'])
+
+    @classmethod
+    def open(cls, redis_client, cache_size: int = DEFAULT_CACHE_SIZE) -> Optional['RedisDataset']:
+        """Retourne le dataset partagé s'il a été importé, sinon None"""
+        try:
+            return cls(redis_client, cache_size)
+        except (LookupError, redis.ConnectionError):
+            return None
+
+    def refresh(self):
+        """Vide le cache local si le dataset a été réimporté"""
+        version = self.redis_client.hget(META_KEY, 'version')
+        if version != self.version:
+            self.cache.clear()
+            self.version = version
+
+    def coordinates(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Retourne les tableaux (ids, lat, lng) depuis le GEO index"""
+        ids = self.redis_client.zrange(RESTAURANT_GEO_KEY, 0, -1)
+        positions = []
+        for start in range(0, len(ids), PIPELINE_BATCH_SIZE):
+            positions.extend(self.redis_client.geopos(RESTAURANT_GEO_KEY, *ids[start:start + PIPELINE_BATCH_SIZE]))
+
+        lats = np.array([pos[1] if pos else np.nan for pos in positions], dtype=np.float64)
+        lngs = np.array([pos[0] if pos else np.nan for pos in positions], dtype=np.float64)
+        return np.array(ids, dtype=np.int64), lats, lngs
+
+    def restaurant_categories(self) -> Tuple[np.ndarray, List]:
+        """Retourne les ids et les catégories (cuisines) de tous les restaurants"""
+        ids = sorted(int(restaurant_id) for restaurant_id in self.redis_client.smembers(RESTAURANT_IDS_KEY))
+        categories = []
+        for start in range(0, len(ids), PIPELINE_BATCH_SIZE):
+            pipe = self.redis_client.pipeline(transaction=False)
+            for restaurant_id in ids[start:start + PIPELINE_BATCH_SIZE]:
+                pipe.hget(RESTAURANT_KEY.format(restaurant_id), 'category')
+            categories.extend(category or None for category in pipe.execute())
+        return np.array(ids, dtype=np.int64), categories
+
+    def menu_columns(self) -> Tuple[np.ndarray, List, List]:
+        """Retourne (id du restaurant, nom, catégorie) de tous les items de menu, dans l'ordre des menus"""
+        ids = sorted(int(restaurant_id) for restaurant_id in self.redis_client.smembers(RESTAURANT_IDS_KEY))
+        restaurant_ids, names, categories = [], [], []
+        for start in range(0, len(ids), PIPELINE_BATCH_SIZE):
+            batch = ids[start:start + PIPELINE_BATCH_SIZE]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for restaurant_id in batch:
+                pipe.lrange(MENU_KEY.format(restaurant_id), 0, -1)
+            for restaurant_id, items in zip(batch, pipe.execute()):
+                for raw in items:
+                    name, category, _ = json.loads(raw)
+                    restaurant_ids.append(restaurant_id)
+                    names.append(name or None)
+                    categories.append(category or None)
+        return np.array(restaurant_ids, dtype=np.int64), names, categories
+
+    def random_restaurant(self) -> Dict:
+        """Retourne un restaurant aléatoire"""
+        restaurant_id = self.redis_client.srandmember(RESTAURANT_IDS_KEY)
+        return self.get_restaurant(int(restaurant_id))
+
+    def get_restaurant(self, restaurant_id: int) -> Optional[Dict]:
+        """Retourne un restaurant par son id"""
+        key = ('restaurant', restaurant_id)
+        restaurant = self.cache.get(key)
+        if restaurant is None:
+            data = self.redis_client.hgetall(RESTAURANT_KEY.format(restaurant_id))
+            if not data:
+                return None
+            restaurant = {
+                'id': restaurant_id,
+                'name': data['name'],
+                'address': data['address'],
+                'lat': float(data['lat']),
+                'lng': float(data['lng']),
+                'category': data['category'],
+                'price_range': data['price_range']
+            }
+            self.cache.put(key, restaurant)
+        return dict(restaurant)
+
+    def menu_items(self, restaurant_id: int) -> List[Dict]:
+        """Retourne les items du menu d'un restaurant"""
+        key = ('menu', restaurant_id)
+        items = self.cache.get(key)
+        if items is None:
+            items = [json.loads(raw) for raw in self.redis_client.lrange(MENU_KEY.format(restaurant_id), 0, -1)]
+            self.cache.put(key, items)
+        return [{'name': name, 'category': category, 'price': price} for name, category, price in items]
+
+
+def main():
+    """Importe les CSV dans Redis"""
+    print("📦 IMPORT DU DATASET DANS REDIS")
+    print("=" * 50)
+
+    redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+    start = time.perf_counter()
+    try:
+        meta = load_dataset_into_redis(redis_client)
+    except Exception as e:
+        print(f"❌ Erreur lors de l'import: {e}")
+        return
+
+    print(f"✅ {meta['restaurants']} restaurants et {meta['menu_items']} items de menu importés")
+    if meta['rejected_prices']:
+        print(f"⚠️ {meta['rejected_prices']} prix invalides remplacés par 0.00")
+    print(f"⏱️  Durée: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
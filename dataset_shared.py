@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Dataset en mémoire partagée - Restaurants et menus lus par plusieurs processus
+Le processus principal copie le LocalDataset dans un seul segment
+multiprocessing.shared_memory: colonnes numériques (numpy) et chaînes UTF-8
+concaténées avec leurs offsets. Les processus de génération s'y attachent
+par son nom, sans copie ni pandas: même API de lecture que LocalDataset.
+L'index des menus (menu_index.MenuIndex) du manager peut être copié dans le
+même segment: les processus l'utilisent sans le reconstruire.
+"""
+import random
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Colonnes texte: (colonne, source dans le LocalDataset)
+RESTAURANT_TEXT_COLUMNS = (('name', '_names'), ('address', '_addresses'),
+                           ('category', '_categories'), ('price_range', '_price_ranges'))
+MENU_TEXT_COLUMNS = (('menu_name', '_menu_names'), ('menu_category', '_menu_categories'))
+
+# Préfixe des colonnes de l'index des menus dans le segment
+MENU_INDEX_PREFIX = 'menu_index_'
+
+# Alignement des tableaux dans le segment
+ALIGNMENT = 8
+
+
+def _pack_text(values: List) -> Tuple[np.ndarray, np.ndarray, bytes]:
+    """Chaînes -> (offsets, valeurs absentes, octets concaténés); NaN et None sont absents"""
+    encoded = [value.encode('utf-8') if isinstance(value, str) else b'' for value in values]
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    missing = np.array([not isinstance(value, str) for value in values], dtype=np.uint8)
+    return offsets, missing, b''.join(encoded)
+
+
+class SharedDataset:
+    """Copie en lecture seule du dataset dans un segment de mémoire partagée"""
+
+    def __init__(self, shm: shared_memory.SharedMemory, descriptor: Dict, owner: bool = False):
+        self.shm = shm
+        self.descriptor = descriptor
+        self.owner = owner
+        self.rejected_price_count = descriptor['rejected_price_count']
+        self._menu_item_count = descriptor['menu_item_count']
+
+        arrays = {name: np.ndarray((length,), dtype=dtype, buffer=shm.buf, offset=offset)
+                  for name, (dtype, offset, length) in descriptor['layout'].items()}
+        self._arrays = arrays
+        self._ids = arrays['ids']
+        self._lats = arrays['lats']
+        self._lngs = arrays['lngs']
+        self._menu_offsets = arrays['menu_offsets']
+        self._menu_prices = arrays['menu_prices']
+        self._positions = {int(restaurant_id): i for i, restaurant_id in enumerate(self._ids)}
+        self._menu_index = None
+
+    @classmethod
+    def create(cls, dataset, menu_index=None) -> 'SharedDataset':
+        """Copie un LocalDataset (et son index des menus) dans un nouveau segment (à libérer avec close())"""
+        # Lignes de menu regroupées par restaurant, dans l'ordre des restaurants
+        menu_rows = [dataset._menu_rows.get(int(restaurant_id), np.empty(0, dtype=np.int64))
+                     for restaurant_id in dataset._ids]
+        rows = np.concatenate(menu_rows).astype(np.int64) if menu_rows else np.empty(0, dtype=np.int64)
+        menu_offsets = np.zeros(len(menu_rows) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in menu_rows], out=menu_offsets[1:])
+
+        columns = {
+            'ids': np.asarray(dataset._ids, dtype=np.int64),
+            'lats': np.asarray(dataset._lats, dtype=np.float64),
+            'lngs': np.asarray(dataset._lngs, dtype=np.float64),
+            'menu_offsets': menu_offsets,
+            'menu_prices': np.asarray(dataset._menu_prices, dtype=np.float32)[rows],
+        }
+        for name, source in RESTAURANT_TEXT_COLUMNS:
+            columns[f'{name}_offsets'], columns[f'{name}_missing'], text = _pack_text(getattr(dataset, source))
+            columns[f'{name}_text'] = np.frombuffer(text, dtype=np.uint8)
+        for name, source in MENU_TEXT_COLUMNS:
+            values = getattr(dataset, source)
+            columns[f'{name}_offsets'], columns[f'{name}_missing'], text = _pack_text([values[row] for row in rows])
+            columns[f'{name}_text'] = np.frombuffer(text, dtype=np.uint8)
+        if menu_index is not None:
+            index_columns = menu_index.columns()
+            for name in menu_index.ARRAYS:
+                columns[MENU_INDEX_PREFIX + name] = index_columns[name]
+            for name in menu_index.TERMS:
+                column = MENU_INDEX_PREFIX + name
+                columns[f'{column}_offsets'], columns[f'{column}_missing'], text = _pack_text(index_columns[name])
+                columns[f'{column}_text'] = np.frombuffer(text, dtype=np.uint8)
+
+        # Disposition: chaque colonne alignée à la suite dans le segment
+        layout, size = {}, 0
+        for name, array in columns.items():
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout[name] = (array.dtype.str, size, len(array))
+            size += array.nbytes
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, array in columns.items():
+            dtype, offset, length = layout[name]
+            np.ndarray((length,), dtype=dtype, buffer=shm.buf, offset=offset)[:] = array
+
+        descriptor = {
+            'name': shm.name,
+            'size': size,
+            'layout': layout,
+            'menu_item_count': dataset.menu_item_count,
+            'rejected_price_count': dataset.rejected_price_count,
+            'menu_index': menu_index is not None
+        }
+        return cls(shm, descriptor, owner=True)
+
+    @classmethod
+    def attach(cls, descriptor: Dict) -> 'SharedDataset':
+        """S'attache au segment créé par le processus principal (seul responsable de sa libération)"""
+        # Les processus enfants partagent le resource_tracker du parent: le segment
+        # n'est supprimé qu'au unlink() du parent (ou à sa sortie)
+        return cls(shared_memory.SharedMemory(name=descriptor['name']), descriptor)
+
+    def close(self):
+        """Détache le segment (et le supprime si ce processus l'a créé)"""
+        self._arrays = self._ids = self._lats = self._lngs = None
+        self._menu_offsets = self._menu_prices = self._menu_index = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    @property
+    def restaurant_count(self) -> int:
+        return len(self._ids)
+
+    @property
+    def menu_item_count(self) -> int:
+        return self._menu_item_count
+
+    @property
+    def nbytes(self) -> int:
+        return self.descriptor['size']
+
+    def menu_index(self):
+        """Index des menus copié dans le segment (None s'il n'y a pas été copié)"""
+        if self._menu_index is None and self.descriptor.get('menu_index'):
+            # Import tardif: menu_index dépend de pandas, inutile aux processus sans requête filtrée
+            from menu_index import MenuIndex
+            columns = {name: self._arrays[MENU_INDEX_PREFIX + name] for name in MenuIndex.ARRAYS}
+            for name in MenuIndex.TERMS:
+                column = MENU_INDEX_PREFIX + name
+                count = len(self._arrays[f'{column}_missing'])
+                columns[name] = [self._text(column, position) for position in range(count)]
+            self._menu_index = MenuIndex.from_columns(columns)
+        return self._menu_index
+
+    def coordinates(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Retourne les tableaux (ids, lat, lng) de tous les restaurants"""
+        return self._ids, self._lats, self._lngs
+
+    def _text(self, column: str, position: int) -> Optional[str]:
+        if self._arrays[f'{column}_missing'][position]:
+            return None
+        offsets = self._arrays[f'{column}_offsets']
+        return self._arrays[f'{column}_text'][offsets[position]:offsets[position + 1]].tobytes().decode('utf-8')
+
+    def _restaurant_at(self, position: int) -> Dict:
+        return {
+            'id': int(self._ids[position]),
+            'name': self._text('name', position),
+            'address': self._text('address', position),
+            'lat': float(self._lats[position]),
+            'lng': float(self._lngs[position]),
+            'category': self._text('category', position),
+            'price_range': self._text('price_range', position)
+        }
+
+    def random_restaurant(self) -> Dict:
+        """Retourne un restaurant aléatoire"""
+        return self._restaurant_at(random.randrange(len(self._ids)))
+
+    def get_restaurant(self, restaurant_id: int) -> Optional[Dict]:
+        """Retourne un restaurant par son id"""
+        position = self._positions.get(int(restaurant_id))
+        if position is None:
+            return None
+        return self._restaurant_at(position)
+
+    def menu_items(self, restaurant_id: int) -> List[Dict]:
+        """Retourne les items du menu d'un restaurant"""
+        position = self._positions.get(int(restaurant_id))
+        if position is None:
+            return []
+        return [
+            {
+                'name': self._text('menu_name', row),
+                'category': self._text('menu_category', row),
+                'price': round(float(self._menu_prices[row]), 2)
+            }
+            for row in range(self._menu_offsets[position], self._menu_offsets[position + 1])
+        ]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Grand livre des gains - Crédit atomique et classements dans Redis
+Chaque sélection crédite le livreur choisi de la compensation réelle de
+l'annonce, en une transaction (MULTI/EXEC):
+    earnings:leaderboard        ZSET livreur -> gains totaux
+    earnings:deliveries         ZSET livreur -> livraisons attribuées
+    earnings:hour:{AAAAMMJJHH}  ZSET livreur -> gains de l'heure
+    earnings:day:{AAAAMMJJ}     ZSET livreur -> gains du jour
+    earnings:totals             HASH totaux de la flotte depuis le début (gains, livraisons)
+    earnings:total:hour:{AAAAMMJJHH}  gains de la flotte dans l'heure (même rétention que le ZSET)
+    earnings:total:day:{AAAAMMJJ}     gains de la flotte dans la journée
+    earnings:names              HASH livreur -> nom affiché
+Les classements se lisent en O(log n + k) (ZREVRANGE/ZREVRANK), sans
+parcourir les livreurs.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+LEADERBOARD_KEY = 'earnings:leaderboard'
+DELIVERIES_KEY = 'earnings:deliveries'
+HOUR_KEY = 'earnings:hour:{}'
+DAY_KEY = 'earnings:day:{}'
+TOTALS_KEY = 'earnings:totals'
+HOUR_TOTAL_KEY = 'earnings:total:hour:{}'
+DAY_TOTAL_KEY = 'earnings:total:day:{}'
+NAMES_KEY = 'earnings:names'
+
+# Rétention des classements par période
+HOUR_TTL_SECONDS = 8 * 24 * 3600
+DAY_TTL_SECONDS = 90 * 24 * 3600
+
+
+def period_ids(at: Optional[datetime] = None) -> Tuple[str, str]:
+    """Identifiants (heure, jour) d'un instant"""
+    at = at or datetime.now()
+    return at.strftime('%Y%m%d%H'), at.strftime('%Y%m%d')
+
+
+class EarningsLedger:
+    """Gains des livreurs agrégés dans Redis"""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+
+    def credit(self, person_id: str, name: str, amount: float, at: Optional[datetime] = None):
+        """Crédite un livreur (transaction: tous les agrégats ou aucun)"""
+        hour, day = period_ids(at)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.zincrby(LEADERBOARD_KEY, amount, person_id)
+        pipe.zincrby(DELIVERIES_KEY, 1, person_id)
+        pipe.zincrby(HOUR_KEY.format(hour), amount, person_id)
+        pipe.expire(HOUR_KEY.format(hour), HOUR_TTL_SECONDS)
+        pipe.zincrby(DAY_KEY.format(day), amount, person_id)
+        pipe.expire(DAY_KEY.format(day), DAY_TTL_SECONDS)
+        pipe.hincrbyfloat(TOTALS_KEY, 'earnings', amount)
+        pipe.hincrby(TOTALS_KEY, 'deliveries', 1)
+        pipe.incrbyfloat(HOUR_TOTAL_KEY.format(hour), amount)
+        pipe.expire(HOUR_TOTAL_KEY.format(hour), HOUR_TTL_SECONDS)
+        pipe.incrbyfloat(DAY_TOTAL_KEY.format(day), amount)
+        pipe.expire(DAY_TOTAL_KEY.format(day), DAY_TTL_SECONDS)
+        pipe.hset(NAMES_KEY, person_id, name)
+        pipe.execute()
+
+    def _key(self, period: Optional[str]) -> str:
+        if period is None:
+            return LEADERBOARD_KEY
+        hour, day = period_ids()
+        return {'hour': HOUR_KEY.format(hour), 'day': DAY_KEY.format(day)}[period]
+
+    def top(self, count: int = 10, period: Optional[str] = None) -> List[Dict]:
+        """Meilleurs livreurs (period: None = depuis le début, 'hour' ou 'day' en cours)"""
+        entries = self.redis_client.zrevrange(self._key(period), 0, count - 1, withscores=True)
+        if not entries:
+            return []
+        ids = [_decode(person_id) for person_id, _ in entries]
+        names = self.redis_client.hmget(NAMES_KEY, ids)
+        return [{'rank': i + 1, 'person_id': person_id, 'name': _decode(name) if name else person_id[:8],
+                 'earnings': round(score, 2)}
+                for i, (person_id, (_, score), name) in enumerate(zip(ids, entries, names))]
+
+    def courier(self, person_id: str) -> Dict:
+        """Gains, livraisons et rang d'un livreur"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zscore(LEADERBOARD_KEY, person_id)
+        pipe.zscore(DELIVERIES_KEY, person_id)
+        pipe.zrevrank(LEADERBOARD_KEY, person_id)
+        pipe.zcard(LEADERBOARD_KEY)
+        earnings, deliveries, rank, fleet_size = pipe.execute()
+        return {
+            'earnings': round(earnings or 0.0, 2),
+            'deliveries': int(deliveries or 0),
+            'rank': rank + 1 if rank is not None else None,
+            'fleet_size': fleet_size
+        }
+
+    def totals(self) -> Dict[str, float]:
+        """Totaux de la flotte: global, heure et jour en cours"""
+        hour, day = period_ids()
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.hmget(TOTALS_KEY, ['earnings', 'deliveries'])
+        pipe.get(HOUR_TOTAL_KEY.format(hour))
+        pipe.get(DAY_TOTAL_KEY.format(day))
+        (earnings, deliveries), hour_total, day_total = pipe.execute()
+        return {
+            'earnings': round(float(earnings or 0.0), 2),
+            'deliveries': int(deliveries or 0),
+            'hour': round(float(hour_total or 0.0), 2),
+            'day': round(float(day_total or 0.0), 2)
+        }
+
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
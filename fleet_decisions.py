@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Décisions groupées de la flotte - Intérêt des livreurs automatiques calculé en NumPy
+Branché sur un EventHub (EventHub(..., decider=FleetDecider())), il remplace le
+_decide_interest scalaire et le PUBLISH par réponse de chaque DeliveryPerson
+automatique: les annonces reçues sont regroupées en lots (taille maximale ou
+attente `linger`), la matrice d'intérêt annonces x livreurs est calculée d'un
+coup puis toutes les réponses du lot partent en un pipeline par nœud Redis.
+
+Mêmes règles que DeliveryPerson._decide_interest:
+    probabilité = interest_probability x facteur distance x facteur compensation
+    livreur simulé: occupé = pas intéressé, hors du rayon de réponse = pas de réponse,
+    le trajet jusqu'au restaurant s'ajoute à la distance
+
+Les livreurs manuels du hub reçoivent toujours les annonces un par un.
+Les doublons (republications après redémarrage du manager) sont filtrés une fois
+pour toute la flotte, pas dans seen_announcements de chaque livreur.
+"""
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from console import get_logger
+from metrics import REGISTRY
+from models import Announcement, Response
+from tracing import child_trace, now_us
+
+# Channels Redis
+CHANNELS = {
+    'ORDER_ANNOUNCEMENT': 'order:announcement',
+    'DELIVERY_RESPONSE': 'delivery:response',
+    'DELIVERY_SELECTION': 'delivery:selection',
+    'DELIVERY_NOTIFICATION': 'delivery:notification'
+}
+
+# Lots d'annonces: taille maximale et attente maximale de la première annonce
+DEFAULT_MAX_BATCH = 64
+DEFAULT_LINGER = 0.01
+
+# Cellules annonces x livreurs calculées à la fois (borne la mémoire des très grandes flottes)
+MAX_MATRIX_CELLS = 4_000_000
+
+# PUBLISH envoyés par aller-retour
+PIPELINE_BATCH_SIZE = 1000
+
+# Identifiants d'annonces mémorisés pour ignorer les doublons
+SEEN_ANNOUNCEMENTS_LIMIT = 10000
+
+# Vitesse moyenne (km/h) des livreurs non simulés pour le temps d'arrivée
+DEFAULT_SPEED_KMH = 30.0
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+log = get_logger('fleet')
+
+COURIER_ANNOUNCEMENTS_TOTAL = REGISTRY.counter('courier_announcements_total', 'Annonces reçues par les livreurs')
+COURIER_RESPONSES_TOTAL = REGISTRY.counter('courier_responses_total', 'Réponses envoyées par les livreurs')
+COURIER_ERRORS_TOTAL = REGISTRY.counter('dispatch_errors_total', 'Erreurs du pipeline', {'component': 'courier'})
+FLEET_BATCH_SIZE = REGISTRY.histogram('courier_fleet_batch_size', 'Annonces par lot de décisions',
+                                      buckets=BATCH_SIZE_BUCKETS)
+FLEET_DECISION_SECONDS = REGISTRY.histogram('courier_fleet_decision_seconds', 'Durée du calcul de la matrice d\'intérêt')
+FLEET_PUBLISH_SECONDS = REGISTRY.histogram('courier_fleet_publish_seconds', 'Durée des réponses pipelinées d\'un lot')
+
+
+class _CourierGroup:
+    """Livreurs automatiques partageant la même simulation (ou sans simulation)"""
+
+    def __init__(self, simulation, couriers: List):
+        self.simulation = simulation
+        self.couriers = couriers
+        self.interest = np.array([dp.interest_probability for dp in couriers], dtype=np.float64)
+        self.sim_indices = (np.array([dp.sim_index for dp in couriers], dtype=np.int64)
+                            if simulation is not None else None)
+
+
+class FleetDecider:
+    """Étape de décision de la flotte: lots d'annonces, matrice d'intérêt NumPy, réponses pipelinées"""
+
+    def __init__(self, max_batch: int = DEFAULT_MAX_BATCH, linger: float = DEFAULT_LINGER,
+                 seed: Optional[int] = None):
+        self.max_batch = max_batch
+        self.linger = linger
+        self.rng = np.random.default_rng(seed)
+        self.buffer = queue.Queue()
+        self.hub = None
+        self.running = False
+        self.decider_thread = None
+        self.seen_announcements = OrderedDict()
+
+        # Groupes de livreurs reconstruits quand les inscriptions du hub changent
+        self._groups: List[_CourierGroup] = []
+        self._members_version = None
+
+        # Statistiques
+        self.stats = {
+            'batches': 0,
+            'announcements': 0,
+            'decisions': 0,
+            'responses': 0,
+            'interested': 0,
+            'failed_batches': 0
+        }
+
+    def start(self, hub):
+        """Démarre le thread de décision pour les livreurs automatiques du hub"""
+        self.hub = hub
+        self.running = True
+        self.decider_thread = threading.Thread(target=self._run)
+        self.decider_thread.daemon = True
+        self.decider_thread.start()
+
+    def stop(self):
+        """Arrête le thread et traite les annonces encore en file"""
+        self.running = False
+        if self.decider_thread:
+            self.decider_thread.join(timeout=5)
+        batch = self._drain(block=False)
+        if batch:
+            self.process_batch(batch)
+
+    def submit(self, announcement: Announcement, trace_hops: Optional[Dict] = None):
+        """Met une annonce décodée en file (appelé par le thread d'écoute du hub)"""
+        self.buffer.put((announcement, trace_hops or {}))
+
+    def _run(self):
+        while self.running:
+            batch = self._drain(block=True)
+            if batch:
+                try:
+                    self.process_batch(batch)
+                except Exception as e:
+                    COURIER_ERRORS_TOTAL.inc()
+                    self.stats['failed_batches'] += 1
+                    log.error("❌ Erreur lors des décisions de la flotte: %s", e)
+
+    def _drain(self, block: bool) -> List[Tuple[Announcement, Dict]]:
+        """Lot d'annonces: jusqu'à max_batch, au plus `linger` secondes après la première"""
+        batch = []
+        try:
+            batch.append(self.buffer.get(timeout=0.1) if block else self.buffer.get_nowait())
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.buffer.get(timeout=remaining) if remaining > 0 else self.buffer.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _courier_groups(self) -> List[_CourierGroup]:
+        """Livreurs automatiques du hub groupés par simulation"""
+        version = self.hub.members_version
+        if version != self._members_version:
+            by_simulation: Dict[int, Tuple] = {}
+            for dp in self.hub.get_delivery_persons():
+                if dp.auto_respond:
+                    by_simulation.setdefault(id(dp.simulation), (dp.simulation, []))[1].append(dp)
+            self._groups = [_CourierGroup(simulation, couriers) for simulation, couriers in by_simulation.values()]
+            self._members_version = version
+        return self._groups
+
+    def process_batch(self, batch: List[Tuple[Announcement, Dict]]) -> int:
+        """Décide pour toute la flotte et publie les réponses d'un lot; retourne le nombre de réponses"""
+        # Doublons filtrés une fois pour toute la flotte
+        announcements, hops = [], []
+        for announcement, trace_hops in batch:
+            if announcement.announcement_id in self.seen_announcements:
+                continue
+            self.seen_announcements[announcement.announcement_id] = True
+            if len(self.seen_announcements) > SEEN_ANNOUNCEMENTS_LIMIT:
+                self.seen_announcements.popitem(last=False)
+            announcements.append(announcement)
+            hops.append(trace_hops)
+        if not announcements:
+            return 0
+        FLEET_BATCH_SIZE.observe(len(announcements))
+
+        groups = self._courier_groups()
+        fleet_size = sum(len(group.couriers) for group in groups)
+        for group in groups:
+            for dp in group.couriers:
+                dp.stats['announcements_received'] += len(announcements)
+                dp.state_version += 1
+        COURIER_ANNOUNCEMENTS_TOTAL.inc(len(announcements) * fleet_size)
+
+        start = time.perf_counter()
+        responses = []
+        for group in groups:
+            responses.extend(self._group_responses(group, announcements, hops))
+        FLEET_DECISION_SECONDS.observe(time.perf_counter() - start)
+
+        sent = self._publish(responses)
+        self.stats['batches'] += 1
+        self.stats['announcements'] += len(announcements)
+        self.stats['decisions'] += len(announcements) * fleet_size
+        log.debug("🧮 Lot de %d annonces x %d livreurs: %d réponses", len(announcements), fleet_size, sent)
+        return sent
+
+    def decide(self, group: _CourierGroup, announcements: List[Announcement]):
+        """Matrices [annonce, livreur] d'un groupe: (répond, intéressé, distance au restaurant, lat, lng)
+
+        Sans simulation, tous les livreurs répondent et la distance au restaurant vaut None.
+        """
+        estimated = np.array([a.estimated_distance for a in announcements], dtype=np.float64)
+        compensation = np.array([a.compensation for a in announcements], dtype=np.float64)
+        shape = (len(announcements), len(group.couriers))
+
+        simulation = group.simulation
+        if simulation is None:
+            eligible = np.ones(shape, dtype=bool)
+            idle = np.ones(shape[1], dtype=bool)
+            pickup, lat, lng = None, None, None
+            distance = np.broadcast_to(estimated[:, None], shape)
+        else:
+            pickup_lats = np.array([a.order.restaurant.lat for a in announcements], dtype=np.float64)
+            pickup_lngs = np.array([a.order.restaurant.lng for a in announcements], dtype=np.float64)
+            lat, lng, idle, pickup = simulation.pickup_distances(group.sim_indices, pickup_lats, pickup_lngs)
+            eligible = pickup <= simulation.response_radius_km
+            distance = estimated[:, None] + pickup
+
+        # Distance (max 10 km) et compensation (min 3€, max 15€), comme _decide_interest
+        distance_factor = np.maximum(0.1, 1.0 - distance / 10.0)
+        compensation_factor = np.minimum(1.5, compensation / 8.0)[:, None]
+        probability = group.interest[None, :] * distance_factor * compensation_factor
+        interested = (self.rng.random(shape) < probability) & idle[None, :]
+        return eligible, interested, pickup, lat, lng
+
+    def _group_responses(self, group: _CourierGroup, announcements: List[Announcement],
+                         hops: List[Dict]) -> List[Tuple[Announcement, object, Response]]:
+        """Réponses (annonce, livreur, réponse) d'un groupe, par tranches de MAX_MATRIX_CELLS"""
+        if not group.couriers:
+            return []
+        simulation = group.simulation
+        speed = simulation.speed_kmh if simulation is not None else DEFAULT_SPEED_KMH
+        step = max(1, MAX_MATRIX_CELLS // len(group.couriers))
+        results = []
+        for offset in range(0, len(announcements), step):
+            chunk = announcements[offset:offset + step]
+            eligible, interested, pickup, lat, lng = self.decide(group, chunk)
+            rows, cols = np.nonzero(eligible)
+            flags = interested[rows, cols].tolist()
+            pickups = pickup[rows, cols].tolist() if pickup is not None else [None] * len(flags)
+            responded, response_time = now_us(), datetime.now().isoformat()
+            traces = [child_trace(a.trace, **hops[offset + i], responded=responded) for i, a in enumerate(chunk)]
+
+            for row, col, is_interested, pickup_distance in zip(rows.tolist(), cols.tolist(), flags, pickups):
+                announcement = chunk[row]
+                dp = group.couriers[col]
+                response = Response(
+                    response_id=str(uuid.uuid4()),
+                    delivery_person_id=dp.person_id,
+                    delivery_person_name=dp.name,
+                    announcement_id=announcement.announcement_id,
+                    is_interested=is_interested,
+                    estimated_arrival_time=None,
+                    current_location=dp.current_location,
+                    response_time=response_time,
+                    trace=traces[row]
+                )
+                if pickup_distance is None:
+                    if is_interested:
+                        response.estimated_arrival_time = int((announcement.estimated_distance / speed) * 60)
+                else:
+                    # Livreur simulé: position courante et distance jusqu'au restaurant
+                    response.current_lat = float(lat[col])
+                    response.current_lng = float(lng[col])
+                    response.current_location = f"{response.current_lat:.5f}, {response.current_lng:.5f}"
+                    response.distance_to_pickup_km = round(pickup_distance, 3)
+                    if is_interested:
+                        response.estimated_arrival_time = int(pickup_distance / speed * 60)
+                results.append((announcement, dp, response))
+        return results
+
+    def _response_client(self, announcement: Announcement):
+        """Nœud Redis où répondre: celui qui a publié l'annonce"""
+        shard_router = self.hub.shard_router
+        if shard_router is None:
+            return self.hub.redis_client
+        if announcement.shard:
+            return shard_router.client(announcement.shard)
+        return shard_router.client_for_zone(announcement.zone)
+
+    def _publish(self, responses: List[Tuple[Announcement, object, Response]]) -> int:
+        """Publie les réponses d'un lot, un pipeline par nœud Redis"""
+        by_node: Dict[int, Tuple] = {}
+        for announcement, dp, response in responses:
+            client = self._response_client(announcement)
+            by_node.setdefault(id(client), (client, []))[1].append((dp, response))
+
+        sent = 0
+        start = time.perf_counter()
+        for client, pending in by_node.values():
+            for offset in range(0, len(pending), PIPELINE_BATCH_SIZE):
+                chunk = pending[offset:offset + PIPELINE_BATCH_SIZE]
+                try:
+                    pipe = client.pipeline(transaction=False)
+                    for _, response in chunk:
+                        pipe.publish(CHANNELS['DELIVERY_RESPONSE'], response.to_json())
+                    pipe.execute()
+                except Exception as e:
+                    COURIER_ERRORS_TOTAL.inc()
+                    self.stats['failed_batches'] += 1
+                    log.error("❌ Erreur lors de l'envoi de %d réponses de la flotte: %s", len(chunk), e)
+                    continue
+                for dp, response in chunk:
+                    dp.stats['responses_sent'] += 1
+                    dp.state_version += 1
+                    if response.is_interested:
+                        self.stats['interested'] += 1
+                sent += len(chunk)
+        FLEET_PUBLISH_SECONDS.observe(time.perf_counter() - start)
+
+        COURIER_RESPONSES_TOTAL.inc(sent)
+        self.stats['responses'] += sent
+        return sent
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Historique MongoDB - Archivage des annonces terminées
+Tampon en mémoire vidé par lots (insert_many) par taille et par temps
+
+Un lot interrompu par une erreur de connexion est réessayé après RETRY_INTERVAL
+secondes, au plus MAX_WRITE_ATTEMPTS fois. Les doublons (index unique sur
+announcement_id) sont ignorés sans perdre le reste du lot.
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from console import get_logger
+from models import Announcement, Response, Selection
+
+try:
+    import pymongo
+    from pymongo.errors import BulkWriteError, ConnectionFailure
+except ImportError:  # pymongo est optionnel: sans lui l'historique est désactivé
+    pymongo = None
+
+    class BulkWriteError(Exception):
+        """Équivalent de pymongo.errors.BulkWriteError (levée par InMemoryCollection)"""
+
+        def __init__(self, details: Dict):
+            super().__init__("batch op errors occurred")
+            self.details = details
+
+    class ConnectionFailure(Exception):
+        """Équivalent de pymongo.errors.ConnectionFailure"""
+
+# Configuration MongoDB
+MONGO_URI = 'mongodb://localhost:27017'
+MONGO_DB = 'ubereats'
+MONGO_COLLECTION = 'order_history'
+
+# Paramètres du tampon d'écriture
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_MAX_BUFFER = 10000
+
+# Réessai des lots après une erreur de connexion
+MAX_WRITE_ATTEMPTS = 5
+RETRY_INTERVAL = 1.0
+
+# Code d'erreur MongoDB d'une clé unique déjà présente
+DUPLICATE_KEY_ERROR = 11000
+
+log = get_logger('history')
+
+
+def build_history_document(announcement: Announcement, responses: List[Response],
+                           selection: Optional[Selection] = None) -> Dict:
+    """Construit le document d'historique d'une annonce terminée"""
+    order = announcement.order
+    interested = [r for r in responses if r.is_interested]
+
+    return {
+        'announcement_id': announcement.announcement_id,
+        'order_id': order.order_id,
+        'trace_id': (announcement.trace or {}).get('id'),
+        'restaurant_id': order.restaurant.id,
+        'restaurant_name': order.restaurant.name,
+        'compensation': announcement.compensation,
+        'estimated_distance': announcement.estimated_distance,
+        'total_amount': order.total_amount,
+        'items': [item.to_dict() for item in order.items],
+        'created_at': announcement.created_at,
+        'completed_at': datetime.now(),
+        'status': 'assigned' if selection else 'closed',
+        'response_count': len(responses),
+        'interested_count': len(interested),
+        'responses': [
+            {
+                'delivery_person_id': r.delivery_person_id,
+                'delivery_person_name': r.delivery_person_name,
+                'is_interested': r.is_interested,
+                'estimated_arrival_time': r.estimated_arrival_time,
+                'response_time': r.response_time
+            }
+            for r in responses
+        ],
+        'selected_delivery_person_id': selection.selected_delivery_person_id if selection else None,
+        'selected_delivery_person_name': selection.selected_delivery_person_name if selection else None,
+        'selection_reason': selection.selection_reason if selection else None,
+        'selected_at': selection.selected_at if selection else None
+    }
+
+
+class InMemoryCollection:
+    """Collection en mémoire compatible avec le sous-ensemble utilisé de pymongo
+
+    Permet de tester l'historique sans mongod.
+    """
+
+    def __init__(self):
+        self.documents = []
+        self.indexes = []
+        self.unique_keys = {}  # champs d'un index unique -> valeurs déjà présentes
+        self.lock = threading.Lock()
+
+    def insert_many(self, documents, ordered=True):
+        errors, inserted = [], 0
+        with self.lock:
+            for position, doc in enumerate(documents):
+                keys = [(fields, tuple(doc.get(field) for field in fields)) for fields in self.unique_keys]
+                if any(value in self.unique_keys[fields] for fields, value in keys):
+                    errors.append({'index': position, 'code': DUPLICATE_KEY_ERROR, 'errmsg': 'duplicate key'})
+                    if ordered:
+                        break
+                    continue
+                for fields, value in keys:
+                    self.unique_keys[fields].add(value)
+                self.documents.append(dict(doc))
+                inserted += 1
+        if errors:
+            raise BulkWriteError({'nInserted': inserted, 'writeErrors': errors})
+
+    def create_index(self, keys, **kwargs):
+        self.indexes.append((keys, kwargs))
+        if kwargs.get('unique'):
+            fields = tuple(field for field, _ in keys)
+            with self.lock:
+                self.unique_keys[fields] = {tuple(doc.get(field) for field in fields) for doc in self.documents}
+        return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+    def find(self, filter=None):
+        filter = filter or {}
+        with self.lock:
+            return [doc for doc in self.documents if all(doc.get(k) == v for k, v in filter.items())]
+
+    def count_documents(self, filter=None):
+        return len(self.find(filter))
+
+
+class OrderHistorySink:
+    """Écriture différée (write-behind) de l'historique vers MongoDB
+
+    record() ne bloque jamais: si le tampon est plein, le document est compté
+    comme perdu. Un thread vide le tampon dès qu'un lot est complet ou que
+    l'intervalle de flush est écoulé. Les documents d'un lot en échec (MongoDB
+    injoignable) repartent en tête d'un lot suivant après RETRY_INTERVAL.
+    """
+
+    def __init__(self, collection, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_buffer: int = DEFAULT_MAX_BUFFER):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = queue.Queue(maxsize=max_buffer)
+        self.running = False
+        self.writer_thread = None
+        self.flush_lock = threading.Lock()
+
+        # Documents des lots en échec avec leur nombre d'essais: [(essais, document)]
+        self.failed: List[Tuple[int, Dict]] = []
+        self.retry_at = 0.0
+
+        # Statistiques
+        self.stats = {
+            'recorded': 0,
+            'written': 0,
+            'duplicates': 0,
+            'dropped': 0,
+            'failed_batches': 0,
+            'retried': 0,
+            'flushes': 0
+        }
+
+    @classmethod
+    def from_uri(cls, uri: str = MONGO_URI, db_name: str = MONGO_DB,
+                 collection_name: str = MONGO_COLLECTION, **kwargs) -> 'OrderHistorySink':
+        """Crée le sink sur une base MongoDB (nécessite pymongo)"""
+        if pymongo is None:
+            raise RuntimeError("pymongo n'est pas installé: pip install pymongo")
+        client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=2000)
+        client.admin.command('ping')
+        return cls(client[db_name][collection_name], **kwargs)
+
+    def ensure_indexes(self):
+        """Crée les index pour les requêtes par restaurant et par livreur"""
+        self.collection.create_index([('announcement_id', 1)], unique=True)
+        self.collection.create_index([('restaurant_id', 1), ('completed_at', -1)])
+        self.collection.create_index([('selected_delivery_person_id', 1), ('completed_at', -1)])
+        self.collection.create_index([('responses.delivery_person_id', 1), ('completed_at', -1)])
+
+    def start(self):
+        """Démarre le thread d'écriture"""
+        self.running = True
+        self.writer_thread = threading.Thread(target=self._run)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def stop(self):
+        """Arrête le thread et écrit ce qui reste dans le tampon"""
+        self.running = False
+        if self.writer_thread:
+            self.writer_thread.join(timeout=5)
+        self.flush()
+
+    def record(self, document: Dict) -> bool:
+        """Ajoute un document au tampon sans bloquer"""
+        try:
+            self.buffer.put_nowait(document)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            return False
+        self.stats['recorded'] += 1
+        return True
+
+    def flush(self) -> int:
+        """Écrit immédiatement le contenu du tampon (et les lots à réessayer, en respectant
+        RETRY_INTERVAL), retourne le nombre de documents écrits"""
+        written = 0
+        with self.flush_lock:
+            while True:
+                batch = self._drain(self.batch_size)
+                if not batch and not self.failed:
+                    break
+                if not batch:
+                    time.sleep(max(0.0, self.retry_at - time.monotonic()))
+                written += self._write(batch)
+        return written
+
+    def _drain(self, limit: int) -> List[Tuple[int, Dict]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append((0, self.buffer.get_nowait()))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Tuple[int, Dict]]) -> int:
+        """Insère un lot [(essais, document)] (appelé sous flush_lock), avec les documents
+        à réessayer en tête si leur délai est écoulé"""
+        if self.failed and time.monotonic() >= self.retry_at:
+            self.stats['retried'] += len(self.failed)
+            batch, self.failed = self.failed + batch, []
+        if not batch:
+            return 0
+        try:
+            self.collection.insert_many([document for _, document in batch], ordered=False)
+            written = len(batch)
+        except BulkWriteError as e:
+            # Lot non ordonné: tous les documents sans erreur sont insérés
+            written = e.details.get('nInserted', 0)
+            errors = e.details.get('writeErrors', [])
+            duplicates = sum(1 for error in errors if error.get('code') == DUPLICATE_KEY_ERROR)
+            self.stats['duplicates'] += duplicates
+            if len(errors) > duplicates:
+                self.stats['failed_batches'] += 1
+                self.stats['dropped'] += len(errors) - duplicates
+                log.error("❌ Erreur lors de l'écriture de l'historique (%d documents rejetés): %s",
+                          len(errors) - duplicates, e.details.get('writeErrors'))
+        except ConnectionFailure as e:
+            self._failed(batch, e)
+            return 0
+        except Exception as e:
+            self.stats['failed_batches'] += 1
+            self.stats['dropped'] += len(batch)
+            log.error("❌ Erreur lors de l'écriture de l'historique (%d documents): %s", len(batch), e)
+            return 0
+        self.stats['written'] += written
+        self.stats['flushes'] += 1
+        return written
+
+    def _failed(self, batch: List[Tuple[int, Dict]], error: Exception):
+        """Garde les documents d'un lot interrompu pour un prochain lot, ou les abandonne
+        après MAX_WRITE_ATTEMPTS essais"""
+        self.stats['failed_batches'] += 1
+        kept = [(attempts + 1, document) for attempts, document in batch if attempts + 1 < MAX_WRITE_ATTEMPTS]
+        lost = len(batch) - len(kept)
+        self.failed.extend(kept)
+        self.retry_at = time.monotonic() + RETRY_INTERVAL
+        self.stats['dropped'] += lost
+        log.error("❌ MongoDB injoignable (%d documents, %d à réessayer, %d perdus): %s",
+                  len(batch), len(kept), lost, error)
+
+    def _run(self):
+        """Boucle du thread d'écriture: flush par taille ou par temps"""
+        while self.running:
+            try:
+                first = self.buffer.get(timeout=min(self.flush_interval, RETRY_INTERVAL))
+            except queue.Empty:
+                if self.failed and time.monotonic() >= self.retry_at:
+                    with self.flush_lock:
+                        self._write([])
+                continue
+
+            # Attendre un lot complet sans retenir le premier document plus que l'intervalle
+            batch = [(0, first)]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append((0, self.buffer.get(timeout=remaining)))
+                except queue.Empty:
+                    break
+
+            with self.flush_lock:
+                self._write(batch)
+
+
+def create_history_sink() -> Optional[OrderHistorySink]:
+    """Crée et démarre le sink MongoDB par défaut, ou None si MongoDB est indisponible"""
+    try:
+        sink = OrderHistorySink.from_uri()
+        sink.ensure_indexes()
+    except Exception as e:
+        log.warning("⚠️ Historique MongoDB désactivé: %s", e)
+        return None
+    sink.start()
+    log.info("🗄️  Historique MongoDB actif: %s.%s", MONGO_DB, MONGO_COLLECTION)
+    return sink
@@ -3,15 +3,26 @@
 Livreur Redis - Système de livraison de repas
 Écoute les annonces et manifeste son intérêt
 """
-import redis
-import json
 import time
 import threading
 import random
 import uuid
 import math
+import logging
+from collections import Counter, OrderedDict
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from models import Announcement, Notification, Response, loads
+from tracing import child_trace, now_us
+from metrics import REGISTRY, print_metrics, start_metrics_server
+from profiling import toggle_profiling, is_profiling
+from console import get_logger, flush_console, toggle_quiet
+from earnings_ledger import EarningsLedger
+from sharding import ShardRouter, courier_zones
+from redis_connections import get_client, listen
+from snapshots import SnapshotWriter, read_snapshot, restorable, snapshot_path
+from spatial_index import DEFAULT_ZONE_KM
 
 # Configuration Redis
 REDIS_HOST = 'localhost'
@@ -26,24 +37,74 @@ CHANNELS = {
     'DELIVERY_NOTIFICATION': 'delivery:notification'
 }
 
+log = get_logger('courier')
+
+# Identifiants d'annonces mémorisés par livreur pour ignorer les doublons
+SEEN_ANNOUNCEMENTS_LIMIT = 10000
+
+# Métriques des livreurs
+COURIER_ANNOUNCEMENTS_TOTAL = REGISTRY.counter('courier_announcements_total', 'Annonces reçues par les livreurs')
+COURIER_RESPONSES_TOTAL = REGISTRY.counter('courier_responses_total', 'Réponses envoyées par les livreurs')
+COURIER_NOTIFICATIONS_TOTAL = REGISTRY.counter('courier_notifications_total', 'Notifications reçues par les livreurs')
+COURIER_ERRORS_TOTAL = REGISTRY.counter('dispatch_errors_total', 'Erreurs du pipeline', {'component': 'courier'})
+RESPONSE_PUBLISH_SECONDS = REGISTRY.histogram('dispatch_publish_seconds', 'Durée des PUBLISH', {'channel': 'response'})
+COURIER_PENDING_ANNOUNCEMENTS = REGISTRY.gauge('courier_pending_announcements', 'Annonces en attente de réponse (tous livreurs)')
+
 class DeliveryPerson:
     """Classe représentant un livreur individuel"""
     
-    def __init__(self, person_id: str, name: str, current_location: str = "Birmingham, AL"):
+    def __init__(self, person_id: str, name: str, current_location: str = "Birmingham, AL",
+                 redis_client=None, auto_respond: bool = False, hub=None, simulation=None,
+                 snapshot_path=None, shard_router=None, zones=None):
         self.person_id = person_id
         self.name = name
         self.current_location = current_location
-        self.redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+        
+        # Avec un EventHub, le livreur n'a ni connexion ni thread propres
+        self.hub = hub
+        if redis_client is None and hub is not None:
+            redis_client = hub.redis_client
+        
+        # Répartition par zone (sharding.ShardRouter): écoute des seuls nœuds de ses zones
+        # (un livreur simulé sans zones les suit depuis sa position)
+        if shard_router is None and hub is not None:
+            shard_router = hub.shard_router
+        self.shard_router = shard_router
+        self.zones = zones
+        self.zone_subscription = None
+        if redis_client is None and shard_router is not None:
+            redis_client = shard_router.primary
+        if redis_client is None:
+            redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+        self.redis_client = redis_client
         self.running = False
         
-        # Threads pour écouter les annonces et notifications
-        self.announcement_listener_thread = None
-        self.notification_listener_thread = None
+        # Mode sans terminal: le livreur répond seul via _decide_interest
+        self.auto_respond = auto_respond
+        
+        # Position simulée (courier_simulation.CourierFleetSimulation), index attribué au démarrage
+        self.simulation = simulation
+        self.sim_index = None
+        
+        # Threads pour écouter les annonces et notifications (deux par nœud Redis écouté)
+        self.listener_threads = []
         
         # Queue pour les annonces en attente de réponse
         self.pending_announcements = []
         self.lock = threading.Lock()
         
+        # Étapes de trace côté livreur (réception, décodage) par annonce, bornées comme
+        # seen_announcements: les annonces jamais répondues ne s'accumulent pas
+        self.trace_hops = OrderedDict()
+        
+        # Annonces déjà reçues (les republications après redémarrage du manager sont ignorées)
+        self.seen_announcements = OrderedDict()
+        
+        # Instantané pour le redémarrage à chaud (optionnel), écrit quand state_version change
+        self.snapshot_path = snapshot_path
+        self.snapshot_writer = None
+        self.state_version = 0
+        
         # Statistiques
         self.stats = {
             'announcements_received': 0,
@@ -58,96 +119,178 @@ class DeliveryPerson:
         
     def start(self):
         """Démarre le livreur"""
-        print(f"🚀 Démarrage du livreur {self.name} (ID: {self.person_id})...")
+        log.info(f"🚀 Démarrage du livreur {self.name} (ID: {self.person_id})...")
         self.running = True
+        COURIER_PENDING_ANNOUNCEMENTS.track(self, lambda dp: len(dp.pending_announcements))
+        if self.simulation is not None and self.sim_index is None:
+            self.sim_index = self.simulation.add_courier(self.person_id)
+            if self.shard_router is not None and self.zones is None:
+                self.zones = self._position_zones(*self.simulation.position(self.sim_index))
+                self.simulation.watch_zone(self.sim_index, self._on_zone_change)
+        if self.snapshot_path:
+            self._restore_snapshot()
+            self.snapshot_writer = SnapshotWriter(self.snapshot_path, self._capture_state,
+                                                  lambda: self.state_version)
+            self.snapshot_writer.start()
+        
+        if self.hub is not None:
+            self.hub.register(self)
+            log.info(f"✅ Livreur {self.name} inscrit sur le hub partagé")
+            return
         
         # Démarrer les threads d'écoute
-        self.announcement_listener_thread = threading.Thread(target=self._listen_for_announcements)
-        self.announcement_listener_thread.daemon = True
-        self.announcement_listener_thread.start()
-        
-        self.notification_listener_thread = threading.Thread(target=self._listen_for_notifications)
-        self.notification_listener_thread.daemon = True
-        self.notification_listener_thread.start()
+        if self.shard_router:
+            self.zone_subscription = self.shard_router.subscribe_nodes(
+                lambda node: self._start_listeners(self.shard_router.client(node)), self.zones)
+        else:
+            self._start_listeners(self.redis_client)
         
-        print(f"✅ Livreur {self.name} démarré avec succès")
-        print(f"   Probabilité d'intérêt: {self.interest_probability:.2f}")
+        log.info(f"✅ Livreur {self.name} démarré avec succès\n"
+                 f"   Probabilité d'intérêt: {self.interest_probability:.2f}")
     
     def stop(self):
         """Arrête le livreur"""
-        print(f"🛑 Arrêt du livreur {self.name}...")
+        log.info(f"🛑 Arrêt du livreur {self.name}...")
         self.running = False
+        COURIER_PENDING_ANNOUNCEMENTS.untrack(self)
         
-        if self.announcement_listener_thread:
-            self.announcement_listener_thread.join(timeout=5)
-        if self.notification_listener_thread:
-            self.notification_listener_thread.join(timeout=5)
+        if self.hub is not None:
+            self.hub.unregister(self)
+        for thread in self.listener_threads:
+            thread.join(timeout=5)
+        if self.snapshot_writer:
+            self.snapshot_writer.stop()
         
-        print(f"✅ Livreur {self.name} arrêté")
+        log.info(f"✅ Livreur {self.name} arrêté")
     
-    def _listen_for_announcements(self):
-        """Écoute les annonces de livraison"""
-        pubsub = self.redis_client.pubsub()
-        pubsub.subscribe(CHANNELS['ORDER_ANNOUNCEMENT'])
-        
-        print(f"👂 {self.name} écoute les annonces sur: {CHANNELS['ORDER_ANNOUNCEMENT']}")
-        
-        for message in pubsub.listen():
-            if not self.running:
-                break
-                
-            if message['type'] == 'message':
-                try:
-                    announcement = json.loads(message['data'])
-                    self._process_announcement(announcement)
-                except Exception as e:
-                    print(f"❌ Erreur lors du traitement de l'annonce par {self.name}: {e}")
-        
-        pubsub.close()
+    def update_zones(self, zones):
+        """Change les zones écoutées: abonnement aux nœuds devenus nécessaires"""
+        with self.lock:
+            previous, self.zones = self.zones, zones
+        if previous == zones:
+            return
+        if self.hub is not None:
+            if self.running:
+                self.hub.member_zones_changed(previous, zones)
+        elif self.zone_subscription is not None:
+            self.shard_router.update_zones(self.zone_subscription, zones)
     
-    def _listen_for_notifications(self):
-        """Écoute les notifications de sélection"""
-        pubsub = self.redis_client.pubsub()
-        pubsub.subscribe(CHANNELS['DELIVERY_NOTIFICATION'])
-        
-        print(f"👂 {self.name} écoute les notifications sur: {CHANNELS['DELIVERY_NOTIFICATION']}")
-        
-        for message in pubsub.listen():
-            if not self.running:
-                break
-                
-            if message['type'] == 'message':
-                try:
-                    notification = json.loads(message['data'])
-                    
-                    # Vérifier si la notification nous concerne
-                    if notification.get('delivery_person_id') == self.person_id:
-                        self._process_notification(notification)
-                    
-                except Exception as e:
-                    print(f"❌ Erreur lors du traitement de la notification par {self.name}: {e}")
-        
-        pubsub.close()
+    def _position_zones(self, lat, lng):
+        # Marge d'une zone: la liste n'est recalculée qu'au changement de zone du livreur
+        return courier_zones((lat, lng), self.simulation.response_radius_km + DEFAULT_ZONE_KM)
+    
+    def _on_zone_change(self, lat, lng):
+        """Livreur simulé entré dans une nouvelle zone"""
+        if self.running:
+            self.update_zones(self._position_zones(lat, lng))
+    
+    def _capture_state(self):
+        """État du livreur pour l'instantané"""
+        with self.lock:
+            return {
+                'person_id': self.person_id,
+                'name': self.name,
+                'stats': self.stats.copy(),
+                'pending_announcements': list(self.pending_announcements),
+                'seen_announcements': list(self.seen_announcements)
+            }
     
-    def _process_announcement(self, announcement):
+    def _restore_snapshot(self):
+        """Reprend statistiques et annonces en attente de l'instantané du même livreur"""
+        state = read_snapshot(self.snapshot_path)
+        if not restorable(state) or state['person_id'] != self.person_id:
+            return
+        with self.lock:
+            self.stats.update(state['stats'])
+            self.pending_announcements = state['pending_announcements'] + self.pending_announcements
+            self.seen_announcements.update((announcement_id, True) for announcement_id in state['seen_announcements'])
+            self.state_version += 1
+        log.info(f"♻️ {self.name}: état restauré ({len(state['pending_announcements'])} annonce(s) en attente)")
+    
+    def _start_listeners(self, redis_client):
+        for target in (self._listen_for_announcements, self._listen_for_notifications):
+            thread = threading.Thread(target=target, args=(redis_client,))
+            thread.daemon = True
+            thread.start()
+            self.listener_threads.append(thread)
+    
+    def _listen_for_announcements(self, redis_client):
+        """Écoute les annonces de livraison (reconnexion automatique en cas de coupure)"""
+        log.info("👂 %s écoute les annonces sur: %s", self.name, CHANNELS['ORDER_ANNOUNCEMENT'])
+        listen(redis_client, [CHANNELS['ORDER_ANNOUNCEMENT']], self._handle_announcement_message,
+               lambda: self.running, f"{self.name} (annonces)")
+    
+    def _handle_announcement_message(self, message):
+        try:
+            received = now_us()
+            announcement = Announcement.from_json(message['data'])
+            self._process_announcement(announcement, {'received': received, 'decoded': now_us()})
+        except Exception as e:
+            COURIER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors du traitement de l'annonce par %s: %s", self.name, e)
+    
+    def _listen_for_notifications(self, redis_client):
+        """Écoute les notifications de sélection (reconnexion automatique en cas de coupure)"""
+        log.info("👂 %s écoute les notifications sur: %s", self.name, CHANNELS['DELIVERY_NOTIFICATION'])
+        listen(redis_client, [CHANNELS['DELIVERY_NOTIFICATION']], self._handle_notification_message,
+               lambda: self.running, f"{self.name} (notifications)")
+    
+    def _handle_notification_message(self, message):
+        try:
+            notification = Notification.from_json(message['data'])
+            
+            # Vérifier si la notification nous concerne
+            if notification.delivery_person_id == self.person_id:
+                self._process_notification(notification)
+            
+        except Exception as e:
+            COURIER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors du traitement de la notification par %s: %s", self.name, e)
+    
+    def _process_announcement(self, announcement, trace_hops=None):
         """Traite une annonce de livraison"""
-        self.stats['announcements_received'] += 1
+        with self.lock:
+            if announcement.announcement_id in self.seen_announcements:
+                return
+            self.seen_announcements[announcement.announcement_id] = True
+            if len(self.seen_announcements) > SEEN_ANNOUNCEMENTS_LIMIT:
+                self.seen_announcements.popitem(last=False)
+            self.stats['announcements_received'] += 1
+            self.state_version += 1
+        COURIER_ANNOUNCEMENTS_TOTAL.inc()
+        if trace_hops and announcement.trace:
+            with self.lock:
+                self.trace_hops[announcement.announcement_id] = trace_hops
+                if len(self.trace_hops) > SEEN_ANNOUNCEMENTS_LIMIT:
+                    self.trace_hops.popitem(last=False)
+        
+        if self.auto_respond:
+            # Livreur simulé: les annonces trop loin de sa position sont ignorées
+            if (self.simulation is not None
+                    and self._distance_to_pickup(announcement) > self.simulation.response_radius_km):
+                self.trace_hops.pop(announcement.announcement_id, None)
+                return
+            self._send_response(announcement, self._decide_interest(announcement))
+            return
         
         # Ajouter l'annonce à la queue
         with self.lock:
             self.pending_announcements.append(announcement)
         
-        print(f"\n{'='*60}")
-        print(f"📢 NOUVELLE ANNONCE REÇUE !")
-        print(f"{'='*60}")
-        print(f"🏪 Restaurant: {announcement['order']['restaurant']['name']}")
-        print(f"📍 Adresse: {announcement['order']['restaurant']['address']}")
-        print(f"🚗 Distance: {announcement['estimated_distance']} km")
-        print(f"💰 Compensation: {announcement['compensation']}€")
-        print(f"🍽️  Items: {len(announcement['order']['items'])} articles")
-        print(f"{'='*60}")
-        print(f"💡 Tapez 'r' pour répondre à cette annonce")
-        print(f"{'='*60}")
+        if log.isEnabledFor(logging.INFO):
+            log.info(
+                f"\n{'='*60}\n"
+                f"📢 NOUVELLE ANNONCE REÇUE !\n"
+                f"{'='*60}\n"
+                f"🏪 Restaurant: {announcement.order.restaurant.name}\n"
+                f"📍 Adresse: {announcement.order.restaurant.address}\n"
+                f"🚗 Distance: {announcement.estimated_distance} km\n"
+                f"💰 Compensation: {announcement.compensation}€\n"
+                f"🍽️  Items: {len(announcement.order.items)} articles\n"
+                f"{'='*60}\n"
+                f"💡 Tapez 'r' pour répondre à cette annonce\n"
+                f"{'='*60}"
+            )
     
     def _respond_to_announcement(self):
         """Permet au livreur de répondre à une annonce en attente"""
@@ -159,14 +302,15 @@ class DeliveryPerson:
             # Prendre la première annonce en attente
             announcement = self.pending_announcements.pop(0)
         
+        flush_console()
         print(f"\n{'='*60}")
         print(f"📋 ANNONCE EN ATTENTE DE RÉPONSE")
         print(f"{'='*60}")
-        print(f"🏪 Restaurant: {announcement['order']['restaurant']['name']}")
-        print(f"📍 Adresse: {announcement['order']['restaurant']['address']}")
-        print(f"🚗 Distance: {announcement['estimated_distance']} km")
-        print(f"💰 Compensation: {announcement['compensation']}€")
-        print(f"🍽️  Items: {len(announcement['order']['items'])} articles")
+        print(f"🏪 Restaurant: {announcement.order.restaurant.name}")
+        print(f"📍 Adresse: {announcement.order.restaurant.address}")
+        print(f"🚗 Distance: {announcement.estimated_distance} km")
+        print(f"💰 Compensation: {announcement.compensation}€")
+        print(f"🍽️  Items: {len(announcement.order.items)} articles")
         print(f"{'='*60}")
         
         # Demander à l'utilisateur s'il est intéressé
@@ -201,11 +345,18 @@ class DeliveryPerson:
         
         base_interest = self.interest_probability
         
+        # Livreur simulé: occupé = pas intéressé, et le trajet jusqu'au restaurant compte
+        distance = announcement.estimated_distance
+        if self.simulation is not None:
+            if not self.simulation.is_idle(self.sim_index):
+                return False
+            distance += self._distance_to_pickup(announcement)
+        
         # Ajustement basé sur la distance (max 10km)
-        distance_factor = max(0.1, 1.0 - (announcement['estimated_distance'] / 10.0))
+        distance_factor = max(0.1, 1.0 - (distance / 10.0))
         
         # Ajustement basé sur la compensation (min 3€, max 15€)
-        compensation_factor = min(1.5, announcement['compensation'] / 8.0)
+        compensation_factor = min(1.5, announcement.compensation / 8.0)
         
         # Calcul de la probabilité finale
         final_probability = base_interest * distance_factor * compensation_factor
@@ -218,48 +369,91 @@ class DeliveryPerson:
         estimated_arrival = None
         if is_interested:
             # Estimation basée sur la distance (vitesse moyenne 30 km/h)
-            estimated_arrival = int((announcement['estimated_distance'] / 30.0) * 60)  # en minutes
-        
-        response = {
-            'response_id': str(uuid.uuid4()),
-            'delivery_person_id': self.person_id,
-            'delivery_person_name': self.name,
-            'announcement_id': announcement['announcement_id'],
-            'is_interested': is_interested,
-            'estimated_arrival_time': estimated_arrival,
-            'current_location': self.current_location,
-            'response_time': datetime.now().isoformat()
-        }
+            estimated_arrival = int((announcement.estimated_distance / 30.0) * 60)  # en minutes
+        
+        response = Response(
+            response_id=str(uuid.uuid4()),
+            delivery_person_id=self.person_id,
+            delivery_person_name=self.name,
+            announcement_id=announcement.announcement_id,
+            is_interested=is_interested,
+            estimated_arrival_time=estimated_arrival,
+            current_location=self.current_location,
+            response_time=datetime.now().isoformat()
+        )
+        
+        # Livreur simulé: position courante et distance jusqu'au restaurant
+        if self.simulation is not None:
+            lat, lng = self.simulation.position(self.sim_index)
+            pickup_distance = self._distance_to_pickup(announcement)
+            response.current_location = f"{lat:.5f}, {lng:.5f}"
+            response.current_lat = lat
+            response.current_lng = lng
+            response.distance_to_pickup_km = round(pickup_distance, 3)
+            if is_interested:
+                response.estimated_arrival_time = int(pickup_distance / self.simulation.speed_kmh * 60)
+        
+        # Trace: étapes de réception et de décodage puis réponse
+        hops = self.trace_hops.pop(announcement.announcement_id, {})
+        hops['responded'] = now_us()
+        response.trace = child_trace(announcement.trace, **hops)
         
         try:
-            message = json.dumps(response, ensure_ascii=False)
-            self.redis_client.publish(CHANNELS['DELIVERY_RESPONSE'], message)
+            message = response.to_json()
+            start = time.perf_counter()
+            self._response_client(announcement).publish(CHANNELS['DELIVERY_RESPONSE'], message)
+            RESPONSE_PUBLISH_SECONDS.observe(time.perf_counter() - start)
             
             self.stats['responses_sent'] += 1
+            self.state_version += 1
+            COURIER_RESPONSES_TOTAL.inc()
             
-            status = "✅ Intéressé" if is_interested else "❌ Pas intéressé"
-            print(f"📤 {self.name} a envoyé sa réponse: {status}")
+            log.info("📤 %s a envoyé sa réponse: %s", self.name, "✅ Intéressé" if is_interested else "❌ Pas intéressé")
             
         except Exception as e:
-            print(f"❌ Erreur lors de l'envoi de la réponse par {self.name}: {e}")
+            COURIER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors de l'envoi de la réponse par %s: %s", self.name, e)
+    
+    def _distance_to_pickup(self, announcement) -> float:
+        """Distance (km) entre la position simulée et le restaurant de l'annonce"""
+        restaurant = announcement.order.restaurant
+        return self.simulation.distance_to(self.sim_index, restaurant.lat, restaurant.lng)
+    
+    def _response_client(self, announcement):
+        """Nœud Redis où répondre: celui qui a publié l'annonce"""
+        if self.shard_router is None:
+            return self.redis_client
+        if announcement.shard:
+            return self.shard_router.client(announcement.shard)
+        return self.shard_router.client_for_zone(announcement.zone)
     
     def _process_notification(self, notification):
         """Traite une notification de sélection"""
-        self.stats['selections_received'] += 1
+        COURIER_NOTIFICATIONS_TOTAL.inc()
         
-        is_selected = notification.get('is_selected', False)
+        # Annonce clôturée: plus de réponse à tracer
+        self.trace_hops.pop(notification.announcement_id, None)
+        
+        is_selected = notification.is_selected
+        
+        # Livreur simulé: partir chercher la commande
+        if is_selected and self.simulation is not None and notification.pickup_lat is not None:
+            self.simulation.assign(self.sim_index, notification.announcement_id,
+                                   (notification.pickup_lat, notification.pickup_lng),
+                                   (notification.delivery_lat, notification.delivery_lng))
         
-        print(f"\n{'='*60}")
         if is_selected:
-            print(f"🎉 Félicitations {self.name.upper()} !")
-            print(f"🎯 Vous avez été sélectionné pour cette livraison !")
-            # Simuler l'ajout des gains
-            self.stats['total_earnings'] += 5.0  # Montant fictif
+            # Gains de la session; le manager crédite le grand livre Redis
+            compensation = float(notification.compensation or 0.0)
+            self.stats['selections_received'] += 1
+            self.stats['total_earnings'] += compensation
+            self.state_version += 1
+            log.info(f"\n{'='*60}\n🎉 Félicitations {self.name.upper()} !\n"
+                     f"🎯 Vous avez été sélectionné pour cette livraison !\n"
+                     f"💰 Compensation: {compensation:.2f}€\n{'='*60}")
         else:
-            selected_person = notification.get('selected_delivery_person_name', 'Inconnu')
-            print(f"😔 DÉSOLÉ {self.name}")
-            print(f"❌ Vous n'avez pas été sélectionné")
-        print(f"{'='*60}")
+            log.info(f"\n{'='*60}\n😔 DÉSOLÉ {self.name}\n"
+                     f"❌ Vous n'avez pas été sélectionné\n{'='*60}")
     
     def get_stats(self):
         """Retourne les statistiques du livreur"""
@@ -281,9 +475,221 @@ class DeliveryPerson:
         print(f"🏆 Sélections reçues: {self.stats['selections_received']}")
         print(f"💰 Gains totaux: {self.stats['total_earnings']:.2f}€")
         print(f"🎯 Taux de sélection: {(self.stats['selections_received']/max(1,self.stats['responses_sent'])*100):.1f}%")
+        try:
+            ledger = EarningsLedger(self.redis_client).courier(self.person_id)
+            if ledger['rank'] is not None:
+                print(f"🏅 Classement flotte: #{ledger['rank']}/{ledger['fleet_size']} "
+                      f"({ledger['earnings']:.2f}€ sur {ledger['deliveries']} livraisons)")
+        except Exception as e:
+            print(f"⚠️ Classement indisponible: {e}")
         print(f"{'='*50}")
 
 
+class EventHub:
+    """Connexion Pub/Sub unique partagée par de nombreux livreurs d'un même processus
+    
+    Un seul thread reçoit les annonces et les notifications, décode chaque message
+    une fois puis le distribue aux livreurs inscrits (tous pour une annonce, le
+    destinataire seul pour une notification).
+    
+    Avec un decider (fleet_decisions.FleetDecider), les annonces des livreurs
+    automatiques sont décidées par lots pour toute la flotte.
+    
+    Avec la répartition par zone et sans zones fixées, le hub écoute les nœuds des
+    zones de ses livreurs (tous les nœuds dès qu'un livreur n'a pas de zones).
+    """
+    
+    def __init__(self, redis_client=None, shard_router=None, zones=None, decider=None):
+        if redis_client is None and shard_router is not None:
+            redis_client = shard_router.primary
+        if redis_client is None:
+            redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+        self.redis_client = redis_client
+        self.shard_router = shard_router
+        self.zones = zones
+        self.zone_subscription = None
+        # Zones des livreurs inscrits (nombre de livreurs par zone) et livreurs sans zones
+        self.member_zones = Counter()
+        self.unzoned_members = 0
+        self.delivery_persons: Dict[str, DeliveryPerson] = {}
+        self.decider = decider
+        self.lock = threading.Lock()
+        self.running = False
+        self.listener_threads = []
+        
+        # Version incrémentée à chaque inscription ou message distribué (tableaux de bord)
+        self.state_version = 0
+        # Version des inscriptions seules (livreurs groupés par le decider)
+        self.members_version = 0
+        self._snapshot = None
+    
+    def start(self):
+        """Démarre le thread d'écoute partagé (un par nœud Redis avec la répartition par zone)"""
+        self.running = True
+        if self.decider is not None:
+            self.decider.start(self)
+        if self.shard_router:
+            with self.lock:
+                zones = self._subscribed_zones()
+            self.zone_subscription = self.shard_router.subscribe_nodes(
+                lambda node: self._start_listener(self.shard_router.client(node)), zones)
+        else:
+            self._start_listener(self.redis_client)
+        log.info("🔀 Hub d'événements démarré (annonces + notifications%s)",
+                 ", décisions groupées" if self.decider is not None else "")
+    
+    def stop(self):
+        """Arrête le hub et tous les livreurs inscrits"""
+        if self.decider is not None:
+            self.decider.stop()
+        for delivery_person in self.get_delivery_persons():
+            delivery_person.stop()
+        self.running = False
+        for thread in self.listener_threads:
+            thread.join(timeout=5)
+    
+    def _start_listener(self, redis_client):
+        thread = threading.Thread(target=self._listen, args=(redis_client,))
+        thread.daemon = True
+        thread.start()
+        self.listener_threads.append(thread)
+    
+    def register(self, delivery_person: DeliveryPerson):
+        with self.lock:
+            self.delivery_persons[delivery_person.person_id] = delivery_person
+            self.state_version += 1
+            self.members_version += 1
+            widened = self._count_zones(delivery_person.zones, 1)
+        if widened:
+            self._update_subscription()
+    
+    def unregister(self, delivery_person: DeliveryPerson):
+        with self.lock:
+            if self.delivery_persons.pop(delivery_person.person_id, None) is not None:
+                self._count_zones(delivery_person.zones, -1)
+            self.state_version += 1
+            self.members_version += 1
+    
+    def member_zones_changed(self, previous, zones):
+        """Un livreur inscrit a changé de zones (livreur simulé qui se déplace)"""
+        with self.lock:
+            self._count_zones(previous, -1)
+            widened = self._count_zones(zones, 1)
+        if widened:
+            self._update_subscription()
+    
+    def _count_zones(self, zones, delta: int) -> bool:
+        """Compte les zones d'un livreur (appelé sous verrou); vrai si une zone ou
+        un livreur sans zones apparaît"""
+        if zones is None:
+            self.unzoned_members += delta
+            return delta > 0 and self.unzoned_members == 1
+        widened = False
+        for zone in zones:
+            self.member_zones[zone] += delta
+            if self.member_zones[zone] <= 0:
+                del self.member_zones[zone]
+            elif delta > 0 and self.member_zones[zone] == 1:
+                widened = True
+        return widened
+    
+    def _subscribed_zones(self):
+        """Zones à écouter (appelé sous verrou): fixées, sinon celles des livreurs inscrits"""
+        if self.zones is not None:
+            return self.zones
+        return None if self.unzoned_members else set(self.member_zones)
+    
+    def _update_subscription(self):
+        if self.zone_subscription is None or self.zones is not None:
+            return
+        with self.lock:
+            zones = self._subscribed_zones()
+        self.shard_router.update_zones(self.zone_subscription, zones)
+    
+    def get_delivery_persons(self) -> List[DeliveryPerson]:
+        with self.lock:
+            return list(self.delivery_persons.values())
+    
+    def touch(self):
+        """Signale un changement fait hors du hub (réponse manuelle d'un livreur)"""
+        with self.lock:
+            self.state_version += 1
+    
+    def snapshot(self) -> Dict:
+        """Instantané versionné des livreurs inscrits, reconstruit seulement si la version a changé"""
+        with self.lock:
+            if self._snapshot is not None and self._snapshot['version'] == self.state_version:
+                return self._snapshot
+            version = self.state_version
+            delivery_persons = list(self.delivery_persons.values())
+        
+        couriers = [{
+            'person_id': dp.person_id,
+            'name': dp.name,
+            'auto_respond': dp.auto_respond,
+            'stats': dp.stats.copy(),
+            'pending': len(dp.pending_announcements)
+        } for dp in delivery_persons]
+        simulated = [c for c in couriers if c['auto_respond']]
+        snapshot = {
+            'version': version,
+            'couriers': couriers,
+            'simulated_count': len(simulated),
+            'simulated_responses': sum(c['stats']['responses_sent'] for c in simulated),
+            'total_earnings': sum(c['stats']['total_earnings'] for c in couriers)
+        }
+        with self.lock:
+            self._snapshot = snapshot
+        return snapshot
+    
+    def _listen(self, redis_client):
+        listen(redis_client, [CHANNELS['ORDER_ANNOUNCEMENT'], CHANNELS['DELIVERY_NOTIFICATION']],
+               self._handle_message, lambda: self.running, 'hub')
+    
+    def _handle_message(self, message):
+        try:
+            received = now_us()
+            payload = loads(message['data'])
+            decoded = now_us()
+        except ValueError as e:
+            COURIER_ERRORS_TOTAL.inc()
+            log.error("❌ Message illisible sur %s: %s", message['channel'], e)
+            return
+        
+        if message['channel'] == CHANNELS['ORDER_ANNOUNCEMENT']:
+            # Un seul objet Announcement partagé par tous les livreurs inscrits
+            try:
+                announcement = Announcement.from_dict(payload)
+            except (KeyError, TypeError) as e:
+                COURIER_ERRORS_TOTAL.inc()
+                log.error("❌ Annonce incomplète: %s", e)
+                return
+            hops = {'received': received, 'decoded': decoded}
+            if self.decider is not None:
+                self.decider.submit(announcement, hops)
+            for delivery_person in self.get_delivery_persons():
+                if self.decider is not None and delivery_person.auto_respond:
+                    continue
+                self._dispatch(delivery_person._process_announcement, delivery_person, announcement, dict(hops))
+        else:
+            with self.lock:
+                delivery_person = self.delivery_persons.get(payload.get('delivery_person_id'))
+            if delivery_person is not None:
+                self._dispatch(lambda: delivery_person._process_notification(Notification.from_dict(payload)),
+                               delivery_person)
+        
+        with self.lock:
+            self.state_version += 1
+    
+    def _dispatch(self, handler, delivery_person, *args):
+        """Appelle le traitement d'un livreur sans interrompre la distribution aux autres"""
+        try:
+            handler(*args)
+        except Exception as e:
+            COURIER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors du traitement du message par %s: %s", delivery_person.name, e)
+
+
 def main():
     """Fonction principale"""
     print("🛵 LIVREUR REDIS - SYSTÈME DE LIVRAISON")
@@ -295,15 +701,32 @@ def main():
         name = f"Livreur_{random.randint(1000, 9999)}"
     
     try:
-        # Créer le livreur
-        delivery_person = DeliveryPerson(str(uuid.uuid4()), name)
+        # Créer le livreur (même identifiant qu'avant un redémarrage, pour recevoir ses notifications)
+        path = snapshot_path(f"courier-{name}")
+        state = read_snapshot(path)
+        person_id = state['person_id'] if restorable(state) else str(uuid.uuid4())
+        # Zones écoutées (COURIER_ZONES) avec la répartition par zone, tous les nœuds sinon
+        zones = courier_zones()
+        delivery_person = DeliveryPerson(person_id, name, snapshot_path=path, shard_router=ShardRouter.from_env(),
+                                         zones=zones)
         delivery_person.start()
+        if zones:
+            print(f"🗺️  Zones écoutées: {', '.join(zones)}")
+        
+        # Endpoint Prometheus sur un port libre (plusieurs livreurs par machine)
+        metrics_port = start_metrics_server(0)
+        if metrics_port:
+            print(f"📈 Métriques Prometheus: http://localhost:{metrics_port}/metrics")
         
+        flush_console()
         print(f"\n{'='*50}")
         print(f"🎮 COMMANDES DISPONIBLES")
         print(f"{'='*50}")
         print("  'r' - Répondre à une annonce en attente")
         print("  's' - Afficher mes statistiques")
+        print("  'm' - Afficher les métriques")
+        print("  'p' - Démarrer/arrêter le profilage")
+        print("  'v' - Basculer le mode silencieux (haut débit)")
         print("  'q' - Quitter le programme")
         print(f"{'='*50}")
         print(f"👤 Livreur {name} en attente d'annonces...")
@@ -312,6 +735,7 @@ def main():
         
         while True:
             try:
+                flush_console()
                 command = input(f"\n[{name}] > ").strip().lower()
                 
                 if command == 'r':
@@ -320,12 +744,21 @@ def main():
                 elif command == 's':
                     delivery_person.print_stats()
                 
+                elif command == 'm':
+                    print_metrics()
+                
+                elif command == 'p':
+                    toggle_profiling()
+                
+                elif command == 'v':
+                    toggle_quiet()
+                
                 elif command == 'q':
                     print("👋 Au revoir!")
                     break
                 
                 else:
-                    print("❌ Commande inconnue. Utilisez 'r', 's' ou 'q'")
+                    print("❌ Commande inconnue. Utilisez 'r', 's', 'm', 'p', 'v' ou 'q'")
                     
             except KeyboardInterrupt:
                 print("\n👋 Au revoir!")
@@ -336,6 +769,9 @@ def main():
     except Exception as e:
         print(f"❌ Erreur fatale: {e}")
     finally:
+        # Écrire le profil en cours avant de quitter
+        if is_profiling():
+            toggle_profiling()
         if 'delivery_person' in locals():
             delivery_person.stop()
 
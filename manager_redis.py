@@ -3,17 +3,37 @@
 Manager Redis - Système de livraison de repas
 Publie des annonces et sélectionne les livreurs
 """
-import redis
-import json
 import time
 import threading
-import random
 import uuid
-import pandas as pd
-import math
+import logging
+import os
+import heapq
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 
+from dataset import LocalDataset, RESTAURANTS_CSV, MENUS_CSV
+from dataset_redis import RedisDataset
+from dataset_partitions import dataset_from_env
+from spatial_index import RestaurantSpatialIndex
+from menu_index import MenuIndex
+from zone_tracker import ZoneTracker
+from sharding import ShardRouter
+from redis_connections import get_client, listen
+from earnings_ledger import EarningsLedger
+from stream_analytics import StreamAnalytics
+from orders import build_announcement, create_random_order
+from models import Announcement, Notification, Response, Selection
+from order_workers import ANNOUNCEMENT_KEY, WORKERS_ENV, OrderWorkerPool
+from batching_publisher import BatchingPublisher
+from snapshots import (SnapshotWriter, DATASET_SNAPSHOT, MENU_INDEX_SNAPSHOT, load_cached, read_snapshot,
+                       restorable, snapshot_path, source_signature)
+from history_mongo import build_history_document, create_history_sink
+from tracing import start_trace, child_trace, stamp, now_us
+from metrics import REGISTRY, print_metrics, start_metrics_server, METRICS_PORT
+from profiling import toggle_profiling, is_profiling
+from console import get_logger, flush_console, toggle_quiet
+
 # Configuration Redis
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
@@ -27,238 +47,556 @@ CHANNELS = {
     'DELIVERY_NOTIFICATION': 'delivery:notification'
 }
 
+log = get_logger('manager')
+
+# Durée de vie d'une annonce: sans sélection passé ce délai, elle est close
+# (aucun livreur intéressé, sélection manuelle jamais faite)
+ANNOUNCEMENT_TTL_SECONDS = 120.0
+
+# Métriques du manager
+ANNOUNCEMENTS_TOTAL = REGISTRY.counter('dispatch_announcements_total', 'Annonces publiées')
+RESPONSES_TOTAL = REGISTRY.counter('dispatch_responses_total', 'Réponses de livreurs reçues')
+SELECTIONS_TOTAL = REGISTRY.counter('dispatch_selections_total', 'Sélections publiées')
+EXPIRED_TOTAL = REGISTRY.counter('dispatch_expired_announcements_total', 'Annonces closes sans sélection (expirées)')
+MANAGER_ERRORS_TOTAL = REGISTRY.counter('dispatch_errors_total', 'Erreurs du pipeline', {'component': 'manager'})
+OPEN_ANNOUNCEMENTS = REGISTRY.gauge('dispatch_open_announcements', 'Annonces en attente de sélection')
+ANNOUNCEMENT_PUBLISH_SECONDS = REGISTRY.histogram('dispatch_publish_seconds', 'Durée des PUBLISH', {'channel': 'announcement'})
+SELECTION_PUBLISH_SECONDS = REGISTRY.histogram('dispatch_publish_seconds', 'Durée des PUBLISH', {'channel': 'selection'})
+NOTIFICATION_PUBLISH_SECONDS = REGISTRY.histogram('dispatch_publish_seconds', 'Durée des PUBLISH', {'channel': 'notification'})
+FIRST_RESPONSE_SECONDS = REGISTRY.histogram('dispatch_first_response_seconds', 'Délai annonce -> première réponse')
+ASSIGNMENT_SECONDS = REGISTRY.histogram('dispatch_assignment_seconds', 'Délai annonce -> sélection du livreur')
+
+def _build_local_indexes():
+    """Dataset local et index spatial construits depuis les CSV (mis en cache par les instantanés)"""
+    dataset = LocalDataset.from_csv()
+    return dataset, RestaurantSpatialIndex.from_dataset(dataset)
+
 class DeliveryManager:
     """Manager responsable de la publication d'annonces et de la sélection des livreurs"""
     
-    def __init__(self):
-        self.redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+    def __init__(self, dataset=None, history_sink=None, redis_client=None,
+                 auto_select: bool = False, selection_delay: float = 15.0, zone_tracker=None,
+                 earnings_ledger=None, analytics=None, snapshot_path=None, shard_router=None,
+                 publisher=None, order_workers=None, announcement_ttl: Optional[float] = ANNOUNCEMENT_TTL_SECONDS):
+        if redis_client is None:
+            redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+        self.redis_client = redis_client
         self.active_announcements = {}
         self.pending_responses = {}
+        self.responders = {}  # annonce -> livreurs ayant déjà répondu (doublons ignorés)
         self.running = False
-        self.response_listener_thread = None
+        self.response_listener_threads = []
+        
+        # Répartition du Pub/Sub par zone sur plusieurs nœuds Redis (optionnel, sharding.ShardRouter)
+        self.shard_router = shard_router
+        
+        # Sélection: manuelle (input) par défaut, automatique pour les modes sans terminal
+        self.auto_select = auto_select
+        self.selection_delay = selection_delay
+        
+        # Historique des annonces terminées (MongoDB, optionnel)
+        self.history_sink = history_sink
+        
+        # Offre/demande par zone et multiplicateur de compensation (optionnel)
+        self.zone_tracker = zone_tracker
+        
+        # Gains des livreurs crédités dans Redis à chaque sélection (optionnel)
+        self.earnings_ledger = earnings_ledger
+        
+        # Analytique en flux par restaurant, zone et catégorie (optionnel)
+        self.analytics = analytics
+        
+        # Publication groupée avec limite de débit et contre-pression (optionnel,
+        # batching_publisher.BatchingPublisher); sans lui chaque PUBLISH est synchrone
+        self.publisher = publisher
+        
+        # Annonces générées et publiées par des processus (optionnel, order_workers.OrderWorkerPool):
+        # comptées dans leur zone dès leur publication, chargées depuis Redis à leur première réponse
+        self.order_workers = order_workers
+        self.load_lock = threading.Lock()
+        self.unloaded_announcements: Dict[str, str] = {}  # publiées sans réponse encore: id -> zone
+        self.loaded_before_report = set()  # chargées avant que leur publication soit signalée
+        if order_workers:
+            order_workers.on_published = self._workers_published
+        
+        # Instant de publication de chaque annonce active (pour les latences)
+        self.announcement_started = {}
+        
+        # Expiration des annonces: tas (échéance, annonce) vidé par un thread de fond (None: jamais)
+        self.announcement_ttl = announcement_ttl
+        self.expiry_heap = []
+        self.expiry_lock = threading.Lock()
+        self.expiry_thread = None
+        OPEN_ANNOUNCEMENTS.track(self, lambda manager: len(manager.active_announcements))
         
-        # Charger les données
-        self.restaurants_df = pd.read_csv('restaurants.csv')
-        self.menus_df = pd.read_csv('restaurant-menus.csv')
-        print(f"✅ Données chargées: {len(self.restaurants_df)} restaurants, {len(self.menus_df)} items de menu")
+        # État du tableau de bord: résumés et compteurs tenus à jour à chaque événement,
+        # instantané reconstruit seulement quand la version change
+        self.state_lock = threading.Lock()
+        self.state_version = 0
+        self.announcement_summaries = {}
+        self.open_response_count = 0
+        self.open_interested_count = 0
+        self._snapshot = None
+        
+        # Instantané de l'état en cours pour le redémarrage à chaud (optionnel)
+        self.snapshot_path = snapshot_path
+        self.snapshot_writer = None
+        
+        # Charger les données: copie partagée dans Redis si elle existe, sinon CSV locaux
+        # (avec instantanés: dataset et index spatial relus depuis le cache si les CSV n'ont pas changé)
+        spatial_index = None
+        self.menu_index_cache = None
+        if dataset is None:
+            dataset = RedisDataset.open(self.redis_client)
+            if dataset is not None:
+                log.info("📦 Dataset partagé trouvé dans Redis")
+            elif snapshot_path:
+                cache_dir = os.path.dirname(snapshot_path) or '.'
+                dataset, spatial_index = load_cached(os.path.join(cache_dir, DATASET_SNAPSHOT),
+                                                     source_signature(RESTAURANTS_CSV, MENUS_CSV),
+                                                     _build_local_indexes)
+                self.menu_index_cache = os.path.join(cache_dir, MENU_INDEX_SNAPSHOT)
+            else:
+                dataset = LocalDataset.from_csv()
+        self.dataset = dataset
+        log.info(f"✅ Données chargées: {self.dataset.restaurant_count} restaurants, {self.dataset.menu_item_count} items de menu")
+        if self.dataset.rejected_price_count:
+            log.warning(f"⚠️ {self.dataset.rejected_price_count} prix invalides remplacés par 0.00")
+        
+        # Index spatial des restaurants (rayon et plus proches voisins)
+        self.spatial_index = spatial_index or RestaurantSpatialIndex.from_dataset(self.dataset)
+        
+        # Index inversé des plats et des cuisines (commandes filtrées, recherches): construit à la
+        # première requête filtrée, relu depuis le cache des instantanés s'il y en a un
+        self._menu_index = None
+        self.menu_index_lock = threading.Lock()
+    
+    @property
+    def menu_index(self) -> MenuIndex:
+        """Index des menus, construit (ou relu depuis le cache) au premier accès"""
+        if self._menu_index is None:
+            with self.menu_index_lock:
+                if self._menu_index is None:
+                    start = time.perf_counter()
+                    if self.menu_index_cache:
+                        self._menu_index = load_cached(self.menu_index_cache,
+                                                       source_signature(RESTAURANTS_CSV, MENUS_CSV),
+                                                       lambda: MenuIndex.from_dataset(self.dataset))
+                    else:
+                        self._menu_index = MenuIndex.from_dataset(self.dataset)
+                    log.info(f"🔎 Index des menus prêt: {len(self._menu_index)} items "
+                             f"({time.perf_counter() - start:.2f}s)")
+        return self._menu_index
     
     def start(self):
         """Démarre le manager"""
-        print("🚀 Démarrage du DeliveryManager...")
+        log.info("🚀 Démarrage du DeliveryManager...")
         self.running = True
+        restored = self._restore_snapshot() if self.snapshot_path else []
+        
+        # Démarrer l'écoute des réponses (un thread par nœud Redis, y compris ceux ajoutés ensuite)
+        if self.shard_router:
+            self.shard_router.subscribe_nodes(
+                lambda node: self._start_response_listener(self.shard_router.client(node)))
+        else:
+            self._start_response_listener(self.redis_client)
         
-        # Démarrer le thread d'écoute des réponses
-        self.response_listener_thread = threading.Thread(target=self._listen_for_responses)
-        self.response_listener_thread.daemon = True
-        self.response_listener_thread.start()
+        if self.announcement_ttl:
+            self.expiry_thread = threading.Thread(target=self._expire_announcements)
+            self.expiry_thread.daemon = True
+            self.expiry_thread.start()
         
-        print("✅ DeliveryManager démarré avec succès")
+        if self.snapshot_path:
+            self._reconcile(restored)
+            self.snapshot_writer = SnapshotWriter(self.snapshot_path, self._capture_state,
+                                                  lambda: self.state_version)
+            self.snapshot_writer.start()
+        
+        log.info("✅ DeliveryManager démarré avec succès")
     
     def stop(self):
         """Arrête le manager"""
-        print("🛑 Arrêt du DeliveryManager...")
+        log.info("🛑 Arrêt du DeliveryManager...")
+        if self.order_workers:
+            self.order_workers.stop()
         self.running = False
-        if self.response_listener_thread:
-            self.response_listener_thread.join(timeout=5)
-        print("✅ DeliveryManager arrêté")
+        for thread in self.response_listener_threads:
+            thread.join(timeout=5)
+        if self.expiry_thread:
+            self.expiry_thread.join(timeout=5)
+        if self.snapshot_writer:
+            self.snapshot_writer.stop()
+        if self.history_sink:
+            self.history_sink.stop()
+        if self.zone_tracker:
+            self.zone_tracker.stop()
+        if self.analytics:
+            self.analytics.stop()
+        if self.publisher:
+            self.publisher.stop()
+        OPEN_ANNOUNCEMENTS.untrack(self)
+        log.info("✅ DeliveryManager arrêté")
     
-    def create_and_publish_announcement(self):
-        """Crée et publie une nouvelle annonce de livraison"""
-        # Créer une commande aléatoire
-        order = self._create_random_order()
+    def restaurants_within(self, lat: float, lng: float, radius_km: float) -> List[Dict]:
+        """Restaurants à moins de radius_km d'un point, du plus proche au plus loin"""
+        ids, distances = self.spatial_index.query_radius(lat, lng, radius_km)
+        return self._restaurants_with_distance(ids, distances)
+    
+    def nearest_restaurants(self, lat: float, lng: float, k: int = 5) -> List[Dict]:
+        """Les k restaurants les plus proches d'un point"""
+        ids, distances = self.spatial_index.query_knn(lat, lng, k)
+        return self._restaurants_with_distance(ids, distances)
+    
+    def _restaurants_with_distance(self, ids, distances):
+        restaurants = []
+        for restaurant_id, distance in zip(ids.tolist(), distances.tolist()):
+            restaurant = self.dataset.get_restaurant(restaurant_id)
+            if restaurant is not None:
+                restaurant['distance_km'] = round(distance, 3)
+                restaurants.append(restaurant)
+        return restaurants
+    
+    def restaurants_matching(self, items: Optional[str] = None, cuisine: Optional[str] = None,
+                             limit: int = 10) -> List[Dict]:
+        """Restaurants ayant des plats `items` et/ou de cuisine `cuisine`, les plus fournis d'abord"""
+        ids, counts = self.menu_index.query(items, cuisine).counts()
+        restaurants = []
+        for restaurant_id, count in sorted(zip(ids.tolist(), counts.tolist()), key=lambda entry: -entry[1])[:limit]:
+            restaurant = self.dataset.get_restaurant(restaurant_id)
+            if restaurant is not None:
+                restaurant['matching_items'] = count
+                restaurants.append(restaurant)
+        return restaurants
+    
+    def create_and_publish_announcement(self, near: Optional[Tuple[float, float]] = None, radius_km: float = 2.0,
+                                        items: Optional[str] = None, cuisine: Optional[str] = None):
+        """Crée et publie une nouvelle annonce de livraison
         
-        # Calculer la distance estimée
-        distance = self._calculate_distance(
-            order['restaurant']['lat'], order['restaurant']['lng'],
-            order['customer_lat'], order['customer_lng']
-        )
+        Si near=(lat, lng) est fourni, le restaurant est choisi dans ce rayon.
+        items / cuisine: commande de plats (nom ou catégorie, ex. "pizza") ou d'une cuisine
+        (catégorie du restaurant, ex. "mexican"), via l'index des menus.
+        """
+        # Limite de débit et contre-pression: attendre avant de créer l'annonce
+        if self.publisher:
+            self.publisher.admit()
         
-        # Calculer la compensation
-        compensation = order['delivery_fee'] + (distance * 0.5)
-        
-        # Créer l'annonce
-        announcement = {
-            'announcement_id': str(uuid.uuid4()),
-            'order': order,
-            'pickup_location': order['restaurant']['address'],
-            'delivery_location': order['customer_address'],
-            'compensation': round(compensation, 2),
-            'estimated_distance': round(distance, 2),
-            'created_at': datetime.now().isoformat()
-        }
+        trace = start_trace()
+        
+        # Créer une commande aléatoire
+        order = self._create_random_order(near, radius_km, items, cuisine)
+        
+        # Créer l'annonce (compensation majorée selon l'offre et la demande de la zone)
+        announcement = build_announcement(order, self.zone_tracker.surge if self.zone_tracker else {}, trace)
+        zone, surge = announcement.zone, announcement.surge_multiplier
+        distance, compensation = announcement.estimated_distance, announcement.compensation
+        if self.shard_router:
+            # Nœud de l'annonce: réponses et notifications y reviennent même après un rééquilibrage
+            announcement.shard = self.shard_router.node_for_zone(zone)
         
         # Stocker l'annonce active
-        self.active_announcements[announcement['announcement_id']] = announcement
-        self.pending_responses[announcement['announcement_id']] = []
+        self._open_announcement(announcement, time.perf_counter())
+        if self.analytics:
+            self.analytics.order_published(order)
         
-        # Afficher l'annonce créée
-        print(f"\n{'='*60}")
-        print(f"📢 NOUVELLE ANNONCE CRÉÉE !")
-        print(f"{'='*60}")
-        print(f"🆔 ID: {announcement['announcement_id'][:8]}...")
-        print(f"🏪 Restaurant: {order['restaurant']['name']}")
-        print(f"📍 Adresse: {order['restaurant']['address']}")
-        print(f"🚗 Distance: {distance:.2f} km")
-        print(f"💰 Compensation: {compensation:.2f}€")
-        print(f"🍽️  Items: {len(order['items'])} articles")
-        print(f"💵 Total commande: {order['total_amount']:.2f}€")
-        print(f"{'='*60}")
+        # Afficher l'annonce créée (un seul message, construit seulement si affiché)
+        if log.isEnabledFor(logging.INFO):
+            surge_label = f" (surge x{surge:g}, zone {zone})" if surge != 1.0 else ""
+            log.info(
+                f"\n{'='*60}\n"
+                f"📢 NOUVELLE ANNONCE CRÉÉE !\n"
+                f"{'='*60}\n"
+                f"🆔 ID: {announcement.announcement_id[:8]}...\n"
+                f"🏪 Restaurant: {order.restaurant.name}\n"
+                f"📍 Adresse: {order.restaurant.address}\n"
+                f"🚗 Distance: {distance:.2f} km\n"
+                f"💰 Compensation: {compensation:.2f}€{surge_label}\n"
+                f"🍽️  Items: {len(order.items)} articles\n"
+                f"💵 Total commande: {order.total_amount:.2f}€\n"
+                f"{'='*60}"
+            )
         
         # Publier l'annonce
         self._publish_announcement(announcement)
         
-        return announcement['announcement_id']
-    
-    def _create_random_order(self):
-        """Crée une commande aléatoire"""
-        # Sélectionner un restaurant aléatoire
-        restaurant_data = self.restaurants_df.sample(1).iloc[0]
-        
-        restaurant = {
-            'id': int(restaurant_data['id']),
-            'name': restaurant_data['name'],
-            'address': restaurant_data['full_address'],
-            'lat': float(restaurant_data['lat']),
-            'lng': float(restaurant_data['lng']),
-            'category': restaurant_data['category'],
-            'price_range': restaurant_data['price_range']
-        }
-        
-        # Sélectionner des items du menu
-        restaurant_menu = self.menus_df[
-            self.menus_df['restaurant_id'] == restaurant['id']
-        ].sample(min(3, len(self.menus_df[self.menus_df['restaurant_id'] == restaurant['id']])))
-        
-        items = []
-        total_amount = 0
-        for _, item in restaurant_menu.iterrows():
-            price_str = str(item['price']).replace('USD', '').strip()
-            try:
-                price = float(price_str)
-            except ValueError:
-                price = 0.0
-            
-            items.append({
-                'name': item['name'],
-                'category': item['category'],
-                'price': price
-            })
-            total_amount += price
-        
-        # Générer une localisation client aléatoire
-        customer_lat, customer_lng, customer_address = self._generate_customer_location(
-            restaurant['lat'], restaurant['lng']
-        )
+        return announcement.announcement_id
+    
+    def _open_announcement(self, announcement, started, responses=None, zone_counted: bool = False):
+        """Enregistre une annonce active (nouvelle ou restaurée avec ses réponses)
         
+        zone_counted: déjà comptée dans la demande de sa zone (publiée par les processus de génération)
+        """
+        announcement_id = announcement.announcement_id
+        responses = responses or []
+        interested = sum(1 for r in responses if r.is_interested)
+        self.active_announcements[announcement_id] = announcement
+        self.pending_responses[announcement_id] = responses
+        self.responders[announcement_id] = {r.delivery_person_id for r in responses}
+        self.announcement_started[announcement_id] = started
+        if self.announcement_ttl:
+            with self.expiry_lock:
+                heapq.heappush(self.expiry_heap, (started + self.announcement_ttl, announcement_id))
+        with self.state_lock:
+            self.announcement_summaries[announcement_id] = {
+                'announcement_id': announcement_id,
+                'restaurant_name': announcement.order.restaurant.name,
+                'estimated_distance': announcement.estimated_distance,
+                'compensation': announcement.compensation,
+                'responses': len(responses),
+                'interested': interested
+            }
+            self.open_response_count += len(responses)
+            self.open_interested_count += interested
+            self.state_version += 1
+        if self.zone_tracker and not zone_counted:
+            self.zone_tracker.order_opened(announcement.zone)
+    
+    def _capture_state(self):
+        """État en cours pour l'instantané: annonces, réponses et instants de publication"""
+        with self.state_lock:
+            announcements = dict(self.active_announcements)
+            pending = dict(self.pending_responses)
+            started = dict(self.announcement_started)
+        now, perf = time.time(), time.perf_counter()
         return {
-            'order_id': str(uuid.uuid4()),
-            'restaurant': restaurant,
-            'customer_address': customer_address,
-            'customer_lat': customer_lat,
-            'customer_lng': customer_lng,
-            'items': items,
-            'total_amount': total_amount,
-            'delivery_fee': 3.50,
-            'created_at': datetime.now().isoformat()
+            'announcements': announcements,
+            'responses': {announcement_id: list(responses) for announcement_id, responses in pending.items()
+                          if announcement_id in announcements},
+            'started_at': {announcement_id: now - (perf - value) for announcement_id, value in started.items()}
         }
     
-    def _generate_customer_location(self, restaurant_lat, restaurant_lng, radius_km=5.0):
-        """Génère une localisation aléatoire pour un client"""
-        # Génération d'un angle et d'une distance aléatoires
-        angle = random.uniform(0, 2 * math.pi)
-        distance_km = random.uniform(0.5, radius_km)
-        
-        # Conversion de la distance en degrés
-        lat_offset = (distance_km / 111.0) * math.cos(angle)
-        lng_offset = (distance_km / (111.0 * math.cos(math.radians(restaurant_lat)))) * math.sin(angle)
-        
-        customer_lat = restaurant_lat + lat_offset
-        customer_lng = restaurant_lng + lng_offset
-        
-        # Génération d'une adresse fictive
-        street_number = random.randint(100, 9999)
-        street_names = ["Main St", "Oak Ave", "Pine St", "Elm St", "Maple Ave"]
-        street_name = random.choice(street_names)
-        customer_address = f"{street_number} {street_name}, Birmingham, AL"
-        
-        return customer_lat, customer_lng, customer_address
+    def _restore_snapshot(self) -> List[str]:
+        """Restaure les annonces ouvertes de l'instantané, retourne leurs identifiants"""
+        start = time.perf_counter()
+        state = read_snapshot(self.snapshot_path)
+        if not restorable(state):
+            return []
+        now, perf = time.time(), time.perf_counter()
+        for announcement_id, announcement in state['announcements'].items():
+            started_at = state['started_at'].get(announcement_id, now)
+            self._open_announcement(announcement, perf - (now - started_at),
+                                    state['responses'].get(announcement_id, []))
+        log.info("♻️ %d annonce(s) restaurée(s) depuis %s en %.1f ms", len(state['announcements']),
+                 self.snapshot_path, (time.perf_counter() - start) * 1000)
+        return list(state['announcements'])
     
-    def _calculate_distance(self, lat1, lng1, lat2, lng2):
-        """Calcule la distance entre deux points en kilomètres"""
-        R = 6371  # Rayon de la Terre en km
+    def _reconcile(self, announcement_ids):
+        """Republie les annonces restaurées et relance leurs timers de sélection
         
-        lat1_rad = math.radians(lat1)
-        lng1_rad = math.radians(lng1)
-        lat2_rad = math.radians(lat2)
-        lng2_rad = math.radians(lng2)
-        
-        dlat = lat2_rad - lat1_rad
-        dlng = lng2_rad - lng1_rad
-        
-        a = (math.sin(dlat/2)**2 + 
-             math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2)
-        c = 2 * math.asin(math.sqrt(a))
-        
-        return R * c
+        Les réponses envoyées pendant le redémarrage sont perdues (Pub/Sub): les livreurs
+        qui avaient déjà répondu ignorent la republication, les autres répondent à nouveau.
+        """
+        for announcement_id in announcement_ids:
+            announcement = self.active_announcements.get(announcement_id)
+            if not announcement:
+                continue
+            self._publish_announcement(announcement)
+            if any(r.is_interested for r in self.pending_responses.get(announcement_id, [])):
+                timer_thread = threading.Timer(self.selection_delay, self._consider_selection, args=[announcement_id])
+                timer_thread.daemon = True
+                timer_thread.start()
+    
+    def _create_random_order(self, near: Optional[Tuple[float, float]] = None, radius_km: float = 2.0,
+                             items: Optional[str] = None, cuisine: Optional[str] = None):
+        """Crée une commande aléatoire (plats ou cuisine demandés si fournis)"""
+        match = None
+        if items or cuisine:
+            match = self.menu_index.query(items, cuisine)
+            if match.empty:
+                log.warning("⚠️ Aucun restaurant pour plats=%r cuisine=%r: commande sans filtre", items, cuisine)
+        return create_random_order(self.dataset, self.spatial_index, near, radius_km, match)
     
     def _publish_announcement(self, announcement):
         """Publie une annonce sur le channel Redis"""
         try:
-            message = json.dumps(announcement, ensure_ascii=False)
-            self.redis_client.publish(CHANNELS['ORDER_ANNOUNCEMENT'], message)
-            print(f"📡 Annonce publiée sur le channel: {CHANNELS['ORDER_ANNOUNCEMENT']}")
+            stamp(announcement.trace, 'published')
+            message = announcement.to_json()
+            self._publish(self._shard_client(announcement), CHANNELS['ORDER_ANNOUNCEMENT'], message,
+                          ANNOUNCEMENT_PUBLISH_SECONDS, self._announcement_sent)
         except Exception as e:
-            print(f"❌ Erreur lors de la publication de l'annonce: {e}")
+            MANAGER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors de la publication de l'annonce: %s", e)
+    
+    def _announcement_sent(self):
+        ANNOUNCEMENTS_TOTAL.inc()
+        log.info("📡 Annonce publiée sur le channel: %s", CHANNELS['ORDER_ANNOUNCEMENT'])
     
-    def _listen_for_responses(self):
-        """Écoute les réponses des livreurs"""
-        pubsub = self.redis_client.pubsub()
-        pubsub.subscribe(CHANNELS['DELIVERY_RESPONSE'])
+    def _selection_sent(self):
+        SELECTIONS_TOTAL.inc()
+        log.info("📡 Sélection publiée sur le channel: %s", CHANNELS['DELIVERY_SELECTION'])
+    
+    def _publish(self, redis_client, channel, message, histogram, on_sent=None):
+        """PUBLISH synchrone, ou mis en file du publisher groupé s'il est configuré
         
-        print(f"👂 Écoute des réponses sur le channel: {CHANNELS['DELIVERY_RESPONSE']}")
+        histogram et on_sent() suivent l'envoi effectif: avec le publisher groupé, la
+        durée mesurée va de la mise en file à l'exécution du pipeline.
+        """
+        start = time.perf_counter()
         
-        for message in pubsub.listen():
-            if not self.running:
-                break
-                
-            if message['type'] == 'message':
-                try:
-                    response = json.loads(message['data'])
-                    self._process_delivery_response(response)
-                except Exception as e:
-                    print(f"❌ Erreur lors du traitement de la réponse: {e}")
+        def sent():
+            histogram.observe(time.perf_counter() - start)
+            if on_sent:
+                on_sent()
+        
+        if self.publisher:
+            self.publisher.publish(channel, message, client=redis_client, on_sent=sent)
+            return
+        redis_client.publish(channel, message)
+        sent()
+    
+    def _shard_client(self, announcement):
+        """Client Redis du nœud d'une annonce (le Redis unique sans répartition)"""
+        if self.shard_router and announcement and announcement.shard:
+            return self.shard_router.client(announcement.shard)
+        return self.redis_client
+    
+    def _start_response_listener(self, redis_client):
+        thread = threading.Thread(target=self._listen_for_responses, args=(redis_client,))
+        thread.daemon = True
+        thread.start()
+        self.response_listener_threads.append(thread)
+    
+    def _listen_for_responses(self, redis_client):
+        """Écoute les réponses des livreurs (reconnexion automatique en cas de coupure)"""
+        log.info("👂 Écoute des réponses sur le channel: %s", CHANNELS['DELIVERY_RESPONSE'])
+        listen(redis_client, [CHANNELS['DELIVERY_RESPONSE']], self._handle_response_message,
+               lambda: self.running, 'manager',
+               on_reconnect=lambda gap: self._republish_open_announcements(redis_client))
+    
+    def _handle_response_message(self, message):
+        try:
+            response = Response.from_json(message['data'])
+            self._process_delivery_response(response)
+        except Exception as e:
+            MANAGER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors du traitement de la réponse: %s", e)
+    
+    def _republish_open_announcements(self, redis_client):
+        """Après une coupure: republie les annonces ouvertes de ce nœud
         
-        pubsub.close()
+        Les annonces publiées pendant la coupure n'ont atteint personne et les réponses
+        envoyées pendant ce temps sont perdues; les livreurs ignorent celles déjà reçues.
+        """
+        announcements = [announcement for announcement in list(self.active_announcements.values())
+                         if self._shard_client(announcement) is redis_client]
+        for announcement in announcements:
+            self._publish_announcement(announcement)
+        if announcements:
+            log.warning("📡 %d annonce(s) ouverte(s) republiée(s) après la coupure", len(announcements))
     
     def _process_delivery_response(self, response):
         """Traite une réponse de livreur"""
-        announcement_id = response['announcement_id']
+        announcement_id = response.announcement_id
+        
+        if announcement_id not in self.active_announcements and not self._load_announcement(announcement_id):
+            log.warning("⚠️ Réponse reçue pour une annonce inexistante: %s", announcement_id)
+            return
         
-        if announcement_id not in self.active_announcements:
-            print(f"⚠️ Réponse reçue pour une annonce inexistante: {announcement_id}")
+        # Une seule réponse par livreur (republication après redémarrage)
+        responders = self.responders.setdefault(announcement_id, set())
+        if response.delivery_person_id in responders:
+            log.debug("Réponse en double ignorée: %s", response.delivery_person_name)
             return
+        responders.add(response.delivery_person_id)
         
         # Ajouter la réponse à la liste des réponses en attente
         self.pending_responses[announcement_id].append(response)
+        RESPONSES_TOTAL.inc()
+        if len(self.pending_responses[announcement_id]) == 1 and announcement_id in self.announcement_started:
+            FIRST_RESPONSE_SECONDS.observe(time.perf_counter() - self.announcement_started[announcement_id])
+        with self.state_lock:
+            summary = self.announcement_summaries.get(announcement_id)
+            if summary is not None:
+                summary['responses'] += 1
+                self.open_response_count += 1
+                if response.is_interested:
+                    summary['interested'] += 1
+                    self.open_interested_count += 1
+                self.state_version += 1
+        announcement = self.active_announcements[announcement_id]
+        if self.zone_tracker:
+            self.zone_tracker.response(announcement.zone, response.is_interested, response.delivery_person_id)
+        if self.analytics:
+            self.analytics.response(announcement.zone, announcement.order.restaurant,
+                                    response.delivery_person_id, response.is_interested)
         
-        status = "✅ Intéressé" if response['is_interested'] else "❌ Pas intéressé"
-        print(f"📨 Réponse reçue de {response['delivery_person_name']}: {status}")
-        
-        # Afficher le nombre total de réponses reçues
-        total_responses = len(self.pending_responses[announcement_id])
-        interested_count = len([r for r in self.pending_responses[announcement_id] if r['is_interested']])
-        print(f"📊 Total: {total_responses} réponse(s) reçue(s) ({interested_count} intéressé(s))")
+        # Afficher la réponse et le nombre total de réponses reçues
+        if log.isEnabledFor(logging.INFO):
+            status = "✅ Intéressé" if response.is_interested else "❌ Pas intéressé"
+            total_responses = len(self.pending_responses[announcement_id])
+            interested_count = len([r for r in self.pending_responses[announcement_id] if r.is_interested])
+            log.info(f"📨 Réponse reçue de {response.delivery_person_name}: {status}\n"
+                     f"📊 Total: {total_responses} réponse(s) reçue(s) ({interested_count} intéressé(s))")
         
         # Déclencher la sélection après un délai pour laisser le temps aux autres livreurs
-        if response['is_interested']:
+        if response.is_interested:
             # Démarrer un timer pour la sélection (seulement si c'est la première réponse intéressée)
-            interested_responses = [r for r in self.pending_responses[announcement_id] if r['is_interested']]
+            interested_responses = [r for r in self.pending_responses[announcement_id] if r.is_interested]
             if len(interested_responses) == 1:  # Première réponse intéressée
-                print(f"⏰ Démarrage du timer de sélection (15 secondes)...")
-                timer_thread = threading.Timer(15.0, self._consider_selection, args=[announcement_id])
+                log.info("⏰ Démarrage du timer de sélection (%g secondes)...", self.selection_delay)
+                timer_thread = threading.Timer(self.selection_delay, self._consider_selection, args=[announcement_id])
                 timer_thread.daemon = True
                 timer_thread.start()
     
+    def _load_announcement(self, announcement_id) -> bool:
+        """Ouvre une annonce publiée par les processus de génération, lue depuis Redis
+        
+        Lue et supprimée en une transaction: une réponse tardive (annonce déjà close)
+        ne la rouvre pas, et un seul manager la prend en charge.
+        """
+        if not self.order_workers:
+            return False
+        with self.load_lock:
+            if announcement_id in self.active_announcements:
+                return True
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.get(ANNOUNCEMENT_KEY.format(announcement_id))
+            pipe.delete(ANNOUNCEMENT_KEY.format(announcement_id))
+            message, _ = pipe.execute()
+            if message is None:
+                return False
+            announcement = Announcement.from_json(message)
+            # Déjà comptée à sa publication, sinon comptée ici (et pas une seconde fois au signalement)
+            reported = self.unloaded_announcements.pop(announcement_id, None) is not None
+            if not reported:
+                self.loaded_before_report.add(announcement_id)
+            age = time.time() - datetime.fromisoformat(announcement.created_at).timestamp()
+            self._open_announcement(announcement, time.perf_counter() - max(0.0, age), zone_counted=reported)
+        if self.analytics and not reported:
+            self.analytics.order_published(announcement.order)
+        return True
+    
+    def _workers_published(self, reports):
+        """Annonces publiées par les processus de génération [(id, zone, catégories)]:
+        comptées dans la demande de leur zone et soumises à l'expiration dès la publication"""
+        started = time.perf_counter()
+        published = []
+        with self.load_lock:
+            for announcement_id, zone, categories in reports:
+                if announcement_id in self.loaded_before_report:
+                    self.loaded_before_report.discard(announcement_id)
+                    continue
+                self.unloaded_announcements[announcement_id] = zone
+                published.append((announcement_id, zone, categories))
+        if self.announcement_ttl:
+            with self.expiry_lock:
+                for announcement_id, _, _ in published:
+                    heapq.heappush(self.expiry_heap, (started + self.announcement_ttl, announcement_id))
+        for _, zone, categories in published:
+            if self.zone_tracker:
+                self.zone_tracker.order_opened(zone)
+            if self.analytics:
+                self.analytics.categories_published(categories)
+    
+    def _expire_unloaded(self, announcement_id):
+        """Annonce des processus de génération expirée sans réponse: relue depuis Redis
+        pour être archivée (et close dans sa zone) comme les autres"""
+        if self._load_announcement(announcement_id):
+            return
+        with self.load_lock:
+            zone = self.unloaded_announcements.pop(announcement_id, None)
+        if zone is not None and self.zone_tracker:
+            self.zone_tracker.order_closed(zone)
+    
     def _consider_selection(self, announcement_id):
         """Considère la sélection d'un livreur pour une annonce"""
         announcement = self.active_announcements.get(announcement_id)
@@ -266,28 +604,42 @@ class DeliveryManager:
             return
         
         responses = self.pending_responses[announcement_id]
-        interested_responses = [r for r in responses if r['is_interested']]
+        interested_responses = [r for r in responses if r.is_interested]
         
         if not interested_responses:
-            print(f"❌ Aucun livreur intéressé pour l'annonce {announcement_id[:8]}...")
+            log.info("❌ Aucun livreur intéressé pour l'annonce %s...", announcement_id[:8])
             return
         
-        print(f"⏰ Timer de sélection déclenché - Traitement des réponses...")
+        log.info("⏰ Timer de sélection déclenché - Traitement des réponses...")
         final_interested = interested_responses
         
+        if self.auto_select:
+            # Livreurs simulés: le plus proche du restaurant, sinon le premier arrivé
+            distances = [r.distance_to_pickup_km for r in final_interested]
+            if any(distance is not None for distance in distances):
+                nearest = min(final_interested, key=lambda r: r.distance_to_pickup_km
+                              if r.distance_to_pickup_km is not None else float('inf'))
+                self._select_delivery_person(announcement_id, nearest, final_interested,
+                                             "Sélection automatique (plus proche du restaurant)")
+            else:
+                self._select_delivery_person(announcement_id, final_interested[0], final_interested,
+                                             "Sélection automatique (premier arrivé)")
+            return
+        
         # Afficher les livreurs intéressés et laisser le manager choisir
+        flush_console()
         print(f"\n{'='*60}")
         print(f"📋 LIVREURS INTÉRESSÉS POUR L'ANNONCE")
         print(f"{'='*60}")
-        print(f"🏪 Restaurant: {announcement['order']['restaurant']['name']}")
-        print(f"💰 Compensation: {announcement['compensation']}€")
-        print(f"🚗 Distance: {announcement['estimated_distance']} km")
+        print(f"🏪 Restaurant: {announcement.order.restaurant.name}")
+        print(f"💰 Compensation: {announcement.compensation}€")
+        print(f"🚗 Distance: {announcement.estimated_distance} km")
         print(f"{'='*60}")
         
         for i, response in enumerate(final_interested, 1):
-            print(f"{i}. {response['delivery_person_name']} (ID: {response['delivery_person_id'][:8]}...)")
-            if response.get('estimated_arrival_time'):
-                print(f"   ⏱️  Temps d'arrivée estimé: {response['estimated_arrival_time']} min")
+            print(f"{i}. {response.delivery_person_name} (ID: {response.delivery_person_id[:8]}...)")
+            if response.estimated_arrival_time:
+                print(f"   ⏱️  Temps d'arrivée estimé: {response.estimated_arrival_time} min")
         
         print(f"{'='*60}")
         
@@ -316,15 +668,20 @@ class DeliveryManager:
                 print("\n👋 Au revoir!")
                 return
         
+        self._select_delivery_person(announcement_id, selected_response, final_interested, selection_reason)
+    
+    def _select_delivery_person(self, announcement_id, selected_response, final_interested, selection_reason):
+        """Publie la sélection, notifie les livreurs intéressés et clôt l'annonce"""
         # Créer la sélection
-        selection = {
-            'selection_id': str(uuid.uuid4()),
-            'announcement_id': announcement_id,
-            'selected_delivery_person_id': selected_response['delivery_person_id'],
-            'selected_delivery_person_name': selected_response['delivery_person_name'],
-            'selection_reason': selection_reason,
-            'selected_at': datetime.now().isoformat()
-        }
+        selection = Selection(
+            selection_id=str(uuid.uuid4()),
+            announcement_id=announcement_id,
+            selected_delivery_person_id=selected_response.delivery_person_id,
+            selected_delivery_person_name=selected_response.delivery_person_name,
+            selection_reason=selection_reason,
+            selected_at=datetime.now().isoformat(),
+            trace=child_trace(self._announcement_trace(announcement_id), selected=now_us())
+        )
         
         # Publier la sélection
         self._publish_selection(selection)
@@ -332,56 +689,151 @@ class DeliveryManager:
         # Notifier tous les livreurs
         self._notify_all_delivery_persons(announcement_id, selection, final_interested)
         
+        # Créditer le livreur sélectionné de la compensation de l'annonce
+        self._credit_earnings(announcement_id, selection)
+        
         # Nettoyer les données
-        self._cleanup_announcement(announcement_id)
+        self._cleanup_announcement(announcement_id, selection)
         
-        print(f"🎯 Livreur sélectionné: {selected_response['delivery_person_name']}")
+        log.info("🎯 Livreur sélectionné: %s", selected_response.delivery_person_name)
+    
+    def _credit_earnings(self, announcement_id, selection):
+        """Crédite la compensation au livreur sélectionné dans le grand livre Redis"""
+        announcement = self.active_announcements.get(announcement_id)
+        if not announcement or not self.earnings_ledger:
+            return
+        try:
+            self.earnings_ledger.credit(selection.selected_delivery_person_id,
+                                        selection.selected_delivery_person_name,
+                                        announcement.compensation)
+        except Exception as e:
+            MANAGER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors du crédit des gains: %s", e)
+    
+    def _announcement_trace(self, announcement_id):
+        """Trace de l'annonce active, None si absente"""
+        announcement = self.active_announcements.get(announcement_id)
+        return announcement.trace if announcement else None
     
     def _publish_selection(self, selection):
         """Publie la sélection d'un livreur"""
         try:
-            message = json.dumps(selection, ensure_ascii=False)
-            self.redis_client.publish(CHANNELS['DELIVERY_SELECTION'], message)
-            print(f"📡 Sélection publiée sur le channel: {CHANNELS['DELIVERY_SELECTION']}")
+            message = selection.to_json()
+            self._publish(self._shard_client(self.active_announcements.get(selection.announcement_id)),
+                          CHANNELS['DELIVERY_SELECTION'], message, SELECTION_PUBLISH_SECONDS,
+                          self._selection_sent)
         except Exception as e:
-            print(f"❌ Erreur lors de la publication de la sélection: {e}")
+            MANAGER_ERRORS_TOTAL.inc()
+            log.error("❌ Erreur lors de la publication de la sélection: %s", e)
     
     def _notify_all_delivery_persons(self, announcement_id, selection, interested_responses):
         """Notifie tous les livreurs du résultat de la sélection"""
-        print(f"\n📢 ENVOI DES NOTIFICATIONS...")
-        print(f"{'='*50}")
+        lines = [f"\n📢 ENVOI DES NOTIFICATIONS...", f"{'='*50}"]
+        
+        # Compensation et coordonnées du trajet, envoyées au livreur sélectionné
+        announcement = self.active_announcements.get(announcement_id)
+        route = {}
+        if announcement:
+            order = announcement.order
+            route = {
+                'compensation': announcement.compensation,
+                'pickup_lat': order.restaurant.lat,
+                'pickup_lng': order.restaurant.lng,
+                'delivery_lat': order.customer_lat,
+                'delivery_lng': order.customer_lng
+            }
         
+        shard_client = self._shard_client(announcement)
         for response in interested_responses:
-            is_selected = response['delivery_person_id'] == selection['selected_delivery_person_id']
+            is_selected = response.delivery_person_id == selection.selected_delivery_person_id
             
-            notification = {
-                'announcement_id': announcement_id,
-                'delivery_person_id': response['delivery_person_id'],
-                'delivery_person_name': response['delivery_person_name'],
-                'is_selected': is_selected,
-                'selected_delivery_person_name': selection['selected_delivery_person_name'] if is_selected else None,
-                'notification_time': datetime.now().isoformat()
-            }
+            notification = Notification(
+                announcement_id=announcement_id,
+                delivery_person_id=response.delivery_person_id,
+                delivery_person_name=response.delivery_person_name,
+                is_selected=is_selected,
+                selected_delivery_person_name=selection.selected_delivery_person_name if is_selected else None,
+                notification_time=datetime.now().isoformat(),
+                trace=child_trace(selection.trace, notified=now_us()),
+                **(route if is_selected else {})
+            )
             
             try:
-                message = json.dumps(notification, ensure_ascii=False)
-                self.redis_client.publish(CHANNELS['DELIVERY_NOTIFICATION'], message)
+                message = notification.to_json()
+                self._publish(shard_client, CHANNELS['DELIVERY_NOTIFICATION'], message,
+                              NOTIFICATION_PUBLISH_SECONDS)
                 
                 status = "✅ SÉLECTIONNÉ" if is_selected else "❌ Non sélectionné"
-                print(f"📤 {response['delivery_person_name']}: {status}")
+                lines.append(f"📤 {response.delivery_person_name}: {status}")
                 
             except Exception as e:
-                print(f"❌ Erreur lors de l'envoi de la notification: {e}")
+                MANAGER_ERRORS_TOTAL.inc()
+                log.error("❌ Erreur lors de l'envoi de la notification: %s", e)
         
-        print(f"{'='*50}")
-        print(f"✅ Toutes les notifications ont été envoyées !")
+        lines += [f"{'='*50}", f"✅ Toutes les notifications ont été envoyées !"]
+        log.info('\n'.join(lines))
+    
+    def _expire_announcements(self):
+        """Clôt les annonces ouvertes depuis plus de announcement_ttl sans sélection
+        
+        Sans cela une annonce sans livreur intéressé resterait ouverte indéfiniment
+        (et compterait pour toujours dans la demande de sa zone).
+        """
+        while self.running:
+            time.sleep(min(1.0, self.announcement_ttl / 4))
+            now = time.perf_counter()
+            expired = []
+            with self.expiry_lock:
+                while self.expiry_heap and self.expiry_heap[0][0] <= now:
+                    expired.append(heapq.heappop(self.expiry_heap)[1])
+            for announcement_id in expired:
+                if announcement_id in self.unloaded_announcements:
+                    self._expire_unloaded(announcement_id)
+                if announcement_id not in self.active_announcements:
+                    continue  # déjà sélectionnée
+                log.info("⌛ Annonce %s... expirée sans sélection", announcement_id[:8])
+                EXPIRED_TOTAL.inc()
+                self._cleanup_announcement(announcement_id)
     
-    def _cleanup_announcement(self, announcement_id):
-        """Nettoie les données d'une annonce terminée"""
-        if announcement_id in self.active_announcements:
-            del self.active_announcements[announcement_id]
-        if announcement_id in self.pending_responses:
-            del self.pending_responses[announcement_id]
+    def _cleanup_announcement(self, announcement_id, selection=None):
+        """Nettoie les données d'une annonce terminée et l'archive dans l'historique"""
+        announcement = self.active_announcements.pop(announcement_id, None)
+        responses = self.pending_responses.pop(announcement_id, [])
+        self.responders.pop(announcement_id, None)
+        started = self.announcement_started.pop(announcement_id, None)
+        with self.state_lock:
+            summary = self.announcement_summaries.pop(announcement_id, None)
+            if summary is not None:
+                self.open_response_count -= summary['responses']
+                self.open_interested_count -= summary['interested']
+                self.state_version += 1
+        
+        if selection and started is not None:
+            ASSIGNMENT_SECONDS.observe(time.perf_counter() - started)
+        
+        if announcement and self.zone_tracker:
+            self.zone_tracker.order_closed(announcement.zone)
+        
+        if announcement and self.history_sink:
+            self.history_sink.record(build_history_document(announcement, responses, selection))
+
+    
+    def dashboard_snapshot(self) -> Dict:
+        """Instantané versionné de l'état du manager pour les tableaux de bord
+        
+        Reconstruit seulement si un événement a eu lieu depuis le dernier appel;
+        les annonces sont dans l'ordre de création.
+        """
+        with self.state_lock:
+            if self._snapshot is None or self._snapshot['version'] != self.state_version:
+                self._snapshot = {
+                    'version': self.state_version,
+                    'active_count': len(self.announcement_summaries),
+                    'response_count': self.open_response_count,
+                    'interested_count': self.open_interested_count,
+                    'announcements': [dict(summary) for summary in self.announcement_summaries.values()]
+                }
+            return self._snapshot
     
     def _force_selection(self):
         """Force la sélection pour une annonce active"""
@@ -389,6 +841,7 @@ class DeliveryManager:
             print("❌ Aucune annonce active pour forcer la sélection")
             return
         
+        flush_console()
         print(f"\n{'='*50}")
         print(f"🚀 FORCER LA SÉLECTION")
         print(f"{'='*50}")
@@ -396,8 +849,8 @@ class DeliveryManager:
         # Afficher les annonces actives
         for i, (ann_id, ann) in enumerate(self.active_announcements.items(), 1):
             responses = len(self.pending_responses.get(ann_id, []))
-            interested = len([r for r in self.pending_responses.get(ann_id, []) if r['is_interested']])
-            restaurant = ann['order']['restaurant']['name']
+            interested = len([r for r in self.pending_responses.get(ann_id, []) if r.is_interested])
+            restaurant = ann.order.restaurant.name
             print(f"{i}. {ann_id[:8]}... ({restaurant}): {responses} réponse(s), {interested} intéressé(s)")
         
         print(f"{'='*50}")
@@ -434,16 +887,57 @@ def main():
     print("=" * 50)
     
     try:
-        # Créer le manager
-        manager = DeliveryManager()
+        # Créer le manager (historique MongoDB si disponible)
+        # Pub/Sub réparti par zone si DISPATCH_SHARDS est défini, sinon le Redis unique
+        shard_router = ShardRouter.from_env()
+        if shard_router:
+            redis_client = shard_router.primary
+            print(f"🧩 Répartition par zone sur {len(shard_router.nodes)} nœud(s) Redis")
+        else:
+            redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+        zone_tracker = ZoneTracker(redis_client)
+        zone_tracker.start()
+        analytics = StreamAnalytics(redis_client)
+        analytics.start()
+        publisher = BatchingPublisher(redis_client)
+        publisher.start()
+        # Génération par des processus si ORDER_WORKERS est défini (nombre, ou 'auto': selon les cœurs)
+        order_workers = None
+        workers = os.environ.get(WORKERS_ENV)
+        if workers:
+            order_workers = OrderWorkerPool(
+                workers=None if workers == 'auto' else int(workers),
+                redis_node=shard_router.nodes[0] if shard_router else f"{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
+                shard_nodes=shard_router.nodes if shard_router else None, zone_tracker=zone_tracker)
+        # Seules les partitions de DATASET_PARTITIONS si elle est définie (dataset_partitions.py)
+        manager = DeliveryManager(dataset=dataset_from_env(), history_sink=create_history_sink(),
+                                  redis_client=redis_client, zone_tracker=zone_tracker,
+                                  earnings_ledger=EarningsLedger(redis_client), analytics=analytics,
+                                  snapshot_path=snapshot_path('manager'), shard_router=shard_router,
+                                  publisher=publisher, order_workers=order_workers)
         manager.start()
+        if order_workers:
+            order_workers.start(manager.dataset, manager.menu_index)
+            print(f"⚙️  {order_workers.workers} processus de génération d'annonces")
+        
+        # Endpoint Prometheus
+        metrics_port = start_metrics_server(METRICS_PORT)
+        if metrics_port:
+            print(f"📈 Métriques Prometheus: http://localhost:{metrics_port}/metrics")
         
+        flush_console()
         print(f"\n{'='*50}")
         print(f"🎮 COMMANDES DISPONIBLES")
         print(f"{'='*50}")
         print("  'a' - Créer une nouvelle annonce")
+        if manager.order_workers:
+            print("  'b' - Rafale d'annonces (processus de génération)")
+        print("  'c' - Annonce filtrée (plats et/ou cuisine)")
         print("  's' - Afficher les statistiques")
         print("  'f' - Forcer la sélection pour une annonce")
+        print("  'm' - Afficher les métriques")
+        print("  'p' - Démarrer/arrêter le profilage")
+        print("  'v' - Basculer le mode silencieux (haut débit)")
         print("  'q' - Quitter le programme")
         print(f"{'='*50}")
         print(f"💡 Créez une annonce et choisissez manuellement le livreur !")
@@ -451,10 +945,37 @@ def main():
         
         while True:
             try:
+                flush_console()
                 command = input(f"\n[Manager] > ").strip().lower()
                 
                 if command == 'a':
-                    manager.create_and_publish_announcement()
+                    if manager.order_workers:
+                        manager.order_workers.submit(1)
+                    else:
+                        manager.create_and_publish_announcement()
+                
+                elif command == 'b' and manager.order_workers:
+                    count = input("🔢 Nombre d'annonces: ").strip()
+                    manager.order_workers.submit(int(count) if count.isdigit() else 100)
+                
+                elif command == 'c':
+                    items = input("🍕 Plats (ex. pizza, dessert - vide: tous): ").strip() or None
+                    cuisine = input("🍽️  Cuisine (ex. mexican - vide: toutes): ").strip() or None
+                    restaurants = manager.restaurants_matching(items, cuisine, limit=5)
+                    if not restaurants:
+                        print("❌ Aucun restaurant ne correspond")
+                        continue
+                    match = manager.menu_index.query(items, cuisine)
+                    print(f"🔎 {len(match)} restaurant(s), {match.item_count} item(s) correspondant(s)")
+                    for restaurant in restaurants:
+                        print(f"   - {restaurant['name']} ({restaurant['category']}): "
+                              f"{restaurant['matching_items']} item(s)")
+                    if manager.order_workers:
+                        count = input("🔢 Nombre d'annonces: ").strip()
+                        manager.order_workers.submit(int(count) if count.isdigit() else 1,
+                                                     items=items, cuisine=cuisine)
+                    else:
+                        manager.create_and_publish_announcement(items=items, cuisine=cuisine)
                 
                 elif command == 's':
                     print(f"\n{'='*50}")
@@ -464,21 +985,63 @@ def main():
                     if manager.active_announcements:
                         for ann_id, ann in manager.active_announcements.items():
                             responses = len(manager.pending_responses.get(ann_id, []))
-                            restaurant = ann['order']['restaurant']['name']
+                            restaurant = ann.order.restaurant.name
                             print(f"   - {ann_id[:8]}... ({restaurant}): {responses} réponse(s)")
                     else:
                         print("   Aucune annonce active")
+                    if manager.order_workers:
+                        workers = manager.order_workers.stats
+                        print(f"⚙️  Génération: {workers['generated']} annonces générées, {workers['published']} publiées "
+                              f"({workers['workers']} processus, {workers['pending_tasks']} tâche(s) en attente)")
+                    if manager.zone_tracker and manager.zone_tracker.zone_stats:
+                        print(f"🗺️  Zones (offre/demande):")
+                        zones = sorted(manager.zone_tracker.zone_stats.items(),
+                                       key=lambda item: -manager.zone_tracker.surge_multiplier(item[0]))
+                        for zone, stats in zones[:5]:
+                            acceptance = stats['acceptance_rate']
+                            print(f"   - {zone}: {stats['open_orders']} ouverte(s), "
+                                  f"{stats['available_couriers']} livreur(s) dispo, acceptation "
+                                  f"{f'{acceptance:.0%}' if acceptance is not None else '—'}, "
+                                  f"surge x{manager.zone_tracker.surge_multiplier(zone):g}")
+                    if manager.earnings_ledger:
+                        totals = manager.earnings_ledger.totals()
+                        print(f"💰 Gains versés: {totals['earnings']:.2f}€ ({totals['deliveries']} livraisons), "
+                              f"aujourd'hui {totals['day']:.2f}€, cette heure {totals['hour']:.2f}€")
+                        for entry in manager.earnings_ledger.top(5):
+                            print(f"   {entry['rank']}. {entry['name']}: {entry['earnings']:.2f}€")
+                    if manager.analytics:
+                        summary = manager.analytics.summary()
+                        couriers = summary['couriers']
+                        if couriers['all'] is not None:
+                            zones = ', '.join(f"{zone}: ~{count}" for zone, count in couriers['zones'].items())
+                            print(f"🛵 Livreurs uniques: ~{couriers['all']}" + (f" ({zones})" if zones else ""))
+                        if summary['categories']:
+                            print("🍽️  Catégories populaires: " +
+                                  ', '.join(f"{c['category']} (~{c['count']})" for c in summary['categories']))
+                        for restaurant in summary['restaurants']:
+                            rate = restaurant['acceptance_rate']
+                            print(f"   - {restaurant['name']}: ~{restaurant['interested']}/{restaurant['responses']} "
+                                  f"intéressés ({f'{rate:.0%}' if rate is not None else '—'})")
                     print(f"{'='*50}")
                 
                 elif command == 'f':
                     manager._force_selection()
                 
+                elif command == 'm':
+                    print_metrics()
+                
+                elif command == 'p':
+                    toggle_profiling()
+                
+                elif command == 'v':
+                    toggle_quiet()
+                
                 elif command == 'q':
                     print("👋 Au revoir!")
                     break
                 
                 else:
-                    print("❌ Commande inconnue. Utilisez 'a', 's', 'f' ou 'q'")
+                    print("❌ Commande inconnue. Utilisez 'a', 'c', 's', 'f', 'm', 'p', 'v' ou 'q'")
                     
             except KeyboardInterrupt:
                 print("\n👋 Au revoir!")
@@ -489,6 +1052,9 @@ def main():
     except Exception as e:
         print(f"❌ Erreur fatale: {e}")
     finally:
+        # Écrire le profil en cours avant de quitter
+        if is_profiling():
+            toggle_profiling()
         if 'manager' in locals():
             manager.stop()
 
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Index inversé des menus - Mots des plats et des cuisines vers restaurants et items
+Construit une fois au chargement à partir du nom et de la catégorie de chaque
+item de menu, et de la catégorie (cuisine) de chaque restaurant. Un mot donne
+directement la liste triée des items ou des restaurants qui le contiennent:
+les commandes filtrées ("pizza", "dessert", cuisine "mexican"...) et les
+recherches se font en O(résultats), sans parcourir menus_df.
+
+Un item est repéré par sa position dans l'index; les items sont triés par
+restaurant et item_ranks donne leur rang dans dataset.menu_items(restaurant_id).
+"""
+import random
+import re
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Mots ignorés (trop fréquents pour filtrer quoi que ce soit)
+STOPWORDS = frozenset({'and', 'with', 'the', 'of', 'in', 'on', 'or', 'de', 'du', 'des', 'la', 'le', 'les', 'et', 'au', 'aux'})
+MIN_TOKEN_LENGTH = 2
+
+
+def tokenize(text) -> List[str]:
+    """Mots normalisés d'un texte: minuscules, sans accents, pluriel en 's' retiré"""
+    if not isinstance(text, str):
+        return []
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii').lower()
+    tokens = []
+    for word in re.findall(r'[a-z0-9]+', text):
+        if len(word) < MIN_TOKEN_LENGTH or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        if word not in tokens:
+            tokens.append(word)
+    return tokens
+
+
+def _postings(columns: Sequence[np.ndarray], count: int) -> Tuple[Dict[str, int], np.ndarray, np.ndarray]:
+    """Listes de documents par mot au format CSR: (mot -> numéro, offsets, documents triés)
+
+    Chaque colonne donne un texte par document; les textes répétés (catégories,
+    plats courants) ne sont découpés qu'une fois.
+    """
+    terms: Dict[str, int] = {}
+    term_parts, doc_parts = [], []
+    for values in columns:
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        token_lists = [[terms.setdefault(token, len(terms)) for token in tokenize(value)] for value in uniques]
+        token_lists.append([])  # valeurs absentes (code -1)
+        codes = np.where(codes < 0, len(uniques), codes)
+
+        # Mots de chaque document, sans boucle Python sur les documents
+        lengths = np.array([len(tokens) for tokens in token_lists], dtype=np.int64)
+        flat = np.fromiter((token for tokens in token_lists for token in tokens), dtype=np.int64,
+                           count=int(lengths.sum()))
+        starts = np.cumsum(lengths) - lengths
+        per_doc = lengths[codes]
+        within = np.arange(int(per_doc.sum())) - np.repeat(np.cumsum(per_doc) - per_doc, per_doc)
+        term_parts.append(flat[np.repeat(starts[codes], per_doc) + within])
+        doc_parts.append(np.repeat(np.arange(count, dtype=np.int64), per_doc))
+
+    # Paires (mot, document) uniques, triées par mot puis par document
+    count = max(count, 1)
+    keys = np.unique(np.concatenate(term_parts) * count + np.concatenate(doc_parts)) if term_parts else \
+        np.empty(0, dtype=np.int64)
+    term_ids, docs = keys // count, keys % count
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=offsets[1:])
+    return terms, offsets, docs.astype(np.int32)
+
+
+def _match(terms: Dict[str, int], offsets: np.ndarray, docs: np.ndarray, tokens: List[str]) -> np.ndarray:
+    """Documents contenant tous les mots (intersection des listes, la plus courte d'abord)"""
+    lists = []
+    for token in tokens:
+        term = terms.get(token)
+        if term is None:
+            return np.empty(0, dtype=np.int32)
+        lists.append(docs[offsets[term]:offsets[term + 1]])
+    if not lists:
+        return np.empty(0, dtype=np.int32)
+    lists.sort(key=len)
+    result = lists[0]
+    for postings in lists[1:]:
+        result = np.intersect1d(result, postings, assume_unique=True)
+    return result
+
+
+class MenuIndex:
+    """Index inversé des plats (nom et catégorie des items) et des cuisines des restaurants"""
+
+    # Tableaux numpy de l'index (les mots sont à part: TERMS)
+    ARRAYS = ('restaurant_ids', 'cuisine_offsets', 'cuisine_docs',
+              'item_restaurants', 'item_ranks', 'item_offsets', 'item_docs')
+    TERMS = ('cuisine_terms', 'item_terms')
+
+    def __init__(self, restaurant_ids, cuisines, item_restaurant_ids, item_names, item_categories):
+        restaurant_ids = np.asarray(restaurant_ids, dtype=np.int64)
+        item_restaurant_ids = np.asarray(item_restaurant_ids, dtype=np.int64)
+
+        # Restaurants triés par id
+        order = np.argsort(restaurant_ids, kind='stable')
+        self.restaurant_ids = restaurant_ids[order]
+        self.cuisine_terms, self.cuisine_offsets, self.cuisine_docs = _postings(
+            [np.asarray(cuisines, dtype=object)[order]], len(order))
+
+        # Items triés par restaurant (ordre du menu conservé), rang dans le menu de leur restaurant;
+        # les items d'un restaurant absent du dataset ne sont pas indexés
+        order = np.argsort(item_restaurant_ids, kind='stable')
+        sorted_ids = item_restaurant_ids[order]
+        ranks = np.arange(len(order)) - np.searchsorted(sorted_ids, sorted_ids, side='left')
+        known = np.isin(sorted_ids, self.restaurant_ids)
+        order = order[known]
+        self.item_restaurants = sorted_ids[known]
+        self.item_ranks = ranks[known].astype(np.int32)
+        self.item_terms, self.item_offsets, self.item_docs = _postings(
+            [np.asarray(item_names, dtype=object)[order], np.asarray(item_categories, dtype=object)[order]],
+            len(order))
+
+    @classmethod
+    def from_dataset(cls, dataset) -> 'MenuIndex':
+        """Construit l'index à partir d'un dataset (local ou Redis)"""
+        restaurant_ids, cuisines = dataset.restaurant_categories()
+        item_restaurant_ids, item_names, item_categories = dataset.menu_columns()
+        return cls(restaurant_ids, cuisines, item_restaurant_ids, item_names, item_categories)
+
+    def columns(self) -> Dict[str, object]:
+        """Tableaux de l'index et mots (listés par numéro), pour une copie en mémoire partagée"""
+        columns = {name: getattr(self, name) for name in self.ARRAYS}
+        for name in self.TERMS:
+            columns[name] = sorted(getattr(self, name), key=getattr(self, name).get)
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, object]) -> 'MenuIndex':
+        """Index sur des tableaux existants (sans copie), par exemple ceux d'un segment partagé"""
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, columns[name])
+        for name in cls.TERMS:
+            setattr(index, name, {term: number for number, term in enumerate(columns[name])})
+        return index
+
+    def __len__(self):
+        return len(self.item_restaurants)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAYS)
+
+    def query(self, items: Optional[str] = None, cuisine: Optional[str] = None) -> 'MenuMatch':
+        """Restaurants de la cuisine demandée ayant des plats qui contiennent tous les mots de `items`
+
+        Un mot de `items` est cherché dans le nom et la catégorie des items ("pizza",
+        "dessert", "chicken burger"); `cuisine` dans la catégorie du restaurant.
+        """
+        restaurant_ids = self.restaurant_ids
+        if cuisine:
+            positions = _match(self.cuisine_terms, self.cuisine_offsets, self.cuisine_docs, tokenize(cuisine))
+            restaurant_ids = self.restaurant_ids[positions]
+        item_positions = None
+        if items:
+            item_positions = _match(self.item_terms, self.item_offsets, self.item_docs, tokenize(items))
+            if cuisine:
+                item_positions = item_positions[np.isin(self.item_restaurants[item_positions], restaurant_ids)]
+            restaurant_ids = np.unique(self.item_restaurants[item_positions])
+        return MenuMatch(self, restaurant_ids, item_positions)
+
+
+class MenuMatch:
+    """Résultat d'une requête: restaurants (ids triés) et items correspondants (None: tous les items)"""
+
+    def __init__(self, index: MenuIndex, restaurant_ids: np.ndarray, item_positions: Optional[np.ndarray] = None):
+        self.index = index
+        self.restaurant_ids = restaurant_ids
+        self.item_positions = item_positions
+        # Restaurant de chaque item retenu (trié: les items d'un restaurant sont contigus)
+        self.item_restaurants = index.item_restaurants[item_positions] if item_positions is not None else None
+
+    def __len__(self):
+        return len(self.restaurant_ids)
+
+    @property
+    def empty(self) -> bool:
+        return not len(self.restaurant_ids)
+
+    @property
+    def item_count(self) -> int:
+        """Nombre d'items retenus (tous les items des restaurants si aucun plat n'est demandé)"""
+        return int(self.counts()[1].sum())
+
+    def restrict(self, restaurant_ids) -> 'MenuMatch':
+        """Même requête limitée à certains restaurants (par exemple ceux d'un rayon)"""
+        restaurant_ids = np.asarray(restaurant_ids, dtype=np.int64)
+        kept = self.restaurant_ids[np.isin(self.restaurant_ids, restaurant_ids)]
+        if self.item_positions is None:
+            return MenuMatch(self.index, kept, None)
+        return MenuMatch(self.index, kept, self.item_positions[np.isin(self.item_restaurants, kept)])
+
+    def item_ranks(self, restaurant_id: int) -> Optional[np.ndarray]:
+        """Rangs des items retenus dans le menu du restaurant (None: tous les items)"""
+        if self.item_positions is None:
+            return None
+        start = np.searchsorted(self.item_restaurants, restaurant_id, side='left')
+        end = np.searchsorted(self.item_restaurants, restaurant_id, side='right')
+        return self.index.item_ranks[self.item_positions[start:end]]
+
+    def counts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Restaurants retenus et leur nombre d'items correspondants: (ids, nombres)"""
+        items = self.index.item_restaurants if self.item_positions is None else self.item_restaurants
+        counts = (np.searchsorted(items, self.restaurant_ids, side='right') -
+                  np.searchsorted(items, self.restaurant_ids, side='left'))
+        return self.restaurant_ids, counts
+
+    def sample(self) -> Tuple[int, Optional[np.ndarray]]:
+        """Restaurant au hasard et rangs de ses items retenus
+
+        Avec un filtre sur les plats, un restaurant est tiré en proportion de ses items
+        correspondants (une pizzeria ressort plus souvent pour "pizza").
+        """
+        if self.item_positions is None:
+            return int(random.choice(self.restaurant_ids)), None
+        restaurant_id = int(self.item_restaurants[random.randrange(len(self.item_restaurants))])
+        return restaurant_id, self.item_ranks(restaurant_id)
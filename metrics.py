@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Métriques - Compteurs, jauges et histogrammes du pipeline de dispatch
+Exposés au format texte Prometheus et via une API Python (Streamlit)
+"""
+import bisect
+import os
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# Adresse et port par défaut de l'endpoint /metrics du manager: local seulement (pas
+# d'authentification), hors du port 9100 de node_exporter; METRICS_HOST=0.0.0.0 pour l'exposer
+METRICS_HOST = os.environ.get('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('METRICS_PORT', '9478'))
+
+# Bornes des histogrammes de latence (secondes)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Counter:
+    """Compteur monotone
+
+    L'incrément n'est pas verrouillé: sous le GIL une perte d'incrément entre
+    threads est possible mais rare, en échange d'un coût de ~50 ns.
+    """
+    __slots__ = ('name', 'help', 'labels', 'value')
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Gauge:
+    """Jauge: valeur fixée, incrémentée ou calculée à la lecture"""
+    __slots__ = ('name', 'help', 'labels', '_value', '_function', '_sources')
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: Tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._value = 0
+        self._function = None
+        self._sources = weakref.WeakKeyDictionary()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        self._value += amount
+
+    def dec(self, amount: float = 1):
+        self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """La valeur est calculée à la lecture (aucun coût dans le chemin chaud)"""
+        self._function = function
+
+    def track(self, owner, function: Callable[[object], float]):
+        """Ajoute la valeur function(owner) d'une instance (somme sur les instances vivantes)
+
+        L'instance n'est référencée que faiblement: function ne doit pas capturer owner.
+        """
+        self._sources[owner] = function
+
+    def untrack(self, owner):
+        self._sources.pop(owner, None)
+
+    @property
+    def value(self):
+        if self._sources:
+            total = 0
+            for owner, function in list(self._sources.items()):
+                try:
+                    total += function(owner)
+                except Exception:
+                    pass
+            return total
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return 0
+        return self._value
+
+
+class Histogram:
+    """Histogramme à bornes fixes (recherche dichotomique, sans allocation)"""
+    __slots__ = ('name', 'help', 'labels', 'buckets', 'counts', 'sum', 'count')
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Tuple = (), buckets: Tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimation d'un quantile par interpolation linéaire dans les bornes"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, bucket_count in zip(self.buckets, self.counts):
+            if cumulative + bucket_count >= target and bucket_count:
+                return lower + (upper - lower) * (target - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = upper
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Registre des métriques d'un processus"""
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Tuple], object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help: str, labels: Optional[Dict], **kwargs):
+        label_items = tuple(sorted((labels or {}).items()))
+        key = (name, label_items)
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = cls(name, help, label_items, **kwargs)
+                    self._metrics[key] = metric
+        return metric
+
+    def counter(self, name: str, help: str = '', labels: Optional[Dict] = None) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str = '', labels: Optional[Dict] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str = '', labels: Optional[Dict] = None,
+                  buckets: Tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets=buckets)
+
+    def snapshot(self) -> Dict:
+        """Valeurs actuelles pour l'affichage (Streamlit, commande REPL)"""
+        snapshot = {}
+        for (name, labels), metric in list(self._metrics.items()):
+            key = name + _format_labels(labels)
+            if metric.kind == 'histogram':
+                snapshot[key] = {
+                    'count': metric.count,
+                    'sum': metric.sum,
+                    'p50': metric.quantile(0.50),
+                    'p95': metric.quantile(0.95),
+                    'p99': metric.quantile(0.99)
+                }
+            else:
+                snapshot[key] = metric.value
+        return snapshot
+
+    def render_prometheus(self) -> str:
+        """Rendu au format texte Prometheus (version 0.0.4)"""
+        lines = []
+        documented = set()
+        for (name, labels), metric in sorted(self._metrics.items(), key=lambda item: item[0]):
+            if name not in documented:
+                lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+                documented.add(name)
+
+            if metric.kind == 'histogram':
+                cumulative = 0
+                for upper, bucket_count in zip(metric.buckets, metric.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(upper)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {metric.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+# Registre partagé par tout le processus
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port: int = METRICS_PORT, registry: MetricsRegistry = REGISTRY,
+                         host: str = METRICS_HOST) -> Optional[int]:
+    """Démarre l'endpoint HTTP /metrics dans un thread, retourne le port utilisé"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"⚠️ Endpoint de métriques indisponible sur {host}:{port}: {e}")
+        return None
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server.server_address[1]
+
+
+def print_metrics(registry: MetricsRegistry = REGISTRY):
+    """Affiche les métriques dans le terminal"""
+    print(f"\n{'='*50}")
+    print(f"📈 MÉTRIQUES")
+    print(f"{'='*50}")
+    for name, value in sorted(registry.snapshot().items()):
+        if isinstance(value, dict):
+            if not value['count']:
+                print(f"   {name}: aucune mesure")
+                continue
+            print(f"   {name}: n={value['count']} "
+                  f"p50={value['p50'] * 1000:.1f}ms p95={value['p95'] * 1000:.1f}ms p99={value['p99'] * 1000:.1f}ms")
+        else:
+            print(f"   {name}: {value}")
+    print(f"{'='*50}")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Modèle des messages - Commandes, annonces, réponses, sélections et notifications
+Classes compactes (__slots__, sans dictionnaire par objet) gardées en mémoire par
+le manager, les livreurs et Streamlit; les dictionnaires ne servent plus qu'aux
+frontières (JSON sur Redis, MongoDB). Le format JSON échangé ne change pas:
+les champs optionnels absents (shard, position simulée, trajet) sont omis.
+
+Codec: orjson s'il est installé (plusieurs fois plus rapide), json sinon.
+"""
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel: json de la bibliothèque standard sinon
+    orjson = None
+
+
+def dumps(data: Dict) -> Union[bytes, str]:
+    """Sérialise un message (octets UTF-8 avec orjson, chaîne sinon; Redis accepte les deux)"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False)
+
+
+def loads(data: Union[bytes, str]) -> Dict:
+    """Désérialise un message reçu de Redis"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _without_none(data: Dict, optional: tuple) -> Dict:
+    """Retire les champs optionnels absents (format JSON inchangé)"""
+    for key in optional:
+        if data[key] is None:
+            del data[key]
+    return data
+
+
+@dataclass(slots=True, eq=False)
+class Restaurant:
+    id: int
+    name: Optional[str]
+    address: Optional[str]
+    lat: float
+    lng: float
+    category: Optional[str] = None
+    price_range: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Restaurant':
+        return cls(data['id'], data.get('name'), data.get('address'), data['lat'], data['lng'],
+                   data.get('category'), data.get('price_range'))
+
+    def to_dict(self) -> Dict:
+        return {'id': self.id, 'name': self.name, 'address': self.address, 'lat': self.lat, 'lng': self.lng,
+                'category': self.category, 'price_range': self.price_range}
+
+
+@dataclass(slots=True, eq=False)
+class MenuItem:
+    name: Optional[str]
+    category: Optional[str]
+    price: float
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MenuItem':
+        return cls(data.get('name'), data.get('category'), data['price'])
+
+    def to_dict(self) -> Dict:
+        return {'name': self.name, 'category': self.category, 'price': self.price}
+
+
+@dataclass(slots=True, eq=False)
+class Order:
+    order_id: str
+    restaurant: Restaurant
+    customer_address: str
+    customer_lat: float
+    customer_lng: float
+    items: List[MenuItem]
+    total_amount: float
+    delivery_fee: float
+    created_at: str
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Order':
+        return cls(data['order_id'], Restaurant.from_dict(data['restaurant']), data['customer_address'],
+                   data['customer_lat'], data['customer_lng'], [MenuItem.from_dict(item) for item in data['items']],
+                   data['total_amount'], data['delivery_fee'], data['created_at'])
+
+    def to_dict(self) -> Dict:
+        return {
+            'order_id': self.order_id,
+            'restaurant': self.restaurant.to_dict(),
+            'customer_address': self.customer_address,
+            'customer_lat': self.customer_lat,
+            'customer_lng': self.customer_lng,
+            'items': [item.to_dict() for item in self.items],
+            'total_amount': self.total_amount,
+            'delivery_fee': self.delivery_fee,
+            'created_at': self.created_at
+        }
+
+
+@dataclass(slots=True, eq=False)
+class Announcement:
+    announcement_id: str
+    order: Order
+    pickup_location: str
+    delivery_location: str
+    compensation: float
+    estimated_distance: float
+    zone: Optional[str]
+    surge_multiplier: float
+    created_at: str
+    trace: Optional[Dict] = None
+    shard: Optional[str] = None  # nœud Redis de la zone (sharding), absent sans répartition
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Announcement':
+        return cls(data['announcement_id'], Order.from_dict(data['order']), data['pickup_location'],
+                   data['delivery_location'], data['compensation'], data['estimated_distance'],
+                   data.get('zone'), data.get('surge_multiplier', 1.0), data['created_at'],
+                   data.get('trace'), data.get('shard'))
+
+    @classmethod
+    def from_json(cls, data: Union[bytes, str]) -> 'Announcement':
+        return cls.from_dict(loads(data))
+
+    def to_dict(self) -> Dict:
+        return _without_none({
+            'announcement_id': self.announcement_id,
+            'order': self.order.to_dict(),
+            'pickup_location': self.pickup_location,
+            'delivery_location': self.delivery_location,
+            'compensation': self.compensation,
+            'estimated_distance': self.estimated_distance,
+            'zone': self.zone,
+            'surge_multiplier': self.surge_multiplier,
+            'created_at': self.created_at,
+            'trace': self.trace,
+            'shard': self.shard
+        }, ('shard',))
+
+    def to_json(self) -> Union[bytes, str]:
+        return dumps(self.to_dict())
+
+
+@dataclass(slots=True, eq=False)
+class Response:
+    response_id: str
+    delivery_person_id: str
+    delivery_person_name: str
+    announcement_id: str
+    is_interested: bool
+    estimated_arrival_time: Optional[int]
+    current_location: Optional[str]
+    response_time: str
+    trace: Optional[Dict] = None
+    # Livreurs simulés (courier_simulation.py): position et distance au restaurant
+    current_lat: Optional[float] = None
+    current_lng: Optional[float] = None
+    distance_to_pickup_km: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Response':
+        return cls(data['response_id'], data['delivery_person_id'], data['delivery_person_name'],
+                   data['announcement_id'], data['is_interested'], data.get('estimated_arrival_time'),
+                   data.get('current_location'), data['response_time'], data.get('trace'),
+                   data.get('current_lat'), data.get('current_lng'), data.get('distance_to_pickup_km'))
+
+    @classmethod
+    def from_json(cls, data: Union[bytes, str]) -> 'Response':
+        return cls.from_dict(loads(data))
+
+    def to_dict(self) -> Dict:
+        return _without_none({
+            'response_id': self.response_id,
+            'delivery_person_id': self.delivery_person_id,
+            'delivery_person_name': self.delivery_person_name,
+            'announcement_id': self.announcement_id,
+            'is_interested': self.is_interested,
+            'estimated_arrival_time': self.estimated_arrival_time,
+            'current_location': self.current_location,
+            'response_time': self.response_time,
+            'trace': self.trace,
+            'current_lat': self.current_lat,
+            'current_lng': self.current_lng,
+            'distance_to_pickup_km': self.distance_to_pickup_km
+        }, ('current_lat', 'current_lng', 'distance_to_pickup_km'))
+
+    def to_json(self) -> Union[bytes, str]:
+        return dumps(self.to_dict())
+
+
+@dataclass(slots=True, eq=False)
+class Selection:
+    selection_id: str
+    announcement_id: str
+    selected_delivery_person_id: str
+    selected_delivery_person_name: str
+    selection_reason: str
+    selected_at: str
+    trace: Optional[Dict] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Selection':
+        return cls(data['selection_id'], data['announcement_id'], data['selected_delivery_person_id'],
+                   data['selected_delivery_person_name'], data['selection_reason'], data['selected_at'],
+                   data.get('trace'))
+
+    @classmethod
+    def from_json(cls, data: Union[bytes, str]) -> 'Selection':
+        return cls.from_dict(loads(data))
+
+    def to_dict(self) -> Dict:
+        return {
+            'selection_id': self.selection_id,
+            'announcement_id': self.announcement_id,
+            'selected_delivery_person_id': self.selected_delivery_person_id,
+            'selected_delivery_person_name': self.selected_delivery_person_name,
+            'selection_reason': self.selection_reason,
+            'selected_at': self.selected_at,
+            'trace': self.trace
+        }
+
+    def to_json(self) -> Union[bytes, str]:
+        return dumps(self.to_dict())
+
+
+@dataclass(slots=True, eq=False)
+class Notification:
+    announcement_id: str
+    delivery_person_id: str
+    delivery_person_name: str
+    is_selected: bool
+    selected_delivery_person_name: Optional[str]
+    notification_time: str
+    trace: Optional[Dict] = None
+    # Livreur sélectionné seulement: compensation et coordonnées du trajet
+    compensation: Optional[float] = None
+    pickup_lat: Optional[float] = None
+    pickup_lng: Optional[float] = None
+    delivery_lat: Optional[float] = None
+    delivery_lng: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Notification':
+        return cls(data['announcement_id'], data['delivery_person_id'], data['delivery_person_name'],
+                   data.get('is_selected', False), data.get('selected_delivery_person_name'),
+                   data['notification_time'], data.get('trace'), data.get('compensation'),
+                   data.get('pickup_lat'), data.get('pickup_lng'), data.get('delivery_lat'), data.get('delivery_lng'))
+
+    @classmethod
+    def from_json(cls, data: Union[bytes, str]) -> 'Notification':
+        return cls.from_dict(loads(data))
+
+    def to_dict(self) -> Dict:
+        return _without_none({
+            'announcement_id': self.announcement_id,
+            'delivery_person_id': self.delivery_person_id,
+            'delivery_person_name': self.delivery_person_name,
+            'is_selected': self.is_selected,
+            'selected_delivery_person_name': self.selected_delivery_person_name,
+            'notification_time': self.notification_time,
+            'trace': self.trace,
+            'compensation': self.compensation,
+            'pickup_lat': self.pickup_lat,
+            'pickup_lng': self.pickup_lng,
+            'delivery_lat': self.delivery_lat,
+            'delivery_lng': self.delivery_lng
+        }, ('compensation', 'pickup_lat', 'pickup_lng', 'delivery_lat', 'delivery_lng'))
+
+    def to_json(self) -> Union[bytes, str]:
+        return dumps(self.to_dict())
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Génération multi-processus des annonces
+Des processus de génération construisent et sérialisent les annonces (commande
+aléatoire, compensation, JSON) à partir du dataset en mémoire partagée
+(dataset_shared.py). Un processus de publication unique les envoie par lots:
+chaque annonce est d'abord écrite dans Redis (announcement:{id}), puis publiée
+sur le nœud de sa zone. Le manager ne fait plus que les réponses et la sélection:
+il charge une annonce depuis Redis à sa première réponse. Le processus de
+publication lui signale chaque annonce publiée (zone, catégories) pour qu'elle
+compte dans la demande de sa zone dès sa publication. Les annonces d'un nœud en
+échec sont renvoyées, sans bloquer celles des autres nœuds.
+
+    processus manager ──tâches──▶ N générateurs ──JSON──▶ publication ──▶ Redis
+          ▲                                                              │
+          └──────────────── réponses (Pub/Sub) ◀── livreurs ◀────────────┘
+
+Les processus sont lancés en 'spawn' (le manager a déjà des threads actifs).
+"""
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from console import get_logger
+from dataset import LocalDataset
+from dataset_shared import SharedDataset
+from menu_index import MenuIndex
+from metrics import REGISTRY
+
+# Configuration Redis
+REDIS_HOST = 'localhost'
+REDIS_PORT = 6379
+REDIS_DB = 0
+
+# Channels Redis
+CHANNELS = {
+    'ORDER_ANNOUNCEMENT': 'order:announcement',
+    'DELIVERY_RESPONSE': 'delivery:response',
+    'DELIVERY_SELECTION': 'delivery:selection',
+    'DELIVERY_NOTIFICATION': 'delivery:notification'
+}
+
+# Annonces générées par les processus, relues par le manager à la première réponse
+ANNOUNCEMENT_KEY = 'announcement:{}'
+ANNOUNCEMENT_TTL_SECONDS = 3600
+
+# Variable d'environnement: nombre de processus de génération du manager
+WORKERS_ENV = 'ORDER_WORKERS'
+
+# Annonces par tâche (une tâche = un aller-retour entre processus)
+TASK_CHUNK_SIZE = 50
+
+# Files bornées: les générateurs attendent quand la publication prend du retard
+MAX_PENDING_TASKS = 256
+MAX_PENDING_BATCHES = 64
+
+# Lots de publication
+PUBLISH_BATCH_SIZE = 500
+
+# Renvoi des annonces dont le SET ou le PUBLISH a échoué (nœud Redis coupé)
+PUBLISH_MAX_ATTEMPTS = 5
+PUBLISH_RETRY_INTERVAL = 0.5
+
+# Intervalle de transmission des multiplicateurs de surge aux générateurs
+SURGE_SYNC_INTERVAL = 1.0
+
+log = get_logger('workers')
+
+ANNOUNCEMENTS_TOTAL = REGISTRY.counter('dispatch_announcements_total', 'Annonces publiées')
+WORKERS_PENDING_TASKS = REGISTRY.gauge('dispatch_workers_pending_tasks', 'Tâches de génération en attente')
+WORKERS_GENERATED = REGISTRY.gauge('dispatch_workers_generated', 'Annonces générées par les processus')
+
+
+def default_worker_count() -> int:
+    """Un processus de génération par cœur, en laissant un cœur au manager et un à la publication"""
+    return max(1, (os.cpu_count() or 1) - 2)
+
+
+class OrderWorkerPool:
+    """Processus de génération et de publication des annonces du manager"""
+
+    def __init__(self, workers: Optional[int] = None, redis_node: Optional[str] = None,
+                 shard_nodes: Optional[List[str]] = None, zone_tracker=None, rate: Optional[float] = None):
+        self.workers = workers or default_worker_count()
+        self.redis_node = redis_node or f"{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+        self.shard_nodes = shard_nodes
+        self.zone_tracker = zone_tracker
+        self.rate = rate
+
+        self.context = multiprocessing.get_context('spawn')
+        self.shared = None
+        self.tasks = self.context.Queue(MAX_PENDING_TASKS)
+        self.batches = self.context.Queue(MAX_PENDING_BATCHES)
+        # Annonces publiées [(id, zone, catégories)], remises à on_published (le manager)
+        self.reports = self.context.Queue()
+        self.on_published: Optional[Callable[[List[Tuple]], None]] = None
+        self.report_thread = None
+        self.surge_queues = []
+        self.processes = []
+        self.generated = self.context.Value('q', 0)
+        self.published = self.context.Value('q', 0)
+        self.pending_tasks = self.context.Value('q', 0)
+        self.running = False
+        self.sync_thread = None
+        self.counted = 0
+
+        WORKERS_PENDING_TASKS.track(self, lambda pool: pool.pending_tasks.value)
+        WORKERS_GENERATED.track(self, lambda pool: pool.generated.value)
+
+    def start(self, dataset=None, menu_index=None):
+        """Copie le dataset en mémoire partagée et lance les processus
+        
+        dataset: LocalDataset déjà chargé (celui du manager); relu depuis les CSV sinon.
+        menu_index: index des menus du manager (construit sinon), copié avec le dataset dans
+        la mémoire partagée: les générateurs l'utilisent sans le recevoir ni le reconstruire.
+        """
+        start = time.perf_counter()
+        if not isinstance(dataset, LocalDataset):
+            dataset, menu_index = LocalDataset.from_csv(), None
+        if menu_index is None:
+            menu_index = MenuIndex.from_dataset(dataset)
+        self.shared = SharedDataset.create(dataset, menu_index)
+        for index in range(self.workers):
+            surge_queue = self.context.Queue()
+            process = self.context.Process(
+                target=_generate_main, name=f"order-worker-{index}",
+                args=(self.shared.descriptor, self.tasks, surge_queue, self.batches,
+                      self.shard_nodes, self.generated, self.pending_tasks)
+            )
+            process.daemon = True
+            process.start()
+            self.surge_queues.append(surge_queue)
+            self.processes.append(process)
+        publisher = self.context.Process(
+            target=_publish_main, name="order-publisher",
+            args=(self.batches, self.reports, self.redis_node, self.shard_nodes, self.workers, self.rate,
+                  self.published)
+        )
+        publisher.daemon = True
+        publisher.start()
+        self.processes.append(publisher)
+
+        self.running = True
+        self.sync_thread = threading.Thread(target=self._run)
+        self.sync_thread.daemon = True
+        self.sync_thread.start()
+        self.report_thread = threading.Thread(target=self._receive_reports)
+        self.report_thread.daemon = True
+        self.report_thread.start()
+        log.info("⚙️  %d processus de génération + 1 de publication (dataset partagé: %.1f Mo, %.0f ms)",
+                 self.workers, self.shared.nbytes / 1e6, (time.perf_counter() - start) * 1000)
+
+    def stop(self, timeout: float = 10.0):
+        """Termine les tâches en cours, arrête les processus et libère la mémoire partagée"""
+        self.running = False
+        for _ in range(self.workers):
+            self.tasks.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(0.1, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        if self.sync_thread:
+            self.sync_thread.join(timeout=5)
+        if self.report_thread:
+            self.report_thread.join(timeout=5)
+        self._count_published()
+        WORKERS_PENDING_TASKS.untrack(self)
+        WORKERS_GENERATED.untrack(self)
+        if self.shared:
+            self.shared.close()
+            self.shared = None
+
+    def submit(self, count: int = 1, near: Optional[Tuple[float, float]] = None, radius_km: float = 2.0,
+               items: Optional[str] = None, cuisine: Optional[str] = None):
+        """Demande `count` annonces aux générateurs (bloque si trop de tâches sont en attente)
+        
+        items / cuisine: plats ou cuisine demandés (voir MenuIndex.query).
+        """
+        while count > 0:
+            chunk = min(TASK_CHUNK_SIZE, count)
+            with self.pending_tasks.get_lock():
+                self.pending_tasks.value += 1
+            self.tasks.put((chunk, near, radius_km, items, cuisine))
+            count -= chunk
+
+    @property
+    def stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'pending_tasks': self.pending_tasks.value,
+            'generated': self.generated.value,
+            'published': self.published.value
+        }
+
+    def _count_published(self):
+        """Reporte les annonces publiées par le processus de publication dans les métriques"""
+        published = self.published.value
+        ANNOUNCEMENTS_TOTAL.inc(published - self.counted)
+        self.counted = published
+
+    def _receive_reports(self):
+        """Remet les annonces publiées au manager, jusqu'à la fin du processus de publication"""
+        while True:
+            try:
+                reports = self.reports.get(timeout=0.5)
+            except queue.Empty:
+                if not self.running and not any(process.is_alive() for process in self.processes):
+                    break
+                continue
+            if reports is None:
+                break
+            if self.on_published:
+                try:
+                    self.on_published(reports)
+                except Exception as e:
+                    log.error("❌ Erreur lors du suivi de %d annonces publiées: %s", len(reports), e)
+
+    def _run(self):
+        """Transmet les multiplicateurs de surge aux générateurs quand ils changent"""
+        sent = None
+        while self.running:
+            surge = self.zone_tracker.surge if self.zone_tracker else None
+            if surge is not None and surge is not sent:
+                for surge_queue in self.surge_queues:
+                    surge_queue.put(dict(surge))
+                sent = surge
+            self._count_published()
+            time.sleep(SURGE_SYNC_INTERVAL)
+
+
+def _generate_main(descriptor, tasks, surge_queue, batches, shard_nodes, generated, pending_tasks):
+    """Processus de génération: commandes, annonces et JSON, sans accès à Redis"""
+    from orders import build_announcement, create_random_order
+    from sharding import ConsistentHashRing
+    from spatial_index import RestaurantSpatialIndex
+    from tracing import start_trace, stamp
+
+    random.seed()
+    dataset = SharedDataset.attach(descriptor)
+    spatial_index = RestaurantSpatialIndex.from_dataset(dataset)
+    ring = ConsistentHashRing(shard_nodes) if shard_nodes else None
+    surge: Dict[str, float] = {}
+    matches = {}  # requêtes de plats/cuisine déjà résolues (index des menus du segment partagé)
+    match = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            count, near, radius_km, items, cuisine = task
+            match = None
+            if items or cuisine:
+                if (items, cuisine) not in matches:
+                    matches[items, cuisine] = dataset.menu_index().query(items, cuisine)
+                match = matches[items, cuisine]
+            # Dernière table de surge reçue
+            while True:
+                try:
+                    surge = surge_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            batch = []
+            for _ in range(count):
+                trace = start_trace()
+                order = create_random_order(dataset, spatial_index, near, radius_km, match)
+                announcement = build_announcement(order, surge, trace)
+                shard = ring.node_for(announcement.zone) if ring else None
+                announcement.shard = shard
+                stamp(trace, 'published')
+                batch.append((announcement.announcement_id, shard, announcement.to_json(), announcement.zone,
+                              tuple(item.category for item in order.items)))
+            batches.put(batch)
+            with generated.get_lock():
+                generated.value += len(batch)
+            with pending_tasks.get_lock():
+                pending_tasks.value -= 1
+    finally:
+        batches.put(None)
+        # Plus aucune vue sur le segment avant de le détacher
+        matches.clear()
+        match = None
+        dataset.close()
+
+
+def _publish_main(batches, reports, redis_node, shard_nodes, workers, rate, published):
+    """Processus de publication: SET des annonces puis PUBLISH sur le nœud de leur zone, par lots;
+    les annonces publiées sont signalées au manager sur `reports`"""
+    from batching_publisher import TokenBucket, DEFAULT_BURST
+    from redis_connections import get_client
+    from sharding import ShardRouter, parse_node
+
+    primary = get_client(*parse_node(redis_node))
+    router = ShardRouter(shard_nodes) if shard_nodes else None
+    bucket = TokenBucket(rate, DEFAULT_BURST) if rate else None
+    try:
+        _publish_batches(batches, reports, primary, router, bucket, workers, published)
+    finally:
+        reports.put(None)
+
+
+def _publish_batches(batches, reports, primary, router, bucket, workers, published):
+    """Boucle de publication, jusqu'à la fin de tous les générateurs et des renvois en attente
+
+    Les annonces d'un nœud en échec (ou de tout le lot si le SET échoue) sont renvoyées
+    après PUBLISH_RETRY_INTERVAL, au plus PUBLISH_MAX_ATTEMPTS fois; celles des nœuds
+    qui ont réussi sont comptées et signalées tout de suite.
+    """
+    finished = 0
+    retry: List[Tuple[int, Tuple]] = []  # (essais, annonce) des envois en échec
+    retry_at = 0.0
+    while finished < workers or retry:
+        pending = []
+        if finished < workers:
+            # Sans renvoi en attente, attend le prochain lot; sinon au plus jusqu'à l'échéance
+            wait = max(0.0, retry_at - time.monotonic()) if retry else None
+            try:
+                pending.append(batches.get(timeout=wait) if wait != 0.0 else batches.get_nowait())
+            except queue.Empty:
+                pass
+            # Regroupe ce qui est déjà en file, sans attendre
+            while pending and sum(len(batch) for batch in pending if batch) < PUBLISH_BATCH_SIZE:
+                try:
+                    pending.append(batches.get_nowait())
+                except queue.Empty:
+                    break
+        elif retry_at > time.monotonic():
+            time.sleep(retry_at - time.monotonic())
+        finished += sum(1 for batch in pending if batch is None)
+        attempts = [(0, entry) for batch in pending if batch for entry in batch]
+        if bucket:
+            for _ in attempts:
+                bucket.acquire()
+        if retry and time.monotonic() >= retry_at:
+            attempts, retry = retry + attempts, []
+        if not attempts:
+            continue
+
+        sent, failed = _publish_entries(attempts, primary, router)
+        if failed:
+            kept = [(count + 1, entry) for count, entry in failed if count + 1 < PUBLISH_MAX_ATTEMPTS]
+            retry.extend(kept)
+            retry_at = time.monotonic() + PUBLISH_RETRY_INTERVAL
+            if len(kept) < len(failed):
+                log.error("❌ %d annonces perdues après %d essais", len(failed) - len(kept), PUBLISH_MAX_ATTEMPTS)
+        if sent:
+            with published.get_lock():
+                published.value += len(sent)
+            reports.put([(announcement_id, zone, categories) for announcement_id, _, _, zone, categories in sent])
+
+
+def _publish_entries(attempts: List[Tuple[int, Tuple]], primary,
+                     router) -> Tuple[List[Tuple], List[Tuple[int, Tuple]]]:
+    """SET puis PUBLISH d'un lot [(essais, annonce)], un pipeline par nœud
+
+    Retourne (annonces publiées, [(essais, annonce)] en échec).
+    """
+    try:
+        # Annonces écrites avant d'être publiées: une réponse ne peut pas précéder son annonce
+        pipe = primary.pipeline(transaction=False)
+        for _, (announcement_id, _, message, _, _) in attempts:
+            pipe.set(ANNOUNCEMENT_KEY.format(announcement_id), message, ex=ANNOUNCEMENT_TTL_SECONDS)
+        pipe.execute()
+    except Exception as e:
+        log.error("❌ Erreur lors de l'écriture de %d annonces: %s", len(attempts), e)
+        return [], attempts
+
+    by_node: Dict[Optional[str], List[Tuple[int, Tuple]]] = {}
+    for attempt in attempts:
+        by_node.setdefault(attempt[1][1], []).append(attempt)
+    sent, failed = [], []
+    for node, node_attempts in by_node.items():
+        try:
+            pipe = (router.client(node) if node else primary).pipeline(transaction=False)
+            for _, (_, _, message, _, _) in node_attempts:
+                pipe.publish(CHANNELS['ORDER_ANNOUNCEMENT'], message)
+            pipe.execute()
+        except Exception as e:
+            log.error("❌ Erreur lors de la publication de %d annonces sur %s: %s",
+                      len(node_attempts), node or 'le nœud principal', e)
+            failed.extend(node_attempts)
+            continue
+        sent.extend(entry for _, entry in node_attempts)
+    return sent, failed
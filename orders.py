@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Commandes - Construction des commandes aléatoires et des annonces
+Partagé par le manager et les processus de génération (order_workers.py):
+ne dépend que du dataset (local, Redis ou mémoire partagée) et de l'index spatial.
+"""
+import math
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from models import Announcement, MenuItem, Order, Restaurant
+from spatial_index import zone_for
+
+# Frais de livraison fixes et part de la distance dans la compensation
+DELIVERY_FEE = 3.50
+COMPENSATION_PER_KM = 0.5
+
+STREET_NAMES = ["Main St", "Oak Ave", "Pine St", "Elm St", "Maple Ave"]
+
+
+def create_random_order(dataset, spatial_index, near: Optional[Tuple[float, float]] = None,
+                        radius_km: float = 2.0, match=None) -> Order:
+    """Crée une commande aléatoire
+
+    match: résultat de MenuIndex.query (plats ou cuisine demandés); le restaurant est
+    choisi parmi ses restaurants et les items parmi ses items correspondants.
+    """
+    restaurant, ranks = None, None
+    if match is not None and not match.empty:
+        # Restaurants correspondants dans la zone demandée; toute la sélection si aucun n'y est
+        if near is not None:
+            ids, _ = spatial_index.query_radius(near[0], near[1], radius_km)
+            nearby = match.restrict(ids)
+            match = match if nearby.empty else nearby
+        restaurant_id, ranks = match.sample()
+        restaurant = dataset.get_restaurant(restaurant_id)
+    elif near is not None:
+        # Sélectionner un restaurant aléatoire dans la zone demandée
+        ids, _ = spatial_index.query_radius(near[0], near[1], radius_km)
+        if len(ids):
+            restaurant = dataset.get_restaurant(int(random.choice(ids)))
+    if restaurant is None:
+        restaurant, ranks = dataset.random_restaurant(), None
+
+    # Sélectionner des items du menu (prix déjà typés depuis le chargement)
+    menu = dataset.menu_items(restaurant['id'])
+    if ranks is not None:
+        menu = [menu[rank] for rank in ranks.tolist() if rank < len(menu)]
+    items = [MenuItem.from_dict(item) for item in random.sample(menu, min(3, len(menu)))]
+    total_amount = sum(item.price for item in items)
+
+    # Générer une localisation client aléatoire
+    customer_lat, customer_lng, customer_address = generate_customer_location(
+        restaurant['lat'], restaurant['lng']
+    )
+
+    return Order(
+        order_id=str(uuid.uuid4()),
+        restaurant=Restaurant.from_dict(restaurant),
+        customer_address=customer_address,
+        customer_lat=customer_lat,
+        customer_lng=customer_lng,
+        items=items,
+        total_amount=total_amount,
+        delivery_fee=DELIVERY_FEE,
+        created_at=datetime.now().isoformat()
+    )
+
+
+def generate_customer_location(restaurant_lat, restaurant_lng, radius_km=5.0):
+    """Génère une localisation aléatoire pour un client"""
+    # Génération d'un angle et d'une distance aléatoires
+    angle = random.uniform(0, 2 * math.pi)
+    distance_km = random.uniform(0.5, radius_km)
+
+    # Conversion de la distance en degrés
+    lat_offset = (distance_km / 111.0) * math.cos(angle)
+    lng_offset = (distance_km / (111.0 * math.cos(math.radians(restaurant_lat)))) * math.sin(angle)
+
+    customer_lat = restaurant_lat + lat_offset
+    customer_lng = restaurant_lng + lng_offset
+
+    # Génération d'une adresse fictive
+    street_number = random.randint(100, 9999)
+    street_name = random.choice(STREET_NAMES)
+    customer_address = f"{street_number} {street_name}, Birmingham, AL"
+
+    return customer_lat, customer_lng, customer_address
+
+
+def calculate_distance(lat1, lng1, lat2, lng2):
+    """Calcule la distance entre deux points en kilomètres"""
+    R = 6371  # Rayon de la Terre en km
+
+    lat1_rad = math.radians(lat1)
+    lng1_rad = math.radians(lng1)
+    lat2_rad = math.radians(lat2)
+    lng2_rad = math.radians(lng2)
+
+    dlat = lat2_rad - lat1_rad
+    dlng = lng2_rad - lng1_rad
+
+    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlng/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+
+    return R * c
+
+
+def build_announcement(order: Order, surge: Dict[str, float], trace: Optional[Dict] = None) -> Announcement:
+    """Annonce d'une commande: distance, zone et compensation majorée par le surge de la zone
+
+    surge: zone -> multiplicateur (ZoneTracker.surge), 1.0 pour une zone absente.
+    """
+    restaurant = order.restaurant
+    distance = calculate_distance(restaurant.lat, restaurant.lng, order.customer_lat, order.customer_lng)
+    zone = zone_for(restaurant.lat, restaurant.lng)
+    multiplier = surge.get(zone, 1.0)
+    compensation = (order.delivery_fee + (distance * COMPENSATION_PER_KM)) * multiplier
+
+    return Announcement(
+        announcement_id=str(uuid.uuid4()),
+        order=order,
+        pickup_location=restaurant.address,
+        delivery_location=order.customer_address,
+        compensation=round(compensation, 2),
+        estimated_distance=round(distance, 2),
+        zone=zone,
+        surge_multiplier=multiplier,
+        created_at=datetime.now().isoformat(),
+        trace=trace
+    )
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Profilage à chaud - Échantillonnage CPU de tous les threads et snapshots tracemalloc
+Démarré et arrêté depuis les REPL (commande 'p') ou Streamlit, sans redémarrer le processus.
+Les résultats sont écrits dans PROFILE_DIR:
+    profile-<horodatage>.collapsed  piles agrégées (format flamegraph)
+    profile-<horodatage>.txt        résumé des fonctions chaudes
+    memory-<horodatage>.txt         allocations (tracemalloc) et différence depuis le début
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Dossier des résultats
+PROFILE_DIR = 'profiles'
+
+# Intervalle d'échantillonnage (secondes)
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+# Fonctions suivies en priorité dans le résumé
+FOCUS_FUNCTIONS = (
+    '_create_random_order',
+    '_process_delivery_response',
+    '_listen_for_responses',
+    '_listen_for_announcements',
+    '_listen_for_notifications',
+)
+
+# Fonctions feuilles où un thread attend (socket, verrou, sommeil): échantillon inactif
+IDLE_LEAF_FUNCTIONS = {
+    'select', 'poll', 'wait', 'recv', 'recv_into', 'readline', 'read', 'accept',
+    'sleep', '_wait_for', 'can_read', 'get', 'input', '_read_from_socket',
+}
+
+# Nombre de lignes des résumés
+TOP_N = 20
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfilingSession:
+    """Session de profilage: échantillonneur CPU + tracemalloc"""
+
+    def __init__(self, sample_interval: float = DEFAULT_SAMPLE_INTERVAL, output_dir: str = PROFILE_DIR):
+        self.sample_interval = sample_interval
+        self.output_dir = output_dir
+        self.running = False
+        self.sampler_thread = None
+        self.started_at = None
+        self.stacks = Counter()       # pile complète -> échantillons
+        self.self_samples = Counter()  # fonction feuille -> échantillons actifs
+        self.total_samples = Counter()  # fonction présente dans la pile -> échantillons actifs
+        self.sample_count = 0
+        self.idle_count = 0
+        self.memory_start = None
+        self.started_tracemalloc = False
+
+    def start(self):
+        """Démarre l'échantillonnage et la traçe des allocations"""
+        self.running = True
+        self.started_at = datetime.now()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self.started_tracemalloc = True
+        self.memory_start = tracemalloc.take_snapshot()
+
+        self.sampler_thread = threading.Thread(target=self._sample_loop)
+        self.sampler_thread.daemon = True
+        self.sampler_thread.start()
+
+    def stop(self) -> Dict:
+        """Arrête la session, écrit les fichiers et retourne le résumé"""
+        self.running = False
+        if self.sampler_thread:
+            self.sampler_thread.join(timeout=5)
+
+        memory_end = tracemalloc.take_snapshot()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = self.started_at.strftime('%Y%m%d-%H%M%S')
+        paths = {
+            'collapsed': os.path.join(self.output_dir, f'profile-{stamp}.collapsed'),
+            'summary': os.path.join(self.output_dir, f'profile-{stamp}.txt'),
+            'memory': os.path.join(self.output_dir, f'memory-{stamp}.txt'),
+        }
+
+        with open(paths['collapsed'], 'w') as collapsed_file:
+            for stack, count in self.stacks.most_common():
+                collapsed_file.write(f"{stack} {count}\n")
+
+        summary_lines = self.summary_lines()
+        with open(paths['summary'], 'w') as summary_file:
+            summary_file.write('\n'.join(summary_lines) + '\n')
+
+        with open(paths['memory'], 'w') as memory_file:
+            memory_file.write('\n'.join(_memory_lines(memory_end, self.memory_start)) + '\n')
+
+        return {'paths': paths, 'summary': summary_lines}
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while self.running:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self._record(frame)
+            time.sleep(self.sample_interval)
+
+    def _record(self, frame):
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        labels.reverse()
+
+        self.sample_count += 1
+        leaf_name = labels[-1].split(' ', 1)[0]
+        if leaf_name in IDLE_LEAF_FUNCTIONS:
+            self.idle_count += 1
+            self.stacks[';'.join(labels) + ';[inactif]'] += 1
+            return
+
+        self.stacks[';'.join(labels)] += 1
+        self.self_samples[labels[-1]] += 1
+        for label in set(labels):
+            self.total_samples[label] += 1
+
+    def summary_lines(self) -> List[str]:
+        """Résumé texte: fonctions chaudes et fonctions suivies"""
+        active = max(1, self.sample_count - self.idle_count)
+        lines = [
+            f"Profil du {self.started_at:%Y-%m-%d %H:%M:%S} - {self.sample_count} échantillons "
+            f"({self.idle_count} inactifs, intervalle {self.sample_interval * 1000:g} ms)",
+            "",
+            f"Top {TOP_N} - temps propre (échantillons actifs)",
+        ]
+        for label, count in self.self_samples.most_common(TOP_N):
+            lines.append(f"  {count / active:6.1%}  {label}")
+
+        lines += ["", f"Top {TOP_N} - temps inclusif"]
+        for label, count in self.total_samples.most_common(TOP_N):
+            lines.append(f"  {count / active:6.1%}  {label}")
+
+        lines += ["", "Fonctions suivies (temps inclusif, et leurs appels les plus chauds)"]
+        for function in FOCUS_FUNCTIONS:
+            matching = [(label, count) for label, count in self.total_samples.items()
+                        if label.split(' ', 1)[0] == function]
+            if not matching:
+                lines.append(f"  {function}: aucun échantillon actif")
+                continue
+            for label, count in matching:
+                lines.append(f"  {count / active:6.1%}  {label}")
+                for callee, callee_count in self._hot_callees(label)[:5]:
+                    lines.append(f"      {callee_count / active:6.1%}  {callee}")
+        return lines
+
+    def _hot_callees(self, label: str):
+        """Fonctions feuilles les plus fréquentes sous une fonction donnée"""
+        callees = Counter()
+        for stack, count in self.stacks.items():
+            if stack.endswith(';[inactif]'):
+                continue
+            frames = stack.split(';')
+            if label in frames[:-1]:
+                callees[frames[-1]] += count
+        return callees.most_common()
+
+
+def _memory_lines(snapshot, baseline=None) -> List[str]:
+    lines = [f"Top {TOP_N} - allocations par ligne"]
+    for stat in snapshot.statistics('lineno')[:TOP_N]:
+        lines.append(f"  {stat.size / 1024:10.1f} Ko  {stat.count:8d} blocs  {stat.traceback}")
+    if baseline is not None:
+        lines += ["", f"Top {TOP_N} - croissance depuis le début de la session"]
+        for stat in snapshot.compare_to(baseline, 'lineno')[:TOP_N]:
+            lines.append(f"  {stat.size_diff / 1024:+10.1f} Ko  {stat.count_diff:+8d} blocs  {stat.traceback}")
+    return lines
+
+
+# Session active du processus (une seule à la fois)
+_active_session: Optional[ProfilingSession] = None
+_session_lock = threading.Lock()
+
+
+def is_profiling() -> bool:
+    return _active_session is not None
+
+
+def start_profiling(**kwargs) -> bool:
+    """Démarre la session du processus, False si une session est déjà active"""
+    global _active_session
+    with _session_lock:
+        if _active_session is not None:
+            return False
+        _active_session = ProfilingSession(**kwargs)
+        _active_session.start()
+        return True
+
+
+def stop_profiling() -> Optional[Dict]:
+    """Arrête la session du processus et retourne son résumé"""
+    global _active_session
+    with _session_lock:
+        session, _active_session = _active_session, None
+    if session is None:
+        return None
+    return session.stop()
+
+
+def toggle_profiling():
+    """Commande REPL: démarre ou arrête le profilage et affiche le résumé"""
+    if not is_profiling():
+        start_profiling()
+        print("🔬 Profilage démarré (CPU tous threads + tracemalloc) - 'p' pour arrêter")
+        return
+
+    result = stop_profiling()
+    print(f"\n{'='*60}")
+    print(f"🔬 PROFILAGE TERMINÉ")
+    print(f"{'='*60}")
+    for line in result['summary']:
+        print(line)
+    print(f"{'='*60}")
+    for kind, path in result['paths'].items():
+        print(f"💾 {kind}: {path}")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Connexions Redis - Pools partagés et écoute Pub/Sub résistante aux coupures
+Tous les clients d'un processus vers un même Redis partagent un pool
+(connexions vérifiées par PING après inactivité, commandes rejouées avec
+backoff sur erreur réseau). Les boucles d'écoute se reconnectent avec un
+backoff exponentiel, se réabonnent et signalent la durée de la coupure.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+
+from console import get_logger
+from metrics import REGISTRY
+
+# Configuration Redis
+REDIS_HOST = 'localhost'
+REDIS_PORT = 6379
+REDIS_DB = 0
+
+# Pool: PING avant réutilisation d'une connexion inactive depuis plus de N secondes
+HEALTH_CHECK_INTERVAL = 15
+SOCKET_CONNECT_TIMEOUT = 5.0
+MAX_CONNECTIONS = 64
+
+# Commandes: 3 nouvelles tentatives sur erreur réseau (50 ms, 100 ms, 200 ms...)
+COMMAND_RETRIES = 3
+
+# Reconnexion des listeners: backoff exponentiel avec gigue
+RECONNECT_BACKOFF_INITIAL = 0.1
+RECONNECT_BACKOFF_MAX = 10.0
+
+LISTEN_TIMEOUT = 1.0
+
+log = get_logger('redis')
+
+PUBSUB_RECONNECTS_TOTAL = REGISTRY.counter('dispatch_pubsub_reconnects_total', 'Reconnexions des listeners Pub/Sub')
+PUBSUB_GAP_SECONDS = REGISTRY.histogram('dispatch_pubsub_gap_seconds', 'Durée des coupures Pub/Sub')
+PUBSUB_DISCONNECTED = REGISTRY.gauge('dispatch_pubsub_disconnected', 'Listeners Pub/Sub actuellement déconnectés')
+LISTENER_ERRORS_TOTAL = REGISTRY.counter('dispatch_errors_total', 'Erreurs du pipeline', {'component': 'listener'})
+
+_pools: Dict[Tuple, redis.ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str = REDIS_HOST, port: int = REDIS_PORT, db: int = REDIS_DB,
+             decode_responses: bool = True) -> redis.ConnectionPool:
+    """Pool partagé du processus pour un Redis donné"""
+    key = (host, port, db, decode_responses)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = redis.ConnectionPool(
+                host=host, port=port, db=db, decode_responses=decode_responses,
+                max_connections=MAX_CONNECTIONS,
+                health_check_interval=HEALTH_CHECK_INTERVAL,
+                socket_connect_timeout=SOCKET_CONNECT_TIMEOUT,
+                socket_keepalive=True,
+                retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), COMMAND_RETRIES),
+                retry_on_error=[redis.ConnectionError, redis.TimeoutError]
+            )
+        return pool
+
+
+def get_client(host: str = REDIS_HOST, port: int = REDIS_PORT, db: int = REDIS_DB,
+               decode_responses: bool = True) -> redis.Redis:
+    """Client Redis adossé au pool partagé"""
+    return redis.Redis(connection_pool=get_pool(host, port, db, decode_responses))
+
+
+def listen(redis_client, channels: Iterable[str], handler: Callable[[Dict], None],
+           is_running: Callable[[], bool], name: str = 'listener',
+           on_reconnect: Optional[Callable[[float], None]] = None,
+           on_idle: Optional[Callable[[], None]] = None):
+    """Boucle d'écoute Pub/Sub qui survit aux coupures
+
+    handler(message) est appelé pour chaque message publié; une erreur de handler
+    est journalisée et comptée sans arrêter l'écoute. on_idle() est appelé quand
+    aucun message n'arrive pendant LISTEN_TIMEOUT. Après une coupure, la boucle se reconnecte
+    (backoff exponentiel), se réabonne puis appelle on_reconnect(durée_coupure).
+    """
+    channels = list(channels)
+    backoff = RECONNECT_BACKOFF_INITIAL
+    disconnected_at = None
+
+    while is_running():
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(*channels)
+            if disconnected_at is not None:
+                gap = time.monotonic() - disconnected_at
+                disconnected_at = None
+                backoff = RECONNECT_BACKOFF_INITIAL
+                PUBSUB_DISCONNECTED.dec()
+                PUBSUB_RECONNECTS_TOTAL.inc()
+                PUBSUB_GAP_SECONDS.observe(gap)
+                log.warning("🔌 %s: reconnecté et réabonné après %.1f s de coupure", name, gap)
+                if on_reconnect:
+                    on_reconnect(gap)
+
+            while is_running():
+                message = pubsub.get_message(timeout=LISTEN_TIMEOUT)
+                if message is not None and message['type'] == 'message':
+                    _call_safely(handler, name, message)
+                elif message is None and on_idle:
+                    _call_safely(on_idle, name)
+
+        except (redis.ConnectionError, redis.TimeoutError, OSError) as e:
+            if disconnected_at is None:
+                disconnected_at = time.monotonic()
+                PUBSUB_DISCONNECTED.inc()
+                log.warning("⚠️ %s: connexion Redis perdue (%s), reconnexion...", name, e)
+            # Gigue: les listeners d'un même processus ne se reconnectent pas tous ensemble
+            _sleep_while_running(backoff * random.uniform(0.5, 1.0), is_running)
+            backoff = min(RECONNECT_BACKOFF_MAX, backoff * 2)
+        finally:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+
+    if disconnected_at is not None:
+        PUBSUB_DISCONNECTED.dec()
+
+
+def _call_safely(callback: Callable, name: str, *args):
+    """Appelle un rappel du listener; ses erreurs (même réseau) ne coupent pas l'abonnement"""
+    try:
+        callback(*args)
+    except Exception as e:
+        LISTENER_ERRORS_TOTAL.inc()
+        log.error("❌ %s: erreur lors du traitement d'un message: %s", name, e)
+
+
+def _sleep_while_running(seconds: float, is_running: Callable[[], bool]):
+    """Attente interrompue dès que la boucle doit s'arrêter"""
+    deadline = time.monotonic() + seconds
+    while is_running() and time.monotonic() < deadline:
+        time.sleep(max(0.0, min(0.1, deadline - time.monotonic())))
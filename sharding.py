@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Répartition du dispatch sur plusieurs nœuds Redis par zone
+Chaque zone (spatial_index.zone_for) est attribuée à un nœud par hachage
+cohérent: annonces, réponses, sélections et notifications d'une zone passent
+par le Pub/Sub de ce nœud. Ajouter un nœud ne déplace qu'environ 1/N des zones.
+Les annonces portent le nœud qui les a publiées ('shard'): réponses et
+notifications y reviennent, même si l'anneau change pendant leur traitement.
+
+Les autres données (dataset, zones, gains, analytique) restent sur le nœud principal.
+
+Configuration: DISPATCH_SHARDS="localhost:6379,localhost:6380/0" (hôte:port[/db]).
+Zones écoutées par un livreur: sa position (zone et voisines), ou COURIER_ZONES,
+soit une liste de zones ("z1508:-4690,z1508:-4689"), soit une position ("33.52,-86.81").
+
+Exemples:
+    python3 sharding.py --plan localhost:6379 localhost:6380 --add localhost:6381
+    python3 sharding.py --demo 3
+"""
+import argparse
+import bisect
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from redis_connections import get_client
+from spatial_index import DEFAULT_ZONE_KM, KM_PER_DEG_LAT, zone_for, zones_near
+
+# Variable d'environnement listant les nœuds
+SHARDS_ENV = 'DISPATCH_SHARDS'
+COURIER_ZONES_ENV = 'COURIER_ZONES'
+
+# Points virtuels par nœud (équilibre de la répartition)
+DEFAULT_REPLICAS = 128
+
+
+def parse_node(spec: str) -> Tuple[str, int, int]:
+    """'hôte:port[/db]' -> (hôte, port, db)"""
+    address, _, db = spec.strip().partition('/')
+    host, _, port = address.rpartition(':')
+    return host or 'localhost', int(port), int(db or 0)
+
+
+def courier_zones(position: Optional[Tuple[float, float]] = None,
+                  radius_km: float = DEFAULT_ZONE_KM) -> Optional[List[str]]:
+    """Zones écoutées par un livreur: COURIER_ZONES si définie, sinon celles autour
+    de sa position; None (tous les nœuds) sans l'un ni l'autre"""
+    spec = os.environ.get(COURIER_ZONES_ENV, '').strip()
+    if spec:
+        values = [value.strip() for value in spec.split(',') if value.strip()]
+        if all(value.startswith('z') for value in values):
+            return values
+        try:
+            lat, lng = (float(value) for value in values)
+        except ValueError:
+            raise ValueError(f"{COURIER_ZONES_ENV} invalide: {spec!r} "
+                             f"(zones 'z<ligne>:<colonne>,...' ou position 'lat,lng')") from None
+        return zones_near(lat, lng, radius_km)
+    if position is not None:
+        return zones_near(position[0], position[1], radius_km)
+    return None
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class ConsistentHashRing:
+    """Anneau de hachage cohérent avec points virtuels"""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = DEFAULT_REPLICAS):
+        self.replicas = replicas
+        self.points: List[int] = []
+        self.owners: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(set(self.owners))
+
+    def add_node(self, node: str):
+        if node in self.owners:
+            return
+        for replica in range(self.replicas):
+            point = _hash(f"{node}#{replica}")
+            position = bisect.bisect(self.points, point)
+            self.points.insert(position, point)
+            self.owners.insert(position, node)
+
+    def remove_node(self, node: str):
+        kept = [(point, owner) for point, owner in zip(self.points, self.owners) if owner != node]
+        self.points = [point for point, _ in kept]
+        self.owners = [owner for _, owner in kept]
+
+    def node_for(self, key: str) -> str:
+        if not self.points:
+            raise ValueError("Anneau vide: aucun nœud Redis configuré")
+        position = bisect.bisect(self.points, _hash(key)) % len(self.points)
+        return self.owners[position]
+
+
+class ShardRouter:
+    """Zone -> nœud Redis, connexions ouvertes seulement vers les nœuds utilisés"""
+
+    def __init__(self, nodes: Iterable[str], replicas: int = DEFAULT_REPLICAS,
+                 client_factory: Optional[Callable[[str], object]] = None):
+        self.node_list = list(dict.fromkeys(nodes))  # ordre de configuration, le premier est principal
+        self.ring = ConsistentHashRing(self.node_list, replicas)
+        self.client_factory = client_factory or _default_client
+        self.clients: Dict[str, object] = {}
+        self.lock = threading.Lock()
+        # Abonnés: [rappel, zones ou None pour toutes, nœuds déjà signalés]
+        self.subscriptions: List[list] = []
+
+    @classmethod
+    def from_env(cls) -> Optional['ShardRouter']:
+        """Routeur défini par DISPATCH_SHARDS, None si la variable est absente (un seul Redis)"""
+        specs = [spec for spec in os.environ.get(SHARDS_ENV, '').split(',') if spec.strip()]
+        return cls([spec.strip() for spec in specs]) if specs else None
+
+    @property
+    def nodes(self) -> List[str]:
+        with self.lock:
+            return list(self.node_list)
+
+    @property
+    def primary(self):
+        """Client du premier nœud configuré (données partagées hors Pub/Sub)"""
+        return self.client(self.nodes[0])
+
+    def node_for_zone(self, zone: Optional[str]) -> str:
+        with self.lock:
+            return self.ring.node_for(zone or '')
+
+    def nodes_for_zones(self, zones: Iterable[str]) -> Set[str]:
+        with self.lock:
+            return {self.ring.node_for(zone) for zone in zones}
+
+    def client(self, node: str):
+        with self.lock:
+            client = self.clients.get(node)
+            if client is None:
+                client = self.clients[node] = self.client_factory(node)
+            return client
+
+    def client_for_zone(self, zone: Optional[str]):
+        return self.client(self.node_for_zone(zone))
+
+    def subscribe_nodes(self, callback: Callable[[str], None], zones: Optional[Iterable[str]] = None) -> list:
+        """Appelle callback(nœud) pour chaque nœud nécessaire, maintenant et après chaque ajout
+
+        Sans zones, tous les nœuds sont nécessaires (manager, hub de livreurs sans position).
+        Retourne l'abonnement, à passer à update_zones quand les zones changent.
+        """
+        zones = set(zones) if zones is not None else None
+        subscription = [callback, zones, set()]
+        with self.lock:
+            self.subscriptions.append(subscription)
+        self._notify(subscription)
+        return subscription
+
+    def update_zones(self, subscription: list, zones: Optional[Iterable[str]]):
+        """Change les zones d'un abonnement (livreur qui se déplace): callback(nœud) pour
+        chaque nœud devenu nécessaire. Les nœuds déjà signalés restent écoutés, les
+        notifications des annonces qui y sont en cours arrivent encore (un listener par nœud au plus).
+        """
+        with self.lock:
+            subscription[1] = set(zones) if zones is not None else None
+        self._notify(subscription)
+
+    def add_node(self, node: str) -> float:
+        """Ajoute un nœud et retourne la part de l'anneau qu'il reprend"""
+        with self.lock:
+            if node in self.node_list:
+                return 0.0
+            self.node_list.append(node)
+            self.ring.add_node(node)
+            share = self._share(node)
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            self._notify(subscription)
+        return share
+
+    def remove_node(self, node: str):
+        """Retire un nœud: les nouvelles annonces de ses zones vont aux autres nœuds
+        (les annonces en cours terminent sur leur nœud d'origine)"""
+        with self.lock:
+            if node in self.node_list and len(self.node_list) > 1:
+                self.node_list.remove(node)
+                self.ring.remove_node(node)
+
+    def _share(self, node: str) -> float:
+        """Fraction de l'espace de hachage attribuée à un nœud: arcs se terminant
+        sur un de ses points (appelé sous verrou)"""
+        points, owners = self.ring.points, self.ring.owners
+        space = 1 << 64
+        owned = 0
+        for i, (point, owner) in enumerate(zip(points, owners)):
+            if owner == node:
+                owned += (point - points[i - 1]) % space if len(points) > 1 else space
+        return owned / space
+
+    def _notify(self, subscription):
+        # Nœuds marqués sous verrou: deux mises à jour simultanées ne signalent pas deux fois le même
+        with self.lock:
+            callback, zones, notified = subscription
+            needed = set(self.node_list) if zones is None else {self.ring.node_for(zone) for zone in zones}
+            added = sorted(needed - notified)
+            notified.update(added)
+        for node in added:
+            callback(node)
+
+
+def _default_client(node: str):
+    host, port, db = parse_node(node)
+    return get_client(host, port, db)
+
+
+def zone_grid(lat_min: float, lat_max: float, lng_min: float, lng_max: float) -> List[str]:
+    """Zones couvrant un rectangle de coordonnées"""
+    step = DEFAULT_ZONE_KM / KM_PER_DEG_LAT
+    zones = set()
+    lat = lat_min
+    while lat <= lat_max:
+        lng = lng_min
+        while lng <= lng_max:
+            zones.add(zone_for(lat, lng))
+            lng += step
+        lat += step
+    return sorted(zones)
+
+
+def print_plan(nodes: List[str], added: List[str], zones: List[str]):
+    """Répartition des zones par nœud et zones déplacées par l'ajout de nœuds"""
+    ring = ConsistentHashRing(nodes)
+    before = {zone: ring.node_for(zone) for zone in zones}
+    print(f"🗺️  {len(zones)} zones sur {len(nodes)} nœud(s)")
+    for node in ring.nodes:
+        print(f"   {node}: {sum(1 for owner in before.values() if owner == node)} zones")
+    for node in added:
+        ring.add_node(node)
+    if added:
+        after = {zone: ring.node_for(zone) for zone in zones}
+        moved = sum(1 for zone in zones if before[zone] != after[zone])
+        print(f"➕ Ajout de {', '.join(added)}: {moved} zones déplacées ({moved / len(zones):.0%})")
+        for node in ring.nodes:
+            print(f"   {node}: {sum(1 for owner in after.values() if owner == node)} zones")
+
+
+def run_demo(shard_count: int, couriers: int = 30, announcements: int = 60):
+    """Lance plusieurs redis-server locaux, un manager et des livreurs répartis par zone"""
+    from benchmarks.redis_backend import RedisServerProcess
+    from console import set_console_level
+    from livreur_redis import DeliveryPerson, EventHub
+    from manager_redis import DeliveryManager
+
+    if not RedisServerProcess.available():
+        print("❌ redis-server introuvable: la démonstration a besoin de vrais processus Redis")
+        return
+    set_console_level(logging.WARNING)
+    servers = [RedisServerProcess() for _ in range(shard_count + 1)]
+    for server in servers:
+        server.start()
+    try:
+        nodes = [f"127.0.0.1:{server.port}" for server in servers[:shard_count]]
+        router = ShardRouter(nodes)
+        manager = DeliveryManager(redis_client=router.primary, auto_select=True, selection_delay=0.5,
+                                  shard_router=router)
+        manager.start()
+        hub = EventHub(redis_client=router.primary, shard_router=router)
+        hub.start()
+        for i in range(couriers):
+            delivery_person = DeliveryPerson(f"demo-{i}", f"Démo {i}", hub=hub, auto_respond=True)
+            delivery_person.interest_probability = 1.0
+            delivery_person.start()
+        time.sleep(0.5)
+
+        half = announcements // 2
+        for _ in range(half):
+            manager.create_and_publish_announcement()
+        # Rééquilibrage: un nœud de plus pendant que des annonces sont en cours
+        new_node = f"127.0.0.1:{servers[-1].port}"
+        share = router.add_node(new_node)
+        print(f"➕ Nœud {new_node} ajouté: {share:.0%} de l'anneau")
+        for _ in range(announcements - half):
+            manager.create_and_publish_announcement()
+        deadline = time.monotonic() + 10
+        while manager.active_announcements and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        print(f"✅ {announcements - len(manager.active_announcements)}/{announcements} annonces attribuées")
+        for node in router.nodes:
+            info = router.client(node).info('stats')
+            print(f"   {node}: {info.get('total_commands_processed', 0)} commandes")
+        hub.stop()
+        manager.stop()
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Répartition des zones sur plusieurs nœuds Redis")
+    parser.add_argument('--plan', nargs='+', metavar='NODE', help="nœuds hôte:port[/db] actuels")
+    parser.add_argument('--add', nargs='*', default=[], metavar='NODE', help="nœuds ajoutés")
+    parser.add_argument('--demo', type=int, metavar='N', help="démonstration avec N redis-server locaux")
+    args = parser.parse_args()
+
+    if args.demo:
+        run_demo(args.demo)
+    elif args.plan:
+        # Zones autour de Birmingham (AL)
+        print_plan(args.plan, args.add, zone_grid(33.3, 33.7, -87.1, -86.5))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
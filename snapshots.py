@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Instantanés pour redémarrage à chaud - État en cours du manager et des livreurs
+L'état (annonces ouvertes, réponses, statistiques) est écrit périodiquement
+dans un fichier local, seulement s'il a changé depuis la dernière écriture.
+Les index dérivés du manager (dataset, index spatial) sont mis en cache à part,
+invalidés quand les CSV changent.
+
+Format: en-tête (magic, version, CRC32) + pickle compressé zlib.
+Écriture atomique: fichier temporaire dans le même dossier, fsync puis os.replace;
+un lecteur voit toujours l'ancien ou le nouvel instantané, jamais un fichier partiel.
+Les fichiers ne sont relus que par les scripts qui les ont écrits (pickle).
+"""
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+from console import get_logger
+
+# Dossier et fichiers par défaut
+SNAPSHOT_DIR = 'snapshots'
+DATASET_SNAPSHOT = 'dataset.snap'
+MENU_INDEX_SNAPSHOT = 'menu_index.snap'
+
+# Écriture au plus une fois par intervalle, et seulement si l'état a changé
+DEFAULT_SNAPSHOT_INTERVAL = 1.0
+
+# Un instantané plus ancien n'est pas restauré (annonces périmées)
+RESTORE_MAX_AGE_SECONDS = 900
+
+MAGIC = b'DSNAP'
+FORMAT_VERSION = 2  # 2: annonces et réponses en objets models.py (plus des dictionnaires)
+HEADER = struct.Struct('>5sBI')
+
+log = get_logger('snapshots')
+
+
+def snapshot_path(name: str, directory: str = SNAPSHOT_DIR) -> str:
+    """Chemin de l'instantané d'un composant (manager, courier-<nom>...)"""
+    safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+    return os.path.join(directory, f"{safe_name}.snap")
+
+
+def write_snapshot(path: str, state: Dict) -> int:
+    """Écrit un instantané de façon atomique, retourne sa taille en octets"""
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    data = HEADER.pack(MAGIC, FORMAT_VERSION, zlib.crc32(payload)) + payload
+
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.snap')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+    return len(data)
+
+
+def read_snapshot(path: str) -> Optional[Dict]:
+    """Relit un instantané, None s'il est absent, corrompu ou d'un autre format"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, version, checksum = HEADER.unpack_from(data)
+    payload = data[HEADER.size:]
+    if magic != MAGIC or version != FORMAT_VERSION or zlib.crc32(payload) != checksum:
+        log.warning("⚠️ Instantané ignoré (format ou somme de contrôle invalide): %s", path)
+        return None
+    return pickle.loads(zlib.decompress(payload))
+
+
+def source_signature(*paths: str) -> Tuple:
+    """Taille et date de modification des fichiers sources d'un cache"""
+    signature = []
+    for path in paths:
+        stat = os.stat(path)
+        signature.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+def load_cached(path: str, signature: Tuple, build: Callable[[], object]):
+    """Objet dérivé relu depuis le cache s'il correspond aux sources, reconstruit sinon"""
+    state = read_snapshot(path)
+    if state is not None and state.get('signature') == signature:
+        return state['value']
+    value = build()
+    try:
+        write_snapshot(path, {'signature': signature, 'value': value})
+    except Exception as e:
+        log.warning("⚠️ Cache non écrit (%s): %s", path, e)
+    return value
+
+
+class SnapshotWriter:
+    """Écrit l'instantané d'un composant en tâche de fond quand sa version change
+
+    version() est lue à chaque intervalle (un entier, sans copie); capture()
+    n'est appelée et l'état sérialisé que si elle diffère de la dernière écrite.
+    """
+
+    def __init__(self, path: str, capture: Callable[[], Dict], version: Callable[[], int],
+                 interval: float = DEFAULT_SNAPSHOT_INTERVAL):
+        self.path = path
+        self.capture = capture
+        self.version = version
+        self.interval = interval
+        self.written_version = None
+        self.last_size = 0
+        self.last_write_seconds = 0.0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Arrête le thread et écrit l'état final"""
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=5)
+        try:
+            self.write()
+        except Exception as e:
+            log.warning("⚠️ Instantané final non écrit (%s): %s", self.path, e)
+
+    def _run(self):
+        while self.running:
+            try:
+                self.write()
+            except Exception as e:
+                log.warning("⚠️ Instantané non écrit (%s): %s", self.path, e)
+            time.sleep(self.interval)
+
+    def write(self) -> bool:
+        version = self.version()
+        if version == self.written_version:
+            return False
+        start = time.perf_counter()
+        self.last_size = write_snapshot(self.path, dict(self.capture(), saved_at=time.time()))
+        self.last_write_seconds = time.perf_counter() - start
+        self.written_version = version
+        return True
+
+
+def restorable(state: Optional[Dict], max_age: float = RESTORE_MAX_AGE_SECONDS) -> bool:
+    """Vrai si l'instantané existe et n'est pas trop ancien pour être restauré"""
+    return state is not None and time.time() - state.get('saved_at', 0) <= max_age
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Index spatial - Grille uniforme sur lat/lng
+Recherche des restaurants dans un rayon et des k plus proches voisins
+"""
+import math
+import numpy as np
+from typing import List, Tuple
+
+# Rayon de la Terre en km
+EARTH_RADIUS_KM = 6371.0
+
+# Kilomètres par degré de latitude
+KM_PER_DEG_LAT = 111.0
+
+# Taille d'une cellule de la grille (en km le long d'un méridien)
+DEFAULT_CELL_KM = 1.0
+
+# Taille d'une zone de marché (suivi offre/demande, répartition entre managers)
+DEFAULT_ZONE_KM = 2.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distance en km entre deux points (scalaires ou tableaux numpy)"""
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlng = np.radians(lng2) - np.radians(lng1)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def zone_for(lat: float, lng: float, zone_km: float = DEFAULT_ZONE_KM) -> str:
+    """Identifiant de la zone (carré de la grille en degrés) contenant un point"""
+    zone_deg = zone_km / KM_PER_DEG_LAT
+    return f"z{math.floor(lat / zone_deg)}:{math.floor(lng / zone_deg)}"
+
+
+def zones_near(lat: float, lng: float, radius_km: float = DEFAULT_ZONE_KM,
+               zone_km: float = DEFAULT_ZONE_KM) -> List[str]:
+    """Zone d'un point et zones voisines touchées par un rayon autour de lui"""
+    zone_deg = zone_km / KM_PER_DEG_LAT
+    dlat = radius_km / KM_PER_DEG_LAT
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    rows = range(math.floor((lat - dlat) / zone_deg), math.floor((lat + dlat) / zone_deg) + 1)
+    columns = range(math.floor((lng - dlng) / zone_deg), math.floor((lng + dlng) / zone_deg) + 1)
+    return [f"z{row}:{column}" for row in rows for column in columns]
+
+
+class RestaurantSpatialIndex:
+    """Grille uniforme (cellules carrées en degrés) sur les coordonnées des restaurants
+
+    Les points sont triés par cellule: chaque ligne de cellules couverte par
+    une requête est une tranche contiguë des tableaux, trouvée par dichotomie.
+    Les degrés de longitude sont corrigés par la latitude à la requête, la
+    grille fonctionne donc pour plusieurs villes à la fois.
+    """
+
+    def __init__(self, ids, lats, lngs, cell_km: float = DEFAULT_CELL_KM):
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+
+        # Les coordonnées manquantes ne sont pas indexées
+        valid = np.isfinite(lats) & np.isfinite(lngs)
+        ids, lats, lngs = ids[valid], lats[valid], lngs[valid]
+
+        self.cell_deg = cell_km / KM_PER_DEG_LAT
+        rows = np.floor(lats / self.cell_deg).astype(np.int64)
+        cols = np.floor(lngs / self.cell_deg).astype(np.int64)
+
+        # Tri par cellule: une ligne de la grille est une suite contiguë de cellules
+        keys = self._cell_keys(rows, cols)
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = ids[order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+
+    @staticmethod
+    def _cell_keys(rows, cols):
+        """Clé entière (ligne, colonne) triable, colonne dans les bits de poids faible"""
+        return (np.asarray(rows, dtype=np.int64) << 32) + (np.asarray(cols, dtype=np.int64) + (1 << 31))
+
+    @classmethod
+    def from_dataset(cls, dataset, cell_km: float = DEFAULT_CELL_KM) -> 'RestaurantSpatialIndex':
+        """Construit l'index à partir d'un dataset (local ou Redis)"""
+        ids, lats, lngs = dataset.coordinates()
+        return cls(ids, lats, lngs, cell_km)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _candidates(self, lat: float, lng: float, radius_km: float) -> np.ndarray:
+        """Positions des points situés dans les cellules couvrant le rayon"""
+        dlat = radius_km / KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+        dlng = radius_km / (KM_PER_DEG_LAT * cos_lat)
+
+        row_min = math.floor((lat - dlat) / self.cell_deg)
+        row_max = math.floor((lat + dlat) / self.cell_deg)
+        col_min = math.floor((lng - dlng) / self.cell_deg)
+        col_max = math.floor((lng + dlng) / self.cell_deg)
+
+        # Fenêtre plus grande que le jeu de données: tous les points sont candidats
+        if row_max - row_min + 1 > len(self.keys):
+            return np.arange(len(self.keys))
+
+        # Une recherche dichotomique par ligne de la grille couverte
+        grid_rows = np.arange(row_min, row_max + 1, dtype=np.int64)
+        starts = np.searchsorted(self.keys, self._cell_keys(grid_rows, col_min), side='left')
+        ends = np.searchsorted(self.keys, self._cell_keys(grid_rows, col_max), side='right')
+
+        ranges = [np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist()) if end > start]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(ranges)
+
+    def query_radius(self, lat: float, lng: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Restaurants à moins de radius_km, triés par distance: (ids, distances)"""
+        positions = self._candidates(lat, lng, radius_km)
+        distances = haversine_km(lat, lng, self.lats[positions], self.lngs[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+
+        order = np.argsort(distances, kind='stable')
+        return self.ids[positions[order]], distances[order]
+
+    def query_knn(self, lat: float, lng: float, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Les k restaurants les plus proches, triés par distance: (ids, distances)"""
+        if k <= 0 or not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, len(self.ids))
+
+        # Rayon de recherche doublé jusqu'à trouver k voisins dans le cercle couvert
+        radius_km = self.cell_deg * KM_PER_DEG_LAT
+        while True:
+            ids, distances = self.query_radius(lat, lng, radius_km)
+            if len(ids) >= k:
+                return ids[:k], distances[:k]
+            if radius_km >= 2 * math.pi * EARTH_RADIUS_KM:
+                return ids, distances
+            radius_km *= 2
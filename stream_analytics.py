@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Analytique en flux - Statistiques approximatives à mémoire bornée
+Alimentée par l'écoute des réponses du manager, sans garder les réponses:
+    CountMinSketch  réponses et intérêts par restaurant (taux d'acceptation)
+    TopK            catégories les plus commandées, restaurants les plus demandés
+    HyperLogLog     livreurs uniques par zone (PFADD/PFCOUNT dans Redis, partagé
+                    entre managers, ~12 Ko par zone quel que soit le nombre de livreurs)
+Les compteurs sont divisés par deux toutes les DECAY_SECONDS: les classements
+reflètent l'activité récente.
+
+Clés Redis:
+    analytics:zones                 ZSET zone -> dernier événement
+    analytics:couriers:all          HLL de tous les livreurs ayant répondu
+    analytics:couriers:zone:{zone}  HLL des livreurs ayant répondu dans la zone
+"""
+import threading
+import time
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from console import get_logger
+from models import Order, Restaurant
+
+# Dimensions des structures (erreur du sketch ~ e / largeur × total, avec probabilité 1 - e^-profondeur)
+DEFAULT_WIDTH = 2048
+DEFAULT_DEPTH = 4
+DEFAULT_TOP_K = 20
+DEFAULT_FLUSH_INTERVAL = 1.0
+DECAY_SECONDS = 600
+COURIER_KEY_TTL = 24 * 3600
+
+ZONES_KEY = 'analytics:zones'
+ALL_COURIERS_KEY = 'analytics:couriers:all'
+ZONE_COURIERS_KEY = 'analytics:couriers:zone:{}'
+
+log = get_logger('analytics')
+
+
+class CountMinSketch:
+    """Compteurs approximatifs par clé (jamais sous-estimés), mémoire fixe"""
+
+    def __init__(self, width: int = DEFAULT_WIDTH, depth: int = DEFAULT_DEPTH):
+        self.width = width
+        self.rows = [array('d', bytes(8 * width)) for _ in range(depth)]
+
+    def _columns(self, key):
+        # Double hachage: h1 + i * h2 pour chaque ligne
+        h1 = hash(key)
+        h2 = hash((key, 'cms')) | 1
+        return [(h1 + i * h2) % self.width for i in range(len(self.rows))]
+
+    def add(self, key, count: float = 1.0):
+        for row, column in zip(self.rows, self._columns(key)):
+            row[column] += count
+
+    def estimate(self, key) -> float:
+        return min(row[column] for row, column in zip(self.rows, self._columns(key)))
+
+    def decay(self, factor: float = 0.5):
+        for i, row in enumerate(self.rows):
+            self.rows[i] = array('d', (value * factor for value in row))
+
+
+class TopK:
+    """Éléments les plus fréquents (algorithme Space-Saving, au plus `capacity` compteurs)"""
+
+    def __init__(self, capacity: int = DEFAULT_TOP_K):
+        self.capacity = capacity
+        self.counts: Dict = {}
+
+    def add(self, key, count: float = 1.0):
+        if key in self.counts or len(self.counts) < self.capacity:
+            self.counts[key] = self.counts.get(key, 0.0) + count
+            return
+        # Remplace le plus petit compteur (sa valeur borne l'erreur du nouveau venu)
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[key] = self.counts.pop(smallest) + count
+
+    def top(self, count: int) -> List[tuple]:
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:count]
+
+    def decay(self, factor: float = 0.5):
+        self.counts = {key: value * factor for key, value in self.counts.items() if value * factor >= 0.5}
+
+
+class StreamAnalytics:
+    """Statistiques par restaurant, zone et catégorie, mises à jour en O(1) par événement"""
+
+    def __init__(self, redis_client=None, width: int = DEFAULT_WIDTH, depth: int = DEFAULT_DEPTH,
+                 top_k: int = DEFAULT_TOP_K, flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 decay_seconds: float = DECAY_SECONDS):
+        self.redis_client = redis_client
+        self.flush_interval = flush_interval
+        self.decay_seconds = decay_seconds
+
+        self.lock = threading.Lock()
+        self.responses = CountMinSketch(width, depth)
+        self.interested = CountMinSketch(width, depth)
+        self.categories = TopK(top_k)
+        self.restaurants = TopK(top_k)  # (id, nom) -> réponses intéressées
+        self.pending_couriers: Dict[str, Set[str]] = defaultdict(set)  # zone -> livreurs à pousser
+        self.last_decay = time.time()
+
+        self.running = False
+        self.flush_thread = None
+
+    def start(self):
+        self.running = True
+        self.flush_thread = threading.Thread(target=self._run)
+        self.flush_thread.daemon = True
+        self.flush_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.flush_thread:
+            self.flush_thread.join(timeout=5)
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    # --- Événements ---
+
+    def order_published(self, order: Order):
+        """Catégories des articles d'une commande annoncée"""
+        self.categories_published([item.category for item in order.items])
+
+    def categories_published(self, categories: Iterable[str]):
+        """Catégories des articles d'une annonce publiée ailleurs (processus de génération)"""
+        with self.lock:
+            for category in categories:
+                self.categories.add(category)
+
+    def response(self, zone: Optional[str], restaurant: Restaurant, delivery_person_id: str, is_interested: bool):
+        """Réponse d'un livreur à une annonce"""
+        with self.lock:
+            self.responses.add(restaurant.id)
+            if is_interested:
+                self.interested.add(restaurant.id)
+                self.restaurants.add((restaurant.id, restaurant.name))
+            self.pending_couriers[zone or 'unknown'].add(delivery_person_id)
+
+    # --- Requêtes ---
+
+    def acceptance(self, restaurant_id) -> Dict:
+        """Réponses, intérêts et taux d'acceptation estimés d'un restaurant"""
+        with self.lock:
+            responses = self.responses.estimate(restaurant_id)
+            interested = min(self.interested.estimate(restaurant_id), responses)
+        return {
+            'responses': round(responses),
+            'interested': round(interested),
+            'acceptance_rate': round(interested / responses, 3) if responses else None
+        }
+
+    def top_categories(self, count: int = 5) -> List[Dict]:
+        with self.lock:
+            top = self.categories.top(count)
+        return [{'category': category, 'count': round(value)} for category, value in top]
+
+    def top_restaurants(self, count: int = 5) -> List[Dict]:
+        """Restaurants les plus demandés par les livreurs, avec leur taux d'acceptation"""
+        with self.lock:
+            top = self.restaurants.top(count)
+        return [dict(self.acceptance(restaurant_id), restaurant_id=restaurant_id, name=name)
+                for (restaurant_id, name), _ in top]
+
+    def unique_couriers(self, count: int = 5) -> Dict:
+        """Livreurs uniques (flotte et zones les plus récentes), lus avec PFCOUNT"""
+        if self.redis_client is None:
+            return {'all': None, 'zones': {}}
+        zones = [_decode(zone) for zone in self.redis_client.zrevrange(ZONES_KEY, 0, count - 1)]
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.pfcount(ALL_COURIERS_KEY)
+        for zone in zones:
+            pipe.pfcount(ZONE_COURIERS_KEY.format(zone))
+        results = pipe.execute()
+        return {'all': results[0], 'zones': dict(zip(zones, results[1:]))}
+
+    def summary(self, count: int = 5) -> Dict:
+        return {
+            'categories': self.top_categories(count),
+            'restaurants': self.top_restaurants(count),
+            'couriers': self.unique_couriers(count)
+        }
+
+    # --- Thread de fond ---
+
+    def _run(self):
+        while self.running:
+            try:
+                self.flush()
+            except Exception as e:
+                log.warning("⚠️ Analytique: envoi vers Redis impossible (%s)", e)
+            if time.time() - self.last_decay >= self.decay_seconds:
+                with self.lock:
+                    for structure in (self.responses, self.interested, self.categories, self.restaurants):
+                        structure.decay()
+                self.last_decay = time.time()
+            time.sleep(self.flush_interval)
+
+    def flush(self):
+        """Pousse les livreurs vus depuis le dernier envoi dans les HyperLogLog Redis"""
+        with self.lock:
+            pending, self.pending_couriers = self.pending_couriers, defaultdict(set)
+        if not pending or self.redis_client is None:
+            return
+        now = time.time()
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            everyone = set()
+            for zone, couriers in pending.items():
+                key = ZONE_COURIERS_KEY.format(zone)
+                pipe.pfadd(key, *couriers)
+                pipe.expire(key, COURIER_KEY_TTL)
+                everyone |= couriers
+            pipe.pfadd(ALL_COURIERS_KEY, *everyone)
+            pipe.zadd(ZONES_KEY, {zone: now for zone in pending})
+            pipe.zremrangebyscore(ZONES_KEY, 0, now - COURIER_KEY_TTL)
+            pipe.execute()
+        except Exception:
+            # Livreurs gardés pour le prochain essai
+            with self.lock:
+                for zone, couriers in pending.items():
+                    self.pending_couriers[zone] |= couriers
+            raise
+
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value
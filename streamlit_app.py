@@ -8,12 +8,22 @@ import streamlit as st
 import threading
 import time
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 # Importer nos classes existantes
-from manager_redis import DeliveryManager
-from livreur_redis import DeliveryPerson
+from manager_redis import DeliveryManager, REDIS_HOST, REDIS_PORT, REDIS_DB
+from livreur_redis import DeliveryPerson, EventHub
+from history_mongo import create_history_sink
+from metrics import REGISTRY, start_metrics_server
+from profiling import is_profiling, start_profiling, stop_profiling
+from zone_tracker import ZoneTracker
+from earnings_ledger import EarningsLedger
+from stream_analytics import StreamAnalytics
+from snapshots import snapshot_path
+from sharding import ShardRouter, courier_zones
+from dataset_partitions import dataset_from_env
+from batching_publisher import BatchingPublisher
+from redis_connections import get_client
 
 # Configuration de la page
 st.set_page_config(
@@ -60,52 +70,104 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Rafraîchissement automatique des sections et taille des pages
+REFRESH_SECONDS = 2
+PAGE_SIZE = 20
+
+# Âge maximal de la vue du monitoring (gains et analytique écrits par d'autres processus)
+MONITORING_MAX_AGE_SECONDS = 10
+
+@st.cache_resource
+def get_metrics_port():
+    """Démarre une seule fois l'endpoint Prometheus du processus Streamlit"""
+    return start_metrics_server()
+
+@st.cache_resource
+def get_shard_router():
+    """Répartition par zone (DISPATCH_SHARDS), None avec un seul Redis"""
+    return ShardRouter.from_env()
+
+@st.cache_resource
+def get_manager():
+    """Manager unique du processus, partagé par toutes les sessions du navigateur"""
+    shard_router = get_shard_router()
+    if shard_router:
+        redis_client = shard_router.primary
+    else:
+        redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+    zone_tracker = ZoneTracker(redis_client)
+    zone_tracker.start()
+    analytics = StreamAnalytics(redis_client)
+    analytics.start()
+    publisher = BatchingPublisher(redis_client)
+    publisher.start()
+    manager = DeliveryManager(dataset=dataset_from_env(), history_sink=create_history_sink(),
+                              redis_client=redis_client, zone_tracker=zone_tracker,
+                              earnings_ledger=EarningsLedger(redis_client),
+                              analytics=analytics, snapshot_path=snapshot_path('streamlit-manager'),
+                              shard_router=shard_router, publisher=publisher)
+    manager.start()
+    return manager
+
+@st.cache_resource
+def get_event_hub():
+    """Hub d'événements unique: une connexion Pub/Sub et un thread pour tous les livreurs"""
+    hub = EventHub(shard_router=get_shard_router())
+    hub.start()
+    return hub
+
 class StreamlitDeliverySystem:
     """Système de livraison avec interface Streamlit unifiée"""
     
     def __init__(self):
-        # Initialiser les sessions
+        # Manager et livreurs sont partagés par le processus (st.cache_resource)
         if 'manager' not in st.session_state:
             st.session_state.manager = None
-        if 'delivery_persons' not in st.session_state:
-            st.session_state.delivery_persons = {}
-        if 'pending_announcements' not in st.session_state:
-            st.session_state.pending_announcements = {}
-        if 'notifications' not in st.session_state:
-            st.session_state.notifications = []
+        self.hub = get_event_hub()
+    
+    @property
+    def delivery_persons(self) -> Dict[str, DeliveryPerson]:
+        """Livreurs du hub, par nom"""
+        return {dp.name: dp for dp in self.hub.get_delivery_persons()}
     
     def init_manager(self):
         """Initialise le manager"""
         if st.session_state.manager is None:
             try:
-                st.session_state.manager = DeliveryManager()
-                st.session_state.manager.start()
+                st.session_state.manager = get_manager()
                 return True
             except Exception as e:
                 st.error(f"Erreur lors de l'initialisation du manager: {e}")
                 return False
         return True
     
-    def add_delivery_person(self, name: str):
+    def add_delivery_person(self, name: str, auto_respond: bool = False):
         """Ajoute un livreur"""
-        if name in [dp.name for dp in st.session_state.delivery_persons.values()]:
+        if name in self.delivery_persons:
             return False
         
         try:
-            delivery_person = DeliveryPerson(str(uuid.uuid4()), name)
+            delivery_person = DeliveryPerson(str(uuid.uuid4()), name, hub=self.hub, auto_respond=auto_respond,
+                                             zones=courier_zones())
             delivery_person.start()
-            st.session_state.delivery_persons[name] = delivery_person
             return True
         except Exception as e:
             st.error(f"Erreur lors de l'ajout du livreur: {e}")
             return False
     
+    def add_simulated_delivery_persons(self, count: int):
+        """Ajoute des livreurs simulés (réponse automatique)"""
+        added = 0
+        for _ in range(count):
+            if self.add_delivery_person(f"Simu_{uuid.uuid4().hex[:6]}", auto_respond=True):
+                added += 1
+        return added
+    
     def remove_delivery_person(self, name: str):
         """Supprime un livreur"""
-        if name in st.session_state.delivery_persons:
-            delivery_person = st.session_state.delivery_persons[name]
+        delivery_person = self.delivery_persons.get(name)
+        if delivery_person is not None:
             delivery_person.stop()
-            del st.session_state.delivery_persons[name]
             return True
         return False
 
@@ -153,6 +215,43 @@ def show_unified_interface(system):
     st.markdown("---")
     show_monitoring_section(system)
 
+def auto_refresh(func):
+    """Section rafraîchie seule toutes les REFRESH_SECONDS, sans rerun de toute la page
+    
+    Nécessite st.fragment (Streamlit >= 1.37); sinon la section est rendue avec la page.
+    """
+    if hasattr(st, 'fragment'):
+        return st.fragment(run_every=REFRESH_SECONDS)(func)
+    return func
+
+def rendered_view(section: str, version, build: Callable[[], Dict]) -> Dict:
+    """Vue d'une section (données prêtes à afficher), reconstruite seulement si sa version a changé
+    
+    La dernière version rendue de chaque section est gardée dans session_state: un
+    rafraîchissement sans changement reprend la vue précédente sans relire le manager,
+    le hub ni Redis. Les éléments sont quand même redessinés (Streamlit efface ceux
+    qu'un rerun de fragment ne redessine pas).
+    """
+    views = st.session_state.setdefault('rendered_views', {})
+    rendered = views.get(section)
+    if rendered is None or rendered[0] != version:
+        rendered = views[section] = (version, build())
+    return rendered[1]
+
+def paginate(items: List, key: str) -> List:
+    """Page courante d'une liste (PAGE_SIZE éléments) avec son sélecteur de page"""
+    page_count = max(1, -(-len(items) // PAGE_SIZE))
+    if page_count == 1:
+        return items
+    
+    # Valeur gérée par session_state (pas de value= sur un widget à clé déjà initialisée);
+    # la liste a pu raccourcir depuis le dernier affichage
+    st.session_state[key] = min(st.session_state.get(key, 1), page_count)
+    page = st.number_input(f"Page (1-{page_count}, {len(items)} éléments)", min_value=1,
+                           max_value=page_count, key=key)
+    start = (int(page) - 1) * PAGE_SIZE
+    return items[start:start + PAGE_SIZE]
+
 def show_manager_section(system):
     """Section Manager"""
     st.markdown("""
@@ -165,59 +264,80 @@ def show_manager_section(system):
     
     # Créer une annonce
     st.subheader("📢 Créer une annonce")
+    col1, col2 = st.columns(2)
+    with col1:
+        items = st.text_input("🍕 Plats (optionnel)", placeholder="pizza, dessert...", key="order_items").strip()
+    with col2:
+        cuisine = st.text_input("🍽️ Cuisine (optionnel)", placeholder="mexican, italian...", key="order_cuisine").strip()
+    if items or cuisine:
+        match = manager.menu_index.query(items or None, cuisine or None)
+        st.caption(f"🔎 {len(match)} restaurant(s), {match.item_count} item(s) correspondant(s)")
     if st.button("🎲 Générer une commande aléatoire", type="primary", key="create_announcement"):
         try:
-            announcement_id = manager.create_and_publish_announcement()
+            announcement_id = manager.create_and_publish_announcement(items=items or None, cuisine=cuisine or None)
             st.success(f"✅ Annonce créée et publiée ! ID: {announcement_id[:8]}...")
             st.rerun()
         except Exception as e:
             st.error(f"❌ Erreur: {e}")
     
-    # Annonces actives
+    show_announcements(manager)
+
+def _announcements_view(manager) -> Dict:
+    """Instantané du manager, annonces les plus récentes d'abord"""
+    snapshot = manager.dashboard_snapshot()
+    return {**snapshot, 'announcements': snapshot['announcements'][::-1]}
+
+@auto_refresh
+def show_announcements(manager):
+    """Annonces actives (page courante) et statistiques, depuis l'instantané du manager"""
+    snapshot = rendered_view('announcements', manager.state_version, lambda: _announcements_view(manager))
+    
     st.subheader("📋 Annonces actives")
-    if manager.active_announcements:
-        for ann_id, ann in manager.active_announcements.items():
-            responses = manager.pending_responses.get(ann_id, [])
-            interested = [r for r in responses if r.get('is_interested', False)]
+    if snapshot['announcements']:
+        for summary in paginate(snapshot['announcements'], key="announcements_page"):
+            ann_id = summary['announcement_id']
             
-            with st.expander(f"🏪 {ann['order']['restaurant']['name']} - {len(interested)} intéressé(s)"):
+            with st.expander(f"🏪 {summary['restaurant_name']} - {summary['interested']} intéressé(s)"):
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.markdown(f"""
-                    **Restaurant:** {ann['order']['restaurant']['name']}  
-                    **Distance:** {ann['estimated_distance']} km  
-                    **Compensation:** {ann['compensation']}€
+                    **Restaurant:** {summary['restaurant_name']}  
+                    **Distance:** {summary['estimated_distance']} km  
+                    **Compensation:** {summary['compensation']}€
                     """)
                 
                 with col2:
                     st.markdown(f"""
-                    **Réponses:** {len(responses)}  
-                    **Intéressés:** {len(interested)}  
+                    **Réponses:** {summary['responses']}  
+                    **Intéressés:** {summary['interested']}  
                     **ID:** {ann_id[:8]}...
                     """)
                 
-                # Afficher les livreurs intéressés
+                # Afficher les livreurs intéressés (seulement pour les annonces de la page)
+                interested = []
+                if summary['interested']:
+                    interested = [r for r in manager.pending_responses.get(ann_id, []) if r.is_interested]
                 if interested:
                     st.markdown("**Livreurs intéressés:**")
                     for i, response in enumerate(interested, 1):
-                        st.write(f"{i}. {response['delivery_person_name']}")
-                        if response.get('estimated_arrival_time'):
-                            st.write(f"   ⏱️ Temps d'arrivée: {response['estimated_arrival_time']} min")
+                        st.write(f"{i}. {response.delivery_person_name}")
+                        if response.estimated_arrival_time:
+                            st.write(f"   ⏱️ Temps d'arrivée: {response.estimated_arrival_time} min")
                     
                     # Sélection manuelle
                     st.markdown("**Sélection manuelle:**")
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        if st.button(f"🎯 Sélectionner {interested[0]['delivery_person_name']}", key=f"select_first_{ann_id}"):
+                        if st.button(f"🎯 Sélectionner {interested[0].delivery_person_name}", key=f"select_first_{ann_id}"):
                             # Sélectionner le premier
                             selected = interested[0]
                             _process_selection(manager, ann_id, selected, "Sélection manuelle (premier)")
                             st.rerun()
                     
                     with col2:
-                        if len(interested) > 1 and st.button(f"🎯 Sélectionner {interested[1]['delivery_person_name']}", key=f"select_second_{ann_id}"):
+                        if len(interested) > 1 and st.button(f"🎯 Sélectionner {interested[1].delivery_person_name}", key=f"select_second_{ann_id}"):
                             # Sélectionner le deuxième
                             selected = interested[1]
                             _process_selection(manager, ann_id, selected, "Sélection manuelle (deuxième)")
@@ -237,10 +357,9 @@ def show_manager_section(system):
     st.subheader("📊 Statistiques")
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Annonces actives", len(manager.active_announcements))
+        st.metric("Annonces actives", snapshot['active_count'])
     with col2:
-        total_responses = sum(len(responses) for responses in manager.pending_responses.values())
-        st.metric("Réponses totales", total_responses)
+        st.metric("Réponses totales", snapshot['response_count'])
 
 def show_delivery_section(system):
     """Section Livreurs"""
@@ -266,35 +385,75 @@ def show_delivery_section(system):
             else:
                 st.error("❌ Veuillez entrer un nom")
     
+    # Livreurs simulés (réponse automatique, partagent le hub)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        simulated_count = st.number_input("Livreurs simulés:", min_value=1, max_value=1000, value=50, step=10,
+                                          key="simulated_count")
+    with col2:
+        if st.button("🤖 Simuler"):
+            added = system.add_simulated_delivery_persons(int(simulated_count))
+            st.success(f"✅ {added} livreurs simulés ajoutés!")
+            st.rerun()
+    
+    show_delivery_persons(system)
+
+def _couriers_view(hub) -> Dict:
+    """Instantané du hub et livreurs manuels (les simulés ne sont que comptés)"""
+    snapshot = hub.snapshot()
+    return {**snapshot, 'manual': [courier for courier in snapshot['couriers'] if not courier['auto_respond']]}
+
+@auto_refresh
+def show_delivery_persons(system):
+    """Livreurs inscrits (page courante), depuis l'instantané du hub"""
+    snapshot = rendered_view('couriers', system.hub.state_version, lambda: _couriers_view(system.hub))
+    
+    if snapshot['simulated_count']:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("🤖 Livreurs simulés", snapshot['simulated_count'])
+        with col2:
+            st.metric("Réponses envoyées", snapshot['simulated_responses'])
+        with col3:
+            if st.button("🗑️ Supprimer les simulés"):
+                for dp in system.hub.get_delivery_persons():
+                    if dp.auto_respond:
+                        dp.stop()
+                st.rerun()
+    
     # Livreurs actifs
     st.subheader("👥 Livreurs actifs")
-    if st.session_state.delivery_persons:
-        for name, delivery_person in st.session_state.delivery_persons.items():
+    manual = snapshot['manual']
+    if manual:
+        for courier in paginate(manual, key="couriers_page"):
+            name = courier['name']
+            stats = courier['stats']
             with st.expander(f"🛵 {name}"):
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("Annonces reçues", delivery_person.stats['announcements_received'])
+                    st.metric("Annonces reçues", stats['announcements_received'])
                 with col2:
-                    st.metric("Réponses envoyées", delivery_person.stats['responses_sent'])
+                    st.metric("Réponses envoyées", stats['responses_sent'])
                 with col3:
-                    st.metric("Sélections reçues", delivery_person.stats['selections_received'])
+                    st.metric("Sélections reçues", stats['selections_received'])
                 
-                st.metric("💰 Gains totaux", f"{delivery_person.stats['total_earnings']:.2f}€")
+                st.metric("💰 Gains totaux", f"{stats['total_earnings']:.2f}€")
                 
                 # Répondre aux annonces en attente
-                if delivery_person.pending_announcements:
+                delivery_person = system.hub.delivery_persons.get(courier['person_id'])
+                if delivery_person is not None and delivery_person.pending_announcements:
                     st.markdown("**Annonces en attente de réponse:**")
-                    for announcement in delivery_person.pending_announcements:
+                    for announcement in list(delivery_person.pending_announcements):
                         col1, col2, col3 = st.columns([2, 1, 1])
                         with col1:
-                            st.write(f"🏪 {announcement['order']['restaurant']['name']} - {announcement['compensation']}€")
+                            st.write(f"🏪 {announcement.order.restaurant.name} - {announcement.compensation}€")
                         with col2:
-                            if st.button("✅ Accepter", key=f"accept_{name}_{announcement['announcement_id']}"):
+                            if st.button("✅ Accepter", key=f"accept_{name}_{announcement.announcement_id}"):
                                 _send_delivery_response(delivery_person, announcement, True)
                                 st.rerun()
                         with col3:
-                            if st.button("❌ Refuser", key=f"refuse_{name}_{announcement['announcement_id']}"):
+                            if st.button("❌ Refuser", key=f"refuse_{name}_{announcement.announcement_id}"):
                                 _send_delivery_response(delivery_person, announcement, False)
                                 st.rerun()
                 
@@ -303,7 +462,7 @@ def show_delivery_section(system):
                     if system.remove_delivery_person(name):
                         st.success(f"✅ Livreur {name} supprimé!")
                         st.rerun()
-    else:
+    elif not snapshot['simulated_count']:
         st.info("Aucun livreur ajouté")
 
 def show_monitoring_section(system):
@@ -314,61 +473,149 @@ def show_monitoring_section(system):
     </div>
     """, unsafe_allow_html=True)
     
+    show_monitoring_metrics(system)
+    
+    metrics_port = get_metrics_port()
+    if metrics_port:
+        st.caption(f"Métriques Prometheus: http://localhost:{metrics_port}/metrics")
+    
+    # Profilage du processus Streamlit (manager et livreurs)
+    st.markdown("**🔬 Profilage**")
+    if is_profiling():
+        if st.button("⏹️ Arrêter le profilage"):
+            st.session_state.last_profile = stop_profiling()
+            st.rerun()
+        st.caption("Profilage en cours (CPU tous threads + tracemalloc)")
+    elif st.button("▶️ Démarrer le profilage"):
+        start_profiling()
+        st.rerun()
+    
+    last_profile = st.session_state.get('last_profile')
+    if last_profile:
+        with st.expander("Dernier profil"):
+            st.code('\n'.join(last_profile['summary']))
+            for kind, path in last_profile['paths'].items():
+                st.caption(f"💾 {kind}: {path}")
+
+def _monitoring_view(manager, hub) -> Dict:
+    """Instantanés, gains de la flotte, analytique et métriques lus en une fois"""
+    ledger = manager.earnings_ledger
+    earnings = ledger.totals() if ledger else None
+    return {
+        'manager': manager.dashboard_snapshot(),
+        'hub': hub.snapshot(),
+        'earnings': earnings,
+        'leaders': {period: ledger.top(10, period) for period in (None, 'day', 'hour')} if earnings else {},
+        'analytics': manager.analytics.summary() if manager.analytics else None,
+        'metrics': REGISTRY.snapshot()
+    }
+
+@auto_refresh
+def show_monitoring_metrics(system):
+    """Métriques globales, latences et compteurs du pipeline"""
     manager = st.session_state.manager
+    # Gains et analytique viennent aussi d'autres processus: vue relue au moins toutes les
+    # MONITORING_MAX_AGE_SECONDS même sans événement local
+    version = (manager.state_version, system.hub.state_version, int(time.time() // MONITORING_MAX_AGE_SECONDS))
+    view = rendered_view('monitoring', version, lambda: _monitoring_view(manager, system.hub))
+    manager_snapshot, hub_snapshot = view['manager'], view['hub']
     
     # Métriques globales
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("📢 Annonces actives", len(manager.active_announcements))
+        st.metric("📢 Annonces actives", manager_snapshot['active_count'])
     
     with col2:
-        total_responses = sum(len(responses) for responses in manager.pending_responses.values())
-        st.metric("📨 Réponses totales", total_responses)
+        st.metric("📨 Réponses totales", manager_snapshot['response_count'])
     
     with col3:
-        total_interested = sum(
-            len([r for r in responses if r.get('is_interested', False)]) 
-            for responses in manager.pending_responses.values()
-        )
-        st.metric("✅ Livreurs intéressés", total_interested)
+        st.metric("✅ Livreurs intéressés", manager_snapshot['interested_count'])
     
+    # Gains de toute la flotte (grand livre Redis), sinon ceux des livreurs de ce processus
+    earnings = view['earnings']
     with col4:
-        total_earnings = sum(
-            delivery.stats['total_earnings'] 
-            for delivery in st.session_state.delivery_persons.values()
-        )
+        total_earnings = earnings['earnings'] if earnings else hub_snapshot['total_earnings']
         st.metric("💰 Gains totaux", f"{total_earnings:.2f}€")
     
-    # Bouton de rafraîchissement
-    if st.button("🔄 Rafraîchir", type="primary"):
-        st.rerun()
+    if earnings:
+        st.markdown("**🏅 Classement des livreurs**")
+        periods = [("Depuis le début", None, earnings['earnings']),
+                   ("Aujourd'hui", 'day', earnings['day']),
+                   ("Cette heure", 'hour', earnings['hour'])]
+        for column, (label, period, total) in zip(st.columns(3), periods):
+            with column:
+                st.caption(f"{label}: {total:.2f}€")
+                for entry in view['leaders'][period]:
+                    st.write(f"{entry['rank']}. {entry['name']}: {entry['earnings']:.2f}€")
+    
+    summary = view['analytics']
+    if summary:
+        st.markdown("**🔭 Analytique (estimations)**")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            couriers = summary['couriers']
+            st.caption(f"🛵 Livreurs uniques: ~{couriers['all'] if couriers['all'] is not None else '—'}")
+            for zone, count in couriers['zones'].items():
+                st.write(f"{zone}: ~{count}")
+        with col2:
+            st.caption("🍽️ Catégories populaires")
+            for entry in summary['categories']:
+                st.write(f"{entry['category']}: ~{entry['count']}")
+        with col3:
+            st.caption("🏪 Restaurants les plus demandés")
+            for entry in summary['restaurants']:
+                rate = entry['acceptance_rate']
+                st.write(f"{entry['name']}: {f'{rate:.0%}' if rate is not None else '—'} "
+                         f"(~{entry['responses']} réponses)")
+    
+    # Latences et compteurs du pipeline
+    metrics = view['metrics']
+    st.markdown("**⏱️ Latences du dispatch**")
+    col1, col2, col3 = st.columns(3)
+    latency_metrics = [
+        (col1, "Publication annonce (p95)", 'dispatch_publish_seconds{channel="announcement"}', 'p95'),
+        (col2, "Annonce → 1ère réponse (p50)", 'dispatch_first_response_seconds', 'p50'),
+        (col3, "Annonce → sélection (p50)", 'dispatch_assignment_seconds', 'p50'),
+    ]
+    for column, label, key, quantile in latency_metrics:
+        with column:
+            value = metrics.get(key, {}).get(quantile)
+            st.metric(label, f"{value * 1000:.1f} ms" if value is not None else "—")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("📢 Annonces publiées", metrics.get('dispatch_announcements_total', 0))
+    with col2:
+        st.metric("🎯 Sélections", metrics.get('dispatch_selections_total', 0))
+    with col3:
+        errors = sum(value for key, value in metrics.items() if key.startswith('dispatch_errors_total'))
+        st.metric("❌ Erreurs", errors)
+    
+    if manager.publisher:
+        st.markdown("**📦 Publication groupée**")
+        flush_size = metrics.get('dispatch_publisher_flush_size', {})
+        flush_seconds = metrics.get('dispatch_publisher_flush_seconds', {})
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("📥 File d'attente", metrics.get('dispatch_publisher_queue_depth', 0))
+        with col2:
+            size = flush_size.get('sum', 0) / flush_size['count'] if flush_size.get('count') else None
+            p95 = flush_seconds.get('p95')
+            st.metric("Messages par flush", f"{size:.1f}" if size is not None else "—",
+                      f"p95 {p95 * 1000:.1f} ms" if p95 is not None else None, delta_color='off')
+        with col3:
+            st.metric("🚦 Débit autorisé", f"{metrics.get('dispatch_publisher_rate', 0):.0f}/s")
 
 def _process_selection(manager, announcement_id, selected_response, reason):
     """Traite la sélection d'un livreur"""
     try:
-        # Créer la sélection
-        selection = {
-            'selection_id': str(uuid.uuid4()),
-            'announcement_id': announcement_id,
-            'selected_delivery_person_id': selected_response['delivery_person_id'],
-            'selected_delivery_person_name': selected_response['delivery_person_name'],
-            'selection_reason': reason,
-            'selected_at': datetime.now().isoformat()
-        }
-        
-        # Publier la sélection
-        manager._publish_selection(selection)
-        
-        # Notifier tous les livreurs
+        # Publier la sélection, notifier les livreurs et clore l'annonce
         responses = manager.pending_responses[announcement_id]
-        interested_responses = [r for r in responses if r['is_interested']]
-        manager._notify_all_delivery_persons(announcement_id, selection, interested_responses)
+        interested_responses = [r for r in responses if r.is_interested]
+        manager._select_delivery_person(announcement_id, selected_response, interested_responses, reason)
         
-        # Nettoyer les données
-        manager._cleanup_announcement(announcement_id)
-        
-        st.success(f"✅ {selected_response['delivery_person_name']} sélectionné!")
+        st.success(f"✅ {selected_response.delivery_person_name} sélectionné!")
         
     except Exception as e:
         st.error(f"❌ Erreur lors de la sélection: {e}")
@@ -376,29 +623,15 @@ def _process_selection(manager, announcement_id, selected_response, reason):
 def _send_delivery_response(delivery_person, announcement, is_interested):
     """Envoie une réponse de livreur"""
     try:
-        # Calculer le temps d'arrivée estimé
-        estimated_arrival = None
-        if is_interested:
-            estimated_arrival = int((announcement['estimated_distance'] / 30.0) * 60)
-        
-        response = {
-            'response_id': str(uuid.uuid4()),
-            'delivery_person_id': delivery_person.person_id,
-            'delivery_person_name': delivery_person.name,
-            'announcement_id': announcement['announcement_id'],
-            'is_interested': is_interested,
-            'estimated_arrival_time': estimated_arrival,
-            'current_location': delivery_person.current_location,
-            'response_time': datetime.now().isoformat()
-        }
-        
-        # Envoyer la réponse
+        # Envoyer la réponse (construite par le livreur, models.Response)
         delivery_person._send_response(announcement, is_interested)
         
         # Retirer l'annonce de la queue
         with delivery_person.lock:
             if announcement in delivery_person.pending_announcements:
                 delivery_person.pending_announcements.remove(announcement)
+        if delivery_person.hub is not None:
+            delivery_person.hub.touch()
         
         status = "accepté" if is_interested else "refusé"
         st.success(f"✅ {delivery_person.name} a {status} l'annonce!")
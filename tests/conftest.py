@@ -0,0 +1,35 @@
+"""
+Tests unitaires - Les modules du projet sont à la racine du dépôt
+Lancement: python3 -m pytest -q
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+from benchmarks.synthetic_data import make_dataset
+
+
+@pytest.fixture(scope='session')
+def dataset():
+    """Petit dataset synthétique (pas besoin des CSV)"""
+    return make_dataset(restaurant_count=200, items_per_restaurant=5)
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def make_announcement(dataset):
+    """Fabrique d'annonces tracées à partir du dataset synthétique"""
+    from orders import build_announcement, create_random_order
+
+    def factory(surge=None, trace=True):
+        order = create_random_order(dataset, None)
+        return build_announcement(order, surge or {}, {'id': 'trace', 'hops': {}} if trace else None)
+    return factory
@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+import batching_publisher
+from batching_publisher import MAX_SEND_ATTEMPTS, BatchingPublisher, TokenBucket
+from manager_redis import ANNOUNCEMENT_PUBLISH_SECONDS, ANNOUNCEMENTS_TOTAL, DeliveryManager
+
+
+class FlakyRedis:
+    """Client dont les `failures` premiers pipelines échouent"""
+
+    def __init__(self, redis_client, failures):
+        self.redis_client = redis_client
+        self.failures = failures
+
+    def pipeline(self, transaction=False):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Redis indisponible")
+        return self.redis_client.pipeline(transaction=transaction)
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=200.0, burst=5)
+    assert sum(bucket.acquire() for _ in range(5)) == 0.0
+    start = time.monotonic()
+    waited = sum(bucket.acquire() for _ in range(10))
+    assert waited > 0
+    assert time.monotonic() - start == pytest.approx(10 / 200.0, abs=0.04)
+
+
+def test_flush_keeps_order_and_calls_on_sent(redis_client):
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe('c')
+    publisher = BatchingPublisher(redis_client, max_batch=3, rate=None)
+    sent = []
+    for i in range(7):
+        publisher.publish('c', str(i), on_sent=lambda i=i: sent.append(i))
+    assert sent == []
+    assert publisher.flush() == 7
+    assert sent == list(range(7))
+    messages = [pubsub.get_message(timeout=0.1) for _ in range(10)]
+    received = [message['data'] for message in messages if message]
+    assert received == [str(i) for i in range(7)]
+    assert publisher.stats['flushes'] == 3
+
+
+def test_failed_batches_are_retried_then_dropped(redis_client, monkeypatch):
+    monkeypatch.setattr(batching_publisher, 'RETRY_INTERVAL', 0.02)
+    flaky = FlakyRedis(redis_client, failures=2)
+    publisher = BatchingPublisher(flaky, rate=None)
+    sent = []
+    publisher.publish('c', 'a', on_sent=lambda: sent.append('a'))
+    with publisher.flush_lock:
+        assert publisher._send(publisher._drain(10)) == 0
+    assert sent == [] and len(publisher.failed) == 1
+    publisher.publish('c', 'b', on_sent=lambda: sent.append('b'))
+    assert publisher.flush() == 2
+    assert sent == ['a', 'b']
+    assert publisher.stats['failed_batches'] == 2 and publisher.stats['dropped'] == 0
+
+    flaky.failures = MAX_SEND_ATTEMPTS
+    publisher.publish('c', 'lost')
+    assert publisher.flush() == 0
+    assert publisher.failed == [] and publisher.stats['dropped'] == 1
+
+
+def test_retries_wait_for_the_interval_and_keep_node_order(redis_client, monkeypatch):
+    monkeypatch.setattr(batching_publisher, 'RETRY_INTERVAL', 0.1)
+    flaky = FlakyRedis(redis_client, failures=1)
+    publisher = BatchingPublisher(flaky, rate=None)
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe('c')
+    publisher.publish('c', 'a')
+    with publisher.flush_lock:
+        assert publisher._send(publisher._drain(10)) == 0
+
+    # Avant l'échéance, un nouveau message du même nœud attend derrière le message en échec
+    publisher.publish('c', 'b')
+    with publisher.flush_lock:
+        assert publisher._send(publisher._drain(10)) == 0
+    assert [entry[2] for entry in publisher.failed] == ['a', 'b']
+    assert publisher.stats['failed_batches'] == 1
+
+    # flush() (arrêt) attend l'échéance au lieu d'enchaîner les essais
+    start = time.monotonic()
+    assert publisher.flush() == 2
+    assert time.monotonic() - start >= 0.08
+    messages = [pubsub.get_message(timeout=0.1) for _ in range(10)]
+    assert [message['data'] for message in messages if message] == ['a', 'b']
+    assert publisher.stats['retried'] == 1
+
+
+def test_manager_counts_announcements_when_sent(redis_client, dataset):
+    publisher = BatchingPublisher(redis_client, rate=None)
+    manager = DeliveryManager(dataset=dataset, redis_client=redis_client, publisher=publisher)
+    published, observed = ANNOUNCEMENTS_TOTAL.value, ANNOUNCEMENT_PUBLISH_SECONDS.count
+    manager.create_and_publish_announcement()
+    assert (ANNOUNCEMENTS_TOTAL.value, ANNOUNCEMENT_PUBLISH_SECONDS.count) == (published, observed)
+    publisher.flush()
+    assert (ANNOUNCEMENTS_TOTAL.value, ANNOUNCEMENT_PUBLISH_SECONDS.count) == (published + 1, observed + 1)
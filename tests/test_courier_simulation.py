@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from courier_simulation import STATE_NAMES, CourierFleetSimulation
+from spatial_index import KM_PER_DEG_LAT, haversine_km
+
+START = (33.5, -86.8)
+PICKUP = (START[0] + 1 / KM_PER_DEG_LAT, START[1])
+DROPOFF = (START[0] + 2 / KM_PER_DEG_LAT, START[1])
+
+
+def test_courier_goes_to_restaurant_then_customer_then_idle():
+    # 30 km/h sur 90 s: 0,75 km par tick, restaurant puis client à 1 km
+    simulation = CourierFleetSimulation(speed_kmh=30.0, seed=1)
+    index = simulation.add_courier('c1', *START)
+    assert simulation.assign(index, 'a1', PICKUP, DROPOFF)
+    assert not simulation.assign(index, 'a2', PICKUP, DROPOFF)
+
+    states, positions, delivered = [], [], []
+    for _ in range(4):
+        delivered.append(simulation.tick(90))
+        states.append(STATE_NAMES[simulation.state[index]])
+        positions.append(simulation.position(index))
+
+    assert states == ['to_restaurant', 'to_customer', 'to_customer', 'idle']
+    assert delivered == [[], [], [], ['a1']]
+    assert positions[1] == pytest.approx(PICKUP)
+    assert positions[3] == pytest.approx(DROPOFF)
+    assert simulation.announcement_ids[index] is None
+    assert simulation.stats['pickups'] == 1 and simulation.stats['deliveries'] == 1
+    assert simulation.stats['pickup_distance_km'] == pytest.approx(1.0)
+    assert simulation.is_idle(index)
+
+
+def test_pickup_distances_match_haversine_at_city_scale():
+    simulation = CourierFleetSimulation(seed=2)
+    indices = np.array([simulation.add_courier(f"c{i}") for i in range(50)])
+    simulation.assign(indices[0], 'a1', PICKUP, DROPOFF)
+    rng = np.random.default_rng(3)
+    lats = START[0] + rng.normal(0, 0.05, 20)
+    lngs = START[1] + rng.normal(0, 0.05, 20)
+
+    lat, lng, idle, distances = simulation.pickup_distances(indices, lats, lngs)
+    assert distances.shape == (20, 50)
+    assert idle.tolist() == [False] + [True] * 49
+    # Approximation équirectangulaire (111 km par degré): moins de 0,5 % d'écart en ville
+    expected = haversine_km(lat[None, :], lng[None, :], lats[:, None], lngs[:, None])
+    np.testing.assert_allclose(distances, expected, rtol=5e-3)
+    assert simulation.distance_to(indices[5], lats[2], lngs[2]) == pytest.approx(distances[2, 5])
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset import concat_chunks, normalize_prices, prepare_menus
+
+
+@pytest.mark.parametrize('raw', ['10.00 - 15.00', '10 to 15', '10–15', '10 TO 15', '$10 - $15'])
+def test_price_ranges_give_their_midpoint(raw):
+    normalized, rejected = normalize_prices(pd.Series([raw]))
+    assert rejected == 0
+    assert normalized['price_valid'].tolist() == [True]
+    assert normalized['price_min'].tolist() == [10.0]
+    assert normalized['price_max'].tolist() == [15.0]
+    assert normalized['price'].tolist() == [12.5]
+
+
+def test_single_prices_strip_currency_and_thousands():
+    normalized, rejected = normalize_prices(pd.Series(['$12', '1,200.50 USD', '7.5 €', '£3']))
+    assert rejected == 0
+    assert normalized['price'].tolist() == pytest.approx([12.0, 1200.5, 7.5, 3.0])
+
+
+def test_invalid_prices_are_rejected_as_zero():
+    normalized, rejected = normalize_prices(pd.Series(['abc', '-3', None, '15 - 10', 'inf']))
+    assert rejected == 5
+    assert not normalized['price_valid'].any()
+    assert (normalized['price'] == 0.0).all()
+    assert normalized['price'].dtype == np.float32
+
+
+def test_prepare_menus_keeps_raw_price():
+    menus, rejected = prepare_menus(pd.DataFrame({'restaurant_id': [1, 1], 'price': ['4.00 USD', 'n/a']}))
+    assert rejected == 1
+    assert menus['price_raw'].tolist() == ['4.00 USD', 'n/a']
+    assert menus['price'].tolist() == [4.0, 0.0]
+
+
+def test_concat_chunks_unifies_categories():
+    first = pd.DataFrame({'category': pd.Series(['Pizza'], dtype='category')})
+    second = pd.DataFrame({'category': pd.Series(['Sushi'], dtype='category')})
+    merged = concat_chunks([first, second], {'category': 'category'})
+    assert isinstance(merged['category'].dtype, pd.CategoricalDtype)
+    assert merged['category'].tolist() == ['Pizza', 'Sushi']
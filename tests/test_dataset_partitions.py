@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+from dataset_partitions import (PARTITION_DIR_ENV, PARTITIONS_ENV, UNKNOWN_PARTITION, build_partitions, city_partitions,
+                                dataset_from_env, load_partitions, zone_partitions)
+
+# Deux villes éloignées: Birmingham (AL) et Atlanta (GA)
+RESTAURANTS = [
+    (1, 'Chez Paul', 'french', '$$', '1 Main St, Birmingham, AL', 33.52, -86.81),
+    (2, 'Taco Loco', 'mexican', '$', '2 Oak St, Birmingham, AL', 33.51, -86.80),
+    (3, 'Peach Pit', 'southern', '$$', '3 Peach St, Atlanta, GA', 33.75, -84.39),
+]
+MENUS = [
+    (1, 'Plats', 'Ratatouille', '12.50 USD'),
+    (2, 'Tacos', 'Taco al pastor', '3.00 USD'),
+    (3, 'Desserts', 'Peach cobbler', '6.00 USD'),
+]
+
+
+@pytest.fixture
+def partitions(tmp_path, monkeypatch):
+    restaurants = tmp_path / 'restaurants.csv'
+    menus = tmp_path / 'restaurant-menus.csv'
+    pd.DataFrame(RESTAURANTS, columns=['id', 'name', 'category', 'price_range', 'full_address', 'lat', 'lng']) \
+        .to_csv(restaurants, index=False)
+    pd.DataFrame(MENUS, columns=['restaurant_id', 'category', 'name', 'price']).to_csv(menus, index=False)
+    directory = str(tmp_path / 'partitions')
+    build_partitions(str(restaurants), str(menus), directory, by='zone', zone_km=25)
+    monkeypatch.setenv(PARTITION_DIR_ENV, directory)
+    return directory
+
+
+def test_near_loads_only_partitions_in_range(partitions, monkeypatch):
+    monkeypatch.setenv(PARTITIONS_ENV, 'near:33.52,-86.81,10')
+    dataset = dataset_from_env()
+    assert sorted(dataset.restaurants_df['id'].tolist()) == [1, 2]
+
+
+@pytest.mark.parametrize('value, error', [
+    ('near:0,0,10', LookupError),
+    (' , ', LookupError),
+    ('near:33.52,-86.81', ValueError),
+])
+def test_empty_or_invalid_selection_is_rejected(partitions, monkeypatch, value, error):
+    monkeypatch.setenv(PARTITIONS_ENV, value)
+    with pytest.raises(error):
+        dataset_from_env()
+
+
+def test_unknown_partition_is_rejected(partitions):
+    with pytest.raises(LookupError):
+        load_partitions(['atlantis'], partitions)
+    with pytest.raises(LookupError):
+        load_partitions([], partitions)
+
+
+@pytest.mark.parametrize('address, city', [
+    ('1 Main St, Birmingham, AL, 35203', 'birmingham-al'),
+    ('Birmingham, AL, 35203', 'birmingham-al'),
+    ('Suite 2, 1 Main St, Atlanta, GA, 30301-1234', 'atlanta-ga'),
+    ('2 Oak St, Birmingham, AL', 'birmingham-al'),
+    ('AL, 35203', UNKNOWN_PARTITION),
+    (None, UNKNOWN_PARTITION),
+])
+def test_city_is_read_from_the_right_of_the_address(address, city):
+    assert city_partitions(pd.DataFrame({'full_address': [address]})).tolist() == [city]
+
+
+def test_restaurants_without_coordinates_go_to_unknown_zone():
+    restaurants = pd.DataFrame({'lat': [33.52, float('nan'), 33.52], 'lng': [-86.81, -86.81, float('nan')]})
+    zones = zone_partitions(restaurants, zone_km=25).tolist()
+    assert zones[0].startswith('z') and zones[1:] == [UNKNOWN_PARTITION, UNKNOWN_PARTITION]
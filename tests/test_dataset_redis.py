@@ -0,0 +1,59 @@
+import pandas as pd
+
+from dataset_redis import MENU_KEY, RESTAURANT_GEO_KEY, RESTAURANT_IDS_KEY, RESTAURANT_KEY, RedisDataset, \
+    load_dataset_into_redis
+
+COLUMNS = ['id', 'name', 'category', 'price_range', 'full_address', 'lat', 'lng']
+MENU_COLUMNS = ['restaurant_id', 'category', 'name', 'price']
+
+
+def write_csv(tmp_path, restaurants, menus):
+    restaurants_path = tmp_path / 'restaurants.csv'
+    menus_path = tmp_path / 'restaurant-menus.csv'
+    pd.DataFrame(restaurants, columns=COLUMNS).to_csv(restaurants_path, index=False)
+    pd.DataFrame(menus, columns=MENU_COLUMNS).to_csv(menus_path, index=False)
+    return str(restaurants_path), str(menus_path)
+
+
+def test_restaurants_without_coordinates_are_imported_without_geo_entry(tmp_path, redis_client):
+    paths = write_csv(tmp_path, [
+        (1, 'Chez Paul', 'french', '$$', '1 Main St, Birmingham, AL, 35203', 33.52, -86.81),
+        (2, 'Sans GPS', 'pizza', '$', '2 Oak St, Birmingham, AL, 35203', None, None),
+    ], [(1, 'Plats', 'Ratatouille', '12.50 USD'), (2, 'Pizzas', 'Margherita', '9.00 USD')])
+
+    meta = load_dataset_into_redis(redis_client, *paths)
+
+    assert meta['restaurants'] == 2
+    assert redis_client.smembers(RESTAURANT_IDS_KEY) == {'1', '2'}
+    assert redis_client.zrange(RESTAURANT_GEO_KEY, 0, -1) == ['1']
+    assert redis_client.hget(RESTAURANT_KEY.format(2), 'name') == 'Sans GPS'
+    assert redis_client.llen(MENU_KEY.format(2)) == 1
+
+    ids, lats, lngs = RedisDataset(redis_client).coordinates()
+    assert ids.tolist() == [1]
+
+
+def test_reimport_replaces_previous_keys_and_skips_orphan_menus(tmp_path, redis_client):
+    first = write_csv(tmp_path, [
+        (1, 'Chez Paul', 'french', '$$', '1 Main St, Birmingham, AL, 35203', 33.52, -86.81),
+        (2, 'Taco Loco', 'mexican', '$', '2 Oak St, Birmingham, AL, 35203', 33.51, -86.80),
+    ], [(1, 'Plats', 'Ratatouille', '12.50 USD'), (2, 'Tacos', 'Taco al pastor', '3.00 USD'),
+        (3, 'Desserts', 'Orphelin', '6.00 USD')])
+    load_dataset_into_redis(redis_client, *first)
+    meta = load_dataset_into_redis(redis_client, *first)
+
+    assert meta['menu_items'] == 2
+    assert meta['orphan_menu_items'] == 1
+    assert not redis_client.exists(MENU_KEY.format(3))
+    assert redis_client.llen(MENU_KEY.format(1)) == 1
+
+    # Le restaurant 2 disparaît des CSV: son hash et son menu sont supprimés
+    second = write_csv(tmp_path, [
+        (1, 'Chez Paul', 'french', '$$', '1 Main St, Birmingham, AL, 35203', 33.52, -86.81),
+    ], [(1, 'Plats', 'Ratatouille', '12.50 USD')])
+    load_dataset_into_redis(redis_client, *second)
+
+    assert redis_client.smembers(RESTAURANT_IDS_KEY) == {'1'}
+    assert not redis_client.exists(RESTAURANT_KEY.format(2), MENU_KEY.format(2))
+    assert redis_client.zrange(RESTAURANT_GEO_KEY, 0, -1) == ['1']
+    assert RedisDataset(redis_client).menu_items(1) == [{'name': 'Ratatouille', 'category': 'Plats', 'price': 12.5}]
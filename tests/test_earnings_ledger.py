@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from earnings_ledger import DAY_TTL_SECONDS, HOUR_TTL_SECONDS, TOTALS_KEY, EarningsLedger
+
+
+def test_credit_updates_rankings_and_totals(redis_client):
+    ledger = EarningsLedger(redis_client)
+    ledger.credit('a', 'Alice', 10.0)
+    ledger.credit('b', 'Bob', 4.5)
+    ledger.credit('a', 'Alice', 2.25)
+
+    assert [(entry['name'], entry['earnings']) for entry in ledger.top()] == [('Alice', 12.25), ('Bob', 4.5)]
+    assert ledger.top(period='hour')[0]['earnings'] == 12.25
+    assert ledger.courier('b') == {'earnings': 4.5, 'deliveries': 1, 'rank': 2, 'fleet_size': 2}
+    assert ledger.totals() == {'earnings': 16.75, 'deliveries': 3, 'hour': 16.75, 'day': 16.75}
+
+
+def test_period_totals_expire_and_lifetime_hash_stays_small(redis_client):
+    ledger = EarningsLedger(redis_client)
+    for hour in range(24):
+        ledger.credit('a', 'Alice', 1.0, at=datetime(2024, 5, 1, hour))
+
+    assert set(redis_client.hkeys(TOTALS_KEY)) == {'earnings', 'deliveries'}
+    assert 0 < redis_client.ttl('earnings:total:hour:2024050113') <= HOUR_TTL_SECONDS
+    assert 0 < redis_client.ttl('earnings:total:day:20240501') <= DAY_TTL_SECONDS
+    assert float(redis_client.get('earnings:total:day:20240501')) == 24.0
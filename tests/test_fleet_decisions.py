@@ -0,0 +1,104 @@
+import fakeredis
+import numpy as np
+
+import livreur_redis
+from courier_simulation import CourierFleetSimulation
+from fleet_decisions import CHANNELS, FleetDecider, _CourierGroup
+from livreur_redis import DeliveryPerson
+from models import Response
+
+
+class CountingRedis:
+    """Client qui compte les pipelines ouverts"""
+
+    def __init__(self):
+        self.redis_client = fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
+        self.pipelines = 0
+
+    def pipeline(self, transaction=False):
+        self.pipelines += 1
+        return self.redis_client.pipeline(transaction=transaction)
+
+
+class Router:
+    def __init__(self, clients):
+        self.clients = clients
+
+    def client(self, node):
+        return self.clients[node]
+
+
+class Hub:
+    """Juste ce que le decider lit d'un EventHub"""
+
+    def __init__(self, couriers, redis_client=None, shard_router=None):
+        self.couriers = couriers
+        self.redis_client = redis_client
+        self.shard_router = shard_router
+        self.members_version = 1
+
+    def get_delivery_persons(self):
+        return self.couriers
+
+
+def test_decide_matches_scalar_decisions(monkeypatch, redis_client, make_announcement):
+    announcements = [make_announcement(trace=False) for _ in range(8)]
+    restaurant = announcements[0].order.restaurant
+    simulation = CourierFleetSimulation(seed=1)
+    couriers = []
+    # Sur le restaurant, au centre, très loin, puis occupé sur le restaurant
+    for lat, lng in [(restaurant.lat, restaurant.lng), (None, None), (restaurant.lat + 1, restaurant.lng),
+                     (restaurant.lat, restaurant.lng)]:
+        dp = DeliveryPerson(f"c{len(couriers)}", 'Auto', redis_client=redis_client, auto_respond=True,
+                            simulation=simulation)
+        dp.interest_probability = 0.9
+        dp.sim_index = simulation.add_courier(dp.person_id, lat, lng)
+        couriers.append(dp)
+    simulation.assign(couriers[3].sim_index, 'autre', (restaurant.lat, restaurant.lng), (restaurant.lat, restaurant.lng))
+
+    group = _CourierGroup(simulation, couriers)
+    draws = np.random.default_rng(7).random((len(announcements), len(couriers)))
+    eligible, interested, pickup, _, _ = FleetDecider(seed=7).decide(group, announcements)
+
+    for row, announcement in enumerate(announcements):
+        for col, dp in enumerate(couriers):
+            monkeypatch.setattr(livreur_redis.random, 'random', lambda: draws[row, col])
+            assert pickup[row, col] == dp._distance_to_pickup(announcement)
+            assert eligible[row, col] == (dp._distance_to_pickup(announcement) <= simulation.response_radius_km)
+            if eligible[row, col]:
+                assert interested[row, col] == dp._decide_interest(announcement)
+    assert eligible[0, 0] and not eligible[:, 2].any()
+    assert interested[:, 0].any() and not interested[:, 3].any()
+
+
+def test_process_batch_skips_duplicates_and_sends_one_pipeline_per_node(redis_client, make_announcement):
+    nodes = {'n1': CountingRedis(), 'n2': CountingRedis()}
+    pubsubs = {}
+    for node, client in nodes.items():
+        pubsubs[node] = client.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsubs[node].subscribe(CHANNELS['DELIVERY_RESPONSE'])
+    couriers = [DeliveryPerson(f"c{i}", 'Auto', redis_client=redis_client, auto_respond=True) for i in range(3)]
+    decider = FleetDecider(seed=3)
+    decider.hub = Hub(couriers, redis_client, Router(nodes))
+
+    announcements = [make_announcement() for _ in range(4)]
+    for announcement, node in zip(announcements, ['n1', 'n2', 'n1', 'n2']):
+        announcement.shard = node
+    batch = [(announcement, {'received': 1}) for announcement in announcements + announcements[:2]]
+
+    assert decider.process_batch(batch) == 12
+    assert [client.pipelines for client in nodes.values()] == [1, 1]
+    assert decider.stats['announcements'] == 4
+    assert decider.stats['decisions'] == 12
+    assert all(dp.stats['announcements_received'] == 4 and dp.stats['responses_sent'] == 4 for dp in couriers)
+
+    for node, pubsub in pubsubs.items():
+        messages = [pubsub.get_message(timeout=0.1) for _ in range(10)]
+        responses = [Response.from_json(m['data']) for m in messages if m]
+        expected = {a.announcement_id for a in announcements if a.shard == node}
+        assert len(responses) == 6
+        assert {r.announcement_id for r in responses} == expected
+
+    # Republication du même lot: rien n'est renvoyé
+    assert decider.process_batch(batch) == 0
+    assert [client.pipelines for client in nodes.values()] == [1, 1]
@@ -0,0 +1,107 @@
+import time
+
+import history_mongo
+from history_mongo import ConnectionFailure, InMemoryCollection, OrderHistorySink
+
+
+def documents(count, start=0):
+    return [{'announcement_id': f"a{i}", 'restaurant_id': i} for i in range(start, start + count)]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class FlakyCollection(InMemoryCollection):
+    """Collection qui perd la connexion pendant les `failures` premiers insert_many"""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def insert_many(self, documents, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionFailure("connection refused")
+        super().insert_many(documents, ordered)
+
+
+def test_flush_by_size():
+    collection = InMemoryCollection()
+    sink = OrderHistorySink(collection, batch_size=10, flush_interval=30)
+    sink.start()
+    try:
+        for document in documents(10):
+            sink.record(document)
+        assert wait_for(lambda: collection.count_documents() == 10)
+        assert sink.stats['flushes'] == 1
+    finally:
+        sink.stop()
+
+
+def test_flush_by_time():
+    collection = InMemoryCollection()
+    sink = OrderHistorySink(collection, batch_size=100, flush_interval=0.1)
+    sink.start()
+    try:
+        sink.record(documents(1)[0])
+        assert wait_for(lambda: collection.count_documents() == 1)
+    finally:
+        sink.stop()
+
+
+def test_drop_when_full():
+    sink = OrderHistorySink(InMemoryCollection(), max_buffer=3)
+    results = [sink.record(document) for document in documents(5)]
+    assert results == [True, True, True, False, False]
+    assert sink.stats['recorded'] == 3 and sink.stats['dropped'] == 2
+
+
+def test_stop_flushes_the_buffer():
+    collection = InMemoryCollection()
+    sink = OrderHistorySink(collection, batch_size=2, flush_interval=30)
+    for document in documents(5):
+        sink.record(document)
+    sink.stop()
+    assert collection.count_documents() == 5
+    assert sink.stats['written'] == 5
+
+
+def test_duplicates_do_not_fail_the_rest_of_the_batch():
+    collection = InMemoryCollection()
+    sink = OrderHistorySink(collection)
+    sink.ensure_indexes()
+    collection.insert_many(documents(1))
+    for document in documents(3):
+        sink.record(document)
+    assert sink.flush() == 2
+    assert collection.count_documents() == 3
+    assert sink.stats['duplicates'] == 1
+    assert sink.stats['failed_batches'] == 0
+
+
+def test_connection_errors_are_retried_after_the_interval(monkeypatch):
+    monkeypatch.setattr(history_mongo, 'RETRY_INTERVAL', 0.05)
+    collection = FlakyCollection(failures=2)
+    sink = OrderHistorySink(collection)
+    for document in documents(3):
+        sink.record(document)
+
+    start = time.monotonic()
+    assert sink.flush() == 3
+    assert time.monotonic() - start >= 0.1
+    assert collection.count_documents() == 3
+    assert sink.stats['retried'] == 6 and sink.stats['dropped'] == 0
+
+
+def test_documents_are_dropped_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(history_mongo, 'RETRY_INTERVAL', 0.0)
+    collection = FlakyCollection(failures=history_mongo.MAX_WRITE_ATTEMPTS)
+    sink = OrderHistorySink(collection)
+    for document in documents(2):
+        sink.record(document)
+    assert sink.flush() == 0
+    assert sink.stats['dropped'] == 2 and not sink.failed
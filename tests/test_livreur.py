@@ -0,0 +1,50 @@
+import livreur_redis
+import redis_connections
+from livreur_redis import DeliveryPerson
+from models import Notification, Response
+
+
+def test_trace_hops_are_bounded_for_unanswered_announcements(monkeypatch, redis_client, make_announcement):
+    monkeypatch.setattr(livreur_redis, 'SEEN_ANNOUNCEMENTS_LIMIT', 5)
+    courier = DeliveryPerson('c1', 'Manuel', redis_client=redis_client)
+    announcements = [make_announcement() for _ in range(12)]
+    for announcement in announcements:
+        courier._process_announcement(announcement, {'received': 1, 'decoded': 2})
+
+    assert len(courier.trace_hops) == 5
+    assert list(courier.trace_hops) == [a.announcement_id for a in announcements[-5:]]
+    assert len(courier.pending_announcements) == 12
+
+
+def test_notification_drops_trace_hops(redis_client, make_announcement):
+    courier = DeliveryPerson('c1', 'Manuel', redis_client=redis_client)
+    announcement = make_announcement()
+    courier._process_announcement(announcement, {'received': 1, 'decoded': 2})
+    courier._process_notification(Notification(announcement.announcement_id, 'c1', 'Manuel', False, 'Autre', 'now'))
+    assert not courier.trace_hops
+
+
+def test_auto_courier_response_carries_trace_hops(redis_client, make_announcement):
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(livreur_redis.CHANNELS['DELIVERY_RESPONSE'])
+    courier = DeliveryPerson('c1', 'Auto', redis_client=redis_client, auto_respond=True)
+    courier._process_announcement(make_announcement(), {'received': 1, 'decoded': 2})
+
+    messages = [pubsub.get_message(timeout=0.1) for _ in range(3)]
+    [response] = [Response.from_json(m['data']) for m in messages if m]
+    assert response.trace['hops'] == {'received': 1, 'decoded': 2, 'responded': response.trace['hops']['responded']}
+    assert not courier.trace_hops
+    assert courier.stats['responses_sent'] == 1
+
+
+def test_pending_announcements_gauge_tracks_running_couriers(monkeypatch, redis_client, make_announcement):
+    monkeypatch.setattr(redis_connections, 'LISTEN_TIMEOUT', 0.01)
+    baseline = livreur_redis.COURIER_PENDING_ANNOUNCEMENTS.value
+    courier = DeliveryPerson('c1', 'Manuel', redis_client=redis_client)
+    courier.start()
+    courier._process_announcement(make_announcement(), {})
+    courier._process_announcement(make_announcement(), {})
+    assert livreur_redis.COURIER_PENDING_ANNOUNCEMENTS.value == baseline + 2
+
+    courier.stop()
+    assert livreur_redis.COURIER_PENDING_ANNOUNCEMENTS.value == baseline
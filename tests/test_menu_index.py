@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from menu_index import MenuIndex, tokenize
+
+
+@pytest.fixture
+def index():
+    # Restaurant 30 sans item, items du restaurant 99 absent du dataset (non indexés)
+    return MenuIndex(
+        restaurant_ids=[20, 10, 30],
+        cuisines=['Mexican', 'Italian', 'Italian'],
+        item_restaurant_ids=[10, 20, 10, 10, 20, 99],
+        item_names=['Pizza Margherita', 'Tacos al pastor', 'Pizzas Calzone', 'Tiramisu', 'Churros', 'Pizza'],
+        item_categories=['Pizzas', 'Tacos', 'Pizzas', 'Desserts', 'Desserts', 'Pizzas'],
+    )
+
+
+def test_tokenize_normalizes_words():
+    assert tokenize("Crème Brûlée & the Pizzas") == ['creme', 'brulee', 'pizza']
+    assert tokenize("Glass of water, glass") == ['glass', 'water']
+    assert tokenize(None) == []
+
+
+def test_query_by_items_cuisine_and_both(index):
+    assert len(index) == 5
+    pizza = index.query(items='pizza')
+    assert pizza.restaurant_ids.tolist() == [10]
+    assert pizza.item_ranks(10).tolist() == [0, 1]
+    assert index.query(items='dessert').restaurant_ids.tolist() == [10, 20]
+    assert index.query(cuisine='italian').restaurant_ids.tolist() == [10, 30]
+    assert index.query(items='dessert', cuisine='mexican').restaurant_ids.tolist() == [20]
+    assert index.query(items='pizza sushi').empty
+    assert index.query().item_ranks(10) is None
+
+
+def test_counts_restrict_and_sample(index):
+    desserts = index.query(items='dessert')
+    assert [ids.tolist() for ids in desserts.counts()] == [[10, 20], [1, 1]]
+    assert desserts.item_count == 2
+    assert index.query(cuisine='italian').item_count == 3
+
+    restricted = desserts.restrict([20, 30])
+    assert restricted.restaurant_ids.tolist() == [20]
+    assert restricted.item_ranks(20).tolist() == [1]
+
+    random.seed(0)
+    samples = {index.query(items='pizza').sample()[0] for _ in range(20)}
+    assert samples == {10}
+    restaurant_id, ranks = index.query(cuisine='italian').sample()
+    assert restaurant_id in (10, 30) and ranks is None
+
+
+def test_shared_segment_carries_the_index(dataset):
+    from dataset_shared import SharedDataset
+
+    index = MenuIndex.from_dataset(dataset)
+    shared = SharedDataset.create(dataset, index)
+    attached = SharedDataset.attach(shared.descriptor)
+    try:
+        copy = attached.menu_index()
+        assert len(copy) == len(index)
+        for items, cuisine in [('pizza', None), (None, 'italian'), ('dessert', 'mexican')]:
+            expected, found = index.query(items, cuisine), copy.query(items, cuisine)
+            assert found.restaurant_ids.tolist() == expected.restaurant_ids.tolist()
+            assert [c.tolist() for c in found.counts()] == [c.tolist() for c in expected.counts()]
+        without_index = SharedDataset.attach({**shared.descriptor, 'menu_index': False})
+        assert without_index.menu_index() is None
+        without_index.close()
+    finally:
+        attached.close()
+        shared.close()
+
+
+def test_manager_builds_the_index_on_first_filtered_query(dataset, redis_client):
+    from manager_redis import DeliveryManager
+
+    manager = DeliveryManager(dataset=dataset, redis_client=redis_client, announcement_ttl=None)
+    assert manager._menu_index is None
+    assert manager.restaurants_matching(cuisine='italian')
+    assert manager._menu_index is not None
+    assert manager.menu_index is manager._menu_index
@@ -0,0 +1,45 @@
+import gc
+import urllib.request
+
+from metrics import MetricsRegistry, start_metrics_server
+
+
+class Owner:
+    def __init__(self, size):
+        self.size = size
+
+
+def test_tracked_gauge_sums_live_instances_without_keeping_them_alive():
+    gauge = MetricsRegistry().gauge('open', 'Annonces ouvertes')
+    first, second = Owner(2), Owner(3)
+    gauge.track(first, lambda owner: owner.size)
+    gauge.track(second, lambda owner: owner.size)
+    assert gauge.value == 5
+
+    gauge.untrack(first)
+    assert gauge.value == 3
+    del second
+    gc.collect()
+    assert gauge.value == 0
+
+
+def test_histogram_quantiles_and_prometheus_rendering():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latence', {'channel': 'response'}, buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 2.0):
+        histogram.observe(value)
+    registry.counter('events_total', 'Événements').inc(3)
+
+    assert histogram.quantile(0.5) <= 0.1
+    text = registry.render_prometheus()
+    assert 'latency_seconds_bucket{channel="response",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{channel="response",le="+Inf"} 4' in text
+    assert 'events_total 3' in text
+
+
+def test_metrics_server_listens_on_loopback_by_default():
+    registry = MetricsRegistry()
+    registry.counter('up_total').inc()
+    port = start_metrics_server(0, registry)
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+        assert b'up_total 1' in response.read()
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+import models
+from models import Announcement, Notification, Response, Selection
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def codec(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(models, 'orjson', None)
+    elif models.orjson is None:
+        pytest.skip("orjson non installé")
+    return request.param
+
+
+def test_announcement_round_trip_omits_absent_shard(codec, make_announcement):
+    announcement = make_announcement()
+    announcement.compensation = np.float64(7.5)
+    payload = announcement.to_json()
+    data = json.loads(payload)
+    assert 'shard' not in data and data['compensation'] == 7.5
+
+    decoded = Announcement.from_json(payload)
+    assert decoded.to_dict() == json.loads(payload)
+    assert decoded.order.restaurant.id == announcement.order.restaurant.id
+    assert [item.name for item in decoded.order.items] == [item.name for item in announcement.order.items]
+
+    announcement.shard = '127.0.0.1:6380'
+    assert Announcement.from_json(announcement.to_json()).shard == '127.0.0.1:6380'
+
+
+def test_optional_fields_are_omitted_and_restored(codec):
+    response = Response('r1', 'c1', 'Alice', 'a1', True, 12, 'Centre', '2024-05-01T12:00:00')
+    assert set(json.loads(response.to_json())) >= {'trace', 'estimated_arrival_time'}
+    assert 'current_lat' not in json.loads(response.to_json())
+    simulated = Response('r2', 'c2', 'Bob', 'a1', False, None, None, '2024-05-01T12:00:01',
+                         current_lat=33.5, current_lng=-86.8, distance_to_pickup_km=1.25)
+    assert Response.from_json(simulated.to_json()).to_dict() == simulated.to_dict()
+
+    notification = Notification('a1', 'c1', 'Alice', False, None, '2024-05-01T12:00:02')
+    data = json.loads(notification.to_json())
+    assert not {'compensation', 'pickup_lat', 'delivery_lng'} & set(data)
+    selected = Notification('a1', 'c2', 'Bob', True, 'Bob', '2024-05-01T12:00:02', {'trace_id': 't'},
+                            9.0, 33.5, -86.8, 33.6, -86.7)
+    assert Notification.from_json(selected.to_json()).to_dict() == selected.to_dict()
+
+    selection = Selection('s1', 'a1', 'c2', 'Bob', 'premier intéressé', '2024-05-01T12:00:02')
+    assert Selection.from_json(selection.to_json()).to_dict() == selection.to_dict()
+
+
+def test_older_messages_without_optional_keys_still_decode():
+    notification = Notification.from_dict({'announcement_id': 'a1', 'delivery_person_id': 'c1',
+                                           'delivery_person_name': 'Alice', 'notification_time': 'now'})
+    assert notification.is_selected is False and notification.compensation is None
+    assert models.loads(b'{"x": "\xc3\xa9"}') == {'x': 'é'}
@@ -0,0 +1,100 @@
+import json
+import multiprocessing
+import queue
+
+import fakeredis
+import pytest
+
+import order_workers
+from order_workers import ANNOUNCEMENT_KEY, CHANNELS, PUBLISH_MAX_ATTEMPTS, _publish_batches
+
+
+class FlakyRedis:
+    """Client dont les `failures` premiers pipelines échouent"""
+
+    def __init__(self, redis_client, failures):
+        self.redis_client = redis_client
+        self.failures = failures
+
+    def pipeline(self, transaction=False):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Redis indisponible")
+        return self.redis_client.pipeline(transaction=transaction)
+
+
+class Router:
+    def __init__(self, clients):
+        self.clients = clients
+
+    def client(self, node):
+        return self.clients[node]
+
+
+def entry(index, shard=None):
+    announcement_id = f"a{index}"
+    return announcement_id, shard, json.dumps({'announcement_id': announcement_id}), f"z{index}", ('Pizzas',)
+
+
+def run(batches, primary, router=None, workers=1):
+    """Publie des lots puis la fin des `workers` générateurs, retourne (rapports, publiées)"""
+    queued, reports = queue.Queue(), queue.Queue()
+    for batch in batches:
+        queued.put(batch)
+    for _ in range(workers):
+        queued.put(None)
+    published = multiprocessing.Value('q', 0)
+    _publish_batches(queued, reports, primary, router, None, workers, published)
+    received = []
+    while not reports.empty():
+        received.extend(reports.get())
+    return received, published.value
+
+
+def published_messages(pubsub):
+    # Le premier message lu est la confirmation d'abonnement (ignorée: None)
+    messages = [pubsub.get_message(timeout=0.01) for _ in range(10)]
+    return [json.loads(message['data'])['announcement_id'] for message in messages if message]
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(order_workers, 'PUBLISH_RETRY_INTERVAL', 0.01)
+
+
+def test_announcements_are_written_published_and_reported(redis_client):
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CHANNELS['ORDER_ANNOUNCEMENT'])
+    reports, published = run([[entry(0), entry(1)], [entry(2)]], redis_client, workers=2)
+
+    assert published == 3
+    assert reports == [('a0', 'z0', ('Pizzas',)), ('a1', 'z1', ('Pizzas',)), ('a2', 'z2', ('Pizzas',))]
+    assert redis_client.exists(*(ANNOUNCEMENT_KEY.format(f"a{i}") for i in range(3))) == 3
+    assert published_messages(pubsub) == ['a0', 'a1', 'a2']
+
+
+def test_failed_node_is_retried_without_republishing_the_others(redis_client):
+    other = fakeredis.FakeRedis(decode_responses=True)
+    pubsubs = {}
+    for name, client in (('a', redis_client), ('b', other)):
+        pubsubs[name] = client.pubsub(ignore_subscribe_messages=True)
+        pubsubs[name].subscribe(CHANNELS['ORDER_ANNOUNCEMENT'])
+    router = Router({'a': redis_client, 'b': FlakyRedis(other, failures=2)})
+
+    reports, published = run([[entry(0, 'a'), entry(1, 'b'), entry(2, 'a')]], redis_client, router)
+
+    assert published == 3
+    assert [report[0] for report in reports] == ['a0', 'a2', 'a1']
+    assert published_messages(pubsubs['a']) == ['a0', 'a2']
+    assert published_messages(pubsubs['b']) == ['a1']
+
+
+def test_failed_set_retries_the_whole_batch(redis_client):
+    reports, published = run([[entry(0), entry(1)]], FlakyRedis(redis_client, failures=1))
+    assert published == 2
+    assert [report[0] for report in reports] == ['a0', 'a1']
+
+
+def test_announcements_are_dropped_after_max_attempts(redis_client):
+    reports, published = run([[entry(0)]], FlakyRedis(redis_client, failures=PUBLISH_MAX_ATTEMPTS))
+    assert (reports, published) == ([], 0)
@@ -0,0 +1,59 @@
+import threading
+
+import redis
+
+import redis_connections
+from redis_connections import LISTENER_ERRORS_TOTAL, PUBSUB_DISCONNECTED, PUBSUB_GAP_SECONDS, \
+    PUBSUB_RECONNECTS_TOTAL, listen
+
+
+class FlakyPubSubRedis:
+    """Client dont le premier abonnement échoue comme un Redis redémarré"""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.subscriptions = 0
+
+    def pubsub(self, **kwargs):
+        pubsub = self.redis_client.pubsub(**kwargs)
+        self.subscriptions += 1
+        if self.subscriptions == 1:
+            def subscribe(*channels):
+                raise redis.ConnectionError("Connection refused")
+            pubsub.subscribe = subscribe
+        return pubsub
+
+
+def test_listener_reconnects_resubscribes_and_survives_handler_errors(monkeypatch, redis_client):
+    monkeypatch.setattr(redis_connections, 'RECONNECT_BACKOFF_INITIAL', 0.01)
+    monkeypatch.setattr(redis_connections, 'LISTEN_TIMEOUT', 0.01)
+    reconnects, gaps, errors = PUBSUB_RECONNECTS_TOTAL.value, PUBSUB_GAP_SECONDS.count, LISTENER_ERRORS_TOTAL.value
+    client = FlakyPubSubRedis(redis_client)
+    stop, reconnected, done = threading.Event(), threading.Event(), threading.Event()
+    received = []
+
+    def handler(message):
+        if message['data'] == 'boom':
+            raise ValueError("message illisible")
+        received.append(message['data'])
+        done.set()
+
+    thread = threading.Thread(target=listen, args=(client, ['canal'], handler, lambda: not stop.is_set(), 'test'),
+                              kwargs={'on_reconnect': lambda gap: reconnected.set()}, daemon=True)
+    thread.start()
+    try:
+        assert reconnected.wait(2)
+        redis_client.publish('canal', 'boom')
+        redis_client.publish('canal', 'ok')
+        assert done.wait(2)
+    finally:
+        stop.set()
+        thread.join(2)
+
+    assert not thread.is_alive()
+    assert client.subscriptions == 2
+    assert received == ['ok']
+    assert LISTENER_ERRORS_TOTAL.value == errors + 1
+    assert PUBSUB_RECONNECTS_TOTAL.value == reconnects + 1
+    assert PUBSUB_GAP_SECONDS.count == gaps + 1
+    assert PUBSUB_DISCONNECTED.value == 0
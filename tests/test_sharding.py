@@ -0,0 +1,91 @@
+from collections import Counter
+
+import pytest
+
+from courier_simulation import CourierFleetSimulation
+from livreur_redis import DeliveryPerson, EventHub
+from sharding import COURIER_ZONES_ENV, ConsistentHashRing, ShardRouter, courier_zones, zone_grid
+from spatial_index import zone_for, zones_near
+
+NODES = ['127.0.0.1:6379', '127.0.0.1:6380', '127.0.0.1:6381']
+ZONES = zone_grid(33.3, 33.7, -87.1, -86.5)
+
+
+def test_ring_balances_and_moves_about_one_nth_of_zones():
+    ring = ConsistentHashRing(NODES[:2])
+    before = {zone: ring.node_for(zone) for zone in ZONES}
+    assert ConsistentHashRing(reversed(NODES[:2])).node_for(ZONES[0]) == before[ZONES[0]]
+    assert min(Counter(before.values()).values()) > len(ZONES) / 4
+
+    ring.add_node(NODES[2])
+    after = {zone: ring.node_for(zone) for zone in ZONES}
+    moved = [zone for zone in ZONES if before[zone] != after[zone]]
+    assert all(after[zone] == NODES[2] for zone in moved)
+    assert 0.15 < len(moved) / len(ZONES) < 0.5
+
+    ring.remove_node(NODES[2])
+    assert {zone: ring.node_for(zone) for zone in ZONES} == before
+    with pytest.raises(ValueError):
+        ConsistentHashRing().node_for('z1:1')
+
+
+def test_zones_near_and_courier_zones(monkeypatch):
+    zones = zones_near(33.5186, -86.8104, 3.0)
+    assert zone_for(33.5186, -86.8104) in zones
+    assert zone_for(33.5186 + 2.9 / 111.0, -86.8104) in zones
+    assert len(zones) == len(set(zones))
+
+    monkeypatch.delenv(COURIER_ZONES_ENV, raising=False)
+    assert courier_zones() is None
+    assert courier_zones((33.5186, -86.8104), 3.0) == zones
+    monkeypatch.setenv(COURIER_ZONES_ENV, 'z1508:-4690, z1508:-4689')
+    assert courier_zones((0.0, 0.0)) == ['z1508:-4690', 'z1508:-4689']
+    monkeypatch.setenv(COURIER_ZONES_ENV, '33.5186,-86.8104')
+    assert courier_zones(radius_km=3.0) == zones
+    monkeypatch.setenv(COURIER_ZONES_ENV, 'centre-ville')
+    with pytest.raises(ValueError):
+        courier_zones()
+
+
+def test_subscription_follows_zone_changes():
+    router = ShardRouter(NODES[:2], client_factory=lambda node: node)
+    notified = []
+    first, second = ZONES[0], next(z for z in ZONES if router.node_for_zone(z) != router.node_for_zone(ZONES[0]))
+    subscription = router.subscribe_nodes(notified.append, [first])
+    assert notified == [router.node_for_zone(first)]
+
+    router.update_zones(subscription, [second])
+    router.update_zones(subscription, [first, second])
+    assert sorted(notified) == sorted(NODES[:2])
+
+    router.add_node(NODES[2])
+    assert set(notified) == set(NODES[:2]) | router.nodes_for_zones([first, second])
+    assert len(notified) == len(set(notified))
+
+
+def test_hub_listens_to_its_couriers_zones(redis_client):
+    router = ShardRouter(NODES, client_factory=lambda node: node)
+    hub = EventHub(redis_client, shard_router=router)
+    listened = []
+    hub._start_listener = listened.append
+    hub.start()
+    assert listened == []
+
+    simulation = CourierFleetSimulation(seed=1)
+    courier = DeliveryPerson('c1', 'Sim', hub=hub, auto_respond=True, simulation=simulation)
+    courier.start()
+    assert set(listened) == router.nodes_for_zones(courier.zones)
+    assert zone_for(*simulation.position(courier.sim_index)) in courier.zones
+
+    # Course lointaine: le livreur change de zone et le hub écoute les nœuds de ses nouvelles zones
+    lat, lng = simulation.position(courier.sim_index)
+    simulation.assign(courier.sim_index, 'a1', (lat + 0.5, lng), (lat + 0.5, lng))
+    for _ in range(10):
+        simulation.tick(600)
+    assert zone_for(lat + 0.5, lng) in courier.zones
+    assert set(listened) >= router.nodes_for_zones(courier.zones)
+    assert set(hub.member_zones) == set(courier.zones)
+
+    DeliveryPerson('c2', 'Manuel', hub=hub).start()
+    assert sorted(listened) == sorted(NODES)
+    hub.stop()
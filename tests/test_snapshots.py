@@ -0,0 +1,62 @@
+import time
+
+import snapshots
+from snapshots import (HEADER, SnapshotWriter, load_cached, read_snapshot, restorable, snapshot_path,
+                       source_signature, write_snapshot)
+
+
+def test_round_trip_and_rejected_files(tmp_path):
+    path = snapshot_path('courier-Jean Dupont', str(tmp_path))
+    assert path.endswith('courier-Jean_Dupont.snap')
+    assert read_snapshot(path) is None
+
+    size = write_snapshot(path, {'announcements': {'a': [1, 2]}})
+    assert size == (tmp_path / 'courier-Jean_Dupont.snap').stat().st_size
+    assert read_snapshot(path) == {'announcements': {'a': [1, 2]}}
+    assert [p.name for p in tmp_path.iterdir()] == ['courier-Jean_Dupont.snap']
+
+    data = bytearray(open(path, 'rb').read())
+    data[-1] ^= 0xFF
+    open(path, 'wb').write(bytes(data))
+    assert read_snapshot(path) is None
+
+    write_snapshot(path, {'x': 1})
+    data = bytearray(open(path, 'rb').read())
+    data[5] = snapshots.FORMAT_VERSION + 1
+    open(path, 'wb').write(bytes(data))
+    assert read_snapshot(path) is None
+
+    open(path, 'wb').write(b'x' * (HEADER.size - 1))
+    assert read_snapshot(path) is None
+
+
+def test_restorable_checks_age():
+    assert not restorable(None)
+    assert restorable({'saved_at': time.time()})
+    assert not restorable({'saved_at': time.time() - 60}, max_age=30)
+
+
+def test_load_cached_rebuilds_when_sources_change(tmp_path):
+    source = tmp_path / 'data.csv'
+    source.write_text('a\n')
+    cache = str(tmp_path / 'cache.snap')
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {'rows': len(builds)}
+
+    assert load_cached(cache, source_signature(str(source)), build) == {'rows': 1}
+    assert load_cached(cache, source_signature(str(source)), build) == {'rows': 1}
+    source.write_text('a\nb\n')
+    assert load_cached(cache, source_signature(str(source)), build) == {'rows': 2}
+
+
+def test_writer_only_writes_new_versions(tmp_path):
+    state = {'version': 1}
+    writer = SnapshotWriter(str(tmp_path / 'manager.snap'), lambda: dict(state), lambda: state['version'])
+    assert writer.write()
+    assert not writer.write()
+    state['version'] = 2
+    assert writer.write()
+    assert read_snapshot(writer.path)['version'] == 2
@@ -0,0 +1,23 @@
+import numpy as np
+
+from spatial_index import RestaurantSpatialIndex, haversine_km
+
+
+def test_radius_and_knn_match_brute_force():
+    rng = np.random.default_rng(7)
+    lats = 33.5 + rng.normal(0, 0.05, 2000)
+    lngs = -86.8 + rng.normal(0, 0.05, 2000)
+    lats[0] = np.nan  # coordonnées manquantes: non indexées
+    ids = np.arange(2000)
+    index = RestaurantSpatialIndex(ids, lats, lngs, cell_km=0.5)
+    assert len(index) == 1999
+
+    distances = haversine_km(33.51, -86.79, lats, lngs)
+    ids_in_range, found = index.query_radius(33.51, -86.79, 2.0)
+    expected = ids[np.nan_to_num(distances, nan=np.inf) <= 2.0]
+    assert sorted(ids_in_range.tolist()) == sorted(expected.tolist())
+    assert np.all(np.diff(found) >= 0)
+
+    nearest, _ = index.query_knn(33.51, -86.79, 10)
+    assert nearest.tolist() == ids[np.argsort(np.nan_to_num(distances, nan=np.inf), kind='stable')][:10].tolist()
+    assert len(index.query_knn(0.0, 0.0, 3)[0]) == 3
@@ -0,0 +1,42 @@
+from models import Restaurant
+from stream_analytics import ALL_COURIERS_KEY, ZONE_COURIERS_KEY, CountMinSketch, StreamAnalytics, TopK
+
+
+def test_count_min_sketch_never_underestimates():
+    sketch = CountMinSketch(width=16, depth=3)
+    for key in range(200):
+        sketch.add(key, count=key % 7)
+    assert all(sketch.estimate(key) >= key % 7 for key in range(200))
+
+    sketch = CountMinSketch()
+    sketch.add('r1', 3)
+    sketch.add('r2')
+    assert sketch.estimate('r1') == 3
+    sketch.decay()
+    assert sketch.estimate('r1') == 1.5
+
+
+def test_top_k_keeps_heavy_hitters_within_capacity():
+    top = TopK(capacity=3)
+    for key, count in [('pizza', 50), ('sushi', 30), ('burger', 20)]:
+        top.add(key, count)
+    for i in range(10):
+        top.add(f"rare-{i}")
+
+    assert len(top.counts) == 3
+    assert [key for key, _ in top.top(2)] == ['pizza', 'sushi']
+    top.decay(0.01)
+    assert set(top.counts) == {'pizza'}
+
+
+def test_acceptance_and_unique_couriers(redis_client):
+    analytics = StreamAnalytics(redis_client)
+    restaurant = Restaurant(id=7, name='Chez Paul', address='1 rue', lat=33.5, lng=-86.8)
+    for i in range(4):
+        analytics.response('z1:2', restaurant, f"c{i % 3}", is_interested=i < 3)
+    analytics.flush()
+
+    assert analytics.acceptance(7) == {'responses': 4, 'interested': 3, 'acceptance_rate': 0.75}
+    assert analytics.top_restaurants(1)[0]['name'] == 'Chez Paul'
+    assert analytics.unique_couriers() == {'all': 3, 'zones': {'z1:2': 3}}
+    assert redis_client.pfcount(ALL_COURIERS_KEY) == redis_client.pfcount(ZONE_COURIERS_KEY.format('z1:2'))
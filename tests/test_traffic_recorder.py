@@ -0,0 +1,64 @@
+import gzip
+import os
+import time
+
+import fakeredis
+
+from traffic_recorder import TrafficRecorder, capture_info, list_captures, list_segments, read_capture, replay
+
+
+def record(directory, messages, spacing_ns):
+    """Capture synthétique: un message toutes les spacing_ns, segments compressés"""
+    recorder = TrafficRecorder(str(directory), redis_client=object(), max_segment_bytes=200)
+    recorder._open_segment()
+    for i, (channel, data) in enumerate(messages):
+        recorder.write(channel, data, recorder.monotonic_start_ns + i * spacing_ns)
+    recorder._close_segment()
+    for thread in recorder.compression_threads:
+        thread.join()
+    return recorder.capture_start_ns
+
+
+def test_segments_rotate_and_read_back_in_order(tmp_path):
+    messages = [('order:announcement', f'announcement-{i}'.encode() * 5) for i in range(10)]
+    record(tmp_path, messages, 1_000_000)
+    assert len(list_segments(str(tmp_path))) > 1
+    assert [data for _, _, data in read_capture(str(tmp_path))] == [data for _, data in messages]
+
+
+def test_captures_in_one_directory_stay_separate(tmp_path):
+    first = record(tmp_path, [('order:announcement', b'a')] * 11, 100_000_000)  # 1 s
+    time.sleep(0.01)
+    second = record(tmp_path, [('delivery:response', b'r')] * 3, 100_000_000)  # 0.2 s
+    assert list_captures(str(tmp_path)) == [first, second]
+
+    latest = capture_info(str(tmp_path))
+    assert latest['capture'] == second
+    assert latest['channels'] == {'delivery:response': 3}
+    assert latest['duration_seconds'] == 0.2
+
+    older = capture_info(str(tmp_path), first)
+    assert older['channels'] == {'order:announcement': 11}
+    assert older['duration_seconds'] == 1.0
+
+
+def test_uncompressed_duplicate_of_a_compressed_segment_is_skipped(tmp_path):
+    record(tmp_path, [('order:announcement', b'a')] * 2, 1_000)
+    [path] = list_segments(str(tmp_path))
+    with gzip.open(path, 'rb') as source, open(path[:-len('.gz')], 'wb') as target:
+        target.write(source.read())
+    assert list_segments(str(tmp_path)) == [path]
+    assert len(list(read_capture(str(tmp_path)))) == 2
+
+    os.remove(path)  # compression en cours: seul le .bin est complet
+    open(path + '.tmp', 'wb').close()
+    assert list_segments(str(tmp_path)) == [path[:-len('.gz')]]
+
+
+def test_replay_publishes_only_the_selected_capture(tmp_path):
+    first = record(tmp_path, [('order:announcement', b'a')] * 4, 1_000)
+    time.sleep(0.01)
+    record(tmp_path, [('delivery:response', b'r')] * 2, 1_000)
+    client = fakeredis.FakeRedis()
+    assert replay(str(tmp_path), client, speed=0)['messages'] == 2
+    assert replay(str(tmp_path), client, speed=0, capture=first)['messages'] == 4
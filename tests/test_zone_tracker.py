@@ -0,0 +1,145 @@
+import time
+from types import SimpleNamespace
+
+import fakeredis
+
+from courier_simulation import CourierFleetSimulation
+from history_mongo import InMemoryCollection, OrderHistorySink
+from manager_redis import DeliveryManager
+from models import Response
+from order_workers import ANNOUNCEMENT_KEY
+from spatial_index import zone_for
+from zone_tracker import MAX_SURGE, RingCounter, ZoneTracker, compute_surge
+
+
+def test_ring_counter_drops_buckets_leaving_the_window():
+    counter = RingCounter(window_seconds=30, bucket_seconds=10)
+    counter.add(2, now=100)
+    counter.add(3, now=115)
+    assert counter.value(now=125) == 5
+    assert counter.value(now=135) == 3
+    assert counter.value(now=200) == 0
+
+
+def test_surge_grows_with_unserved_orders_and_low_acceptance():
+    assert compute_surge(open_orders=2, available_couriers=3, responses=0, interested=0) == 1.0
+    assert compute_surge(open_orders=4, available_couriers=2, responses=0, interested=0) == 1.5
+    assert compute_surge(open_orders=0, available_couriers=0, responses=10, interested=1) == 1.4
+    assert compute_surge(open_orders=50, available_couriers=0, responses=0, interested=0) == MAX_SURGE
+
+
+def test_available_couriers_are_distinct_couriers():
+    tracker = ZoneTracker()
+    for _ in range(5):
+        tracker.response('z', True, 'same-courier')
+    tracker.response('z', True, 'other-courier')
+    tracker.response('z', False, 'third-courier')
+    tracker.refresh()
+    assert tracker.zone_stats['z']['available_couriers'] == 2
+    assert tracker.zone_stats['z']['responses'] == 7
+
+
+def test_trackers_share_distinct_couriers_and_open_orders_through_redis():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    first, second = ZoneTracker(client), ZoneTracker(client)
+    first.response('z', True, 'a')
+    second.response('z', True, 'a')
+    second.response('z', True, 'b')
+    for _ in range(4):
+        first.order_opened('z')
+    first.refresh()
+    second.refresh()
+    assert second.zone_stats['z'] == {'open_orders': 4, 'available_couriers': 2,
+                                      'acceptance_rate': 1.0, 'responses': 3}
+    assert second.surge_multiplier('z') == 1.5
+
+
+def test_unanswered_announcement_expires_and_closes_its_zone(dataset, redis_client):
+    tracker = ZoneTracker()
+    collection = InMemoryCollection()
+    sink = OrderHistorySink(collection)
+    manager = DeliveryManager(dataset=dataset, redis_client=redis_client, auto_select=True,
+                              zone_tracker=tracker, history_sink=sink, announcement_ttl=0.2)
+    manager.start()
+    try:
+        announcement_id = manager.create_and_publish_announcement()
+        zone = manager.active_announcements[announcement_id].zone
+        assert tracker.open_orders[zone] == 1
+        deadline = time.monotonic() + 5
+        while manager.active_announcements and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        manager.stop()
+    assert not manager.active_announcements
+    assert tracker.open_orders[zone] == 0
+    assert [document['status'] for document in collection.documents] == ['closed']
+
+
+def test_worker_announcements_count_in_their_zone_from_publication(dataset, redis_client, make_announcement):
+    tracker = ZoneTracker()
+    collection = InMemoryCollection()
+    pool = SimpleNamespace(stop=lambda: None)
+    manager = DeliveryManager(dataset=dataset, redis_client=redis_client, zone_tracker=tracker,
+                              history_sink=OrderHistorySink(collection), order_workers=pool,
+                              announcement_ttl=0.3)
+    early, answered, unanswered = (make_announcement() for _ in range(3))
+    for announcement in (early, answered, unanswered):
+        redis_client.set(ANNOUNCEMENT_KEY.format(announcement.announcement_id), announcement.to_json())
+
+    def respond(announcement):
+        manager._process_delivery_response(Response(
+            response_id='r', delivery_person_id='c1', delivery_person_name='Alice',
+            announcement_id=announcement.announcement_id, is_interested=False, estimated_arrival_time=5,
+            current_location='Centre', response_time='2024-05-01T12:00:00'))
+
+    def open_orders():
+        return sum(tracker.open_orders.values())
+
+    manager.start()
+    try:
+        # Réponse plus rapide que le signalement de la publication: comptée une seule fois
+        respond(early)
+        pool.on_published([(a.announcement_id, a.zone, ('pizza',)) for a in (early, answered, unanswered)])
+        assert open_orders() == 3
+        respond(answered)
+        assert open_orders() == 3 and unanswered.announcement_id not in manager.active_announcements
+
+        deadline = time.monotonic() + 5
+        while (manager.active_announcements or manager.unloaded_announcements) and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        manager.stop()
+    assert open_orders() == 0
+    assert not manager.loaded_before_report
+    assert len(collection.documents) == 3
+    assert redis_client.get(ANNOUNCEMENT_KEY.format(unanswered.announcement_id)) is None
+
+
+def test_idle_couriers_count_as_available_supply():
+    tracker = ZoneTracker()
+    tracker.couriers_idle({'z': ['a', 'b', 'c'], 'y': ['d']})
+    tracker.response('z', True, 'a')
+    tracker.response('z', True, 'manuel')
+    for _ in range(5):
+        tracker.order_opened('z')
+    tracker.refresh()
+    assert tracker.zone_stats['z']['available_couriers'] == 4
+    assert tracker.zone_stats['y']['available_couriers'] == 1
+    assert tracker.surge_multiplier('z') == 1.25
+
+
+def test_simulation_reports_idle_couriers_once_per_bucket():
+    client = fakeredis.FakeRedis(decode_responses=True)
+    simulation_tracker, manager_tracker = ZoneTracker(client), ZoneTracker(client)
+    simulation = CourierFleetSimulation(seed=1, zone_tracker=simulation_tracker)
+    for courier_id in ('a', 'b', 'c'):
+        simulation.add_courier(courier_id, 33.5, -86.8)
+    simulation.assign(simulation.index_by_id['c'], 'x', (33.51, -86.8), (33.52, -86.8))
+
+    assert simulation.report_idle(now=100) == 2
+    assert simulation.report_idle(now=105) == 0
+    zone = zone_for(33.5, -86.8)
+    manager_tracker.order_opened(zone)
+    simulation_tracker.refresh()
+    manager_tracker.refresh()
+    assert manager_tracker.zone_stats[zone]['available_couriers'] == 2
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Traçage - Identifiant de trace et horodatages numériques par étape
+Chaque annonce, réponse, sélection et notification porte un champ 'trace':
+    {'id': '<16 hex>', 'hops': {'created': 1234, 'published': 1240, ...}}
+Les horodatages sont des entiers en microsecondes sur l'horloge monotone du
+système (CLOCK_MONOTONIC, commune à tous les processus d'une même machine).
+Pour des processus sur plusieurs machines, TRACE_CLOCK=wall utilise l'heure
+système (à synchroniser par NTP).
+
+Le collecteur reconstruit la chronologie de chaque annonce:
+    python3 tracing.py
+"""
+import copy
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from redis_connections import get_client, listen
+
+# Configuration Redis
+REDIS_HOST = 'localhost'
+REDIS_PORT = 6379
+REDIS_DB = 0
+
+# Channels Redis
+CHANNELS = {
+    'ORDER_ANNOUNCEMENT': 'order:announcement',
+    'DELIVERY_RESPONSE': 'delivery:response',
+    'DELIVERY_SELECTION': 'delivery:selection',
+    'DELIVERY_NOTIFICATION': 'delivery:notification'
+}
+
+# Horloge des horodatages: 'monotonic' (défaut) ou 'wall'
+TRACE_CLOCK = os.environ.get('TRACE_CLOCK', 'monotonic')
+
+if TRACE_CLOCK == 'wall':
+    def now_us() -> int:
+        """Horodatage en microsecondes (heure système)"""
+        return time.time_ns() // 1000
+else:
+    def now_us() -> int:
+        """Horodatage en microsecondes (horloge monotone du système)"""
+        return time.monotonic_ns() // 1000
+
+# Étapes mesurées, dans l'ordre du pipeline
+STAGES = [
+    'publish',       # created -> published: construction et publication de l'annonce
+    'delivery',      # published -> received: transit Redis jusqu'au livreur
+    'decode',        # received -> decoded: décodage JSON côté livreur
+    'response',      # decoded -> responded: décision du livreur (humain ou auto)
+    'selection',     # première réponse -> selected: attente puis choix du manager
+    'notification',  # selected -> notified: envoi des notifications
+]
+
+# Nombre maximal de chronologies gardées par le collecteur
+DEFAULT_MAX_TRACES = 10000
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def start_trace() -> Dict:
+    """Nouvelle trace, étape 'created' horodatée"""
+    return {'id': new_trace_id(), 'hops': {'created': now_us()}}
+
+
+def child_trace(trace: Optional[Dict], **hops) -> Optional[Dict]:
+    """Trace d'un message dérivé (réponse, sélection, notification) avec ses propres étapes"""
+    if not trace:
+        return None
+    return {'id': trace['id'], 'hops': hops}
+
+
+def stamp(trace: Optional[Dict], hop: str, timestamp: Optional[int] = None):
+    """Horodate une étape d'une trace (sans effet si le message n'a pas de trace)"""
+    if trace:
+        trace['hops'][hop] = timestamp if timestamp is not None else now_us()
+
+
+class TraceCollector:
+    """Reconstruit la chronologie de chaque annonce à partir des 4 channels"""
+
+    def __init__(self, redis_client=None, max_traces: int = DEFAULT_MAX_TRACES):
+        if redis_client is None:
+            redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB)
+        self.redis_client = redis_client
+        self.max_traces = max_traces
+        self.timelines: 'OrderedDict[str, Dict]' = OrderedDict()
+        self.lock = threading.Lock()
+        self.running = False
+        self.listener_thread = None
+
+    def start(self):
+        self.running = True
+        self.listener_thread = threading.Thread(target=self._listen)
+        self.listener_thread.daemon = True
+        self.listener_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.listener_thread:
+            self.listener_thread.join(timeout=5)
+
+    def _listen(self):
+        listen(self.redis_client, CHANNELS.values(), self._handle_message, lambda: self.running, 'traces')
+
+    def _handle_message(self, message):
+        try:
+            self.add(message['channel'], json.loads(message['data']))
+        except (ValueError, KeyError, TypeError):
+            pass
+
+    def add(self, channel: str, payload: Dict):
+        """Ajoute un message à la chronologie de sa trace"""
+        trace = payload.get('trace')
+        if not trace:
+            return
+
+        with self.lock:
+            timeline = self.timelines.get(trace['id'])
+            if timeline is None:
+                timeline = {'announcement_id': payload.get('announcement_id'), 'announcement': {},
+                            'responses': {}, 'selection': {}, 'notifications': {}}
+                self.timelines[trace['id']] = timeline
+                if len(self.timelines) > self.max_traces:
+                    self.timelines.popitem(last=False)
+
+            hops = trace['hops']
+            if channel == CHANNELS['ORDER_ANNOUNCEMENT']:
+                timeline['announcement'].update(hops)
+            elif channel == CHANNELS['DELIVERY_RESPONSE']:
+                timeline['responses'][payload.get('delivery_person_id', '?')] = hops
+            elif channel == CHANNELS['DELIVERY_SELECTION']:
+                timeline['selection'].update(hops)
+            elif channel == CHANNELS['DELIVERY_NOTIFICATION']:
+                timeline['notifications'][payload.get('delivery_person_id', '?')] = hops
+
+    def stage_durations(self, trace_id: str) -> Dict[str, List[float]]:
+        """Durées (ms) de chaque étape d'une trace; une valeur par livreur si besoin"""
+        with self.lock:
+            timeline = copy.deepcopy(self.timelines.get(trace_id))
+        if timeline is None:
+            return {}
+
+        durations: Dict[str, List[float]] = {}
+
+        def add(stage, start, end):
+            if start is not None and end is not None:
+                durations.setdefault(stage, []).append((end - start) / 1000)
+
+        announcement = timeline['announcement']
+        selection = timeline['selection']
+        add('publish', announcement.get('created'), announcement.get('published'))
+
+        for hops in timeline['responses'].values():
+            add('delivery', announcement.get('published'), hops.get('received'))
+            add('decode', hops.get('received'), hops.get('decoded'))
+            add('response', hops.get('decoded'), hops.get('responded'))
+
+        responded = [hops['responded'] for hops in timeline['responses'].values() if 'responded' in hops]
+        if responded:
+            add('selection', min(responded), selection.get('selected'))
+
+        for hops in timeline['notifications'].values():
+            add('notification', selection.get('selected'), hops.get('notified'))
+        return durations
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """p50/p95/max par étape sur toutes les traces gardées"""
+        with self.lock:
+            trace_ids = list(self.timelines.keys())
+
+        samples: Dict[str, List[float]] = {}
+        for trace_id in trace_ids:
+            for stage, values in self.stage_durations(trace_id).items():
+                samples.setdefault(stage, []).extend(values)
+
+        summary = {}
+        for stage in STAGES:
+            values = sorted(samples.get(stage, []))
+            if not values:
+                continue
+            summary[stage] = {
+                'count': len(values),
+                'p50': round(values[len(values) // 2], 3),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+                'max': round(values[-1], 3)
+            }
+        return summary
+
+    def print_summary(self):
+        summary = self.stage_summary()
+        print(f"\n{'='*60}")
+        print(f"🔎 DURÉE DES ÉTAPES ({len(self.timelines)} traces)")
+        print(f"{'='*60}")
+        if not summary:
+            print("   Aucune trace complète pour le moment")
+        slowest = max(summary.items(), key=lambda item: item[1]['p50'])[0] if summary else None
+        for stage, values in summary.items():
+            marker = "🐢" if stage == slowest else "  "
+            print(f"{marker} {stage:<13} n={values['count']:<6} p50={values['p50']:>10.3f}ms "
+                  f"p95={values['p95']:>10.3f}ms max={values['max']:>10.3f}ms")
+        print(f"{'='*60}")
+
+
+def main():
+    """Collecteur de traces: affiche la durée des étapes toutes les 10 secondes"""
+    print("🔎 COLLECTEUR DE TRACES")
+    print("=" * 50)
+    collector = TraceCollector()
+    collector.start()
+    print("💡 Ctrl+C pour arrêter")
+    try:
+        while True:
+            time.sleep(10)
+            collector.print_summary()
+    except KeyboardInterrupt:
+        collector.print_summary()
+    finally:
+        collector.stop()
+
+
+if __name__ == "__main__":
+    main()
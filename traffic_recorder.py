@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Enregistreur de trafic Redis - Capture et rejeu des 4 channels
+Enregistre chaque message avec un horodatage monotone dans des segments
+binaires append-only, tournants et compressés, puis les republie à 1x, Nx
+ou vitesse maximale.
+
+Exemples:
+    python3 traffic_recorder.py record captures/
+    python3 traffic_recorder.py replay captures/ --speed 5
+    python3 traffic_recorder.py info captures/
+    python3 traffic_recorder.py replay captures/ --capture 1718000000000000000
+
+Un répertoire peut contenir plusieurs captures (capture-<début ns>-<segment>.bin):
+chacune est lue séparément, la plus récente par défaut.
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from redis_connections import get_client, listen
+
+# Configuration Redis
+REDIS_HOST = 'localhost'
+REDIS_PORT = 6379
+REDIS_DB = 0
+
+# Channels Redis
+CHANNELS = {
+    'ORDER_ANNOUNCEMENT': 'order:announcement',
+    'DELIVERY_RESPONSE': 'delivery:response',
+    'DELIVERY_SELECTION': 'delivery:selection',
+    'DELIVERY_NOTIFICATION': 'delivery:notification'
+}
+
+# Format des segments:
+#   en-tête: MAGIC, début de capture (ns epoch), numéro de segment, table des channels (JSON)
+#   message: délai depuis le début de capture (ns monotone), index du channel, taille, contenu
+MAGIC = b'UBRC1'
+SEGMENT_HEADER = struct.Struct('<QIH')
+RECORD_HEADER = struct.Struct('<QBI')
+
+# Rotation par défaut
+DEFAULT_MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_SEGMENT_SECONDS = 3600
+
+# Nom des segments: capture-<début de capture ns>-<numéro>.bin[.gz]
+SEGMENT_NAME_PATTERN = re.compile(r'^capture-(\d+)-(\d+)\.bin(\.gz)?$')
+
+# Taille des lots publiés en pipeline en vitesse maximale
+REPLAY_BATCH_SIZE = 500
+
+
+class TrafficRecorder:
+    """Abonné à tous les channels, écrit les messages dans des segments tournants"""
+
+    def __init__(self, output_dir: str, redis_client=None, channels: Optional[List[str]] = None,
+                 max_segment_bytes: int = DEFAULT_MAX_SEGMENT_BYTES,
+                 max_segment_seconds: float = DEFAULT_MAX_SEGMENT_SECONDS):
+        if redis_client is None:
+            redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB, decode_responses=False)
+        self.redis_client = redis_client
+        self.output_dir = output_dir
+        self.channels = channels or list(CHANNELS.values())
+        self.channel_index = {channel: i for i, channel in enumerate(self.channels)}
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_seconds = max_segment_seconds
+
+        self.running = False
+        self.listener_thread = None
+        self.segment_file = None
+        self.segment_path = None
+        self.segment_number = 0
+        self.segment_bytes = 0
+        self.segment_opened_at = 0.0
+        self.compression_threads = []
+
+        self.stats = {'messages': 0, 'bytes': 0, 'segments': 0}
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.capture_start_ns = time.time_ns()
+        self.monotonic_start_ns = time.monotonic_ns()
+
+    def start(self):
+        """Démarre la capture"""
+        self.running = True
+        self._open_segment()
+        self.listener_thread = threading.Thread(target=self._listen)
+        self.listener_thread.daemon = True
+        self.listener_thread.start()
+        print(f"🎙️  Enregistrement de {len(self.channels)} channels dans {self.output_dir}")
+
+    def stop(self):
+        """Arrête la capture et compresse le dernier segment"""
+        self.running = False
+        if self.listener_thread:
+            self.listener_thread.join(timeout=5)
+        self._close_segment()
+        for thread in self.compression_threads:
+            thread.join()
+        print(f"✅ Capture terminée: {self.stats['messages']} messages, {self.stats['segments']} segment(s)")
+
+    def _listen(self):
+        listen(self.redis_client, self.channels, self._handle_message, lambda: self.running, 'recorder',
+               on_idle=self._rotate_if_needed)
+
+    def _handle_message(self, message):
+        channel = message['channel']
+        if isinstance(channel, bytes):
+            channel = channel.decode('utf-8')
+        data = message['data']
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.write(channel, data, time.monotonic_ns())
+
+    def write(self, channel: str, data: bytes, monotonic_ns: int):
+        """Ajoute un message au segment courant"""
+        offset_ns = monotonic_ns - self.monotonic_start_ns
+        record = RECORD_HEADER.pack(offset_ns, self.channel_index[channel], len(data)) + data
+        self.segment_file.write(record)
+        self.segment_bytes += len(record)
+        self.stats['messages'] += 1
+        self.stats['bytes'] += len(record)
+        self._rotate_if_needed()
+
+    def _rotate_if_needed(self):
+        if (self.segment_bytes >= self.max_segment_bytes
+                or time.monotonic() - self.segment_opened_at >= self.max_segment_seconds):
+            self._close_segment()
+            self._open_segment()
+
+    def _open_segment(self):
+        self.segment_number += 1
+        name = f"capture-{self.capture_start_ns}-{self.segment_number:05d}.bin"
+        self.segment_path = os.path.join(self.output_dir, name)
+        self.segment_file = open(self.segment_path, 'wb')
+
+        table = json.dumps(self.channels).encode('utf-8')
+        self.segment_file.write(MAGIC + SEGMENT_HEADER.pack(self.capture_start_ns, self.segment_number, len(table)) + table)
+        self.segment_bytes = 0
+        self.segment_opened_at = time.monotonic()
+        self.stats['segments'] += 1
+
+    def _close_segment(self):
+        if not self.segment_file:
+            return
+        self.segment_file.close()
+        path = self.segment_path
+        self.segment_file = None
+
+        # Compression en arrière-plan pour ne pas retarder la capture
+        thread = threading.Thread(target=_compress_segment, args=(path,))
+        thread.start()
+        self.compression_threads = [t for t in self.compression_threads if t.is_alive()] + [thread]
+
+
+def _compress_segment(path: str):
+    """Compresse un segment terminé (.bin -> .bin.gz)"""
+    with open(path, 'rb') as source, gzip.open(path + '.gz.tmp', 'wb') as target:
+        shutil.copyfileobj(source, target)
+    os.replace(path + '.gz.tmp', path + '.gz')
+    os.remove(path)
+
+
+def _segment_names(capture_dir: str) -> Dict[int, List[Tuple[int, str]]]:
+    """Segments du répertoire groupés par capture: début ns -> [(numéro, nom)]
+
+    Un .bin dont la version compressée existe déjà (compression interrompue entre
+    os.replace et os.remove) est ignoré. Pendant la compression (.gz.tmp), le .bin
+    reste la seule copie complète et il est lu.
+    """
+    names = set(os.listdir(capture_dir))
+    captures: Dict[int, List[Tuple[int, str]]] = {}
+    for name in names:
+        match = SEGMENT_NAME_PATTERN.match(name)
+        if match is None or (not match.group(3) and name + '.gz' in names):
+            continue
+        captures.setdefault(int(match.group(1)), []).append((int(match.group(2)), name))
+    return captures
+
+
+def list_captures(capture_dir: str) -> List[int]:
+    """Débuts (ns epoch) des captures du répertoire, de la plus ancienne à la plus récente"""
+    return sorted(_segment_names(capture_dir))
+
+
+def list_segments(capture_dir: str, capture: Optional[int] = None) -> List[str]:
+    """Segments d'une capture (la plus récente par défaut), dans l'ordre"""
+    captures = _segment_names(capture_dir)
+    if not captures:
+        return []
+    if capture is None:
+        capture = max(captures)
+    elif capture not in captures:
+        raise ValueError(f"Capture {capture} absente de {capture_dir}")
+    return [os.path.join(capture_dir, name) for _, name in sorted(captures[capture])]
+
+
+def read_segment(path: str) -> Iterator[Tuple[int, str, bytes]]:
+    """Messages d'un segment: (délai ns depuis le début de capture, channel, contenu)"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as segment:
+        if segment.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Segment invalide: {path}")
+        _, _, table_size = SEGMENT_HEADER.unpack(segment.read(SEGMENT_HEADER.size))
+        channels = json.loads(segment.read(table_size))
+
+        while True:
+            header = segment.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return  # fin du segment (ou segment tronqué par un arrêt brutal)
+            offset_ns, channel_index, size = RECORD_HEADER.unpack(header)
+            data = segment.read(size)
+            if len(data) < size:
+                return
+            yield offset_ns, channels[channel_index], data
+
+
+def read_capture(capture_dir: str, capture: Optional[int] = None) -> Iterator[Tuple[int, str, bytes]]:
+    """Tous les messages d'une capture (la plus récente par défaut), dans l'ordre d'enregistrement"""
+    for path in list_segments(capture_dir, capture):
+        yield from read_segment(path)
+
+
+def replay(capture_dir: str, redis_client=None, speed: float = 1.0, capture: Optional[int] = None) -> Dict:
+    """Republie une capture (la plus récente par défaut); speed=0 pour la vitesse maximale"""
+    if redis_client is None:
+        redis_client = get_client(REDIS_HOST, REDIS_PORT, REDIS_DB, decode_responses=False)
+
+    published = 0
+    first_offset_ns = None
+    start = time.monotonic()
+    pipe = redis_client.pipeline(transaction=False)
+    pending = 0
+
+    for offset_ns, channel, data in read_capture(capture_dir, capture):
+        if speed > 0:
+            if first_offset_ns is None:
+                first_offset_ns = offset_ns
+            delay = start + (offset_ns - first_offset_ns) / 1e9 / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            redis_client.publish(channel, data)
+        else:
+            pipe.publish(channel, data)
+            pending += 1
+            if pending >= REPLAY_BATCH_SIZE:
+                pipe.execute()
+                pending = 0
+        published += 1
+
+    if pending:
+        pipe.execute()
+
+    duration = time.monotonic() - start
+    return {'messages': published, 'seconds': round(duration, 3),
+            'messages_per_sec': round(published / duration, 1) if duration else None}
+
+
+def capture_info(capture_dir: str, capture: Optional[int] = None) -> Dict:
+    """Résumé d'une capture (la plus récente par défaut): messages par channel et durée"""
+    captures = list_captures(capture_dir)
+    if capture is None and captures:
+        capture = captures[-1]
+    counts: Dict[str, int] = {}
+    first = last = None
+    for offset_ns, channel, _ in read_capture(capture_dir, capture):
+        counts[channel] = counts.get(channel, 0) + 1
+        first = offset_ns if first is None else first
+        last = offset_ns
+    duration = (last - first) / 1e9 if first is not None else 0.0
+    return {'capture': capture, 'captures': captures, 'segments': len(list_segments(capture_dir, capture)),
+            'channels': counts, 'duration_seconds': round(duration, 3)}
+
+
+def main():
+    """Point d'entrée en ligne de commande"""
+    parser = argparse.ArgumentParser(description="Capture et rejeu du trafic Redis Pub/Sub")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="enregistrer le trafic")
+    record_parser.add_argument('output_dir')
+    record_parser.add_argument('--max-mb', type=float, default=DEFAULT_MAX_SEGMENT_BYTES / (1024 * 1024),
+                               help="taille max d'un segment avant rotation")
+    record_parser.add_argument('--max-minutes', type=float, default=DEFAULT_MAX_SEGMENT_SECONDS / 60,
+                               help="durée max d'un segment avant rotation")
+
+    replay_parser = subparsers.add_parser('replay', help="republier une capture")
+    replay_parser.add_argument('capture_dir')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help="1 = temps réel, N = N fois plus vite, 0 = max")
+    replay_parser.add_argument('--capture', type=int, help="début (ns) de la capture à rejouer (la plus récente sinon)")
+
+    info_parser = subparsers.add_parser('info', help="résumé d'une capture")
+    info_parser.add_argument('capture_dir')
+    info_parser.add_argument('--capture', type=int, help="début (ns) de la capture (la plus récente sinon)")
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        recorder = TrafficRecorder(args.output_dir, max_segment_bytes=int(args.max_mb * 1024 * 1024),
+                                   max_segment_seconds=args.max_minutes * 60)
+        recorder.start()
+        print("💡 Ctrl+C pour arrêter")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            recorder.stop()
+
+    elif args.command == 'replay':
+        speed_label = "max" if args.speed <= 0 else f"{args.speed:g}x"
+        print(f"▶️  Rejeu de {args.capture_dir} ({speed_label})")
+        result = replay(args.capture_dir, speed=args.speed, capture=args.capture)
+        print(f"✅ {result['messages']} messages republiés en {result['seconds']}s ({result['messages_per_sec']}/s)")
+
+    elif args.command == 'info':
+        info = capture_info(args.capture_dir, args.capture)
+        if len(info['captures']) > 1:
+            print(f"🗂️  {len(info['captures'])} captures: {', '.join(map(str, info['captures']))} (--capture)")
+        print(f"📼 Capture {info['capture']}: {info['segments']} segment(s), {info['duration_seconds']}s")
+        for channel, count in sorted(info['channels'].items()):
+            print(f"   {channel}: {count} messages")
+
+
+if __name__ == "__main__":
+    main()
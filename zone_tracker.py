@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Suivi offre/demande par zone - Multiplicateur de compensation (surge)
+Chaque événement (annonce ouverte ou close, réponse d'un livreur, livreurs
+libres signalés par la simulation) est compté en O(1) dans des tampons circulaires par zone, en mémoire. Un thread de fond
+pousse ces compteurs dans Redis toutes les secondes et relit les totaux de
+tous les managers pour recalculer le multiplicateur de chaque zone.
+Le chemin des annonces ne fait donc qu'une lecture de dictionnaire.
+
+Clés Redis:
+    zones:trackers              ZSET des trackers actifs (score = dernier flush)
+    zones:open:{tracker_id}     HASH zone -> annonces ouvertes de ce tracker
+    zones:{metric}:{bucket}     HASH zone -> événements du bucket (responses, interested)
+    zones:couriers:{bucket}:{zone}  HyperLogLog des livreurs disponibles du bucket
+"""
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from console import get_logger
+
+# Fenêtre glissante et granularité des buckets
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_BUCKET_SECONDS = 10
+DEFAULT_REFRESH_INTERVAL = 1.0
+
+# Paramètres du multiplicateur
+SURGE_SENSITIVITY = 0.25   # hausse par commande ouverte en plus des livreurs disponibles
+TARGET_ACCEPTANCE = 0.5    # en dessous, le multiplicateur augmente
+MIN_RESPONSES = 5          # réponses minimales avant de tenir compte du taux d'acceptation
+MAX_SURGE = 2.5
+
+TRACKERS_KEY = 'zones:trackers'
+OPEN_KEY = 'zones:open:{}'
+BUCKET_KEY = 'zones:{}:{}'
+COURIERS_KEY = 'zones:couriers:{}:{}'
+WINDOW_METRICS = ('responses', 'interested')
+
+log = get_logger('zones')
+
+
+class RingCounter:
+    """Compteur sur fenêtre glissante: tampon circulaire de buckets, total tenu à jour"""
+
+    __slots__ = ('bucket_seconds', 'counts', 'bucket_ids', 'total')
+
+    def __init__(self, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 bucket_seconds: float = DEFAULT_BUCKET_SECONDS):
+        size = max(1, int(math.ceil(window_seconds / bucket_seconds)))
+        self.bucket_seconds = bucket_seconds
+        self.counts = [0] * size
+        self.bucket_ids = [-1] * size
+        self.total = 0
+
+    def add(self, value: int = 1, now: Optional[float] = None):
+        bucket_id = int((now if now is not None else time.time()) // self.bucket_seconds)
+        slot = bucket_id % len(self.counts)
+        if self.bucket_ids[slot] != bucket_id:
+            # Bucket périmé: il sort de la fenêtre
+            self.total -= self.counts[slot]
+            self.counts[slot] = 0
+            self.bucket_ids[slot] = bucket_id
+        self.counts[slot] += value
+        self.total += value
+
+    def value(self, now: Optional[float] = None) -> int:
+        """Total de la fenêtre (les buckets périmés sont retirés au passage)"""
+        oldest = int((now if now is not None else time.time()) // self.bucket_seconds) - len(self.counts) + 1
+        for slot, bucket_id in enumerate(self.bucket_ids):
+            if 0 <= bucket_id < oldest:
+                self.total -= self.counts[slot]
+                self.counts[slot] = 0
+                self.bucket_ids[slot] = -1
+        return self.total
+
+
+def compute_surge(open_orders: int, available_couriers: int, responses: int, interested: int) -> float:
+    """Multiplicateur d'une zone: commandes ouvertes face aux livreurs distincts disponibles
+    récemment, majoré si le taux d'acceptation est bas"""
+    surge = 1.0 + SURGE_SENSITIVITY * max(0, open_orders - available_couriers)
+    if responses >= MIN_RESPONSES:
+        acceptance = interested / responses
+        if acceptance < TARGET_ACCEPTANCE:
+            surge *= 1.0 + (TARGET_ACCEPTANCE - acceptance)
+    return round(min(MAX_SURGE, surge), 2)
+
+
+class ZoneTracker:
+    """Annonces ouvertes, livreurs disponibles et taux d'acceptation par zone
+
+    Les livreurs disponibles d'une zone sont les livreurs distincts vus libres sur la
+    fenêtre glissante (HyperLogLog par bucket dans Redis, ensemble en mémoire sinon):
+    signalés par la simulation (couriers_idle), ou déclarés intéressés pour les livreurs
+    sans position simulée, toujours libres. Sans Redis, seuls les événements du processus comptent.
+    """
+
+    def __init__(self, redis_client=None, window_seconds: float = DEFAULT_WINDOW_SECONDS,
+                 bucket_seconds: float = DEFAULT_BUCKET_SECONDS,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        self.redis_client = redis_client
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.refresh_interval = refresh_interval
+        self.tracker_id = uuid.uuid4().hex[:12]
+
+        self.lock = threading.Lock()
+        self.open_orders: Dict[str, int] = defaultdict(int)
+        self.windows: Dict[str, Dict[str, RingCounter]] = {}
+        self.pending: Dict[tuple, int] = defaultdict(int)  # (metric, bucket, zone) -> à pousser
+        self.couriers: Dict[str, Dict[str, float]] = defaultdict(dict)  # zone -> livreur -> vu libre
+        self.pending_couriers: Dict[tuple, set] = defaultdict(set)  # (bucket, zone) -> livreurs à pousser
+
+        # Vue globale (tous les managers) recalculée par le thread de fond
+        self.zone_stats: Dict[str, Dict] = {}
+        self.surge: Dict[str, float] = {}
+
+        self.running = False
+        self.refresh_thread = None
+
+    def start(self):
+        self.running = True
+        self.refresh_thread = threading.Thread(target=self._run)
+        self.refresh_thread.daemon = True
+        self.refresh_thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.refresh_thread:
+            self.refresh_thread.join(timeout=5)
+        if self.redis_client is not None:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.zrem(TRACKERS_KEY, self.tracker_id)
+                pipe.delete(OPEN_KEY.format(self.tracker_id))
+                pipe.execute()
+            except Exception:
+                pass
+
+    # --- Événements (O(1), en mémoire) ---
+
+    def surge_multiplier(self, zone: str) -> float:
+        return self.surge.get(zone, 1.0)
+
+    def order_opened(self, zone: str):
+        with self.lock:
+            self.open_orders[zone] += 1
+
+    def order_closed(self, zone: str):
+        with self.lock:
+            if self.open_orders.get(zone, 0) > 0:
+                self.open_orders[zone] -= 1
+
+    def response(self, zone: str, is_interested: bool, courier_id: Optional[str] = None):
+        now = time.time()
+        bucket = int(now // self.bucket_seconds)
+        with self.lock:
+            windows = self.windows.get(zone)
+            if windows is None:
+                windows = self.windows[zone] = {metric: RingCounter(self.window_seconds, self.bucket_seconds)
+                                                for metric in WINDOW_METRICS}
+            windows['responses'].add(1, now)
+            self.pending[('responses', bucket, zone)] += 1
+            if is_interested:
+                windows['interested'].add(1, now)
+                self.pending[('interested', bucket, zone)] += 1
+                if courier_id is not None:
+                    self.couriers[zone][courier_id] = now
+                    self.pending_couriers[(bucket, zone)].add(courier_id)
+
+    def couriers_idle(self, idle: Dict[str, Iterable[str]]):
+        """Livreurs libres par zone (zone -> identifiants), disponibles sur la fenêtre glissante"""
+        now = time.time()
+        bucket = int(now // self.bucket_seconds)
+        with self.lock:
+            for zone, courier_ids in idle.items():
+                pending = self.pending_couriers[(bucket, zone)]
+                seen = self.couriers[zone]
+                for courier_id in courier_ids:
+                    seen[courier_id] = now
+                    pending.add(courier_id)
+
+    # --- Agrégation (thread de fond) ---
+
+    def _run(self):
+        while self.running:
+            try:
+                self.refresh()
+            except Exception as e:
+                log.warning("⚠️ Suivi des zones: rafraîchissement impossible (%s)", e)
+            time.sleep(self.refresh_interval)
+
+    def refresh(self):
+        """Pousse les compteurs locaux, relit la vue globale et recalcule les multiplicateurs"""
+        now = time.time()
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(int)
+            pending_couriers, self.pending_couriers = self.pending_couriers, defaultdict(set)
+            open_orders = {zone: count for zone, count in self.open_orders.items() if count}
+            local = {zone: {metric: counter.value(now) for metric, counter in windows.items()}
+                     for zone, windows in self.windows.items()}
+            # Livreurs disponibles sortis de la fenêtre
+            for zone, seen in list(self.couriers.items()):
+                for courier_id in [c for c, at in seen.items() if at <= now - self.window_seconds]:
+                    del seen[courier_id]
+                if not seen:
+                    del self.couriers[zone]
+            for zone, seen in self.couriers.items():
+                local.setdefault(zone, {})['couriers'] = len(seen)
+
+        if self.redis_client is None:
+            totals = {zone: dict(local.get(zone, {}), open_orders=open_orders.get(zone, 0))
+                      for zone in set(local) | set(open_orders)}
+        else:
+            try:
+                totals = self._exchange(now, pending, pending_couriers, open_orders)
+            except Exception:
+                # Compteurs gardés pour le prochain essai
+                with self.lock:
+                    for key, count in pending.items():
+                        self.pending[key] += count
+                    for key, couriers in pending_couriers.items():
+                        self.pending_couriers[key] |= couriers
+                raise
+
+        stats, surge = {}, {}
+        for zone, values in totals.items():
+            responses = values.get('responses', 0)
+            interested = values.get('interested', 0)
+            stats[zone] = {
+                'open_orders': values.get('open_orders', 0),
+                'available_couriers': values.get('couriers', 0),
+                'acceptance_rate': round(interested / responses, 3) if responses else None,
+                'responses': responses
+            }
+            surge[zone] = compute_surge(stats[zone]['open_orders'], stats[zone]['available_couriers'],
+                                        responses, interested)
+        self.zone_stats, self.surge = stats, surge
+
+    def _exchange(self, now: float, pending: Dict[tuple, int], pending_couriers: Dict[tuple, set],
+                  open_orders: Dict[str, int]) -> Dict[str, Dict]:
+        bucket_ttl = int(self.window_seconds + 2 * self.bucket_seconds)
+        open_key = OPEN_KEY.format(self.tracker_id)
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for (metric, bucket, zone), count in pending.items():
+            key = BUCKET_KEY.format(metric, bucket)
+            pipe.hincrby(key, zone, count)
+            pipe.expire(key, bucket_ttl)
+        for (bucket, zone), couriers in pending_couriers.items():
+            key = COURIERS_KEY.format(bucket, zone)
+            pipe.pfadd(key, *couriers)
+            pipe.expire(key, bucket_ttl)
+        pipe.delete(open_key)
+        if open_orders:
+            pipe.hset(open_key, mapping=open_orders)
+            pipe.expire(open_key, int(10 * self.refresh_interval) + 1)
+        pipe.zadd(TRACKERS_KEY, {self.tracker_id: now})
+        pipe.zremrangebyscore(TRACKERS_KEY, 0, now - 10 * self.refresh_interval)
+        pipe.zrange(TRACKERS_KEY, 0, -1)
+        tracker_ids = pipe.execute()[-1]
+
+        # Lecture de la fenêtre et des annonces ouvertes de tous les trackers
+        current = int(now // self.bucket_seconds)
+        buckets = range(current - int(math.ceil(self.window_seconds / self.bucket_seconds)) + 1, current + 1)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for metric in WINDOW_METRICS:
+            for bucket in buckets:
+                pipe.hgetall(BUCKET_KEY.format(metric, bucket))
+        for tracker_id in tracker_ids:
+            pipe.hgetall(OPEN_KEY.format(tracker_id))
+        results = pipe.execute()
+
+        totals: Dict[str, Dict] = defaultdict(lambda: defaultdict(int))
+        position = 0
+        for metric in WINDOW_METRICS:
+            for _ in buckets:
+                for zone, count in results[position].items():
+                    totals[_decode(zone)][metric] += int(count)
+                position += 1
+        for counts in results[position:]:
+            for zone, count in counts.items():
+                totals[_decode(zone)]['open_orders'] += int(count)
+
+        # Livreurs distincts de la fenêtre: union des HyperLogLog des buckets de chaque zone
+        zones = list(totals)
+        if zones:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for zone in zones:
+                pipe.pfcount(*[COURIERS_KEY.format(bucket, zone) for bucket in buckets])
+            for zone, count in zip(zones, pipe.execute()):
+                totals[zone]['couriers'] = int(count)
+        return totals
+
+
+def _decode(value) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else value